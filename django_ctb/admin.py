@@ -1,4 +1,5 @@
 from functools import update_wrapper
+from typing import cast
 
 from django.contrib import admin
 from django.contrib.admin.utils import unquote
@@ -15,19 +16,21 @@ from django_ctb.tasks import (
     complete_build,
     complete_order,
     generate_vendor_orders,
-    populate_mouser_vendor_part,
+    populate_mouser_vendor_parts,
     sync_project_version,
 )
 
 
 class ExtendibleModelAdminMixin:
-    def _getobj(self, request, object_id):
+    def _getobj(self, request, object_id, queryset=None):
         opts = self.model._meta  # type: ignore[unresolve-attribute]
 
         try:
-            obj = self.get_queryset(  # type: ignore[unresolve-attribute]
-                request,
-            ).get(pk=unquote(object_id))
+            if queryset is None:
+                queryset = self.get_queryset(  # type: ignore[unresolve-attribute]
+                    request,
+                )
+            obj = queryset.get(pk=unquote(object_id))
         except self.model.DoesNotExist:  # type: ignore[unresolve-attribute]
             # Don't raise Http404 just yet, because we haven't checked
             # permissions yet. We don't want an unauthenticated user to
@@ -82,6 +85,7 @@ class VendorAdmin(admin.ModelAdmin):
 
 class VendorOrderLineInline(admin.TabularInline):
     model = models.VendorOrderLine
+    readonly_fields = ("received_quantity",)
 
 
 @admin.register(models.VendorOrder)
@@ -134,20 +138,30 @@ class PartAdmin(admin.ModelAdmin):
     inlines = [VendorPartInline, InventoryLineInline]
 
 
+class VendorPartPriceBreakInline(admin.TabularInline):
+    model = models.VendorPartPriceBreak
+
+
 @admin.register(models.VendorPart)
 class VendorPartAdmin(admin.ModelAdmin):
     list_display = ("item_number", "vendor", "part")
     list_filter = ("vendor",)
+    inlines = (VendorPartPriceBreakInline,)
     actions = ("_populate",)
 
     def _populate(self, request, queryset):
-        for row in queryset:
-            populate_mouser_vendor_part.send(row.pk)
-        self.message_user(request, f"{len(queryset)} processes started")
+        populate_mouser_vendor_parts.send([row.pk for row in queryset])
+        self.message_user(request, f"Populating {len(queryset)} vendor parts")
 
     _populate.short_description = "Populate fields (Mouser)"  # type: ignore[unresolve-attribute]
 
 
+@admin.register(models.MouserPartResponse)
+class MouserPartResponseAdmin(admin.ModelAdmin):
+    list_display = ("part_number", "fetched")
+    search_fields = ("part_number",)
+
+
 @admin.register(models.Owner)
 class OwnerAdmin(admin.ModelAdmin):
     list_display = ("id", "user")
@@ -167,7 +181,14 @@ class InventoryActionInline(admin.TabularInline):
 
 @admin.register(models.InventoryLine)
 class InventoryLineAdmin(admin.ModelAdmin):
-    list_display = ("part", "quantity", "owner", "item_numbers")
+    list_display = (
+        "part",
+        "quantity",
+        "reserved_quantity",
+        "quantity_on_hand",
+        "owner",
+        "item_numbers",
+    )
     list_filter = (
         "owner",
         "part__symbol",
@@ -210,8 +231,8 @@ class ProjectVersionAdmin(ExtendibleModelAdminMixin, admin.ModelAdmin):
     list_display = ("project", "revision", "commit_ref", "synced", "missing_part_count")
     list_filter = ("project",)
     inlines = [MissingPartInline, ProjectBuildInline]
-    actions = ("sync_bom",)
-    readonly_fields = ("last_synced_commit",)
+    actions = ("sync_bom", "force_sync_bom")
+    readonly_fields = ("last_synced_commit", "bom_hash")
 
     def sync_bom(self, request, queryset):
         for row in queryset:
@@ -220,6 +241,13 @@ class ProjectVersionAdmin(ExtendibleModelAdminMixin, admin.ModelAdmin):
 
     sync_bom.short_description = "Sync selected version BOMs"  # type: ignore[unresolve-attribute]
 
+    def force_sync_bom(self, request, queryset):
+        for row in queryset:
+            sync_project_version.send(row.pk, force=True)
+        self.message_user(request, f"{len(queryset)} processes started")
+
+    force_sync_bom.short_description = "Force sync selected version BOMs"  # type: ignore[unresolve-attribute]
+
     def missing_part_count(self, obj):  # pragma: no cover
         return obj.project_parts.filter(part__isnull=True).count()
 
@@ -237,10 +265,17 @@ class ProjectVersionAdmin(ExtendibleModelAdminMixin, admin.ModelAdmin):
         return my_urls + urls
 
     def bom_view(self, request, object_id):
+        queryset = cast(models.ProjectVersionQuerySet, self.get_queryset(request))
         return render(
             request,
             "admin/django_ctb/project_version_bom.html",
-            {"project_version": self._getobj(request, object_id)},
+            {
+                "project_version": self._getobj(
+                    request,
+                    object_id,
+                    queryset=queryset.with_costs(),
+                )
+            },
         )
 
 
@@ -140,6 +140,7 @@ class PartSerializer(serializers.ModelSerializer):
             "package_id",
             "vendor_parts",
             "equivalent_to_id",
+            "equivalence_class",
         )
 
 
@@ -225,6 +226,7 @@ class VendorOrderLineSerializer(serializers.ModelSerializer):
             "vendor_part_id",
             "vendor_order_id",
             "quantity",
+            "received_quantity",
             "cost",
         )
 
@@ -233,6 +235,10 @@ class InventoryLineSerializer(serializers.ModelSerializer):
     part_id = serializers.PrimaryKeyRelatedField(
         source="part", queryset=models.Part.objects.all()
     )
+    reserved_quantity = serializers.IntegerField(read_only=True)
+    # computed here (not read from the generated field) so that it is correct
+    #  for freshly saved instances without another query
+    quantity_on_hand = serializers.SerializerMethodField()
 
     class Meta:
         model = models.InventoryLine
@@ -240,11 +246,16 @@ class InventoryLineSerializer(serializers.ModelSerializer):
             "id",
             "part_id",
             "quantity",
+            "reserved_quantity",
+            "quantity_on_hand",
             "created",
             "updated",
             "is_deprioritized",
         )
 
+    def get_quantity_on_hand(self, obj) -> int:
+        return obj.quantity + obj.reserved_quantity
+
 
 class InventoryActionSerializer(serializers.ModelSerializer):
     inventory_line_id = serializers.PrimaryKeyRelatedField(
@@ -276,7 +287,7 @@ class InventoryActionSerializer(serializers.ModelSerializer):
 class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Project
-        fields = ("id", "name", "git_server", "git_user", "git_repo")
+        fields = ("id", "name", "git_server", "git_user", "git_repo", "git_remote")
 
 
 class ProjectVersionSerializer(serializers.ModelSerializer):
@@ -296,6 +307,7 @@ class ProjectVersionSerializer(serializers.ModelSerializer):
             "pcb_cost",
             "synced",
             "last_synced_commit",
+            "bom_hash",
         )
 
 
@@ -470,3 +482,172 @@ class ProjectBuildPartReservationSerializer(
 
 class GenericActionSerializer(serializers.Serializer):
     pass
+
+
+class ProjectVersionSyncSerializer(serializers.Serializer):
+    force = serializers.BooleanField(
+        default=False,
+        help_text="Re-sync even if the commit and BOM content were already synced",
+    )
+
+
+class VendorOrderReceiptLineSerializer(serializers.Serializer):
+    order_line_id = serializers.IntegerField(help_text="Vendor order line received")
+    quantity = serializers.IntegerField(min_value=1, help_text="Quantity received")
+
+
+class VendorOrderReceiveSerializer(serializers.Serializer):
+    lines = VendorOrderReceiptLineSerializer(
+        many=True,
+        required=False,
+        help_text="Lines received; everything left on the order when omitted",
+    )
+
+    def validate_lines(self, lines):
+        """Each order line may be given once"""
+        order_line_ids = [line["order_line_id"] for line in lines]
+        if len(set(order_line_ids)) != len(order_line_ids):
+            raise serializers.ValidationError("Order lines may only be given once")
+        return lines
+
+
+class PushWebhookResponseSerializer(serializers.Serializer):
+    project_versions = serializers.ListField(
+        child=serializers.IntegerField(),
+        help_text="Project versions queued for sync",
+    )
+
+
+class ProjectVersionDiffSerializer(serializers.Serializer):
+    commit_ref = serializers.CharField(
+        help_text="Commit ref (branch, tag, or commit hash) to compare"
+    )
+    base_ref = serializers.CharField(
+        required=False,
+        help_text="Commit ref to compare against; defaults to the last synced commit",
+    )
+
+
+class ProjectVersionSubstitutionSerializer(serializers.Serializer):
+    project_part_id = serializers.IntegerField(help_text="Project part to substitute")
+    part_id = serializers.PrimaryKeyRelatedField(
+        source="part",
+        queryset=models.Part.objects.all(),
+        help_text="Part to use instead",
+    )
+
+
+class ProjectVersionSimulateSerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1, help_text="Number to build")
+    excluded_project_part_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        default=list,
+        help_text="Project parts to leave out of the build",
+    )
+    substitutions = ProjectVersionSubstitutionSerializer(
+        many=True,
+        required=False,
+        help_text="Parts to use in place of those called for by project parts",
+    )
+
+
+class SimulatedDebitSerializer(serializers.Serializer):
+    inventory_line_id = serializers.PrimaryKeyRelatedField(
+        source="inventory_line", queryset=models.InventoryLine.objects.all()
+    )
+    quantity = serializers.IntegerField()
+
+
+class SimulatedReservationSerializer(serializers.Serializer):
+    part_id = serializers.PrimaryKeyRelatedField(
+        source="part", queryset=models.Part.objects.all()
+    )
+    quantity = serializers.IntegerField()
+    project_part_ids = serializers.PrimaryKeyRelatedField(
+        source="project_parts", many=True, queryset=models.ProjectPart.objects.all()
+    )
+    debits = SimulatedDebitSerializer(many=True)
+
+
+class SimulatedShortageSerializer(serializers.Serializer):
+    part_id = serializers.PrimaryKeyRelatedField(
+        source="part", queryset=models.Part.objects.all()
+    )
+    quantity = serializers.IntegerField()
+
+
+class ClearanceSimulationSerializer(serializers.Serializer):
+    project_version_id = serializers.PrimaryKeyRelatedField(
+        source="project_version", queryset=models.ProjectVersion.objects.all()
+    )
+    quantity = serializers.IntegerField()
+    is_clear = serializers.BooleanField()
+    reservations = SimulatedReservationSerializer(many=True)
+    shortages = SimulatedShortageSerializer(many=True)
+
+
+class BuildableQuantityQuerySerializer(serializers.Serializer):
+    exclude_optional = serializers.BooleanField(
+        default=False, help_text="Leave optional project parts out of the demand"
+    )
+    include_deprioritized = serializers.BooleanField(
+        default=False, help_text="Count deprioritized inventory lines as stock"
+    )
+
+
+class LimitingPartSerializer(serializers.Serializer):
+    part_id = serializers.PrimaryKeyRelatedField(
+        source="part", queryset=models.Part.objects.all()
+    )
+    needed = serializers.IntegerField(help_text="Needed for each build")
+    stock = serializers.IntegerField(help_text="On hand, with equivalent parts")
+
+
+class BuildableQuantitySerializer(serializers.Serializer):
+    project_version_id = serializers.PrimaryKeyRelatedField(
+        source="project_version", queryset=models.ProjectVersion.objects.all()
+    )
+    quantity = serializers.IntegerField(
+        allow_null=True,
+        help_text="Most builds the stock covers; null when no parts are called for",
+    )
+    limiting_parts = LimitingPartSerializer(many=True)
+
+
+class BillOfMaterialsRowSerializer(serializers.Serializer):
+    line_number = serializers.IntegerField()
+    references = serializers.ListField(child=serializers.CharField())
+    quantity = serializers.IntegerField()
+    value = serializers.CharField()
+    footprint_name = serializers.CharField()
+    vendor_name = serializers.CharField(allow_null=True)
+    item_number = serializers.CharField(allow_null=True)
+    optional = serializers.BooleanField()
+
+
+class BomDiffLineSerializer(serializers.Serializer):
+    line_number = serializers.IntegerField()
+    base_row = BillOfMaterialsRowSerializer(allow_null=True)
+    target_row = BillOfMaterialsRowSerializer(allow_null=True)
+    base_quantity = serializers.IntegerField()
+    target_quantity = serializers.IntegerField()
+    base_part_id = serializers.PrimaryKeyRelatedField(
+        source="base_part", read_only=True, allow_null=True
+    )
+    target_part_id = serializers.PrimaryKeyRelatedField(
+        source="target_part", read_only=True, allow_null=True
+    )
+    base_cost = serializers.FloatField()
+    target_cost = serializers.FloatField()
+
+
+class BomDiffSerializer(serializers.Serializer):
+    base_commit = serializers.CharField()
+    target_commit = serializers.CharField()
+    added = BomDiffLineSerializer(many=True)
+    removed = BomDiffLineSerializer(many=True)
+    quantity_changed = BomDiffLineSerializer(many=True)
+    part_changed = BomDiffLineSerializer(many=True)
+    base_cost = serializers.FloatField()
+    target_cost = serializers.FloatField()
+    cost_delta = serializers.FloatField()
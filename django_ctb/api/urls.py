@@ -1,4 +1,5 @@
 # ruff: noqa: D100
+from django.urls import path
 from rest_framework import routers
 
 from django_ctb.api import views
@@ -50,5 +51,7 @@ router.register(
 
 app_name = "django-ctb-api"
 
-urlpatterns = []
+urlpatterns = [
+    path("webhooks/push/", views.PushWebhookView.as_view(), name="push-webhook"),
+]
 urlpatterns += router.urls
@@ -2,15 +2,29 @@
 API Views for handling CRUD operations on resources
 """
 
+import json
+
+from django.db.models import GeneratedField
 from django_filters import rest_framework as filters
 from drf_spectacular.utils import extend_schema
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from django_ctb import models
 from django_ctb.api import serializers
+from django_ctb.exceptions import InvalidReceipt, RefNotFoundException
+from django_ctb.services import (
+    BomDiffService,
+    BuildableQuantityCalculator,
+    ClearanceSimulator,
+    PushWebhookService,
+    VendorOrderService,
+)
 from django_ctb.tasks import (
     cancel_build,
     clear_to_build,
@@ -18,6 +32,8 @@ from django_ctb.tasks import (
     complete_order,
     generate_vendor_orders,
     populate_mouser_vendor_part,
+    receive_order,
+    sync_project,
     sync_project_version,
 )
 
@@ -112,6 +128,7 @@ class PartViewSet(viewsets.ModelViewSet):
         "unit": ["exact"],
         "symbol": ["exact"],
         "package__name": ["exact", "contains"],
+        "equivalence_class": ["exact"],
     }
 
 
@@ -197,6 +214,47 @@ class VendorOrderViewSet(OwnedModelMixin, viewsets.ModelViewSet):
         complete_order.send(int(pk))
         return Response(serializers.GenericActionSerializer().data)
 
+    @extend_schema(
+        request=serializers.VendorOrderReceiveSerializer,
+        responses={
+            200: serializers.GenericActionSerializer,
+        },
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        serializer_class=serializers.VendorOrderReceiveSerializer,
+    )
+    def receive(self, request, pk):
+        """
+        Credits inventory with the quantity received of each given order line
+        (all that is left of the order when no lines are given), creating
+        inventory actions to track. Lines may be received in several parts;
+        the vendor order is marked fulfilled once every line has been
+        received in full.
+
+        Refuses lines which are not on the order, quantities beyond what is
+        left of a line, and vendor orders which are already fulfilled.
+        """
+        vendor_order = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = serializer.validated_data.get("lines")
+        received = (
+            None
+            if lines is None
+            else {line["order_line_id"]: line["quantity"] for line in lines}
+        )
+        try:
+            VendorOrderService().validate_receipt(vendor_order, received)
+        except InvalidReceipt as e:
+            raise ValidationError({"lines": [str(e)]}) from None
+        receive_order.send(
+            vendor_order.pk,
+            None if received is None else [list(line) for line in received.items()],
+        )
+        return Response(serializers.GenericActionSerializer().data)
+
 
 @extend_schema(tags=["Procurement"])
 class VendorOrderLineViewSet(OwnedSubModelMixin, viewsets.ModelViewSet):
@@ -210,6 +268,31 @@ class VendorOrderLineViewSet(OwnedSubModelMixin, viewsets.ModelViewSet):
     owner_ref = "vendor_order__owner"
 
 
+class InventoryLineFilterSet(filters.FilterSet):
+    """
+    Filters for inventory lines; ``quantity_on_hand`` is a generated field
+    which django-filter does not recognize on its own.
+    """
+
+    class Meta:
+        model = models.InventoryLine
+        fields = {
+            "part": ["exact"],
+            "part__name": ["exact", "contains"],
+            "part__value": ["exact", "contains"],
+            "part__unit": ["exact"],
+            "part__symbol": ["exact"],
+            "part__package__name": ["exact", "contains"],
+            "part__equivalence_class": ["exact"],
+            "quantity": ["exact", "gte", "lte"],
+            "reserved_quantity": ["exact", "gte", "lte"],
+            "quantity_on_hand": ["exact", "gte", "lte"],
+        }
+        filter_overrides = {
+            GeneratedField: {"filter_class": filters.NumberFilter},
+        }
+
+
 @extend_schema(tags=["Inventory"])
 class InventoryLineViewSet(OwnedModelMixin, viewsets.ModelViewSet):
     """
@@ -219,15 +302,9 @@ class InventoryLineViewSet(OwnedModelMixin, viewsets.ModelViewSet):
     queryset = models.InventoryLine.objects.all()
     serializer_class = serializers.InventoryLineSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = (filters.DjangoFilterBackend,)
-    filterset_fields = {
-        "part": ["exact"],
-        "part__name": ["exact", "contains"],
-        "part__value": ["exact", "contains"],
-        "part__unit": ["exact"],
-        "part__symbol": ["exact"],
-        "part__package__name": ["exact", "contains"],
-    }
+    filter_backends = (filters.DjangoFilterBackend, OrderingFilter)
+    filterset_class = InventoryLineFilterSet
+    ordering_fields = ("quantity", "reserved_quantity", "quantity_on_hand", "updated")
 
 
 @extend_schema(tags=["Inventory"])
@@ -262,6 +339,31 @@ class ProjectViewSet(OwnedModelMixin, viewsets.ModelViewSet):
     serializer_class = serializers.ProjectSerializer
     permission_classes = [IsAuthenticated]
 
+    @extend_schema(
+        request=serializers.ProjectVersionSyncSerializer,
+        responses={
+            200: serializers.GenericActionSerializer,
+        },
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        serializer_class=serializers.ProjectVersionSyncSerializer,
+    )
+    def sync(self, request, pk):
+        """
+        Syncs the BOMs of every version of the project together (see the
+        project version ``sync`` action). Each commit ref is resolved once,
+        versions at the same commit with the same BOM path share a single
+        download, and downloads run concurrently. Versions whose commit was
+        already synced are skipped unless ``force`` is given.
+        """
+        project = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sync_project.send(project.pk, force=serializer.validated_data["force"])
+        return Response(serializers.GenericActionSerializer().data)
+
 
 @extend_schema(tags=["Projects"])
 class ProjectVersionViewSet(OwnedSubModelMixin, viewsets.ModelViewSet):
@@ -282,14 +384,15 @@ class ProjectVersionViewSet(OwnedSubModelMixin, viewsets.ModelViewSet):
     }
 
     @extend_schema(
+        request=serializers.ProjectVersionSyncSerializer,
         responses={
             200: serializers.GenericActionSerializer,
-        }
+        },
     )
     @action(
         detail=True,
         methods=["post"],
-        serializer_class=serializers.GenericActionSerializer,
+        serializer_class=serializers.ProjectVersionSyncSerializer,
     )
     def sync(self, request, pk):
         """
@@ -305,10 +408,164 @@ class ProjectVersionViewSet(OwnedSubModelMixin, viewsets.ModelViewSet):
 
         Upon completion of the sync process the commit hash where the BOM was
         found will be saved and the project version will be marked synced.
+        Versions whose commit (or BOM content) was already synced are skipped
+        unless ``force`` is given.
         """
-        sync_project_version.send(int(pk))
+        project_version = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sync_project_version.send(
+            project_version.pk, force=serializer.validated_data["force"]
+        )
         return Response(serializers.GenericActionSerializer().data)
 
+    @extend_schema(
+        parameters=[serializers.ProjectVersionDiffSerializer],
+        responses={
+            200: serializers.BomDiffSerializer,
+        },
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        serializer_class=serializers.ProjectVersionDiffSerializer,
+    )
+    def diff(self, request, pk):
+        """
+        Shows what would change were the project version synced at
+        ``commit_ref``: the BOM lines added and removed, the lines whose
+        quantity changed or which resolve to a different part, and the change
+        in the cost of the parts. Lines are matched by line number, as when
+        syncing. Compares against the last synced commit unless ``base_ref``
+        is given. Nothing is written.
+        """
+        project_version = self.get_object()
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        try:
+            bom_diff = BomDiffService().diff(
+                project_version.pk, **serializer.validated_data
+            )
+        except RefNotFoundException:
+            raise NotFound("Commit ref or BOM not found") from None
+        return Response(serializers.BomDiffSerializer(bom_diff).data)
+
+    @extend_schema(
+        request=serializers.ProjectVersionSimulateSerializer,
+        responses={
+            200: serializers.ClearanceSimulationSerializer,
+        },
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        serializer_class=serializers.ProjectVersionSimulateSerializer,
+    )
+    def simulate(self, request, pk):
+        """
+        Shows what clearing a build of ``quantity`` of the project version
+        would do with the current stock: the reservations it would make (and
+        the inventory lines they would draw on) and the shortages it would
+        record. Project parts may be excluded or given substitute parts, as
+        for a build. Nothing is written (no build is created and no stock is
+        reserved).
+        """
+        project_version = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        simulation = ClearanceSimulator(
+            project_version=project_version,
+            quantity=serializer.validated_data["quantity"],
+            excluded_project_part_pks=serializer.validated_data[
+                "excluded_project_part_ids"
+            ],
+            substitutions={
+                substitution["project_part_id"]: substitution["part"].pk
+                for substitution in serializer.validated_data.get("substitutions", [])
+            },
+        ).simulate()
+        return Response(serializers.ClearanceSimulationSerializer(simulation).data)
+
+    @extend_schema(
+        parameters=[serializers.BuildableQuantityQuerySerializer],
+        responses={
+            200: serializers.BuildableQuantitySerializer(many=True),
+        },
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        serializer_class=serializers.BuildableQuantityQuerySerializer,
+        pagination_class=None,
+    )
+    def buildable(self, request):
+        """
+        Shows the most builds of each project version which the stock on hand
+        covers (counting equivalent parts), and the parts which limit it.
+        Each version is considered on its own; the project version filters
+        apply. Optional project parts are counted unless ``exclude_optional``
+        is given; deprioritized inventory lines are not counted unless
+        ``include_deprioritized`` is given.
+        """
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        buildable = BuildableQuantityCalculator(
+            self.filter_queryset(self.get_queryset()),
+            include_optional=not serializer.validated_data["exclude_optional"],
+            include_deprioritized=serializer.validated_data["include_deprioritized"],
+        ).calculate()
+        return Response(
+            serializers.BuildableQuantitySerializer(buildable, many=True).data
+        )
+
+
+@extend_schema(tags=["Projects"])
+class PushWebhookView(APIView):
+    """
+    Receives push webhooks (Github format, JSON content type) signed with
+    ``CTB_WEBHOOK_SECRET``. Project versions whose ``commit_ref`` is the
+    pushed ref are queued for sync when the push may have changed their BOM.
+    """
+
+    authentication_classes = ()
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        request=None,
+        responses={202: serializers.PushWebhookResponseSerializer},
+    )
+    def post(self, request):
+        """
+        Queues the project versions affected by the push for sync.
+        """
+        service = PushWebhookService()
+        if not service.verify_signature(
+            body=request.body, signature=request.headers.get("X-Hub-Signature-256")
+        ):
+            return Response(
+                {"detail": "Invalid signature."}, status=status.HTTP_403_FORBIDDEN
+            )
+        event = request.headers.get("X-GitHub-Event", "push")
+        if event != "push":
+            # e.g. the `ping` sent when the webhook is created
+            return Response({"project_versions": []}, status=status.HTTP_202_ACCEPTED)
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            return Response(
+                {"detail": "Payload must be a JSON object."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        project_versions = service.get_affected_project_versions(payload)
+        for project_version in project_versions:
+            sync_project_version.send(project_version.pk)
+        return Response(
+            {"project_versions": [pv.pk for pv in project_versions]},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
 
 @extend_schema(tags=["Projects"])
 class ProjectPartViewSet(OwnedSubModelMixin, viewsets.ModelViewSet):
@@ -2,6 +2,9 @@
 Config for Django Clear To Build
 """
 
+import tempfile
+from pathlib import Path
+
 from appconf import AppConf
 from django.conf import settings  # noqa: F401
 
@@ -12,6 +15,42 @@ class DjangoCTBAppConf(AppConf):
     """
 
     MOUSER_API_KEY = ""
+    # Mouser Search API call limits, shared by every worker (0 for no limit)
+    MOUSER_CALLS_PER_MINUTE = 30
+    MOUSER_CALLS_PER_DAY = 1000
+    # seconds a Mouser call waits for the rate limit before it is requeued
+    MOUSER_RATE_LIMIT_MAX_WAIT = 10.0
+    # seconds a Mouser part response is reused before it is fetched again
+    MOUSER_CACHE_TTL = 60 * 60 * 24
+    # where the rate limits are tracked, and the cache or Redis server used;
+    #  the cache must be shared by the workers (not the local memory cache)
+    RATE_LIMIT_BACKEND = "django_ctb.ratelimit.CacheRateLimitBackend"
+    RATE_LIMIT_CACHE = "default"
+    RATE_LIMIT_REDIS_URL = "redis://localhost:6379/0"
+    # HTTP transport used for GitHub, BOM downloads, and Mouser
+    HTTP_TRANSPORT = "django_ctb.transport.HttpTransport"
+    HTTP_TIMEOUT = 10.0
+    HTTP_MAX_RETRIES = 3
+    HTTP_BACKOFF_FACTOR = 0.5
+    HTTP_POOL_CONNECTIONS = 10
+    HTTP_POOL_MAXSIZE = 10
+    HTTP_METRICS_SIZE = 1000
+    # cache alias for GitHub responses and ref resolutions
+    GITHUB_CACHE = "default"
+    # seconds a branch or tag resolution is trusted before it is revalidated
+    GITHUB_REF_TTL = 60
+    # seconds a revalidatable GitHub response is kept
+    GITHUB_CACHE_TIMEOUT = 60 * 60 * 24
+    # directory holding the bare mirrors of local mirror projects
+    GIT_MIRROR_ROOT = str(Path(tempfile.gettempdir()) / "django-ctb-mirrors")
+    # seconds between fetches of a mirror
+    GIT_MIRROR_FETCH_INTERVAL = 60
+    # seconds a git command (e.g. a clone or fetch of a mirror) may run
+    GIT_TIMEOUT = 120.0
+    # threads resolving refs and downloading BOMs when a project is synced
+    SYNC_MAX_WORKERS = 4
+    # shared secret signing push webhooks; the endpoint refuses all when unset
+    WEBHOOK_SECRET = ""
 
     class Meta:
         prefix = "ctb"
@@ -25,6 +25,12 @@ class MissingVendorPart(Exception):
     """
 
 
+class InvalidReceipt(Exception):
+    """
+    When received quantities do not match what is left on a vendor order
+    """
+
+
 class RefNotFoundException(Exception):
     """
     The given commit ref could not be found in the git server
@@ -2,43 +2,107 @@
 Services for interacting with the GitHub API
 """
 
-import requests
+import hashlib
+import re
+import time
+from collections.abc import Callable
+from typing import Any
 
+from django.core.cache import BaseCache, caches
+
+from django_ctb.conf import settings
 from django_ctb.exceptions import RefNotFoundException
+from django_ctb.transport import get_transport
+
+_FULL_SHA = re.compile(r"[0-9a-f]{40}")
 
 
 class GithubService:
     """
     Service for interacting with the GitHub API. Doesn't use a client, just
     calls directly for these minimal public endpoints.
+
+    Responses are cached in the ``CTB_GITHUB_CACHE`` cache. Full commit hashes
+    are immutable, so they are cached forever; branches and tags are trusted
+    for ``CTB_GITHUB_REF_TTL`` seconds, then revalidated with
+    ``If-None-Match`` (a ``304`` doesn't count against the rate limit).
     """
 
     base_url: str = "https://api.github.com"
 
-    def _get_commit_hash(self, *, url_prefix: str, commit_ref: str) -> str:
-        response = requests.get(f"{url_prefix}/commits/{commit_ref}")
-        if response.status_code >= 300:
-            # this is not a commit!
+    @property
+    def cache(self) -> BaseCache:
+        """The cache holding API responses and ref resolutions"""
+        return caches[settings.CTB_GITHUB_CACHE]
+
+    @staticmethod
+    def _cache_key(kind: str, *parts: str) -> str:
+        # urls and refs may not be safe cache keys
+        digest = hashlib.sha256("\0".join(parts).encode()).hexdigest()
+        return f"ctb:github:{kind}:{digest}"
+
+    def _get(self, url: str, *, extract: Callable[[Any], Any], immutable=False):
+        """
+        Gets the ``url``, returning the part of the response picked by
+        ``extract``. Cached, and revalidated with the response ETag once
+        stale.
+        """
+        key = self._cache_key("url", url)
+        entry = self.cache.get(key)
+        if entry is not None and (
+            entry["fresh_until"] is None or entry["fresh_until"] > time.time()
+        ):
+            return entry["value"]
+        headers = {"Accept": "application/vnd.github+json"}
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        response = get_transport().get(url, headers=headers)
+        if entry is not None and response.status_code == 304:
+            value, etag = entry["value"], entry["etag"]
+        elif response.status_code >= 300:
+            self.cache.delete(key)
             raise RefNotFoundException
-        # should be the same thing, but this seems right
-        return response.json()["sha"]
+        else:
+            value, etag = extract(response.json()), response.headers.get("ETag")
+        self.cache.set(
+            key,
+            {
+                "value": value,
+                "etag": etag,
+                "fresh_until": None
+                if immutable
+                else time.time() + settings.CTB_GITHUB_REF_TTL,
+            },
+            timeout=None if immutable else settings.CTB_GITHUB_CACHE_TIMEOUT,
+        )
+        return value
+
+    def _get_commit_hash(self, *, url_prefix: str, commit_ref: str) -> str:
+        # this is not a commit if the request fails!
+        return self._get(
+            f"{url_prefix}/commits/{commit_ref}",
+            extract=lambda commit: commit["sha"],
+            # other refs (e.g. a branch) resolve here too, but can move
+            immutable=_FULL_SHA.fullmatch(commit_ref) is not None,
+        )
 
     def _get_branch_head_commit_hash(self, *, url_prefix: str, commit_ref: str) -> str:
-        response = requests.get(f"{url_prefix}/branches/{commit_ref}")
-        if response.status_code >= 300:
-            # this is not a branch!
-            raise RefNotFoundException
-        return response.json()["commit"]["sha"]
+        # this is not a branch if the request fails!
+        return self._get(
+            f"{url_prefix}/branches/{commit_ref}",
+            extract=lambda branch: branch["commit"]["sha"],
+        )
 
     def _get_tag_commit_hash(self, *, url_prefix: str, commit_ref: str) -> str:
-        response = requests.get(f"{url_prefix}/tags")
-        if response.status_code >= 300:
-            # this is a real problem!
-            raise RefNotFoundException
-        for tag in response.json():
-            if tag["name"] == commit_ref:
-                return tag["commit"]["sha"]
-        raise RefNotFoundException
+        # the list is shared by every tag of the repo
+        tags = self._get(
+            f"{url_prefix}/tags",
+            extract=lambda tags: {tag["name"]: tag["commit"]["sha"] for tag in tags},
+        )
+        try:
+            return tags[commit_ref]
+        except KeyError:
+            raise RefNotFoundException from None
 
     def get_commit_hash_for_ref(self, *, user: str, repo: str, commit_ref: str) -> str:
         """
@@ -49,27 +113,35 @@ class GithubService:
         - A branch name
         - A tag
 
-        The commit hash will be derived from the resource it represents.
+        The commit hash will be derived from the resource it represents. The
+        kind of resource which resolved the ``commit_ref`` is remembered, so
+        later calls go straight to it.
         """
         # the `commit_ref` could be found at these paths
         # - a commit hash proper: `/repos/{owner}/{repo}/commits/{commit_sha}`
         # - a branch name: `/repos/{owner}/{repo}/branches/{branch_name}`
         # - a tag: `/repos/{owner}/{repo}/tags` <- Only list, no detail...
         url_prefix = f"{self.base_url}/repos/{user}/{repo}"
-        try:
-            return self._get_commit_hash(url_prefix=url_prefix, commit_ref=commit_ref)
-        except RefNotFoundException:
-            pass
-        try:
-            return self._get_branch_head_commit_hash(
-                url_prefix=url_prefix, commit_ref=commit_ref
-            )
-        except RefNotFoundException:
-            pass
-        try:
-            return self._get_tag_commit_hash(
-                url_prefix=url_prefix, commit_ref=commit_ref
-            )
-        except RefNotFoundException:
-            pass
+        lookups = {
+            "commit": self._get_commit_hash,
+            "branch": self._get_branch_head_commit_hash,
+            "tag": self._get_tag_commit_hash,
+        }
+        kind_key = self._cache_key("ref", url_prefix, commit_ref)
+        known_kind = self.cache.get(kind_key)
+        if known_kind in lookups:
+            try:
+                return lookups[known_kind](url_prefix=url_prefix, commit_ref=commit_ref)
+            except RefNotFoundException:
+                pass
+        for kind, lookup in lookups.items():
+            if kind == known_kind:
+                continue
+            try:
+                commit_hash = lookup(url_prefix=url_prefix, commit_ref=commit_ref)
+            except RefNotFoundException:
+                continue
+            self.cache.set(kind_key, kind, timeout=settings.CTB_GITHUB_CACHE_TIMEOUT)
+            return commit_hash
+        self.cache.delete(kind_key)
         raise RefNotFoundException
@@ -0,0 +1,3 @@
+"""
+This page intentionally left blank
+"""
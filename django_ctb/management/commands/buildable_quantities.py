@@ -0,0 +1,76 @@
+"""
+Management command for reporting how many of each project version can be
+built from the stock on hand
+"""
+
+from django.core.management.base import BaseCommand
+
+from django_ctb import models
+from django_ctb.services import BuildableQuantityCalculator
+
+
+class Command(BaseCommand):
+    """
+    Reports the buildable quantity of every project version (or those given)
+    and the parts which limit it.
+    """
+
+    help = (
+        "Reports the most builds of each project version which the stock on hand"
+        " covers (counting equivalent parts), and the parts which limit it."
+    )
+
+    def add_arguments(self, parser):
+        """
+        Adds the project version pks and the ``--exclude-optional`` and
+        ``--include-deprioritized`` options.
+        """
+        parser.add_argument(
+            "project_versions",
+            nargs="*",
+            type=int,
+            help="project version pks (default: every project version)",
+        )
+        parser.add_argument(
+            "--exclude-optional",
+            action="store_true",
+            help="leave optional project parts out of the demand",
+        )
+        parser.add_argument(
+            "--include-deprioritized",
+            action="store_true",
+            help="count deprioritized inventory lines as stock",
+        )
+
+    def handle(
+        self,
+        *args,
+        project_versions=None,
+        exclude_optional=False,
+        include_deprioritized=False,
+        **options,
+    ):
+        """
+        Writes a line for each project version, followed by its limiting parts.
+        """
+        queryset = models.ProjectVersion.objects.all()
+        if project_versions:
+            queryset = queryset.filter(pk__in=project_versions)
+        buildable = BuildableQuantityCalculator(
+            queryset,
+            include_optional=not exclude_optional,
+            include_deprioritized=include_deprioritized,
+        ).calculate()
+        for buildable_quantity in buildable:
+            version = buildable_quantity.project_version
+            if buildable_quantity.quantity is None:
+                self.stdout.write(f"{version} (pk:{version.pk}): no parts")
+                continue
+            self.stdout.write(
+                f"{version} (pk:{version.pk}): {buildable_quantity.quantity}"
+            )
+            for limiting_part in buildable_quantity.limiting_parts:
+                self.stdout.write(
+                    f"  limited by {limiting_part.part}: {limiting_part.needed}"
+                    f" needed, {limiting_part.stock} in stock"
+                )
@@ -0,0 +1,52 @@
+"""
+Management command for verifying and rebuilding the denormalized pending
+reservation quantity of inventory lines
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_ctb import models
+
+
+class Command(BaseCommand):
+    """
+    Compares ``InventoryLine.reserved_quantity`` with the inventory actions of
+    pending reservations and corrects any disagreement.
+    """
+
+    help = (
+        "Verifies the pending reservation quantity of every inventory line against"
+        " its inventory actions and rebuilds those which disagree."
+    )
+
+    def add_arguments(self, parser):
+        """Adds the ``--check`` option."""
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="only report mismatched inventory lines; exit non-zero if any exist",
+        )
+
+    def handle(self, *args, check=False, **options):
+        """
+        Reports every mismatched inventory line, then rebuilds them (or raises
+        ``CommandError`` when only checking).
+        """
+        inventory_lines = models.InventoryLine.objects.all()
+        mismatched = inventory_lines.with_mismatched_reserved_quantity().order_by("pk")
+        for inventory_line in mismatched:
+            self.stdout.write(
+                f"Inventory line {inventory_line.pk}: reserved quantity is"
+                f" {inventory_line.reserved_quantity}, expected"
+                f" {inventory_line.expected_reserved_quantity}"
+            )
+        if check:
+            if mismatched:
+                raise CommandError(
+                    f"{len(mismatched)} inventory line(s) have a mismatched"
+                    " reserved quantity"
+                )
+            self.stdout.write("All reserved quantities match")
+            return
+        rebuilt = inventory_lines.rebuild_reserved_quantities()
+        self.stdout.write(f"Rebuilt {len(rebuilt)} inventory line(s)")
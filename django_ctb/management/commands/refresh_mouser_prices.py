@@ -0,0 +1,43 @@
+"""
+Management command for refreshing the prices of Mouser parts whose cached
+response is stale
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_ctb.mouser.services import MouserService
+from django_ctb.ratelimit import RateLimitExceeded
+
+
+class Command(BaseCommand):
+    """
+    Fetches the stale cached Mouser responses again, most used parts first,
+    and updates the cost and volume of their vendor parts.
+    """
+
+    help = (
+        "Refreshes the cost and volume of Mouser vendor parts whose cached"
+        " response is older than CTB_MOUSER_CACHE_TTL, most used parts first."
+    )
+
+    def add_arguments(self, parser):
+        """Adds the ``--limit`` option."""
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="refresh at most this many part numbers",
+        )
+
+    def handle(self, *args, limit=None, **options):
+        """
+        Refreshes the stale prices (or raises ``CommandError`` when the Mouser
+        rate limit is reached).
+        """
+        try:
+            refreshed = MouserService().refresh_stale_prices(limit=limit)
+        except RateLimitExceeded as exc:
+            raise CommandError(
+                f"Mouser rate limit reached; retry after {exc.retry_after:.0f}s"
+            ) from exc
+        self.stdout.write(f"Refreshed {refreshed} Mouser part(s)")
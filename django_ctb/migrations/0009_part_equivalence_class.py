@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:45
+
+import django.db.migrations.operations.special
+from django.db import migrations, models
+
+
+def populate_equivalence_classes(apps, schema_editor):
+    Part = apps.get_model("django_ctb", "Part")
+    parents = {}
+
+    def _find(pk):
+        parents.setdefault(pk, pk)
+        while parents[pk] != pk:
+            pk = parents[pk]
+        return pk
+
+    for pk, equivalent_to_pk in Part.objects.values_list("pk", "equivalent_to"):
+        root = _find(pk)
+        if equivalent_to_pk is not None:
+            other_root = _find(equivalent_to_pk)
+            parents[max(root, other_root)] = min(root, other_root)
+    Part.objects.bulk_update(
+        [Part(pk=pk, equivalence_class=_find(pk)) for pk in list(parents)],
+        ["equivalence_class"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0004_owner_squashed_0008_alter_inventoryline_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='part',
+            name='equivalence_class',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, help_text='Shared by all parts linked through ``equivalent_to`` (at any depth); maintained automatically', null=True),
+        ),
+        migrations.RunPython(
+            code=populate_equivalence_classes,
+            reverse_code=django.db.migrations.operations.special.RunPython.noop,
+        ),
+    ]
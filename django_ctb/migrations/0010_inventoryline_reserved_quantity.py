@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:54
+
+import django.db.migrations.operations.special
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_reserved_quantities(apps, schema_editor):
+    InventoryAction = apps.get_model("django_ctb", "InventoryAction")
+    InventoryLine = apps.get_model("django_ctb", "InventoryLine")
+    pending = (
+        InventoryAction.objects.filter(
+            reservation__isnull=False, reservation__utilized__isnull=True
+        )
+        .order_by()
+        .values_list("inventory_line")
+        .annotate(total=Sum("delta"))
+    )
+    # values for delta are negative
+    InventoryLine.objects.bulk_update(
+        [
+            InventoryLine(pk=inventory_line_pk, reserved_quantity=-total)
+            for inventory_line_pk, total in pending
+            if total
+        ],
+        ["reserved_quantity"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0009_part_equivalence_class'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryline',
+            name='reserved_quantity',
+            field=models.IntegerField(default=0, editable=False, help_text='quantity held by pending (unutilized) reservations; maintained by the build services'),
+        ),
+        migrations.RunPython(
+            code=populate_reserved_quantities,
+            reverse_code=django.db.migrations.operations.special.RunPython.noop,
+        ),
+        migrations.AddField(
+            model_name='inventoryline',
+            name='quantity_on_hand',
+            field=models.GeneratedField(db_persist=False, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '+', models.F('reserved_quantity')), help_text='Number of parts which are countable in physical inventory (includes numbers from pending or cleared reservations)', output_field=models.IntegerField()),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0010_inventoryline_reserved_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectversion',
+            name='bom_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the BOM content at the last synced commit', max_length=64, null=True),
+        ),
+    ]
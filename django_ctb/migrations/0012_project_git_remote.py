@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0011_projectversion_bom_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='git_remote',
+            field=models.CharField(blank=True, help_text='URL (or path) of the repo to clone; overrides user and repo', max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='git_server',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Github'), (2, 'Local mirror')], default=1),
+        ),
+    ]
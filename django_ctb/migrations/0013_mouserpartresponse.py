@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0012_project_git_remote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouserPartResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part_number', models.CharField(max_length=64, unique=True)),
+                ('response', models.JSONField(help_text='the part as returned by Mouser')),
+                ('fetched', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0013_mouserpartresponse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorPartPriceBreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('volume', models.PositiveIntegerField(help_text='minimum quantity for this cost')),
+                ('cost', models.DecimalField(decimal_places=4, help_text='per unit', max_digits=8)),
+                ('vendor_part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_breaks', to='django_ctb.vendorpart')),
+            ],
+            options={
+                'ordering': ('vendor_part', 'volume'),
+                'constraints': [models.UniqueConstraint(fields=('vendor_part', 'volume'), name='unique_vendor_part_volume')],
+            },
+        ),
+    ]
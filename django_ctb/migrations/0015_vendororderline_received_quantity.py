@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:30
+
+import django.db.migrations.operations.special
+from django.db import migrations, models
+
+
+def receive_fulfilled_order_lines(apps, schema_editor):
+    VendorOrderLine = apps.get_model("django_ctb", "VendorOrderLine")
+    VendorOrderLine.objects.filter(vendor_order__fulfilled__isnull=False).update(
+        received_quantity=models.F("quantity")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0014_vendorpartpricebreak'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendororderline',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='quantity received so far; maintained by the order services'),
+        ),
+        migrations.RunPython(
+            code=receive_fulfilled_order_lines,
+            reverse_code=django.db.migrations.operations.special.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ctb', '0015_vendororderline_received_quantity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='git_remote',
+            field=models.CharField(blank=True, help_text='https:// or ssh:// URL of the repo to clone; overrides user and repo', max_length=255, null=True, validators=[django.core.validators.URLValidator(schemes=['https', 'ssh'])]),
+        ),
+    ]
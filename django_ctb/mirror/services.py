@@ -0,0 +1,197 @@
+"""
+Services for reading repositories through bare local mirrors
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from django_ctb.conf import settings
+from django_ctb.exceptions import RefNotFoundException
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # not on POSIX; only the threads of one process are kept apart
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_FULL_SHA = re.compile(r"[0-9a-f]{40}")
+_mirror_locks: dict[Path, threading.Lock] = {}
+_mirror_locks_lock = threading.Lock()
+
+
+class GitMirrorService:
+    """
+    Service for resolving refs and reading files from a bare mirror of a git
+    repository kept under ``CTB_GIT_MIRROR_ROOT``. The mirror is cloned on
+    first use and refreshed with an incremental fetch (at most once every
+    ``CTB_GIT_MIRROR_FETCH_INTERVAL`` seconds). Commits which are already in
+    the mirror are read without touching the remote.
+
+    Cloning and fetching a mirror is serialized across threads and, through a
+    file lock beside the mirror, across the worker processes of a host. The
+    lock file must be on a local filesystem for the processes to see each
+    other's locks. Git commands never prompt and are stopped after
+    ``CTB_GIT_TIMEOUT`` seconds, so a remote which does not answer cannot
+    hold the lock.
+    """
+
+    class GitError(Exception):
+        """A git command failed"""
+
+        pass
+
+    def __init__(
+        self,
+        *,
+        root: str | Path | None = None,
+        fetch_interval=None,
+        timeout: float | None = None,
+    ):
+        """
+        Options default to the ``CTB_GIT_MIRROR_...`` settings and
+        ``CTB_GIT_TIMEOUT``.
+        """
+        self.root = Path(settings.CTB_GIT_MIRROR_ROOT if root is None else root)
+        self.fetch_interval = (
+            settings.CTB_GIT_MIRROR_FETCH_INTERVAL
+            if fetch_interval is None
+            else fetch_interval
+        )
+        self.timeout = settings.CTB_GIT_TIMEOUT if timeout is None else timeout
+
+    def _git(self, *args: str, git_dir: Path | None = None) -> bytes:
+        command = ["git"]
+        if git_dir is not None:
+            command += ["--git-dir", str(git_dir)]
+        command += args
+        # git must fail rather than wait for credentials (or a host key) while
+        #  the mirror is locked
+        env = {
+            **os.environ,
+            "GIT_TERMINAL_PROMPT": "0",
+            "GIT_SSH_COMMAND": "ssh -oBatchMode=yes",
+        }
+        try:
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                check=False,
+                env=env,
+                timeout=self.timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            raise self.GitError(f"git {args[0]} timed out after {self.timeout}s") from e
+        if result.returncode != 0:
+            raise self.GitError(result.stderr.decode(errors="replace").strip())
+        return result.stdout
+
+    def mirror_path(self, remote: str) -> Path:
+        """
+        Location of the mirror of ``remote``
+        """
+        name = remote.rstrip("/").rsplit("/", 1)[-1].removesuffix(".git")
+        digest = hashlib.sha256(remote.encode()).hexdigest()[:16]
+        return self.root / f"{name}-{digest}.git"
+
+    @contextmanager
+    def _lock(self, path: Path) -> Iterator[None]:
+        with _mirror_locks_lock:
+            thread_lock = _mirror_locks.setdefault(path, threading.Lock())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with thread_lock:
+            if fcntl is None:  # pragma: no cover
+                yield
+                return
+            with open(path.with_name(f"{path.name}.lock"), "wb") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(self, remote: str, *, force=False) -> Path:
+        """
+        Clones the mirror of ``remote`` or, unless it was fetched within the
+        fetch interval (or ``force`` is given), fetches its new objects and
+        refs.
+        """
+        path = self.mirror_path(remote)
+        with self._lock(path):
+            stamp = path / "FETCH_HEAD"
+            if not path.exists():
+                logger.info(f">> Cloning mirror of {remote}")
+                try:
+                    self._git("clone", "--mirror", "--quiet", "--", remote, str(path))
+                except self.GitError:
+                    # a clone which was stopped may leave a partial mirror
+                    shutil.rmtree(path, ignore_errors=True)
+                    raise
+                stamp.touch()
+            elif (
+                force
+                or not stamp.exists()
+                or stamp.stat().st_mtime + self.fetch_interval <= time.time()
+            ):
+                logger.info(f">> Fetching mirror of {remote}")
+                self._git("fetch", "--prune", "--quiet", "origin", git_dir=path)
+                stamp.touch()
+        return path
+
+    def _rev_parse(self, path: Path, commit_ref: str) -> str | None:
+        try:
+            output = self._git(
+                "rev-parse",
+                "--verify",
+                "--quiet",
+                f"{commit_ref}^{{commit}}",
+                git_dir=path,
+            )
+        except self.GitError:
+            return None
+        return output.decode().strip()
+
+    def get_commit_hash_for_ref(self, *, remote: str, commit_ref: str) -> str:
+        """
+        Find the commit hash for the given ``commit_ref`` (a commit hash,
+        branch, or tag) in the mirror of ``remote``. A full commit hash which
+        is already mirrored is resolved without fetching.
+        """
+        if not commit_ref or commit_ref.startswith("-"):
+            raise RefNotFoundException
+        path = self.mirror_path(remote)
+        if _FULL_SHA.fullmatch(commit_ref) and path.exists():
+            if commit_hash := self._rev_parse(path, commit_ref):
+                return commit_hash
+        for force in (False, True):
+            # a ref may be newer than a recent fetch; fetch once more to be sure
+            try:
+                path = self.update(remote, force=force)
+            except self.GitError as e:
+                logger.error(f"Cannot update mirror of {remote}: {e}")
+                raise RefNotFoundException from e
+            if commit_hash := self._rev_parse(path, commit_ref):
+                return commit_hash
+        raise RefNotFoundException
+
+    def read_file(self, *, remote: str, commit_hash: str, path: str) -> bytes:
+        """
+        Contents of the file at ``path`` in the given commit, read from the
+        mirror of ``remote``
+        """
+        return self._git(
+            "cat-file",
+            "blob",
+            f"{commit_hash}:{path.lstrip('/')}",
+            git_dir=self.mirror_path(remote),
+        )
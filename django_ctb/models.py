@@ -3,10 +3,13 @@ Data models (and database models) for stock and projects.
 """
 
 import re
-from typing import TYPE_CHECKING
+from datetime import timedelta
+from typing import TYPE_CHECKING, ClassVar, cast
 
 from django.conf import settings
-from django.db import models
+from django.core.validators import URLValidator
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from pydantic import AliasChoices, BaseModel, Field, field_validator
 
@@ -61,6 +64,66 @@ class Vendor(models.Model):
         return self.name
 
 
+def _find_equivalence_classes(links: list[tuple[int, int | None]]) -> dict[int, int]:
+    """
+    Union-find over ``(part pk, equivalent_to pk)`` links. Returns the
+    equivalence class (the lowest part pk in the group) for every part.
+    """
+    parents: dict[int, int] = {}
+
+    def _find(pk: int) -> int:
+        parents.setdefault(pk, pk)
+        root = pk
+        while parents[root] != root:
+            root = parents[root]
+        # compress the path so later lookups are quick
+        while parents[pk] != root:
+            parents[pk], pk = root, parents[pk]
+        return root
+
+    for pk, equivalent_to_pk in links:
+        root = _find(pk)
+        if equivalent_to_pk is not None:
+            other_root = _find(equivalent_to_pk)
+            # the lowest pk is always the root
+            parents[max(root, other_root)] = min(root, other_root)
+    return {pk: _find(pk) for pk in list(parents)}
+
+
+class PartQuerySet(models.QuerySet["Part"]):
+    """
+    Queryset for parts.
+    """
+
+    def rebuild_equivalence_classes(self) -> dict[int, int]:
+        """
+        Recomputes the equivalence class of the selected parts from their
+        ``equivalent_to`` links and saves any which have changed. The
+        selection must hold whole equivalence classes (e.g. every part with
+        a given ``equivalence_class``, or every part). Returns the
+        equivalence class for each selected part.
+        """
+        rows = list(self.values_list("pk", "equivalent_to", "equivalence_class"))
+        classes = _find_equivalence_classes(
+            [(pk, equivalent_to_pk) for pk, equivalent_to_pk, _ in rows]
+        )
+        self.model.objects.bulk_update(
+            [
+                self.model(pk=pk, equivalence_class=classes[pk])
+                for pk, _, equivalence_class in rows
+                if equivalence_class != classes[pk]
+            ],
+            ["equivalence_class"],
+        )
+        return {pk: classes[pk] for pk, _, _ in rows}
+
+
+if TYPE_CHECKING:
+
+    class PartManager(PartQuerySet, models.Manager["Part"]):
+        """The manager made by ``PartQuerySet.as_manager``"""
+
+
 class Part(models.Model):
     """
     Individual parts which are available for procurement from a vendor and
@@ -110,8 +173,22 @@ class Part(models.Model):
         null=True,
         blank=True,
     )
+    equivalence_class = models.BigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text=(
+            "Shared by all parts linked through ``equivalent_to`` (at any "
+            "depth); maintained automatically"
+        ),
+    )
+
+    objects: ClassVar["PartManager"] = cast("PartManager", PartQuerySet.as_manager())
 
     if TYPE_CHECKING:
+        package_id: int | None
+        equivalent_to_id: int | None
         equivalents: RelatedManager["Part"]
         vendor_parts: RelatedManager["VendorPart"]
         inventory_lines: RelatedManager["InventoryLine"]
@@ -119,6 +196,63 @@ class Part(models.Model):
     def __str__(self):  # pragma: no cover
         return f"{self.name} {self.symbol} {self.value} -- {self.package}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values, **kwargs):  # noqa: D102
+        instance = super().from_db(db, field_names, values, **kwargs)
+        instance._saved_equivalent_to_id = instance.__dict__.get("equivalent_to_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the part, then updates the equivalence classes of any parts
+        affected by a change to ``equivalent_to``. The equivalence class is
+        never written when updating a part (the instance may be stale); only
+        ``rebuild_equivalence_classes`` changes it.
+        """
+        if not self._state.adding and not kwargs.get("force_insert"):
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                deferred_fields = self.get_deferred_fields()
+                update_fields = [
+                    _field.attname
+                    for _field in self._meta.concrete_fields
+                    if not _field.primary_key and _field.attname not in deferred_fields
+                ]
+            kwargs["update_fields"] = [
+                name for name in update_fields if name != "equivalence_class"
+            ]
+        super().save(*args, **kwargs)
+        if self.equivalence_class is None or self.equivalent_to_id != getattr(
+            self, "_saved_equivalent_to_id", None
+        ):
+            # the old class of this part and the class of the part it is now
+            #  equivalent to hold every part whose class may change
+            affected_classes = Part.objects.filter(
+                pk__in=[self.pk, self.equivalent_to_id]
+            ).values("equivalence_class")
+            classes = Part.objects.filter(
+                models.Q(pk=self.pk) | models.Q(equivalence_class__in=affected_classes)
+            ).rebuild_equivalence_classes()
+            self.equivalence_class = classes[self.pk]
+        self._saved_equivalent_to_id = self.equivalent_to_id
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the part, then splits its equivalence class if removing the
+        part has separated the remaining parts.
+        """
+        equivalence_class = (
+            Part.objects.filter(pk=self.pk)
+            .values_list("equivalence_class", flat=True)
+            .first()
+        )
+        result = super().delete(*args, **kwargs)
+        if equivalence_class is not None:
+            Part.objects.filter(
+                equivalence_class=equivalence_class
+            ).rebuild_equivalence_classes()
+        return result
+
     @property
     def unit_cost(self) -> float:
         """
@@ -166,6 +300,11 @@ class VendorPart(models.Model):
         db_persist=False,
     )
 
+    if TYPE_CHECKING:
+        vendor_id: int
+        part_id: int
+        price_breaks: RelatedManager["VendorPartPriceBreak"]
+
     @property
     def url(self):  # pragma: no cover
         """
@@ -180,6 +319,100 @@ class VendorPart(models.Model):
         ordering = ("vendor__name", "item_number")
 
 
+class VendorPartPriceBreak(models.Model):
+    """
+    The cost per unit of a vendor part when at least ``volume`` are
+    purchased. A vendor part may have many; without any, its own cost and
+    volume stand in as its only break.
+    """
+
+    vendor_part = models.ForeignKey(
+        VendorPart, related_name="price_breaks", on_delete=models.CASCADE
+    )
+    volume = models.PositiveIntegerField(help_text="minimum quantity for this cost")
+    cost = models.DecimalField(decimal_places=4, max_digits=8, help_text="per unit")
+
+    def __str__(self):  # pragma: no cover
+        return f"{self.vendor_part} - {self.volume}+ @ {self.cost}"
+
+    class Meta:
+        ordering = ("vendor_part", "volume")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("vendor_part", "volume"), name="unique_vendor_part_volume"
+            )
+        ]
+
+
+class MouserPartResponseQuerySet(models.QuerySet["MouserPartResponse"]):
+    """
+    Queryset for cached Mouser part responses.
+    """
+
+    def _cutoff(self):
+        return timezone.now() - timedelta(seconds=settings.CTB_MOUSER_CACHE_TTL)
+
+    def fresh(self) -> "MouserPartResponseQuerySet":
+        """
+        Selects the responses fetched within ``CTB_MOUSER_CACHE_TTL`` seconds.
+        """
+        return self.filter(fetched__gt=self._cutoff())
+
+    def stale(self) -> "MouserPartResponseQuerySet":
+        """
+        Selects the responses older than ``CTB_MOUSER_CACHE_TTL`` seconds.
+        """
+        return self.filter(fetched__lte=self._cutoff())
+
+    def by_priority(self) -> "MouserPartResponseQuerySet":
+        """
+        Orders the responses by how many project parts use the part (most
+        first), then by age (oldest first). Annotates each with ``usage``.
+        """
+        usage = (
+            ProjectPart.objects.filter(
+                part__vendor_parts__vendor__name="Mouser",
+                part__vendor_parts__item_number=models.OuterRef("part_number"),
+            )
+            .order_by()
+            .values("part__vendor_parts__item_number")
+            .annotate(count=models.Count("pk"))
+            .values("count")
+        )
+        return self.annotate(
+            usage=Coalesce(
+                models.Subquery(usage, output_field=models.IntegerField()), 0
+            )
+        ).order_by("-usage", "fetched", "pk")
+
+
+if TYPE_CHECKING:
+
+    class MouserPartResponseManager(
+        MouserPartResponseQuerySet, models.Manager["MouserPartResponse"]
+    ):
+        """The manager made by ``MouserPartResponseQuerySet.as_manager``"""
+
+
+class MouserPartResponse(models.Model):
+    """
+    The part data last returned by the Mouser Search API for a part number,
+    reused for ``CTB_MOUSER_CACHE_TTL`` seconds rather than calling the API
+    again.
+    """
+
+    part_number = models.CharField(max_length=64, unique=True)
+    response = models.JSONField(help_text="the part as returned by Mouser")
+    fetched = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects: ClassVar["MouserPartResponseManager"] = cast(
+        "MouserPartResponseManager", MouserPartResponseQuerySet.as_manager()
+    )
+
+    def __str__(self):  # pragma: no cover
+        return f"{self.part_number} ({self.fetched:%Y-%m-%d %H:%M})"
+
+
 class Owner(models.Model):
     """
     The entity which owns the Inventories, VendorOrders, Projects, and more.
@@ -205,6 +438,10 @@ class ImplicitProjectPart(models.Model):
     for_package = models.ForeignKey(Package, on_delete=models.PROTECT)
     quantity = models.SmallIntegerField(default=1)
 
+    if TYPE_CHECKING:
+        part_id: int
+        for_package_id: int
+
 
 class VendorOrder(models.Model):
     """
@@ -222,6 +459,8 @@ class VendorOrder(models.Model):
         return f"{self.vendor} #{self.order_number}"
 
     if TYPE_CHECKING:
+        owner_id: int
+        vendor_id: int
         lines: RelatedManager["VendorOrderLine"]
 
 
@@ -237,8 +476,17 @@ class VendorOrderLine(models.Model):
         VendorPart, on_delete=models.PROTECT, related_name="lines"
     )
     quantity = models.PositiveIntegerField()
+    received_quantity = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="quantity received so far; maintained by the order services",
+    )
     cost = models.DecimalField(decimal_places=4, max_digits=8, help_text="per unit")
 
+    if TYPE_CHECKING:
+        vendor_order_id: int
+        vendor_part_id: int
+
     def __str__(self):  # pragma: no cover
         return (
             f"{self.vendor_order.vendor} {self.vendor_order.order_number} "
@@ -246,11 +494,89 @@ class VendorOrderLine(models.Model):
         )
 
 
+class InventoryLineQuerySet(models.QuerySet["InventoryLine"]):
+    """
+    Queryset for inventory lines.
+    """
+
+    def locked(self) -> "InventoryLineQuerySet":
+        """
+        Locks the selected inventory lines for the rest of the transaction.
+        Lines are always locked in primary key order so that concurrent
+        transactions cannot deadlock one another.
+        """
+        return self.select_for_update(of=("self",)).order_by("pk")
+
+    def with_expected_reserved_quantity(self) -> "InventoryLineQuerySet":
+        """
+        Annotates each inventory line with ``expected_reserved_quantity``, the
+        quantity held by pending (unutilized) reservations according to the
+        inventory actions.
+        """
+        pending = (
+            InventoryAction.objects.filter(
+                inventory_line=models.OuterRef("pk"),
+                reservation__isnull=False,
+                reservation__utilized__isnull=True,
+            )
+            .order_by()
+            .values("inventory_line")
+            .annotate(total=models.Sum("delta"))
+            .values("total")
+        )
+        return self.annotate(
+            # values for delta are negative
+            expected_reserved_quantity=-Coalesce(
+                models.Subquery(pending, output_field=models.IntegerField()), 0
+            )
+        )
+
+    def with_mismatched_reserved_quantity(self) -> "InventoryLineQuerySet":
+        """
+        Selects the inventory lines whose ``reserved_quantity`` disagrees with
+        their inventory actions.
+        """
+        return self.with_expected_reserved_quantity().exclude(
+            reserved_quantity=models.F("expected_reserved_quantity")
+        )
+
+    def rebuild_reserved_quantities(self) -> list["InventoryLine"]:
+        """
+        Recomputes ``reserved_quantity`` from the inventory actions for every
+        selected inventory line which disagrees with them. Returns the lines
+        which were corrected.
+        """
+        with transaction.atomic():
+            mismatched = list(
+                self.with_mismatched_reserved_quantity()
+                .select_for_update(of=("self",))
+                .order_by("pk")
+            )
+            for inventory_line in mismatched:
+                inventory_line.reserved_quantity = (
+                    inventory_line.expected_reserved_quantity
+                )
+            self.model.objects.bulk_update(
+                mismatched, ["reserved_quantity"], batch_size=500
+            )
+        return mismatched
+
+
+if TYPE_CHECKING:
+
+    class InventoryLineManager(InventoryLineQuerySet, models.Manager["InventoryLine"]):
+        """The manager made by ``InventoryLineQuerySet.as_manager``"""
+
+
 class InventoryLine(models.Model):
     """
     Represents the stock of an individual part.
     """
 
+    objects: ClassVar["InventoryLineManager"] = cast(
+        "InventoryLineManager", InventoryLineQuerySet.as_manager()
+    )
+
     created = models.DateTimeField(default=timezone.now)
     updated = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(Owner, on_delete=models.PROTECT)
@@ -261,10 +587,31 @@ class InventoryLine(models.Model):
         default=0,
         help_text="quantity on hand (unused reservations are removed from this number)",
     )
+    reserved_quantity = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text=(
+            "quantity held by pending (unutilized) reservations; maintained by"
+            " the build services"
+        ),
+    )
+    quantity_on_hand = models.GeneratedField(
+        expression=models.F("quantity") + models.F("reserved_quantity"),
+        output_field=models.IntegerField(),
+        db_persist=False,
+        help_text=(
+            "Number of parts which are countable in physical inventory (includes"
+            " numbers from pending or cleared reservations)"
+        ),
+    )
     is_deprioritized = models.BooleanField(default=False)
 
     if TYPE_CHECKING:
+        owner_id: int
+        part_id: int
         inventory_actions: RelatedManager["InventoryAction"]
+        # from ``InventoryLineQuerySet.with_expected_reserved_quantity``
+        expected_reserved_quantity: int
 
     @property
     def item_numbers(self) -> str:
@@ -280,20 +627,6 @@ class InventoryLine(models.Model):
     def __str__(self):  # pragma: no cover
         return f"{self.quantity}x {self.part} {self.item_numbers}"
 
-    @property
-    def quantity_on_hand(self) -> int:
-        """
-        Number of parts which are countable in physical inventory
-        (includes numbers from pending or cleared reservations).
-        """
-        pending_quantity = sum(
-            self.inventory_actions.filter(
-                reservation__isnull=False, reservation__utilized__isnull=True
-            ).values_list("delta", flat=True)
-        )
-        # values for delta are negative
-        return self.quantity - pending_quantity
-
 
 class InventoryAction(models.Model):
     """
@@ -321,6 +654,11 @@ class InventoryAction(models.Model):
     # when did it happen
     created = models.DateTimeField(default=timezone.now)
 
+    if TYPE_CHECKING:
+        inventory_line_id: int
+        order_line_id: int | None
+        reservation_id: int | None
+
     def __str__(self):  # pragma: no cover
         if self.order_line is not None:
             return (
@@ -341,6 +679,7 @@ class Project(models.Model):
     class GitServer(models.IntegerChoices):
         UNKNOWN = 0
         GITHUB = 1
+        MIRROR = 2, "Local mirror"
 
     owner = models.ForeignKey(Owner, on_delete=models.PROTECT)
     name = models.CharField(max_length=64)
@@ -350,14 +689,28 @@ class Project(models.Model):
     )
     git_user = models.CharField(max_length=64, null=True)
     git_repo = models.CharField(max_length=64, null=True)
+    git_remote = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        # only network remotes; a path or file:// URL would let any project
+        #  owner read repos on the server through the mirror
+        validators=[URLValidator(schemes=["https", "ssh"])],
+        help_text=(
+            "https:// or ssh:// URL of the repo to clone; overrides user and repo"
+        ),
+    )
 
     @property
     def git_url(self) -> str:
         """
-        URL to the git repo represented by the project.
+        URL to the git repo represented by the project. Local mirrors are
+        cloned from here (Github unless ``git_remote`` is given).
         """
+        if self.git_remote:
+            return self.git_remote
         _url: str = "https://"
-        if self.git_server == self.GitServer.GITHUB:
+        if self.git_server in (self.GitServer.GITHUB, self.GitServer.MIRROR):
             _url += "github.com"
         _url += f"/{self.git_user}/{self.git_repo}"
         return _url
@@ -366,6 +719,67 @@ class Project(models.Model):
         return self.name
 
 
+def _cheapest_unit_cost(part_ref: str) -> Coalesce:
+    """
+    Subquery expression for the cost of the cheapest vendor part of the part
+    referenced by ``part_ref`` (mirrors ``Part.unit_cost``).
+    """
+    cost = (
+        VendorPart.objects.filter(part=models.OuterRef(part_ref))
+        .order_by("cost")
+        .values("cost")[:1]
+    )
+    return Coalesce(
+        models.Subquery(cost),
+        models.Value(0),
+        output_field=models.DecimalField(decimal_places=4, max_digits=8),
+    )
+
+
+class ProjectVersionQuerySet(models.QuerySet["ProjectVersion"]):
+    """
+    Queryset for project versions.
+    """
+
+    def with_costs(self) -> "ProjectVersionQuerySet":
+        """
+        Annotates each project version with ``annotated_parts_cost``, the sum
+        of the line costs of its project parts, and prefetches the project
+        parts annotated by ``ProjectPartQuerySet.with_costs``. Costing a
+        version this way takes a fixed number of queries.
+        """
+        parts_cost = (
+            ProjectPart.objects.filter(project_version=models.OuterRef("pk"))
+            .with_costs()
+            .order_by()
+            .values("project_version")
+            .annotate(total=models.Sum("annotated_line_cost"))
+            .values("total")
+        )
+        return self.annotate(
+            annotated_parts_cost=Coalesce(
+                models.Subquery(parts_cost),
+                models.Value(0),
+                output_field=models.DecimalField(decimal_places=4, max_digits=12),
+            )
+        ).prefetch_related(
+            models.Prefetch(
+                "project_parts",
+                queryset=ProjectPart.objects.with_costs().select_related(
+                    "part__package"
+                ),
+            )
+        )
+
+
+if TYPE_CHECKING:
+
+    class ProjectVersionManager(
+        ProjectVersionQuerySet, models.Manager["ProjectVersion"]
+    ):
+        """The manager made by ``ProjectVersionQuerySet.as_manager``"""
+
+
 class ProjectVersion(models.Model):
     """
     A point-in-time representation of the project. Requires a commit ref
@@ -385,6 +799,16 @@ class ProjectVersion(models.Model):
     )
     synced = models.DateTimeField(null=True, blank=True)
     last_synced_commit = models.CharField(max_length=64, null=True, blank=True)
+    bom_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="SHA-256 of the BOM content at the last synced commit",
+    )
+
+    objects: ClassVar["ProjectVersionManager"] = cast(
+        "ProjectVersionManager", ProjectVersionQuerySet.as_manager()
+    )
 
     def __str__(self):  # pragma: no cover
         return f"{self.project} v{self.revision}"
@@ -392,6 +816,32 @@ class ProjectVersion(models.Model):
     if TYPE_CHECKING:
         project_parts: RelatedManager["ProjectPart"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values, **kwargs):  # noqa: D102
+        instance = super().from_db(db, field_names, values, **kwargs)
+        if "bom_path" in instance.__dict__:
+            instance._saved_bom_path = instance.bom_path
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the project version. Changing ``bom_path`` clears ``bom_hash``,
+        since the hash was taken of the BOM at the old path and the next sync
+        must read the new one.
+        """
+        if (
+            not self._state.adding
+            and self.bom_hash is not None
+            and "_saved_bom_path" in self.__dict__
+            and self.bom_path != self._saved_bom_path
+        ):
+            self.bom_hash = None
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "bom_hash" not in update_fields:
+                kwargs["update_fields"] = [*update_fields, "bom_hash"]
+        super().save(*args, **kwargs)
+        self._saved_bom_path = self.bom_path
+
     @property
     def pcb_unit_cost(self) -> float:
         """
@@ -406,8 +856,12 @@ class ProjectVersion(models.Model):
     def total_cost(self) -> float:
         """
         Extrapolates the full cost for all parts and PCB for this project
-        version.
+        version. Uses the annotation from ``ProjectVersionQuerySet.with_costs``
+        when present.
         """
+        annotated_parts_cost = getattr(self, "annotated_parts_cost", None)
+        if annotated_parts_cost is not None:
+            return self.pcb_unit_cost + float(annotated_parts_cost)
         return self.pcb_unit_cost + sum([p.line_cost for p in self.project_parts.all()])
 
     @property
@@ -436,6 +890,30 @@ class ProjectVersion(models.Model):
         return self._bom_url_template.format(commit_ref=commit_ref)
 
 
+class ProjectPartQuerySet(models.QuerySet["ProjectPart"]):
+    """
+    Queryset for project parts.
+    """
+
+    def with_costs(self) -> "ProjectPartQuerySet":
+        """
+        Annotates each project part with ``annotated_unit_cost``, the cost of
+        the cheapest vendor part for its part, and ``annotated_line_cost``.
+        """
+        return self.annotate(annotated_unit_cost=_cheapest_unit_cost("part")).annotate(
+            annotated_line_cost=models.ExpressionWrapper(
+                models.F("annotated_unit_cost") * models.F("quantity"),
+                output_field=models.DecimalField(decimal_places=4, max_digits=12),
+            )
+        )
+
+
+if TYPE_CHECKING:
+
+    class ProjectPartManager(ProjectPartQuerySet, models.Manager["ProjectPart"]):
+        """The manager made by ``ProjectPartQuerySet.as_manager``"""
+
+
 class ProjectPart(models.Model):
     """
     Representation of a BOM line for a project version. Holds references to the
@@ -470,14 +948,38 @@ class ProjectPart(models.Model):
     is_implicit = models.BooleanField(default=False)
     is_optional = models.BooleanField(default=False)
 
+    objects: ClassVar["ProjectPartManager"] = cast(
+        "ProjectPartManager", ProjectPartQuerySet.as_manager()
+    )
+
     if TYPE_CHECKING:
+        part_id: int | None
+        substitute_part_id: int | None
+        project_version_id: int
         footprint_refs: RelatedManager["ProjectPartFootprintRef"]
 
+    @property
+    def unit_cost(self) -> float:
+        """
+        Cost of each individual part of this project part. Uses the
+        annotation from ``ProjectPartQuerySet.with_costs`` when present.
+        """
+        annotated_unit_cost = getattr(self, "annotated_unit_cost", None)
+        if annotated_unit_cost is not None:
+            return float(annotated_unit_cost)
+        if self.part is None:
+            return float(0)
+        return self.part.unit_cost
+
     @property
     def line_cost(self) -> float:
         """
-        Extrapolates the cost for the parts to satisfy this project part
+        Extrapolates the cost for the parts to satisfy this project part. Uses
+        the annotation from ``ProjectPartQuerySet.with_costs`` when present.
         """
+        annotated_line_cost = getattr(self, "annotated_line_cost", None)
+        if annotated_line_cost is not None:
+            return float(annotated_line_cost)
         if self.part is None:
             return float(0)
         return float(self.part.unit_cost * self.quantity)
@@ -510,6 +1012,9 @@ class ProjectPartFootprintRef(models.Model):
     )
     footprint_ref = models.CharField(max_length=8)
 
+    if TYPE_CHECKING:
+        project_part_id: int
+
     def __str__(self):  # pragma: no cover
         return self.footprint_ref
 
@@ -535,7 +1040,9 @@ class ProjectBuild(models.Model):
     )
 
     if TYPE_CHECKING:
+        project_version_id: int
         shortfalls: RelatedManager["ProjectBuildPartShortage"]
+        part_reservations: RelatedManager["ProjectBuildPartReservation"]
 
     @property
     def is_complete(self) -> bool:
@@ -575,6 +1082,11 @@ class ProjectBuildPartShortage(models.Model):
         help_text="Part to be used to cover this shortage upon re-clearing",
     )
 
+    if TYPE_CHECKING:
+        part_id: int
+        project_build_id: int
+        fallback_part_id: int | None
+
 
 class ProjectBuildPartReservation(models.Model):
     """
@@ -624,6 +1136,8 @@ class ProjectBuildPartReservation(models.Model):
     order_key = models.IntegerField(default=0)
 
     if TYPE_CHECKING:
+        project_build_id: int
+        part_id: int | None
         inventory_actions: RelatedManager[InventoryAction]
 
     @property
@@ -671,6 +1185,9 @@ class ProjectBuildPartReservation(models.Model):
         return f"{is_utilized_prefix} {self.project_build}"
 
 
+_SI_INFIX_VALUE = re.compile(r"(?P<whole>\d+)(?P<prefix>[mMkKuUpPn])(?P<frac>\d+)")
+
+
 class BillOfMaterialsRow(BaseModel):
     """
     Maps to the default KiCAD BOM format with extra columns for "Vendor",
@@ -706,7 +1223,7 @@ class BillOfMaterialsRow(BaseModel):
         - 1N4553 -> 1N4553 (Nano is excluded so that diodes don't get mangled)
 
         """
-        matches = re.match(r"(?P<whole>\d+)(?P<prefix>[mMkKuUpPn])(?P<frac>\d+)", value)
+        matches = _SI_INFIX_VALUE.match(value)
         if matches is not None:
             _prefix = matches.group("prefix")
             if _prefix in "UP":
@@ -4,11 +4,15 @@ data models for extracting part data.
 """
 
 import logging
+from collections.abc import Iterable
 
-import requests
 from pydantic import BaseModel, ConfigDict, Field, field_validator
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
 
 from django_ctb.conf import settings
+from django_ctb.ratelimit import Limit, RateLimiter, RateLimitExceeded
+from django_ctb.transport import get_transport
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +31,10 @@ class MouserPricebreak(BaseModel):
 
     @field_validator("cost", mode="before")
     @classmethod
-    def _remove_prefix(cls, value: str) -> float:
-        return float(value.replace("$", ""))
+    def _remove_prefix(cls, value: str | float) -> float:
+        if isinstance(value, str):
+            value = value.replace("$", "")
+        return float(value)
 
 
 class MouserPart(BaseModel):
@@ -94,23 +100,51 @@ class MouserClient:
 
         pass
 
-    def get_part(self, mouser_part_number: str) -> MouserPart:
-        """
-        Search for the specifid part number and parse the response.
-        """
+    # the part number search takes up to this many part numbers, separated
+    #  by "|", in one request
+    max_part_numbers: int = 10
+
+    def _acquire(self):
+        RateLimiter(
+            "mouser",
+            [
+                Limit(calls=settings.CTB_MOUSER_CALLS_PER_MINUTE, period=60),
+                Limit(calls=settings.CTB_MOUSER_CALLS_PER_DAY, period=60 * 60 * 24),
+            ],
+        ).acquire(max_wait=settings.CTB_MOUSER_RATE_LIMIT_MAX_WAIT)
+
+    def _retry_after(self, response) -> float:
+        # seconds Mouser asks to wait after a 429, or a minute when it does
+        #  not say (the per-minute limit has been spent)
+        try:
+            retry_after = Retry().parse_retry_after(
+                response.headers.get("Retry-After") or ""
+            )
+        except InvalidHeader:
+            retry_after = 60.0
+        return float(retry_after)
+
+    def _search(self, part_numbers: str) -> _MouserSearchResponse:
         part_request = _MouserSearchByPartRequestRoot(
             SearchByPartRequest=_MouserSearchByPartRequest(
-                mouserPartNumber=mouser_part_number
+                mouserPartNumber=part_numbers
             )
         )
         _data = part_request.model_dump_json(by_alias=True)
         logger.debug(f"posting to get data {_data}")
-        response = requests.post(
+        # waits for the shared rate limit, or raises ``RateLimitExceeded``
+        self._acquire()
+        response = get_transport().post(
             "https://api.mouser.com/api/v1/search/partnumber",
             data=_data,
             params={"apiKey": settings.CTB_MOUSER_API_KEY},
             headers={"accept": "application/json", "content-type": "application/json"},
         )
+        if response.status_code == 429:
+            # Mouser's own limit was reached regardless of the shared one
+            retry_after = self._retry_after(response)
+            logger.warning(f"Mouser rate limited; retry after {retry_after}s")
+            raise RateLimitExceeded(retry_after=retry_after)
         if response.status_code >= 300:
             logger.error(
                 f"Part response status code: {response.status_code}: {response.text}"
@@ -124,11 +158,36 @@ class MouserClient:
         except Exception:
             logger.error(f"Can't validate data: {response.text}")
             raise
-        if response_model.search_results.number_of_result > 1:
-            for part in response_model.search_results.parts:
+        return response_model.search_results
+
+    def get_part(self, mouser_part_number: str) -> MouserPart:
+        """
+        Search for the specifid part number and parse the response.
+        """
+        search_results = self._search(mouser_part_number)
+        if search_results.number_of_result > 1:
+            for part in search_results.parts:
                 if part.mouser_part_number == mouser_part_number:
                     return part
-        elif response_model.search_results.number_of_result != 1:
-            logger.debug(f"response text: {response.text}")
+        elif search_results.number_of_result != 1:
             raise self.EmptyResponse
-        return response_model.search_results.parts[0]
+        return search_results.parts[0]
+
+    def get_parts(self, mouser_part_numbers: Iterable[str]) -> dict[str, MouserPart]:
+        """
+        Search for many part numbers, ``max_part_numbers`` per request. The
+        parts found are keyed by the requested part number (matched to the
+        "MouserPartNumber" of the results regardless of case); part numbers
+        which are not found are left out.
+        """
+        part_numbers = list(dict.fromkeys(mouser_part_numbers))
+        found: dict[str, MouserPart] = {}
+        for idx in range(0, len(part_numbers), self.max_part_numbers):
+            batch = part_numbers[idx : idx + self.max_part_numbers]
+            requested = {part_number.upper(): part_number for part_number in batch}
+            for part in self._search("|".join(batch)).parts:
+                part_number = requested.get(part.mouser_part_number.upper())
+                if part_number is not None:
+                    found.setdefault(part_number, part)
+            logger.info(f"Found {len(found)} of {idx + len(batch)} Mouser parts")
+        return found
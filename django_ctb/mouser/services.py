@@ -3,11 +3,15 @@ Services for interacting with the Mouser Search API
 """
 
 import logging
+import math
+from collections.abc import Iterable
 
 import dramatiq
+from django.utils import timezone
 
 from django_ctb import models
-from django_ctb.mouser.client import MouserClient, MouserPricebreak
+from django_ctb.mouser.client import MouserClient, MouserPart, MouserPricebreak
+from django_ctb.ratelimit import RateLimitExceeded
 
 logger = logging.getLogger(__name__)
 
@@ -27,14 +31,68 @@ class MouserService:
             cost = price_break.cost
         return volume, cost
 
-    def _populate(self, vendor_part: models.VendorPart):
-        mouser_part = MouserClient().get_part(vendor_part.item_number)
+    def _set_price_breaks(self, price_breaks: dict[int, list[MouserPricebreak]]):
+        # replaces the price breaks of each vendor part (by pk) with Mouser's
+        models.VendorPartPriceBreak.objects.filter(
+            vendor_part__in=price_breaks
+        ).delete()
+        models.VendorPartPriceBreak.objects.bulk_create(
+            [
+                models.VendorPartPriceBreak(
+                    vendor_part_id=vendor_part_pk, volume=volume, cost=cost
+                )
+                for vendor_part_pk, breaks in price_breaks.items()
+                for volume, cost in {
+                    price_break.volume: price_break.cost for price_break in breaks
+                }.items()
+            ]
+        )
+
+    def _get_cached(self, part_numbers: Iterable[str]) -> dict[str, MouserPart]:
+        return {
+            cached.part_number: MouserPart.model_validate(cached.response)
+            for cached in models.MouserPartResponse.objects.fresh().filter(
+                part_number__in=part_numbers
+            )
+        }
+
+    def _store(self, mouser_parts: dict[str, MouserPart]):
+        fetched = timezone.now()
+        models.MouserPartResponse.objects.bulk_create(
+            [
+                models.MouserPartResponse(
+                    part_number=part_number,
+                    response=mouser_part.model_dump(mode="json", by_alias=True),
+                    fetched=fetched,
+                )
+                for part_number, mouser_part in mouser_parts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["part_number"],
+            update_fields=["response", "fetched"],
+        )
+
+    def _get_part(self, item_number: str) -> MouserPart:
+        # the cached response when it is fresh, otherwise from the API
+        cached = self._get_cached([item_number])
+        if item_number in cached:
+            return cached[item_number]
+        mouser_part = MouserClient().get_part(item_number)
+        self._store({item_number: mouser_part})
+        return mouser_part
+
+    def _populate(
+        self, vendor_part: models.VendorPart, mouser_part: MouserPart | None = None
+    ):
+        if mouser_part is None:
+            mouser_part = self._get_part(vendor_part.item_number)
         vendor_part.url_path = mouser_part.url_path
         # find good price
         volume, cost = self._get_price_break(mouser_part.price_breaks)
         vendor_part.cost = cost
         vendor_part.volume = volume
         vendor_part.save()
+        self._set_price_breaks({vendor_part.pk: mouser_part.price_breaks})
         vendor_part.part.name = mouser_part.name
         vendor_part.part.value = mouser_part.name
         vendor_part.part.description = mouser_part.description
@@ -45,7 +103,7 @@ class MouserService:
 
     def _create(self, item_number: str) -> models.VendorPart:
         try:
-            mouser_part = MouserClient().get_part(item_number)
+            mouser_part = self._get_part(item_number)
         except MouserClient.EmptyResponse:
             raise self.MissingPart
         part, _ = models.Part.objects.get_or_create(
@@ -63,6 +121,7 @@ class MouserService:
             cost=cost,
             url_path=mouser_part.url_path,
         )
+        self._set_price_breaks({vendor_part.pk: mouser_part.price_breaks})
         return vendor_part
 
     def populate(self, vendor_part_pk: int):
@@ -74,11 +133,161 @@ class MouserService:
             return
         self._populate(vendor_part)
 
+    class RateLimited(Exception):
+        """The rate limit was reached before every vendor part was populated"""
+
+        def __init__(self, *, retry_after: float, vendor_part_pks: list[int]):
+            """
+            ``vendor_part_pks`` are the vendor parts left to populate.
+            """
+            super().__init__(f"{len(vendor_part_pks)} vendor parts left")
+            self.retry_after = retry_after
+            self.vendor_part_pks = vendor_part_pks
+
+    def populate_many(self, vendor_part_pks: list[int]):
+        """
+        Populate given vendor parts with data from Mouser Search API, looking
+        up their part numbers in batches rather than one request each. Part
+        numbers with a fresh cached response are not looked up.
+        """
+        vendor_parts = list(
+            models.VendorPart.objects.filter(pk__in=vendor_part_pks)
+            .select_related("part")
+            .order_by("pk")
+        )
+        cached = self._get_cached(
+            {vendor_part.item_number for vendor_part in vendor_parts}
+        )
+        for vendor_part in vendor_parts:
+            if vendor_part.item_number in cached:
+                self._populate(vendor_part, mouser_part=cached[vendor_part.item_number])
+        vendor_parts = [
+            vendor_part
+            for vendor_part in vendor_parts
+            if vendor_part.item_number not in cached
+        ]
+        client = MouserClient()
+        for idx in range(0, len(vendor_parts), client.max_part_numbers):
+            batch = vendor_parts[idx : idx + client.max_part_numbers]
+            try:
+                mouser_parts = client.get_parts(
+                    vendor_part.item_number for vendor_part in batch
+                )
+            except RateLimitExceeded as exc:
+                raise self.RateLimited(
+                    retry_after=exc.retry_after,
+                    vendor_part_pks=[
+                        vendor_part.pk for vendor_part in vendor_parts[idx:]
+                    ],
+                ) from exc
+            self._store(mouser_parts)
+            for vendor_part in batch:
+                mouser_part = mouser_parts.get(vendor_part.item_number)
+                if mouser_part is None:
+                    logger.info(f"No Mouser part like {vendor_part.item_number} found")
+                    continue
+                self._populate(vendor_part, mouser_part=mouser_part)
+
+    def refresh_stale_prices(self, limit: int | None = None) -> int:
+        """
+        Fetch again the cached responses older than ``CTB_MOUSER_CACHE_TTL``,
+        most used parts first, and update only the prices (cost, volume, and
+        price breaks) of the Mouser vendor parts for them. At most ``limit``
+        part numbers are fetched; part numbers Mouser no longer lists are
+        dropped from the cache. Returns the number of part numbers refreshed.
+
+        Raises ``RateLimitExceeded`` when the rate limit is reached; the part
+        numbers refreshed by then are fresh and will not be fetched again.
+        """
+        stale = list(
+            models.MouserPartResponse.objects.stale()
+            .by_priority()
+            .values_list("part_number", flat=True)[:limit]
+        )
+        client = MouserClient()
+        refreshed = 0
+        for idx in range(0, len(stale), client.max_part_numbers):
+            batch = stale[idx : idx + client.max_part_numbers]
+            mouser_parts = client.get_parts(batch)
+            self._store(mouser_parts)
+            missing = set(batch) - set(mouser_parts)
+            if missing:
+                logger.info(f"No Mouser parts like {sorted(missing)} found")
+                models.MouserPartResponse.objects.filter(
+                    part_number__in=missing
+                ).delete()
+            vendor_parts = list(
+                models.VendorPart.objects.filter(
+                    vendor__name="Mouser", item_number__in=mouser_parts
+                )
+            )
+            for vendor_part in vendor_parts:
+                vendor_part.volume, vendor_part.cost = self._get_price_break(
+                    mouser_parts[vendor_part.item_number].price_breaks
+                )
+            models.VendorPart.objects.bulk_update(vendor_parts, ["volume", "cost"])
+            self._set_price_breaks(
+                {
+                    vendor_part.pk: mouser_parts[vendor_part.item_number].price_breaks
+                    for vendor_part in vendor_parts
+                }
+            )
+            refreshed += len(mouser_parts)
+        logger.info(f"Refreshed {refreshed} of {len(stale)} stale Mouser parts")
+        return refreshed
+
+
+def _delay(retry_after: float) -> int:
+    # milliseconds to delay a requeued message
+    return math.ceil(retry_after * 1000)
+
 
 @dramatiq.actor
 def populate_mouser_vendor_part(vendor_part_pk: int):
-    """Populate given vendor part with data from Mouser Search API"""
-    MouserService().populate(vendor_part_pk)
+    """
+    Populate given vendor part with data from Mouser Search API. Requeued
+    for later when the rate limit is reached.
+    """
+    try:
+        MouserService().populate(vendor_part_pk)
+    except RateLimitExceeded as exc:
+        logger.info(f"Mouser rate limited; requeueing vendor part {vendor_part_pk}")
+        populate_mouser_vendor_part.send_with_options(
+            args=(vendor_part_pk,), delay=_delay(exc.retry_after)
+        )
+
+
+@dramatiq.actor
+def populate_mouser_vendor_parts(vendor_part_pks: list[int]):
+    """
+    Populate given vendor parts with data from Mouser Search API, in batches.
+    The vendor parts left when the rate limit is reached are requeued for
+    later.
+    """
+    try:
+        MouserService().populate_many(vendor_part_pks)
+    except MouserService.RateLimited as exc:
+        logger.info(
+            f"Mouser rate limited; requeueing {len(exc.vendor_part_pks)} vendor parts"
+        )
+        populate_mouser_vendor_parts.send_with_options(
+            args=(exc.vendor_part_pks,), delay=_delay(exc.retry_after)
+        )
+
+
+@dramatiq.actor
+def refresh_stale_mouser_prices(limit: int | None = None):
+    """
+    Refresh the prices of Mouser parts whose cached response is stale.
+    Requeued for later when the rate limit is reached.
+    """
+    try:
+        MouserService().refresh_stale_prices(limit=limit)
+    except RateLimitExceeded as exc:
+        logger.info("Mouser rate limited; requeueing price refresh")
+        refresh_stale_mouser_prices.send_with_options(
+            args=(limit,), delay=_delay(exc.retry_after)
+        )
 
 
 class MouserPartService:
@@ -127,10 +336,13 @@ class MouserPartService:
     def _get_vendor(self) -> models.Vendor:
         return models.Vendor.objects.get(name="Mouser")
 
-    def create_vendor_part(self, row: models.BillOfMaterialsRow) -> models.VendorPart:
+    def create_vendor_part(
+        self, row: models.BillOfMaterialsRow, *, populate: bool = True
+    ) -> models.VendorPart:
         """
         Creates new vendor part for a BOM row, initiates job to populate part
-        data from Mouser API
+        data from Mouser API. Without ``populate`` the caller is left to
+        populate the vendor part (e.g. in a batch with others).
         """
         part = self._get_part(row)
         # create placeholder vendor part
@@ -143,6 +355,7 @@ class MouserPartService:
             url_path="placeholder",
         )
         # send task for worker to populate part/vendor part with API data
-        populate_mouser_vendor_part.send(vendor_part.pk)
+        if populate:
+            populate_mouser_vendor_part.send(vendor_part.pk)
         # return placeholder vendor part
         return vendor_part
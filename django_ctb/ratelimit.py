@@ -0,0 +1,287 @@
+"""
+Token bucket rate limiting shared by every worker calling an external API
+(e.g. Mouser's per-minute and per-day call limits). Bucket state is kept in
+a pluggable backend: the Django cache, Redis, or (for tests) in process.
+"""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from django_ctb.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """No call can be made within the time the caller was willing to wait"""
+
+    def __init__(self, retry_after: float):
+        """
+        ``retry_after`` is the number of seconds until a call can be made.
+        """
+        super().__init__(f"Rate limited; retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Limit:
+    """At most ``calls`` calls every ``period`` seconds"""
+
+    calls: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        """Calls regained per second"""
+        return self.calls / self.period
+
+
+def _take(
+    buckets: list[tuple[float, float] | None], limits: list[Limit], now: float
+) -> tuple[list[tuple[float, float]], float]:
+    # refills each bucket (tokens, updated) for the time passed, then takes a
+    #  token from every bucket if each has one. Returns the new buckets and
+    #  the seconds to wait (0 when the tokens were taken)
+    refilled = []
+    wait = 0.0
+    for bucket, limit in zip(buckets, limits):
+        tokens, updated = bucket if bucket is not None else (limit.calls, now)
+        tokens = min(limit.calls, tokens + max(0.0, now - updated) * limit.rate)
+        refilled.append(tokens)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / limit.rate)
+    if wait == 0:
+        refilled = [tokens - 1 for tokens in refilled]
+    return [(tokens, now) for tokens in refilled], wait
+
+
+class RateLimitBackend(ABC):
+    """
+    Keeps the token buckets of the rate limiters. Subclasses implement
+    ``try_acquire`` atomically across the processes sharing the backend.
+    """
+
+    @abstractmethod
+    def try_acquire(self, key: str, limits: list[Limit]) -> float:
+        """
+        Takes a call from each limit of ``key`` if every limit allows one.
+        Returns 0 when the call was taken, otherwise the seconds until it
+        could be (nothing is taken).
+        """
+
+    @staticmethod
+    def _bucket_key(key: str, limit: Limit) -> str:
+        return f"ctb-ratelimit:{key}:{limit.calls}/{limit.period:g}"
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """
+    Keeps the buckets in this process only; for tests and single worker
+    setups.
+    """
+
+    def __init__(self):
+        """
+        Starts with every bucket full.
+        """
+        self.buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str, limits: list[Limit]) -> float:  # noqa: D102
+        bucket_keys = [self._bucket_key(key, limit) for limit in limits]
+        with self._lock:
+            buckets, wait = _take(
+                [self.buckets.get(bucket_key) for bucket_key in bucket_keys],
+                limits,
+                time.time(),
+            )
+            self.buckets.update(zip(bucket_keys, buckets))
+        return wait
+
+
+class CacheRateLimitBackend(RateLimitBackend):
+    """
+    Keeps the buckets in the Django cache ``CTB_RATE_LIMIT_CACHE``, which must
+    be shared by the workers (e.g. Redis, Memcached, or the database). Updates
+    are serialized with a short-lived lock made with ``cache.add``.
+
+    A local memory cache (Django's default) only limits the calls of one
+    process, and a dummy cache limits none; either is warned about.
+    """
+
+    # seconds a lock is held at most (should its holder die)
+    lock_timeout: int = 5
+
+    def __init__(self):
+        """
+        Warns when the configured cache is not shared by the workers.
+        """
+        if isinstance(self.cache, (LocMemCache, DummyCache)):
+            logger.warning(
+                f"Rate limits are kept in the {type(self.cache).__name__}"
+                f" {settings.CTB_RATE_LIMIT_CACHE!r} cache, which is not shared"
+                " by the workers; set CTB_RATE_LIMIT_CACHE to a shared cache"
+            )
+
+    @property
+    def cache(self):
+        """The configured Django cache"""
+        return caches[settings.CTB_RATE_LIMIT_CACHE]
+
+    def try_acquire(self, key: str, limits: list[Limit]) -> float:  # noqa: D102
+        lock_key = f"ctb-ratelimit-lock:{key}"
+        deadline = time.monotonic() + self.lock_timeout
+        while not self.cache.add(lock_key, 1, timeout=self.lock_timeout):
+            if time.monotonic() > deadline:
+                # the holder is gone; its lock is about to expire
+                logger.warning(f"Rate limit lock {lock_key} is stuck")
+                return 0.1
+            time.sleep(0.01)
+        try:
+            bucket_keys = [self._bucket_key(key, limit) for limit in limits]
+            stored = self.cache.get_many(bucket_keys)
+            buckets, wait = _take(
+                [stored.get(bucket_key) for bucket_key in bucket_keys],
+                limits,
+                time.time(),
+            )
+            for bucket_key, bucket, limit in zip(bucket_keys, buckets, limits):
+                self.cache.set(bucket_key, bucket, timeout=int(limit.period) + 1)
+        finally:
+            self.cache.delete(lock_key)
+        return wait
+
+
+_REDIS_TAKE = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local calls = tonumber(ARGV[i * 2])
+    local rate = calls / tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call("HMGET", key, "tokens", "updated")
+    local available = tonumber(bucket[1]) or calls
+    local updated = tonumber(bucket[2]) or now
+    available = math.min(calls, available + math.max(0, now - updated) * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    if wait == 0 then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call("HSET", key, "tokens", tostring(tokens[i]), "updated", ARGV[1])
+    redis.call("EXPIRE", key, math.ceil(tonumber(ARGV[i * 2 + 1])) + 1)
+end
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Keeps the buckets in Redis at ``CTB_RATE_LIMIT_REDIS_URL``, updated
+    atomically by a Lua script. Requires the ``redis`` package (installed with
+    the ``dramatiq`` extra).
+    """
+
+    def __init__(self, url: str | None = None):
+        """
+        ``url`` defaults to ``CTB_RATE_LIMIT_REDIS_URL``.
+        """
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.CTB_RATE_LIMIT_REDIS_URL)
+        self._take = self.client.register_script(_REDIS_TAKE)
+
+    def try_acquire(self, key: str, limits: list[Limit]) -> float:  # noqa: D102
+        args: list[float] = [time.time()]
+        for limit in limits:
+            args += [limit.calls, limit.period]
+        return float(
+            self._take(
+                keys=[self._bucket_key(key, limit) for limit in limits], args=args
+            )
+        )
+
+
+class RateLimiter:
+    """
+    Limits the calls made under ``key`` to each of ``limits``, across every
+    process sharing the backend. Limits allowing no calls are ignored.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        limits: list[Limit],
+        *,
+        backend: RateLimitBackend | None = None,
+    ):
+        """
+        ``backend`` defaults to the shared backend (``get_rate_limit_backend``).
+        """
+        self.key = key
+        self.limits = [limit for limit in limits if limit.calls > 0]
+        self.backend = backend or get_rate_limit_backend()
+
+    def acquire(self, *, max_wait: float | None = None):
+        """
+        Waits until a call may be made and takes it. Raises
+        ``RateLimitExceeded`` rather than waiting longer than ``max_wait``
+        seconds in all (``None`` waits as long as it takes), so that the
+        caller can try again later.
+        """
+        if not self.limits:
+            return
+        waited = 0.0
+        while wait := self.backend.try_acquire(self.key, self.limits):
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitExceeded(retry_after=wait)
+            logger.info(f"Rate limited ({self.key}); waiting {wait:.2f}s")
+            time.sleep(wait)
+            waited += wait
+
+
+_backend: RateLimitBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """
+    Returns the shared backend, built from ``CTB_RATE_LIMIT_BACKEND`` on first
+    use.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.CTB_RATE_LIMIT_BACKEND)()
+    return _backend
+
+
+def reset_rate_limit_backend():
+    """
+    Drops the shared backend so that the next call to
+    ``get_rate_limit_backend`` builds a new one from the current settings.
+    """
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting, **kwargs):
+    if setting.startswith("CTB_RATE_LIMIT_"):
+        reset_rate_limit_backend()
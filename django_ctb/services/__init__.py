@@ -2,22 +2,72 @@
 Convenience collection of all main service classes
 """
 
+from django_ctb.services.bom import (
+    BomParser,
+)
 from django_ctb.services.build import (
-    PartSatisfactionManager,
+    ProjectBuildAllocator,
     ProjectBuildPartReservationService,
     ProjectBuildService,
 )
+from django_ctb.services.capacity import (
+    BuildableQuantity,
+    BuildableQuantityCalculator,
+    LimitingPart,
+)
+from django_ctb.services.diff import (
+    BomDiff,
+    BomDiffLine,
+    BomDiffService,
+)
 from django_ctb.services.order import (
     VendorOrderService,
 )
+from django_ctb.services.pricing import (
+    PriceTable,
+    VendorPartOption,
+    VendorPartSelection,
+)
+from django_ctb.services.simulation import (
+    ClearanceSimulation,
+    ClearanceSimulator,
+    SimulatedDebit,
+    SimulatedReservation,
+    SimulatedShortage,
+)
 from django_ctb.services.sync import (
+    BomPartIndex,
+    BomSyncWriter,
     ProjectVersionBomService,
+    ProjectVersionSyncReport,
+)
+from django_ctb.services.webhook import (
+    PushWebhookService,
 )
 
 __all__ = [
-    "PartSatisfactionManager",
+    "BomDiff",
+    "BomDiffLine",
+    "BomDiffService",
+    "BomParser",
+    "BomPartIndex",
+    "BomSyncWriter",
+    "BuildableQuantity",
+    "BuildableQuantityCalculator",
+    "ClearanceSimulation",
+    "ClearanceSimulator",
+    "LimitingPart",
+    "PriceTable",
+    "ProjectBuildAllocator",
     "ProjectBuildPartReservationService",
     "ProjectBuildService",
     "ProjectVersionBomService",
+    "ProjectVersionSyncReport",
+    "PushWebhookService",
+    "SimulatedDebit",
+    "SimulatedReservation",
+    "SimulatedShortage",
     "VendorOrderService",
+    "VendorPartOption",
+    "VendorPartSelection",
 ]
@@ -0,0 +1,142 @@
+"""
+Services for parsing bills of material (BOM) files as they stream in
+"""
+
+import csv
+import io
+import xml.etree.ElementTree as ET
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from django_ctb import models
+
+_ROWS = TypeAdapter(list[models.BillOfMaterialsRow])
+
+
+class _ChunkStream(io.RawIOBase):
+    """Read-only file over an iterable of byte chunks"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class BomParser:
+    """
+    Parses BOM files into ``BillOfMaterialsRow`` from an iterable of byte
+    chunks (e.g. a streamed download) without holding the whole file. Rows are
+    validated in batches of ``batch_size``.
+
+    Two formats are understood:
+
+    - CSV, with the columns of ``BillOfMaterialsRow`` (KiCAD's default)
+    - KiCAD's XML BOM export (``.xml``), whose components are grouped into
+      rows by value, footprint, and the "Vendor", "PartNum", and "Optional"
+      fields. Components excluded from the BOM (or not populated) are skipped.
+    """
+
+    batch_size: int = 500
+
+    def __init__(self, *, batch_size: int | None = None):
+        """
+        ``batch_size`` defaults to ``BomParser.batch_size``.
+        """
+        if batch_size is not None:
+            self.batch_size = batch_size
+
+    def _validate(
+        self, raw_rows: Iterable[dict[str, Any]]
+    ) -> Iterator[models.BillOfMaterialsRow]:
+        raw_rows = iter(raw_rows)
+        while batch := list(islice(raw_rows, self.batch_size)):
+            yield from _ROWS.validate_python(batch)
+
+    def parse(
+        self, chunks: Iterable[bytes], *, path: str = ""
+    ) -> Iterator[models.BillOfMaterialsRow]:
+        """
+        Rows of the BOM, parsed according to the extension of ``path``.
+        """
+        if path.lower().endswith(".xml"):
+            return self.parse_kicad_xml(chunks)
+        return self.parse_csv(chunks)
+
+    def parse_csv(self, chunks: Iterable[bytes]) -> Iterator[models.BillOfMaterialsRow]:
+        """
+        Rows of a CSV BOM. Rows without a "#" column are numbered in order.
+        """
+
+        def _raw_rows():
+            with io.TextIOWrapper(
+                io.BufferedReader(_ChunkStream(chunks)), encoding="utf-8", newline=""
+            ) as bom:
+                for line_number, _row in enumerate(csv.DictReader(bom), start=1):
+                    if "#" not in _row:
+                        _row["#"] = line_number
+                    yield _row
+
+        return self._validate(_raw_rows())
+
+    def parse_kicad_xml(
+        self, chunks: Iterable[bytes]
+    ) -> Iterator[models.BillOfMaterialsRow]:
+        """
+        Rows of a KiCAD XML BOM, numbered in order of their first component.
+        """
+        return self._validate(self._group_components(chunks))
+
+    def _group_components(self, chunks: Iterable[bytes]) -> Iterator[dict[str, Any]]:
+        groups: dict[tuple, dict[str, Any]] = {}
+        stream = io.BufferedReader(_ChunkStream(chunks))
+        for _, element in ET.iterparse(stream, events=("end",)):
+            if element.tag == "comp":
+                self._add_component(groups, element)
+            if element.tag in ("comp", "libpart", "net"):
+                # nothing more is needed from it; keeps memory flat
+                element.clear()
+        for line_number, group in enumerate(groups.values(), start=1):
+            references = group.pop("references")
+            yield {
+                "#": line_number,
+                "Reference": ", ".join(references),
+                "Qty": len(references),
+                **group,
+            }
+
+    def _add_component(self, groups: dict[tuple, dict[str, Any]], comp: ET.Element):
+        fields = {
+            field.get("name"): field.text or ""
+            for field in comp.iterfind("fields/field")
+        }
+        fields.update(
+            (prop.get("name"), prop.get("value") or "")
+            for prop in comp.iterfind("property")
+        )
+        if "exclude_from_bom" in fields or "dnp" in fields:
+            return
+        row = {
+            "Value": comp.findtext("value", ""),
+            "Footprint": comp.findtext("footprint", ""),
+        }
+        for name in ("Vendor", "PartNum", "Optional"):
+            if fields.get(name):
+                row[name] = fields[name]
+        group = groups.setdefault(tuple(row.items()), {**row, "references": []})
+        group["references"].append(comp.get("ref", ""))
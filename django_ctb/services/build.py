@@ -3,8 +3,10 @@ Services associated with Project Builds; clearing, and completing
 """
 
 import logging
+from dataclasses import dataclass, field
 
-from django.db.models import QuerySet
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, QuerySet, Subquery, Sum
 from django.utils import timezone
 
 from django_ctb import models
@@ -30,6 +32,7 @@ class ProjectBuildPartReservationService:
         # undo inventory action
         for inventory_action in reservation.inventory_actions.all():
             inventory_action.inventory_line.quantity -= inventory_action.delta
+            inventory_action.inventory_line.reserved_quantity += inventory_action.delta
             inventory_action.inventory_line.save()
             inventory_action.delete()
 
@@ -48,290 +51,505 @@ class ProjectBuildPartReservationService:
             self.delete_reservation(reservation)
 
 
-class PartSatisfactionManager:
-    """
-    Manages satisfaction of combined demand for parts in a project build.
-    This is a receptacle in which to accumulate project parts which use a
-    common part, then to assess the stock of said part (or it's equivalents),
-    finally creating reservations or shortages.
-
-    Use ``add_project_part`` to accumulate project parts, then
-    use ``ensure_reservation`` to create a reservation (and inventory actions).
-    """
-
-    def __init__(
-        self,
-        *,
-        part: models.Part,
-        project_build: models.ProjectBuild,
-    ):
-        """
-        Provide a part and a project build. Then use ``add_project_part`` to
-        add any project parts which call for the same part. Once all project
-        parts are tabulated, call ``ensure_reservation`` to create the actual
-        reservation.
-        """
-        self.part = part
-        self.project_build = project_build
-
-        self.fulfilled: int = 0
+@dataclass
+class _PartDemand:
+    """Combined demand for a single part across all rows of a project build"""
 
-        # These will be updated post initialization
-        self.project_parts: list[models.ProjectPart] = []
-        self.needed: int = 0
+    part: models.Part
+    project_parts: list[models.ProjectPart] = field(default_factory=list)
+    needed: int = 0
+    fulfilled: int = 0
 
     @property
     def unfulfilled(self) -> int:
-        """Number of parts required for the build which are not yet covered
-        by reserved stock."""
+        """Number of parts required which are not yet covered by stock"""
         return self.needed - self.fulfilled
 
-    def add_project_part(self, *, project_part: models.ProjectPart):
+
+class ProjectBuildAllocator:
+    """
+    Satisfies the demand for every part of a project build at once.
+
+    Candidate inventory lines, existing reservations (with their inventory
+    actions), and shortages (with their fallback parts) are loaded up front,
+    stock is taken from the inventory lines with the least stock first (and
+    returned to those with the most) in memory, and the results are written
+    back in bulk. The number of queries does not depend on the size of the
+    bill of materials.
+
+    Equivalent parts are found through ``Part.equivalence_class`` (so there is
+    no limit to how far removed an equivalent part may be).
+
+    Use ``allocate`` to run the whole process.
+    """
+
+    def __init__(self, *, project_build: models.ProjectBuild):
         """
-        Add a project part for consideration in this manager. Increases the
-        number of ``needed`` parts, and tracks the project part itself for
-        association to the reservation (should it come to pass).
+        Provide the project build to be allocated. Nothing is loaded until
+        ``allocate`` is called.
         """
-        self.needed += project_part.quantity * self.project_build.quantity
-        logger.info(
-            ">> Adding "
-            f"({project_part.quantity} * {self.project_build.quantity} = {self.needed})"
-            f" {project_part.part}"
+        self.project_build = project_build
+        self.demands: list[_PartDemand] = []
+
+        # snapshot of the build and the stock available to it
+        # equivalence class of each part called for (and each fallback part)
+        self.equivalence_classes: dict[int, int] = {}
+        self.shortages: dict[int, models.ProjectBuildPartShortage] = {}
+        self.fallback_part_pks: dict[int, int] = {}
+        self._loaded_shortage_pks: set[int] = set()
+        self.reservations: list[models.ProjectBuildPartReservation] = []
+        self.reservation_project_part_pks: dict[int, set[int]] = {}
+        self.inventory_lines: dict[int, models.InventoryLine] = {}
+        self.inventory_lines_by_class: dict[int, list[models.InventoryLine]] = {}
+        # inventory actions keyed by reservation pk, then inventory line pk
+        self.actions: dict[int, dict[int, models.InventoryAction]] = {}
+
+        # pending writes
+        self._created_reservations: list[models.ProjectBuildPartReservation] = []
+        self._created_actions: list[models.InventoryAction] = []
+        self._created_shortages: list[models.ProjectBuildPartShortage] = []
+        self._dirty_actions: dict[int, models.InventoryAction] = {}
+        self._dirty_shortages: dict[int, models.ProjectBuildPartShortage] = {}
+        self._dirty_line_pks: set[int] = set()
+        self._deleted_action_pks: set[int] = set()
+
+    def _excluded_project_part_pks(self) -> set[int]:
+        return set(
+            self.project_build.excluded_project_parts.all().values_list("pk", flat=True)
         )
-        self.project_parts.append(project_part)
 
-    def _ensure_inventory_action(
-        self,
-        *,
-        inventory_line: models.InventoryLine,
-        depletion: int,
-        reservation: models.ProjectBuildPartReservation,
-    ) -> models.InventoryAction:
+    def _part_called_for(self, project_part: models.ProjectPart) -> models.Part | None:
+        return project_part.substitute_part or project_part.part
+
+    def _load_demands(self):
         """
-        Idempotent creation of inventory action and update of inventory line
+        Consolidate project parts by the actual part (or substitute part)
+        called for. Excludes excluded project parts.
         """
-        inventory_action, _ = models.InventoryAction.objects.get_or_create(
-            inventory_line=inventory_line,
-            reservation=reservation,
-            defaults={"delta": 0},
+        excluded_project_part_pks = self._excluded_project_part_pks()
+        project_parts = models.ProjectPart.objects.filter(
+            project_version_id=self.project_build.project_version_id
+        ).select_related("part", "substitute_part")
+        demands: dict[int, _PartDemand] = {}
+        for project_part in project_parts:
+            if project_part.pk in excluded_project_part_pks:
+                continue
+            part = self._part_called_for(project_part)
+            if part is None:
+                logger.info(f"!! Line {project_part.line_number} has no part, skipping")
+                continue
+            demand = demands.setdefault(part.pk, _PartDemand(part=part))
+            self.equivalence_classes[part.pk] = part.equivalence_class or part.pk
+            demand.needed += project_part.quantity * self.project_build.quantity
+            demand.project_parts.append(project_part)
+        self.demands = list(demands.values())
+
+    def _load_shortages(self):
+        shortages = (
+            self.project_build.shortfalls.all()
+            .select_related("part", "fallback_part")
+            .order_by("pk")
         )
-        inventory_action.delta -= depletion
-        inventory_action.save()
-        inventory_line.quantity -= depletion
-        inventory_line.save()
-        return inventory_action
+        for shortage in shortages:
+            self._loaded_shortage_pks.add(shortage.pk)
+            self.shortages.setdefault(shortage.part_id, shortage)
+            fallback_part = shortage.fallback_part
+            if fallback_part is not None:
+                self.fallback_part_pks.setdefault(shortage.part_id, fallback_part.pk)
+                self.equivalence_classes[fallback_part.pk] = (
+                    fallback_part.equivalence_class or fallback_part.pk
+                )
 
     @staticmethod
-    def find_equivalent_parts(
-        *,
-        part: models.Part,
-        depth: int = 0,
-        maxdepth: int = 5,
-    ) -> set[models.Part]:
-        """
-        Recursively searches for equivalent parts.
-        """
-        _equivalents = set()
-        _equivalents.add(part)
-        if depth >= maxdepth:
-            return _equivalents
-        if part.equivalent_to is not None:
-            _equivalents.update(
-                PartSatisfactionManager.find_equivalent_parts(
-                    part=part.equivalent_to, depth=depth + 1, maxdepth=maxdepth
-                )
+    def _candidate_inventory_lines(
+        *, owner_id: int, equivalence_classes: set[int]
+    ) -> Q:
+        return Q(
+            Q(part__equivalence_class__in=equivalence_classes)
+            # parts saved before equivalence classes existed
+            | Q(part_id__in=equivalence_classes),
+            owner_id=owner_id,
+            is_deprioritized=False,
+        )
+
+    def _inventory_lines_queryset(
+        self, *, owner_id: int, equivalence_classes: set[int]
+    ) -> QuerySet[models.InventoryLine]:
+        """
+        Candidate inventory lines along with any line which already holds
+        stock for this build, locked.
+        """
+        return models.InventoryLine.objects.filter(
+            self._candidate_inventory_lines(
+                owner_id=owner_id, equivalence_classes=equivalence_classes
             )
-        others = part.equivalents.all()
-        for other in others:
-            _equivalents.update(
-                PartSatisfactionManager.find_equivalent_parts(
-                    part=other, depth=depth + 1, maxdepth=maxdepth
-                )
+            | Q(
+                pk__in=models.InventoryAction.objects.filter(
+                    reservation__project_build=self.project_build
+                ).values("inventory_line_id")
             )
-        return _equivalents
+        ).locked()
 
-    def _get_inventory_lines(self) -> list[models.InventoryLine]:
-        def _get_inventory_lines_for_part(part) -> list[models.InventoryLine]:
-            # determine equivalent parts
-            _equivalents = PartSatisfactionManager.find_equivalent_parts(
-                part=part,
+    def _load_inventory_lines(self):
+        """
+        Loads (and locks) candidate inventory lines along with any line which
+        already holds stock for this build.
+        """
+        owner_id = self.project_build.project_version.project.owner_id
+        equivalence_classes = set(self.equivalence_classes.values())
+        inventory_lines = self._inventory_lines_queryset(
+            owner_id=owner_id, equivalence_classes=equivalence_classes
+        ).annotate(part_equivalence_class=F("part__equivalence_class"))
+        for inventory_line in inventory_lines:
+            self.inventory_lines[inventory_line.pk] = inventory_line
+            part_equivalence_class: int | None = getattr(
+                inventory_line, "part_equivalence_class", None
             )
-            # get inventory lines for all equivalent parts
-            _inventory_lines = models.InventoryLine.objects.filter(
-                owner=self.project_build.project_version.project.owner,
-                part__in=_equivalents,
-                is_deprioritized=False,
-            ).order_by("quantity")
-            return list(_inventory_lines)
-
-        # get inventory lines for actual part
-        inventory_lines = _get_inventory_lines_for_part(self.part)
-
-        # get fallback part from past shortage
-        shortage: models.ProjectBuildPartShortage | None = None
-        try:
-            shortage = models.ProjectBuildPartShortage.objects.get(
-                part=self.part,
-                project_build=self.project_build,
-                fallback_part__isnull=False,
+            equivalence_class = part_equivalence_class or inventory_line.part_id
+            if (
+                inventory_line.owner_id == owner_id
+                and equivalence_class in equivalence_classes
+                and not inventory_line.is_deprioritized
+            ):
+                self.inventory_lines_by_class.setdefault(equivalence_class, []).append(
+                    inventory_line
+                )
+
+    def _load_reservations(self):
+        self.reservations = list(
+            self.project_build.part_reservations.all().order_by("pk")
+        )
+        for reservation in self.reservations:
+            self.actions[reservation.pk] = {}
+            self.reservation_project_part_pks[reservation.pk] = set()
+        actions = models.InventoryAction.objects.filter(
+            reservation__project_build=self.project_build
+        ).order_by("pk")
+        for action in actions:
+            # share inventory line instances with the candidate lines so that
+            #  every change to a line quantity is seen everywhere
+            action.inventory_line = self.inventory_lines[action.inventory_line_id]
+            if action.reservation_id is None:  # pragma: no cover
+                # cannot be, since actions are found through their reservation
+                raise ValueError(f"Inventory action {action.pk} has no reservation")
+            self.actions[action.reservation_id][action.inventory_line_id] = action
+        through = models.ProjectBuildPartReservation.project_parts.through
+        project_part_links = through.objects.filter(
+            projectbuildpartreservation__project_build=self.project_build
+        ).values_list("projectbuildpartreservation_id", "projectpart_id")
+        for reservation_pk, project_part_pk in project_part_links:
+            self.reservation_project_part_pks[reservation_pk].add(project_part_pk)
+
+    def _load(self):
+        self._load_demands()
+        self._load_shortages()
+        self._load_inventory_lines()
+        self._load_reservations()
+
+    def _get_inventory_lines(self, part_pk: int) -> list[models.InventoryLine]:
+        """
+        Inventory lines for the part and its equivalents (least stock first),
+        followed by those for the fallback part from a past shortage.
+        """
+
+        def _get_inventory_lines_for_part(_part_pk) -> list[models.InventoryLine]:
+            return sorted(
+                self.inventory_lines_by_class.get(
+                    self.equivalence_classes[_part_pk], []
+                ),
+                key=lambda inventory_line: (inventory_line.quantity, inventory_line.pk),
             )
-        except models.ProjectBuildPartShortage.DoesNotExist:
-            pass
-        if shortage is not None:
-            # get inventory lines for fallback part
+
+        inventory_lines = _get_inventory_lines_for_part(part_pk)
+        fallback_part_pk = self.fallback_part_pks.get(part_pk)
+        if fallback_part_pk is not None:
+            seen = {inventory_line.pk for inventory_line in inventory_lines}
             inventory_lines.extend(
-                _get_inventory_lines_for_part(shortage.fallback_part)
+                inventory_line
+                for inventory_line in _get_inventory_lines_for_part(fallback_part_pk)
+                if inventory_line.pk not in seen
             )
         return inventory_lines
 
-    def _debit_inventory_for_reservation(
-        self, reservation: models.ProjectBuildPartReservation
+    def _adjust_line(self, inventory_line: models.InventoryLine, delta: int):
+        # every adjustment moves stock into or out of a pending reservation
+        inventory_line.quantity += delta
+        inventory_line.reserved_quantity -= delta
+        self._dirty_line_pks.add(inventory_line.pk)
+
+    def _debit(
+        self,
+        demand: _PartDemand,
+        *,
+        reservation: models.ProjectBuildPartReservation,
+        actions: dict[int, models.InventoryAction],
+        inventory_lines: list[models.InventoryLine],
     ):
         """
-        Handles situations where reservation quantities need to be increased.
-        Will create/update inventory actions to cover the full reservation
-        quantity.
-
         Takes stock such that there will be the fewest number of inventory
         lines with stock as possible.
         """
-        logger.info(">> Debiting inventory")
-        # deduct from inventory lines until need is fulfilled
-        for inventory_line in self._get_inventory_lines():
-            depletion = min(self.unfulfilled, inventory_line.quantity)
-            self._ensure_inventory_action(
-                inventory_line=inventory_line,
-                depletion=depletion,
-                reservation=reservation,
-            )
-            self.fulfilled += depletion
-            logger.info(
-                f">>>> Debiting inventory line pk:{inventory_line.pk} {depletion} parts"
-            )
-            if self.unfulfilled == 0:
-                logger.info(">>>> Reservation satisfied")
+        for inventory_line in inventory_lines:
+            depletion = min(demand.unfulfilled, inventory_line.quantity)
+            if depletion > 0:
+                action = actions.get(inventory_line.pk)
+                if action is None:
+                    action = models.InventoryAction(
+                        inventory_line=inventory_line,
+                        reservation=reservation,
+                        delta=0,
+                    )
+                    actions[inventory_line.pk] = action
+                    self._created_actions.append(action)
+                elif action.pk is not None:
+                    self._dirty_actions[action.pk] = action
+                action.delta -= depletion
+                self._adjust_line(inventory_line, -depletion)
+                demand.fulfilled += depletion
+                logger.info(
+                    f">>>> Debiting inventory line pk:{inventory_line.pk} "
+                    f"{depletion} parts"
+                )
+            if demand.unfulfilled == 0:
                 return
 
-    def _credit_inventory_for_reservation(
-        self,
-        reservation: models.ProjectBuildPartReservation,
+    def _credit(
+        self, demand: _PartDemand, *, actions: dict[int, models.InventoryAction]
     ):
         """
-        Return extra parts to stock from reservations such that there will be
-        the fewest number of inventory lines with stock. Do not return stock
-        to lines with zero stock (unless it is last resort)
+        Return extra parts to stock such that there will be the fewest number
+        of inventory lines with stock.
         """
-        logger.info(">> Crediting inventory")
-        actions = reservation.inventory_actions.all().order_by(
-            "-inventory_line__quantity", "delta"
+        ordered_actions = sorted(
+            actions.values(),
+            key=lambda action: (
+                -action.inventory_line.quantity,
+                action.delta,
+                action.pk or 0,
+            ),
         )
-        for action in actions:
+        for action in ordered_actions:
             # These should both be negative quantities
-            credit = max(self.unfulfilled, action.delta) * -1
+            credit = max(demand.unfulfilled, action.delta) * -1
             action.delta += credit
-            action.save()
-            action.inventory_line.quantity += credit
-            action.inventory_line.save()
+            self._adjust_line(action.inventory_line, credit)
             logger.info(
-                f">>>> Crediting inventory line {action.inventory_line} {credit} parts"
+                f">>>> Crediting inventory line pk:{action.inventory_line.pk} "
+                f"{credit} parts"
             )
             if action.delta == 0:
-                logger.info(">>>> Inventory action is depleted, deleting")
-                action.delete()
-            self.fulfilled -= credit
-            if self.unfulfilled == 0:
-                logger.info(">>>> Reservation satisfied")
+                del actions[action.inventory_line.pk]
+                self._dirty_actions.pop(action.pk, None)
+                self._deleted_action_pks.add(action.pk)
+            else:
+                self._dirty_actions[action.pk] = action
+            demand.fulfilled -= credit
+            if demand.unfulfilled == 0:
                 return
 
-    def _check_stock(self):
-        """
-        Confirms that enough stock is on hand to cover the needed amount of
-        parts. Raises ``InsufficientInventory`` otherwise.
-        """
-        if self.unfulfilled == 0:
-            logger.info(">> No stock needed...")
-            return
-        logger.info(f">> Checking stock for {self.part} (need {self.needed} parts)")
-        inventory_lines = self._get_inventory_lines()
-        total_stock = sum([line.quantity for line in inventory_lines])
-        if self.unfulfilled > total_stock:
-            logger.info("!!!! Insufficient stock")
-            self.fulfilled += total_stock
-            shortage, _ = models.ProjectBuildPartShortage.objects.update_or_create(
-                part=self.part,
-                project_build=self.project_build,
-                defaults={"quantity": self.unfulfilled},
-            )
-            raise InsufficientInventory(shortages=[shortage])
-
-    def ensure_reservation(self) -> models.ProjectBuildPartReservation:
-        """
-        Idempotent creation of reservations for an individual part to satisfy
-        build. Creates inventory actions to trace the reservation, and alters
-        inventory line quantities to suit.
-        """
-        logger.info(f"Ensuring Reservation for {self.project_build} {self.part}")
-        reservation = None
-        try:
-            reservation = models.ProjectBuildPartReservation.objects.get(
+    def _ensure_shortage(self, demand: _PartDemand) -> models.ProjectBuildPartShortage:
+        shortage = self.shortages.get(demand.part.pk)
+        if shortage is None:
+            shortage = models.ProjectBuildPartShortage(
+                part=demand.part,
                 project_build=self.project_build,
-                part=self.part,
-            )
-            # add existing reservation quantity to fulfillment
-            logger.info(
-                f">> Reservation already exists with quantity {reservation.quantity}"
+                quantity=demand.unfulfilled,
             )
-            self.fulfilled += reservation.quantity
-        except models.ProjectBuildPartReservation.DoesNotExist:
-            pass
+            self.shortages[demand.part.pk] = shortage
+            self._created_shortages.append(shortage)
+        elif shortage.quantity != demand.unfulfilled:
+            shortage.quantity = demand.unfulfilled
+            self._dirty_shortages[shortage.pk] = shortage
+        return shortage
+
+    def _allocate_demand(
+        self,
+        demand: _PartDemand,
+        *,
+        reservation: models.ProjectBuildPartReservation | None,
+    ) -> models.ProjectBuildPartReservation | models.ProjectBuildPartShortage:
+        logger.info(f"Allocating {demand.needed}x part pk:{demand.part.pk}")
+        actions: dict[int, models.InventoryAction] = {}
+        if reservation is not None:
+            actions = self.actions[reservation.pk]
+            demand.fulfilled -= sum(action.delta for action in actions.values())
+
+        inventory_lines: list[models.InventoryLine] = []
+        if demand.unfulfilled > 0:
+            inventory_lines = self._get_inventory_lines(demand.part.pk)
+            total_stock = sum(line.quantity for line in inventory_lines)
+            if demand.unfulfilled > total_stock:
+                logger.info("!!!! Insufficient stock")
+                demand.fulfilled += total_stock
+                return self._ensure_shortage(demand)
 
-        self._check_stock()
         if reservation is None:
-            logger.info(">> Creating Reservation")
-            reservation = models.ProjectBuildPartReservation.objects.create(
+            reservation = models.ProjectBuildPartReservation(
                 project_build=self.project_build,
-                part=self.part,
-                order_key=min([part.line_number for part in self.project_parts]),
+                part=demand.part,
+                order_key=min(pp.line_number for pp in demand.project_parts),
             )
-        reservation.project_parts.set(self.project_parts)
+            self._created_reservations.append(reservation)
 
-        if self.unfulfilled > 0:
-            self._debit_inventory_for_reservation(reservation)
-        elif self.unfulfilled < 0:
-            self._credit_inventory_for_reservation(reservation)
+        if demand.unfulfilled > 0:
+            self._debit(
+                demand,
+                reservation=reservation,
+                actions=actions,
+                inventory_lines=inventory_lines,
+            )
+        elif demand.unfulfilled < 0:
+            self._credit(demand, actions=actions)
         return reservation
 
+    def _release(self, reservation: models.ProjectBuildPartReservation):
+        """
+        Credits inventory lines for a reservation which is no longer needed,
+        mirroring ``ProjectBuildPartReservationService.delete_reservation``.
+        """
+        for action in self.actions[reservation.pk].values():
+            self._adjust_line(action.inventory_line, -action.delta)
+            self._dirty_actions.pop(action.pk, None)
+            self._deleted_action_pks.add(action.pk)
 
-class ProjectBuildService:
-    """
-    Service for clearing and completing project builds.
-    """
+    def _write_project_part_links(
+        self,
+        reservation_demands: list[
+            tuple[models.ProjectBuildPartReservation, _PartDemand]
+        ],
+    ):
+        through = models.ProjectBuildPartReservation.project_parts.through
+        created_links = []
+        stale_links = Q()
+        for reservation, demand in reservation_demands:
+            wanted = {project_part.pk for project_part in demand.project_parts}
+            existing = self.reservation_project_part_pks.get(reservation.pk, set())
+            created_links.extend(
+                through(
+                    projectbuildpartreservation_id=reservation.pk,
+                    projectpart_id=project_part_pk,
+                )
+                for project_part_pk in sorted(wanted - existing)
+            )
+            if existing - wanted:
+                stale_links |= Q(
+                    projectbuildpartreservation_id=reservation.pk,
+                    projectpart_id__in=existing - wanted,
+                )
+        if stale_links:
+            through.objects.filter(stale_links).delete()
+        through.objects.bulk_create(created_links)
+
+    def _write(
+        self,
+        *,
+        reservation_demands: list[
+            tuple[models.ProjectBuildPartReservation, _PartDemand]
+        ],
+        shortages: list[models.ProjectBuildPartShortage],
+        released: list[models.ProjectBuildPartReservation],
+    ):
+        models.ProjectBuildPartReservation.objects.bulk_create(
+            self._created_reservations
+        )
+        models.InventoryAction.objects.bulk_create(self._created_actions)
+        models.InventoryAction.objects.bulk_update(
+            list(self._dirty_actions.values()), ["delta"]
+        )
+        if self._deleted_action_pks:
+            models.InventoryAction.objects.filter(
+                pk__in=self._deleted_action_pks
+            ).delete()
+        now = timezone.now()
+        dirty_lines = [self.inventory_lines[pk] for pk in sorted(self._dirty_line_pks)]
+        for inventory_line in dirty_lines:
+            inventory_line.updated = now
+        models.InventoryLine.objects.bulk_update(
+            dirty_lines, ["quantity", "reserved_quantity", "updated"]
+        )
+        self._write_project_part_links(reservation_demands)
 
-    def _consolidate_project_parts(
-        self, build: models.ProjectBuild
-    ) -> list[PartSatisfactionManager]:
+        # clean up any resources left over from prior runs
+        if released:
+            models.ProjectBuildPartReservation.objects.filter(
+                pk__in=[reservation.pk for reservation in released]
+            ).delete()
+        models.ProjectBuildPartShortage.objects.bulk_create(self._created_shortages)
+        models.ProjectBuildPartShortage.objects.bulk_update(
+            list(self._dirty_shortages.values()), ["quantity"]
+        )
+        stale_shortage_pks = self._loaded_shortage_pks - {
+            shortage.pk for shortage in shortages
+        }
+        if stale_shortage_pks:
+            models.ProjectBuildPartShortage.objects.filter(
+                pk__in=stale_shortage_pks
+            ).delete()
+
+    def allocate(
+        self,
+    ) -> tuple[
+        list[models.ProjectBuildPartReservation], list[models.ProjectBuildPartShortage]
+    ]:
         """
-        Consolidate project parts by the actual part (or substitute part)
-        called for. Excludes excluded project parts.
+        Reserves stock for every part in the project build (creating, growing,
+        or shrinking reservations as needed) and records shortages for parts
+        which cannot be covered. Reservations and shortages left over from
+        prior runs which no longer apply are removed. Returns the reservations
+        and the shortages for the build.
+
+        Runs in a single transaction; affected inventory lines are locked
+        until it is committed.
         """
-        # Get only parts which are actually included in the build
-        excluded_project_part_pks = build.excluded_project_parts.all().values_list(
-            "pk", flat=True
+        with transaction.atomic():
+            return self._allocate()
+
+    def _allocate(
+        self,
+    ) -> tuple[
+        list[models.ProjectBuildPartReservation], list[models.ProjectBuildPartShortage]
+    ]:
+        self._load()
+        existing_reservations: dict[int, models.ProjectBuildPartReservation] = {}
+        for reservation in self.reservations:
+            if reservation.part_id is not None:
+                existing_reservations.setdefault(reservation.part_id, reservation)
+
+        reservation_demands = []
+        shortages = []
+        for demand in self.demands:
+            outcome = self._allocate_demand(
+                demand, reservation=existing_reservations.get(demand.part.pk)
+            )
+            if isinstance(outcome, models.ProjectBuildPartShortage):
+                shortages.append(outcome)
+            else:
+                reservation_demands.append((outcome, demand))
+
+        kept_reservation_pks = {
+            reservation.pk for reservation, _ in reservation_demands
+        }
+        released = [
+            reservation
+            for reservation in self.reservations
+            if reservation.pk not in kept_reservation_pks
+            and reservation.utilized is None
+        ]
+        for reservation in released:
+            self._release(reservation)
+
+        self._write(
+            reservation_demands=reservation_demands,
+            shortages=shortages,
+            released=released,
         )
+        return [reservation for reservation, _ in reservation_demands], shortages
 
-        # Gather project parts by part (parts may be used on more than one row)
-        # Accumulate total quantity required for all rows
-        logger.info("Starting Project Part Consolidation")
-        consolidated_project_parts: dict[int, PartSatisfactionManager] = {}
-        for project_part in build.project_version.project_parts.all():
-            if project_part.pk in excluded_project_part_pks:
-                # Do not count this project part, it has been excluded from the build
-                continue
-            part = project_part.substitute_part or project_part.part
-            consolidated_project_parts.setdefault(
-                part.pk, PartSatisfactionManager(part=part, project_build=build)
-            ).add_project_part(project_part=project_part)
-        return list(consolidated_project_parts.values())
+
+class ProjectBuildService:
+    """
+    Service for clearing and completing project builds.
+    """
 
     def _clear_to_build(self, build) -> list[models.ProjectBuildPartReservation]:
         """
@@ -341,37 +559,14 @@ class ProjectBuildService:
         parts which have low stocks (then raises an ``InsufficientInventory``
         exception).
         """
-        part_satisfactions = self._consolidate_project_parts(build)
-
-        reservations: list[models.ProjectBuildPartReservation] = []
-        shortages: list[models.ProjectBuildPartShortage] = []
-        for part_satisfaction in part_satisfactions:
-            try:
-                reservations.append(part_satisfaction.ensure_reservation())
-            except InsufficientInventory as exc:
-                shortages.extend(exc.shortages)
-
-        # clean up any resources left over from prior runs
-        ProjectBuildPartReservationService().delete_reservations(
-            models.ProjectBuildPartReservation.objects.exclude(
-                id__in=[res.pk for res in reservations],
-            ).filter(project_build=build)
-        )
-        models.ProjectBuildPartShortage.objects.exclude(
-            id__in=[short.pk for short in shortages]
-        ).filter(project_build=build).delete()
+        reservations, shortages = ProjectBuildAllocator(project_build=build).allocate()
 
         # Display shortages for unavailable parts, and bail early
         if shortages:
             logger.info("!! Not clear to build !!")
             logger.info("!! Lacking: ")
             for shortage in shortages:
-                _vendor_part = shortage.part.vendor_parts.all().order_by("cost").first()
                 logger.info(f">> {shortage.part}, {shortage.quantity}")
-                if _vendor_part:
-                    logger.info(
-                        f">>>> {_vendor_part.vendor.name} {_vendor_part.item_number}"
-                    )
             raise InsufficientInventory(shortages=shortages)
 
         # Housekeeping
@@ -379,12 +574,39 @@ class ProjectBuildService:
         build.save()
         return reservations
 
+    def _release_reserved_quantities(
+        self, reservations: list[models.ProjectBuildPartReservation]
+    ):
+        """
+        Removes the stock held by reservations which are about to be utilized
+        from the pending reservation quantity of their inventory lines.
+        """
+        # values for delta are negative
+        held = (
+            models.InventoryAction.objects.filter(
+                inventory_line=OuterRef("pk"), reservation__in=reservations
+            )
+            .order_by()
+            .values("inventory_line")
+            .annotate(total=Sum("delta"))
+            .values("total")
+        )
+        models.InventoryLine.objects.filter(
+            pk__in=models.InventoryAction.objects.filter(
+                reservation__in=reservations
+            ).values("inventory_line")
+        ).update(
+            reserved_quantity=F("reserved_quantity") + Subquery(held),
+            updated=timezone.now(),
+        )
+
     def _complete_build(self, build):
         logger.info(f"Completing build {build}")
         if build.completed is not None:
             logger.info(f"!! Build already completed at {build.completed}")
             return
         reservations = self._clear_to_build(build)
+        self._release_reserved_quantities(reservations)
 
         for reservation in reservations:
             reservation.utilized = timezone.now()
@@ -400,17 +622,23 @@ class ProjectBuildService:
         reservation associated with the project as utilized. Will only find
         project builds which are not complete and have been cleared.
         """
-        try:
-            build = (
-                models.ProjectBuild.objects.filter(completed__isnull=True)
-                .exclude(cleared__isnull=True)
-                .select_related("project_version")
-                .prefetch_related("project_version__project_parts")
-                .get(pk=build_pk)
-            )
-        except models.ProjectBuild.DoesNotExist:
-            raise
-        return self._complete_build(build)
+        with transaction.atomic():
+            try:
+                build = (
+                    models.ProjectBuild.objects.filter(completed__isnull=True)
+                    .exclude(cleared__isnull=True)
+                    .select_for_update(of=("self",))
+                    .select_related("project_version")
+                    .get(pk=build_pk)
+                )
+            except models.ProjectBuild.DoesNotExist:
+                raise
+            try:
+                return self._complete_build(build)
+            except InsufficientInventory as exc:
+                # keep the shortages found while re-clearing the build
+                insufficient_inventory = exc
+        raise insufficient_inventory
 
     def clear_to_build(self, build_pk):
         """
@@ -421,25 +649,34 @@ class ProjectBuildService:
 
         Ignores any project build which is completed.
         """
-        try:
-            build = (
-                models.ProjectBuild.objects.filter(completed__isnull=True)
-                .select_related("project_version")
-                .prefetch_related("project_version__project_parts")
-                .get(pk=build_pk)
-            )
-        except models.ProjectBuild.DoesNotExist:
-            raise
-        try:
-            return self._clear_to_build(build)
-        except InsufficientInventory:
-            return []
+        with transaction.atomic():
+            try:
+                build = (
+                    models.ProjectBuild.objects.filter(completed__isnull=True)
+                    .select_for_update(of=("self",))
+                    .select_related("project_version")
+                    .get(pk=build_pk)
+                )
+            except models.ProjectBuild.DoesNotExist:
+                raise
+            try:
+                return self._clear_to_build(build)
+            except InsufficientInventory:
+                return []
 
     def _cancel_build(self, build):
         logger.info(f"Canceling build {build}")
         if build.completed is not None:
             logger.info("!! Build already completed, cannot cancel")
             return
+        # lock the inventory lines which will be credited
+        list(
+            models.InventoryLine.objects.filter(
+                pk__in=models.InventoryAction.objects.filter(
+                    reservation__project_build=build
+                ).values("inventory_line_id")
+            ).locked()
+        )
         ProjectBuildPartReservationService().delete_reservations(
             build.part_reservations.all()
         )
@@ -454,9 +691,11 @@ class ProjectBuildService:
 
         Ignores any project build which is marked completed.
         """
-        build = (
-            models.ProjectBuild.objects.filter(completed__isnull=True)
-            .prefetch_related("part_reservations")
-            .get(pk=build_pk)
-        )
-        return self._cancel_build(build)
+        with transaction.atomic():
+            build = (
+                models.ProjectBuild.objects.filter(completed__isnull=True)
+                .select_for_update()
+                .prefetch_related("part_reservations")
+                .get(pk=build_pk)
+            )
+            return self._cancel_build(build)
@@ -0,0 +1,226 @@
+"""
+Services for finding how many of each project version can be built from the
+stock on hand.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from django.db.models import BigIntegerField, F, QuerySet, Sum
+from django.db.models.functions import Coalesce
+
+from django_ctb import models
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LimitingPart:
+    """
+    A part (with its equivalents) whose stock limits the builds of a project
+    version: ``needed`` for each build, ``stock`` on hand.
+    """
+
+    part: models.Part
+    needed: int
+    stock: int
+
+
+@dataclass
+class BuildableQuantity:
+    """
+    The most builds of a project version which the stock on hand covers
+    (``None`` when it calls for no parts), and the parts which limit it.
+    """
+
+    project_version: models.ProjectVersion
+    quantity: int | None
+    limiting_parts: list[LimitingPart] = field(default_factory=list)
+
+
+class BuildableQuantityCalculator:
+    """
+    Finds the buildable quantity of many project versions at once. The demand
+    of every version (project parts by the equivalence class of the part, or
+    substitute part, called for) and the stock of every owner (inventory
+    lines by equivalence class) are loaded in three queries, then each
+    version's quantity is the least, over the parts it calls for, of the
+    stock divided by the number needed per build.
+
+    The parts a version calls for are counted together with their equivalent
+    parts, as when clearing a build. Each version is considered on its own;
+    versions sharing stock are not built from it at once.
+
+    The quantities are computed with NumPy when it is installed (``numpy``
+    extra), in plain Python otherwise.
+    """
+
+    def __init__(
+        self,
+        project_versions: QuerySet[models.ProjectVersion] | None = None,
+        *,
+        include_optional: bool = True,
+        include_deprioritized: bool = False,
+        use_numpy: bool | None = None,
+    ):
+        """
+        ``project_versions`` defaults to every project version. Optional
+        project parts are left out of the demand unless ``include_optional``,
+        and deprioritized inventory lines (ignored when clearing builds) are
+        only counted as stock with ``include_deprioritized``. ``use_numpy``
+        defaults to whether NumPy is installed.
+        """
+        if project_versions is None:
+            project_versions = models.ProjectVersion.objects.all()
+        self.project_versions = project_versions
+        self.include_optional = include_optional
+        self.include_deprioritized = include_deprioritized
+        if use_numpy is None:
+            try:
+                import numpy  # noqa: F401
+            except ImportError:
+                use_numpy = False
+            else:
+                use_numpy = True
+        self.use_numpy = use_numpy
+
+        self.versions: list[models.ProjectVersion] = []
+        # (owner pk, equivalence class) of each column of the demand matrix
+        self.columns: list[tuple[int, int]] = []
+        # part called for by each version in each column (the first found)
+        self.parts: dict[tuple[int, int], models.Part] = {}
+        # sparse demand matrix; needed per build by version index, column index
+        self.demand: dict[int, dict[int, int]] = {}
+        self.stock: list[int] = []
+
+    def _load_demand(self):
+        # start afresh so that ``calculate`` may be called again
+        self.parts = {}
+        self.demand = {}
+        self.versions = list(
+            self.project_versions.select_related("project").order_by("pk")
+        )
+        rows = {version.pk: idx for idx, version in enumerate(self.versions)}
+        owners = {version.pk: version.project.owner_id for version in self.versions}
+        column_indexes: dict[tuple[int, int], int] = {}
+        project_parts = (
+            models.ProjectPart.objects.filter(project_version__in=self.versions)
+            .select_related("part", "substitute_part")
+            .order_by("project_version", "line_number", "pk")
+        )
+        if not self.include_optional:
+            project_parts = project_parts.filter(is_optional=False)
+        for project_part in project_parts:
+            part = project_part.substitute_part or project_part.part
+            if part is None or project_part.quantity <= 0:
+                continue
+            column = (
+                owners[project_part.project_version_id],
+                part.equivalence_class or part.pk,
+            )
+            col = column_indexes.setdefault(column, len(column_indexes))
+            row = rows[project_part.project_version_id]
+            needed = self.demand.setdefault(row, {})
+            needed[col] = needed.get(col, 0) + project_part.quantity
+            self.parts.setdefault((row, col), part)
+        self.columns = list(column_indexes)
+
+    def _load_stock(self):
+        self.stock = [0] * len(self.columns)
+        if not self.columns:
+            return
+        column_indexes = {column: col for col, column in enumerate(self.columns)}
+        inventory_lines = models.InventoryLine.objects.filter(
+            owner__in={owner_pk for owner_pk, _ in self.columns}, quantity__gt=0
+        )
+        if not self.include_deprioritized:
+            inventory_lines = inventory_lines.filter(is_deprioritized=False)
+        stock = (
+            inventory_lines.annotate(
+                part_class=Coalesce(
+                    F("part__equivalence_class"),
+                    F("part_id"),
+                    output_field=BigIntegerField(),
+                )
+            )
+            .order_by()
+            .values("owner", "part_class")
+            .annotate(total=Sum("quantity"))
+            .values_list("owner", "part_class", "total")
+        )
+        for owner_pk, part_class, total in stock:
+            col = column_indexes.get((owner_pk, part_class))
+            if col is not None:
+                self.stock[col] = total
+
+    def _quantities(self) -> list[tuple[int | None, list[int]]]:
+        # (buildable quantity, limiting columns) of each version
+        results: list[tuple[int | None, list[int]]] = []
+        for row in range(len(self.versions)):
+            needed = self.demand.get(row, {})
+            if not needed:
+                results.append((None, []))
+                continue
+            builds = {col: self.stock[col] // count for col, count in needed.items()}
+            quantity = min(builds.values())
+            results.append(
+                (
+                    quantity,
+                    sorted(
+                        col for col, _builds in builds.items() if _builds == quantity
+                    ),
+                )
+            )
+        return results
+
+    def _quantities_numpy(self) -> list[tuple[int | None, list[int]]]:
+        import numpy as np
+
+        demand = np.zeros((len(self.versions), len(self.columns)), dtype=np.int64)
+        for row, needed in self.demand.items():
+            demand[row, list(needed)] = list(needed.values())
+        stock = np.asarray(self.stock, dtype=np.int64)
+        unlimited = np.iinfo(np.int64).max
+        # builds covered by the stock of each part; unlimited where not needed
+        builds = np.where(
+            demand > 0, stock[np.newaxis, :] // np.maximum(demand, 1), unlimited
+        )
+        quantities = builds.min(axis=1, initial=unlimited)
+        limiting = (builds == quantities[:, np.newaxis]) & (demand > 0)
+        return [
+            (
+                None if quantity == unlimited else int(quantity),
+                np.flatnonzero(limits).tolist(),
+            )
+            for quantity, limits in zip(quantities, limiting)
+        ]
+
+    def calculate(self) -> list[BuildableQuantity]:
+        """
+        Returns the buildable quantity of each project version (by pk), with
+        the parts which limit it.
+        """
+        self._load_demand()
+        self._load_stock()
+        quantities = self._quantities_numpy() if self.use_numpy else self._quantities()
+        buildable = []
+        for row, (quantity, limiting_cols) in enumerate(quantities):
+            buildable.append(
+                BuildableQuantity(
+                    project_version=self.versions[row],
+                    quantity=quantity,
+                    limiting_parts=[
+                        LimitingPart(
+                            part=self.parts[(row, col)],
+                            needed=self.demand[row][col],
+                            stock=self.stock[col],
+                        )
+                        for col in limiting_cols
+                    ],
+                )
+            )
+        logger.info(
+            f"Calculated buildable quantities of {len(self.versions)} project"
+            f" versions over {len(self.columns)} parts"
+        )
+        return buildable
@@ -0,0 +1,206 @@
+"""
+Services for comparing the bills of material (BOM) of a project version at
+two commits
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django_ctb import models
+from django_ctb.services.pricing import PriceTable
+from django_ctb.services.sync import BomPartIndex, ProjectVersionBomService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BomDiffLine:
+    """
+    The rows of the base and target BOMs at one line number (as a sync
+    matches BOM rows to project parts) and the parts they resolve to. The
+    ``base_...`` fields are empty when the line was added, the ``target_...``
+    fields when it was removed.
+    """
+
+    line_number: int
+    base_row: models.BillOfMaterialsRow | None = None
+    target_row: models.BillOfMaterialsRow | None = None
+    base_part: models.Part | None = None
+    target_part: models.Part | None = None
+    base_cost: float = 0.0
+    target_cost: float = 0.0
+
+    @property
+    def base_quantity(self) -> int:
+        """Quantity of the base row (0 when the line was added)"""
+        return self.base_row.quantity if self.base_row is not None else 0
+
+    @property
+    def target_quantity(self) -> int:
+        """Quantity of the target row (0 when the line was removed)"""
+        return self.target_row.quantity if self.target_row is not None else 0
+
+
+@dataclass
+class BomDiff:
+    """
+    What would change were a project version synced at ``target_commit``
+    rather than ``base_commit``. Costs are those of the parts (explicit and
+    implicit) the BOM rows resolve to, at the price break of the cheapest
+    vendor part for each line's quantity, excluding the PCB.
+    """
+
+    base_commit: str
+    target_commit: str
+    added: list[BomDiffLine] = field(default_factory=list)
+    removed: list[BomDiffLine] = field(default_factory=list)
+    quantity_changed: list[BomDiffLine] = field(default_factory=list)
+    part_changed: list[BomDiffLine] = field(default_factory=list)
+    base_cost: float = 0.0
+    target_cost: float = 0.0
+
+    @property
+    def cost_delta(self) -> float:
+        """Change in the cost of the parts from the base to the target BOM"""
+        return self.target_cost - self.base_cost
+
+
+class BomDiffService:
+    """
+    Compares the BOM of a project version at two commit refs. Both BOMs are
+    fetched concurrently and resolved to parts as a sync would, but nothing
+    is written: no project parts are touched and unknown vendor parts are not
+    looked up.
+    """
+
+    def __init__(self):
+        """
+        Resolves and reads BOMs with ``ProjectVersionBomService``.
+        """
+        self.bom_service = ProjectVersionBomService()
+
+    def _fetch(
+        self, project_version: models.ProjectVersion, *, base_ref: str, target_ref: str
+    ):
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ctb-diff") as pool:
+            base, target = (
+                pool.submit(
+                    self.bom_service.fetch_bom,
+                    project_version=project_version,
+                    commit_ref=commit_ref,
+                )
+                for commit_ref in (base_ref, target_ref)
+            )
+            return base.result(), target.result()
+
+    def _lines(
+        self, rows: list[models.BillOfMaterialsRow], *, index: BomPartIndex
+    ) -> dict[int, tuple[models.BillOfMaterialsRow, models.Part | None]]:
+        # keyed by line number; a later row with a repeated number wins, as
+        #  when syncing
+        return {
+            row.line_number: (row, index.get_part(row=row))
+            for row in rows
+            if row.line_number is not None
+        }
+
+    def _line_cost(
+        self,
+        part: models.Part | None,
+        quantity: int,
+        *,
+        prices: PriceTable,
+        implicit_definitions: dict[int, list[models.ImplicitProjectPart]],
+    ) -> float:
+        if part is None:
+            return 0.0
+        lines = [(part.pk, quantity)]
+        if part.package_id is not None:
+            lines += [
+                (implicit_definition.part_id, implicit_definition.quantity * quantity)
+                for implicit_definition in implicit_definitions.get(part.package_id, [])
+            ]
+        cost = 0.0
+        for part_pk, part_quantity in lines:
+            cheapest = prices.cheapest(part_pk, part_quantity)
+            if cheapest is not None:
+                cost += cheapest[1] * part_quantity
+        return cost
+
+    def diff(
+        self, project_version_pk, *, commit_ref: str, base_ref: str | None = None
+    ) -> BomDiff:
+        """
+        Diffs the BOM of a project version at ``commit_ref`` against its BOM
+        at ``base_ref``, which defaults to the last synced commit (or the
+        current commit ref of a version which was never synced).
+
+        Raises ``RefNotFoundException`` when either ref cannot be resolved (or
+        has no BOM).
+        """
+        project_version = models.ProjectVersion.objects.select_related("project").get(
+            pk=project_version_pk
+        )
+        if base_ref is None:
+            base_ref = project_version.last_synced_commit or project_version.commit_ref
+        logger.info(f"Diffing {project_version} at {base_ref} and {commit_ref}")
+        (base_commit, base_rows), (target_commit, target_rows) = self._fetch(
+            project_version, base_ref=base_ref, target_ref=commit_ref
+        )
+        index = BomPartIndex(base_rows + target_rows)
+        base_lines = self._lines(base_rows, index=index)
+        target_lines = self._lines(target_rows, index=index)
+        implicit_definitions: dict[int, list[models.ImplicitProjectPart]] = {}
+        for implicit_definition in models.ImplicitProjectPart.objects.filter(
+            owner=project_version.project.owner
+        ):
+            implicit_definitions.setdefault(
+                implicit_definition.for_package_id, []
+            ).append(implicit_definition)
+        parts = {
+            part.pk
+            for _, part in (*base_lines.values(), *target_lines.values())
+            if part is not None
+        }
+        parts.update(
+            implicit_definition.part_id
+            for definitions in implicit_definitions.values()
+            for implicit_definition in definitions
+        )
+        prices = PriceTable.for_parts(parts)
+        bom_diff = BomDiff(base_commit=base_commit, target_commit=target_commit)
+        for line_number in sorted({*base_lines, *target_lines}):
+            base_row, base_part = base_lines.get(line_number, (None, None))
+            target_row, target_part = target_lines.get(line_number, (None, None))
+            line = BomDiffLine(
+                line_number=line_number,
+                base_row=base_row,
+                target_row=target_row,
+                base_part=base_part,
+                target_part=target_part,
+            )
+            line.base_cost = self._line_cost(
+                base_part,
+                line.base_quantity,
+                prices=prices,
+                implicit_definitions=implicit_definitions,
+            )
+            line.target_cost = self._line_cost(
+                target_part,
+                line.target_quantity,
+                prices=prices,
+                implicit_definitions=implicit_definitions,
+            )
+            bom_diff.base_cost += line.base_cost
+            bom_diff.target_cost += line.target_cost
+            if target_row is None:
+                bom_diff.removed.append(line)
+            elif base_row is None:
+                bom_diff.added.append(line)
+            else:
+                if line.base_quantity != line.target_quantity:
+                    bom_diff.quantity_changed.append(line)
+                if base_part != target_part:
+                    bom_diff.part_changed.append(line)
+        return bom_diff
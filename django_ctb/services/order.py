@@ -5,10 +5,13 @@ Services associated with placing and receiving orders from vendors.
 import logging
 from dataclasses import dataclass
 
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
 from django.utils import timezone
 
 from django_ctb import models
-from django_ctb.exceptions import MissingVendorPart
+from django_ctb.exceptions import InvalidReceipt, MissingVendorPart
+from django_ctb.services.pricing import PriceTable, VendorPartSelection
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +22,15 @@ class _PartCount:
     count: int
 
 
+def _by_pk(values: dict[int, int]) -> Case:
+    # the value for each row's pk, for updating many rows in one statement
+    return Case(
+        *(When(pk=pk, then=Value(value)) for pk, value in values.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
 class VendorOrderService:
     """
     Service for creating vendor orders, and seeing their fulfillment through
@@ -26,27 +38,114 @@ class VendorOrderService:
     actions.
     """
 
-    def _complete_order_line(self, order_line: models.VendorOrderLine):
-        # resolve part/inventory line
-        inventory_line, _ = models.InventoryLine.objects.get_or_create(
-            part=order_line.vendor_part.part,
-            owner=order_line.vendor_order.owner,
+    def _receive(self, order: models.VendorOrder, received: dict[int, int]):
+        # credits the received quantity of each order line (by pk) to the
+        #  owner's inventory in a fixed number of queries, however many lines
+        order_lines = [
+            order_line
+            for order_line in order.lines.select_related("vendor_part")
+            if received.get(order_line.pk)
+        ]
+        if not order_lines:
+            return
+        part_pks = {order_line.vendor_part.part_id for order_line in order_lines}
+        # resolve inventory lines, preferring those not deprioritized
+        inventory_lines: dict[int, models.InventoryLine] = {}
+        for inventory_line in models.InventoryLine.objects.filter(
+            owner=order.owner_id, part_id__in=part_pks
+        ).locked():
+            current = inventory_lines.get(inventory_line.part_id)
+            if current is None or (
+                current.is_deprioritized and not inventory_line.is_deprioritized
+            ):
+                inventory_lines[inventory_line.part_id] = inventory_line
+        created = models.InventoryLine.objects.bulk_create(
+            models.InventoryLine(owner_id=order.owner_id, part_id=part_pk)
+            for part_pk in sorted(part_pks - set(inventory_lines))
         )
-        # create inventory action
-        models.InventoryAction.objects.create(
-            inventory_line=inventory_line,
-            delta=order_line.quantity,
-            order_line=order_line,
+        inventory_lines.update(
+            (inventory_line.part_id, inventory_line) for inventory_line in created
         )
-        # update inventory line
-        inventory_line.quantity += order_line.quantity
-        inventory_line.save()
+        # create inventory actions
+        models.InventoryAction.objects.bulk_create(
+            models.InventoryAction(
+                inventory_line=inventory_lines[order_line.vendor_part.part_id],
+                delta=received[order_line.pk],
+                order_line=order_line,
+            )
+            for order_line in order_lines
+        )
+        # credit inventory lines and order lines in place
+        credits: dict[int, int] = {}
+        for order_line in order_lines:
+            inventory_line = inventory_lines[order_line.vendor_part.part_id]
+            credits[inventory_line.pk] = (
+                credits.get(inventory_line.pk, 0) + received[order_line.pk]
+            )
+        models.InventoryLine.objects.filter(pk__in=credits).update(
+            quantity=F("quantity") + _by_pk(credits), updated=timezone.now()
+        )
+        models.VendorOrderLine.objects.filter(
+            pk__in=[order_line.pk for order_line in order_lines]
+        ).update(
+            received_quantity=F("received_quantity")
+            + _by_pk(
+                {order_line.pk: received[order_line.pk] for order_line in order_lines}
+            )
+        )
+
+    def _remaining(self, order: models.VendorOrder) -> dict[int, int]:
+        return {
+            order_line.pk: order_line.quantity - order_line.received_quantity
+            for order_line in order.lines.all()
+        }
+
+    def validate_receipt(
+        self, order: models.VendorOrder, received: dict[int, int] | None = None
+    ) -> dict[int, int]:
+        """
+        Checks the quantity received of each order line (order line PK to
+        quantity) against the vendor order, returning the quantities to
+        receive (everything left on the order when ``received`` is None).
+
+        Raises ``InvalidReceipt`` when the order is already fulfilled, for
+        lines not on the order, and for quantities beyond what is left of a
+        line.
+        """
+        if order.fulfilled is not None:
+            raise InvalidReceipt(f"Vendor order {order.pk} is already fulfilled")
+        remaining = self._remaining(order)
+        if received is None:
+            return remaining
+        for order_line_pk, quantity in received.items():
+            if order_line_pk not in remaining:
+                raise InvalidReceipt(
+                    f"Order line {order_line_pk} is not on vendor order {order.pk}"
+                )
+            if not 0 <= quantity <= remaining[order_line_pk]:
+                raise InvalidReceipt(
+                    f"Cannot receive {quantity} of order line {order_line_pk};"
+                    f" {remaining[order_line_pk]} remaining"
+                )
+        return received
+
+    def _receive_order(
+        self, order: models.VendorOrder, received: dict[int, int] | None = None
+    ):
+        # receives the given quantities (everything left when None), marking
+        #  the order fulfilled once every line has been received in full
+        received = self.validate_receipt(order, received)
+        remaining = self._remaining(order)
+        self._receive(order, received)
+        if all(
+            received.get(order_line_pk, 0) == quantity
+            for order_line_pk, quantity in remaining.items()
+        ):
+            order.fulfilled = timezone.now()
+            order.save()
 
     def _complete_order(self, order):
-        for order_line in order.lines.all():
-            self._complete_order_line(order_line)
-        order.fulfilled = timezone.now()
-        order.save()
+        self._receive_order(order)
 
     def complete_order(self, order_pk):
         """
@@ -56,90 +155,188 @@ class VendorOrderService:
 
         Ignores any vendor order marked fulfilled.
         """
-        try:
+        with transaction.atomic():
+            try:
+                order = (
+                    models.VendorOrder.objects.filter(fulfilled__isnull=True)
+                    .select_for_update()
+                    .prefetch_related("lines")
+                    .get(pk=order_pk)
+                )
+            except models.VendorOrder.DoesNotExist:
+                raise
+            self._complete_order(order)
+
+    def receive_order(self, order_pk, received: dict[int, int] | None = None):
+        """
+        Looks up a vendor order by PK then credits inventory with the
+        quantity received of each order line (order line PK to quantity);
+        lines not given are not received yet. Everything left on the order is
+        received when ``received`` is None. Marks the vendor order as
+        fulfilled once every line has been received in full.
+
+        Raises ``InvalidReceipt`` (receiving nothing) as ``validate_receipt``
+        would.
+        """
+        with transaction.atomic():
             order = (
-                models.VendorOrder.objects.filter(fulfilled__isnull=True)
+                models.VendorOrder.objects.select_for_update()
                 .prefetch_related("lines")
                 .get(pk=order_pk)
             )
-        except models.VendorOrder.DoesNotExist:
-            raise
-        self._complete_order(order)
-
-    def _accumulate_shortfalls(self, build: models.ProjectBuild) -> list[_PartCount]:
-        _shortfalls = {}
-        for shortfall in build.shortfalls.all():
-            part = shortfall.part
-            _shortfalls.setdefault(part.pk, _PartCount(part=part, count=0))
-            _shortfalls[part.pk].count += shortfall.quantity
-        return list(_shortfalls.values())
-
-    def _select_vendor_part(self, part: models.Part) -> models.VendorPart:
-        logger.info(f">> Need more {part}, searching for best vendor")
-        # TODO: should this incorporate the order volume somehow?
-        vendor_part = (
-            models.VendorPart.objects.filter(part=part).order_by("cost").first()
-        )
-        if vendor_part is None:
+            self._receive_order(order, received)
+
+    def _select_vendor_part(
+        self, part: models.Part, quantity: int, *, prices: PriceTable
+    ) -> VendorPartSelection:
+        logger.info(f">> Need {quantity} more {part}, searching for best vendor")
+        selection = prices.select(part.pk, quantity)
+        if selection is None:
             logger.info(
                 f"!! Part {part} does not have a vendor associated, "
                 "cannot generate order!"
             )
             raise MissingVendorPart
-        return vendor_part
+        logger.info(f">> {part}: {selection.explanation}")
+        return selection
+
+    def generate_vendor_orders(self, build_pk) -> list[VendorPartSelection]:
+        """
+        Looks up a project build by PK then creates or updates vendor
+        orders and order lines to cover shortfalls for the given project build.
+        See ``generate_vendor_orders_for_builds``.
+        """
+        return self.generate_vendor_orders_for_builds([build_pk])
 
-    def _populate_vendor_order(
+    def _accumulate_demand(
+        self, builds: list[models.ProjectBuild]
+    ) -> dict[int, list[_PartCount]]:
+        # shortfalls of every build, binned by owner then part
+        owners = {build.pk: build.project_version.project.owner_id for build in builds}
+        demand: dict[int, dict[int, _PartCount]] = {}
+        for shortfall in models.ProjectBuildPartShortage.objects.filter(
+            project_build__in=owners
+        ).select_related("part"):
+            part_counts = demand.setdefault(owners[shortfall.project_build_id], {})
+            part_counts.setdefault(
+                shortfall.part_id, _PartCount(part=shortfall.part, count=0)
+            )
+            part_counts[shortfall.part_id].count += shortfall.quantity
+        return {
+            owner_pk: list(part_counts.values())
+            for owner_pk, part_counts in demand.items()
+        }
+
+    def _upsert_order_lines(
         self,
+        orders: dict[tuple[int, int], list[tuple[models.VendorPart, int]]],
         *,
-        vendor_part: models.VendorPart,
-        quantity: int,
-        owner: models.Owner,
+        prices: PriceTable,
     ):
-        # get (or create) open vendor order for necessary vendor
-        vendor_order, _ = models.VendorOrder.objects.get_or_create(
-            owner=owner,
-            vendor=vendor_part.vendor,
-            placed__isnull=True,
-        )
-        # create order lines for shortfall
-        order_line, _ = models.VendorOrderLine.objects.get_or_create(
-            vendor_order=vendor_order,
-            vendor_part=vendor_part,
-            cost=vendor_part.cost,
-            defaults={"quantity": 0},
+        # adds each (vendor part, quantity) to the open order of its (owner,
+        #  vendor), creating orders and order lines in bulk as needed
+        open_orders: dict[tuple[int, int], models.VendorOrder] = {}
+        for vendor_order in (
+            models.VendorOrder.objects.filter(
+                owner__in={owner_pk for owner_pk, _ in orders},
+                vendor__in={vendor_pk for _, vendor_pk in orders},
+                placed__isnull=True,
+            )
+            .select_for_update()
+            .order_by("pk")
+        ):
+            open_orders.setdefault(
+                (vendor_order.owner_id, vendor_order.vendor_id), vendor_order
+            )
+        new_orders = [
+            models.VendorOrder(owner_id=owner_pk, vendor_id=vendor_pk)
+            for owner_pk, vendor_pk in orders
+            if (owner_pk, vendor_pk) not in open_orders
+        ]
+        models.VendorOrder.objects.bulk_create(new_orders)
+        for vendor_order in new_orders:
+            open_orders[(vendor_order.owner_id, vendor_order.vendor_id)] = vendor_order
+        order_lines: dict[tuple[int, int], models.VendorOrderLine] = {}
+        for order_line in models.VendorOrderLine.objects.filter(
+            vendor_order__in=[open_orders[key] for key in orders]
+        ).order_by("pk"):
+            order_lines.setdefault(
+                (order_line.vendor_order_id, order_line.vendor_part_id), order_line
+            )
+        new_lines = []
+        for key, lines in orders.items():
+            vendor_order = open_orders[key]
+            for vendor_part, quantity in lines:
+                order_line = order_lines.get((vendor_order.pk, vendor_part.pk))
+                if order_line is None:
+                    order_line = models.VendorOrderLine(
+                        vendor_order=vendor_order,
+                        vendor_part=vendor_part,
+                        quantity=0,
+                        cost=vendor_part.cost,
+                    )
+                    order_lines[(vendor_order.pk, vendor_part.pk)] = order_line
+                    new_lines.append(order_line)
+                order_line.quantity += quantity
+                # the price break for the whole line
+                cost = prices.unit_cost(vendor_part.pk, order_line.quantity)
+                if cost is not None:
+                    order_line.cost = cost
+        models.VendorOrderLine.objects.bulk_update(
+            [order_line for order_line in order_lines.values() if order_line.pk],
+            ["quantity", "cost"],
+            batch_size=500,
         )
-        order_line.quantity += quantity
-        order_line.save()
+        models.VendorOrderLine.objects.bulk_create(new_lines, batch_size=500)
 
-    def generate_vendor_orders(self, build_pk):
+    def generate_vendor_orders_for_builds(
+        self, build_pks: list[int]
+    ) -> list[VendorPartSelection]:
         """
-        Looks up a project build by PK then creates or updates vendor
-        orders and order lines to cover shortfalls for the given project build.
-        Searches for appropriate vendors for each part. Will silently ignore
-        parts that don't have vendors.
+        Looks up project builds by PK then creates or updates vendor orders
+        and order lines to cover their shortfalls, in a fixed number of
+        queries however many builds and parts there are.
 
-        Ignores any project build which is completed.
+        Shortfalls are summed per part for each owner across the builds.
+        Selects the vendor part which costs least in all for each quantity
+        (rounded up to purchasable lots or price breaks) from the vendor parts
+        of every shortfall part, loaded at once. Prefers to add to existing
+        (unplaced) orders rather than create new ones; all orders are written
+        in one transaction. Will silently ignore parts that don't have
+        vendors.
+
+        Returns the selections made, each explaining its choice. Ignores any
+        project build which is completed.
         """
-        # get shortfalls
-        try:
-            build = (
-                models.ProjectBuild.objects.filter(completed__isnull=True)
-                .prefetch_related("shortfalls")
-                .get(pk=build_pk)
-            )
-        except models.ProjectBuild.DoesNotExist:
-            return
+        builds = list(
+            models.ProjectBuild.objects.filter(
+                pk__in=build_pks, completed__isnull=True
+            ).select_related("project_version__project")
+        )
         # analyze shortfalls for vendors and item numbers
-        _shortfalls = self._accumulate_shortfalls(build)
-        for _shortfall in _shortfalls:
-            try:
-                selected_vendor_part = self._select_vendor_part(_shortfall.part)
-            except MissingVendorPart:
-                # nothing to do for this part
-                logger.info(f"No vendor part for {_shortfall.part}")
-                continue
-            self._populate_vendor_order(
-                vendor_part=selected_vendor_part,
-                quantity=_shortfall.count,
-                owner=build.project_version.project.owner,
-            )
+        demand = self._accumulate_demand(builds)
+        prices = PriceTable.for_parts(
+            _shortfall.part.pk
+            for _shortfalls in demand.values()
+            for _shortfall in _shortfalls
+        )
+        selections = []
+        orders: dict[tuple[int, int], list[tuple[models.VendorPart, int]]] = {}
+        for owner_pk, _shortfalls in demand.items():
+            for _shortfall in _shortfalls:
+                try:
+                    selection = self._select_vendor_part(
+                        _shortfall.part, _shortfall.count, prices=prices
+                    )
+                except MissingVendorPart:
+                    # nothing to do for this part
+                    logger.info(f"No vendor part for {_shortfall.part}")
+                    continue
+                orders.setdefault(
+                    (owner_pk, selection.vendor_part.vendor_id), []
+                ).append((selection.vendor_part, selection.order_quantity))
+                selections.append(selection)
+        if orders:
+            with transaction.atomic():
+                self._upsert_order_lines(orders, prices=prices)
+        return selections
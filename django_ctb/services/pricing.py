@@ -0,0 +1,220 @@
+"""
+Services for costing parts by the quantity purchased
+"""
+
+import logging
+import math
+from bisect import bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from django.db.models import QuerySet
+
+from django_ctb import models
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VendorPartOption:
+    """
+    Buying ``order_quantity`` of a vendor part at ``unit_cost`` each
+    """
+
+    vendor_part: models.VendorPart
+    order_quantity: int
+    unit_cost: float
+
+    @property
+    def total_cost(self) -> float:
+        """Cost of the whole order quantity"""
+        return self.order_quantity * self.unit_cost
+
+    def __str__(self):
+        return (
+            f"{self.vendor_part.vendor.name} {self.vendor_part.item_number}:"
+            f" {self.order_quantity} @ {self.unit_cost:.4f}"
+            f" = {self.total_cost:.2f}"
+        )
+
+
+@dataclass
+class VendorPartSelection:
+    """
+    The cheapest way to buy ``quantity`` of a part, among every option
+    considered (``options``, cheapest first)
+    """
+
+    part_pk: int
+    quantity: int
+    options: list[VendorPartOption] = field(default_factory=list)
+
+    @property
+    def chosen(self) -> VendorPartOption:
+        """The cheapest option"""
+        return self.options[0]
+
+    @property
+    def vendor_part(self) -> models.VendorPart:
+        """The vendor part of the cheapest option"""
+        return self.chosen.vendor_part
+
+    @property
+    def order_quantity(self) -> int:
+        """The quantity of the cheapest option"""
+        return self.chosen.order_quantity
+
+    @property
+    def explanation(self) -> str:
+        """Why the option was chosen, for logs and reports"""
+        explanation = f"{self.quantity} needed; chose {self.chosen}"
+        if len(self.options) > 1:
+            others = "; ".join(str(option) for option in self.options[1:])
+            explanation += f" over {others}"
+        return explanation
+
+
+class PriceTable:
+    """
+    Unit costs of vendor parts by quantity, from their price breaks (or
+    their own cost and volume when they have none). The vendor parts and
+    their price breaks are loaded up front so that costing any number of
+    lines queries nothing further.
+    """
+
+    def __init__(self, vendor_parts: Iterable[models.VendorPart]):
+        """
+        ``vendor_parts`` should have their ``price_breaks`` prefetched; use
+        ``for_vendor_parts`` or ``for_parts``.
+        """
+        self.vendor_parts: dict[int, models.VendorPart] = {}
+        self._volumes: dict[int, list[int]] = {}
+        self._costs: dict[int, list[float]] = {}
+        self._by_part: dict[int, list[int]] = {}
+        # vendor parts costed by their own cost and volume, bought in lots
+        self._lots: dict[int, int] = {}
+        for vendor_part in vendor_parts:
+            breaks = sorted(
+                (price_break.volume, float(price_break.cost))
+                for price_break in vendor_part.price_breaks.all()
+            )
+            if not breaks and vendor_part.cost is not None:
+                breaks = [(vendor_part.volume or 1, float(vendor_part.cost))]
+                self._lots[vendor_part.pk] = vendor_part.volume or 1
+            self.vendor_parts[vendor_part.pk] = vendor_part
+            self._volumes[vendor_part.pk] = [volume for volume, _ in breaks]
+            self._costs[vendor_part.pk] = [cost for _, cost in breaks]
+            self._by_part.setdefault(vendor_part.part_id, []).append(vendor_part.pk)
+
+    @classmethod
+    def for_vendor_parts(cls, vendor_parts: QuerySet) -> "PriceTable":
+        """
+        Loads the given vendor parts, their vendors, and their price breaks
+        (two queries).
+        """
+        return cls(
+            vendor_parts.select_related("vendor").prefetch_related("price_breaks")
+        )
+
+    @classmethod
+    def for_parts(cls, parts: Iterable[int]) -> "PriceTable":
+        """
+        Loads every vendor part of the given parts and their price breaks
+        (two queries).
+        """
+        return cls.for_vendor_parts(
+            models.VendorPart.objects.filter(part__in=parts).order_by("pk")
+        )
+
+    def unit_cost(self, vendor_part_pk: int, quantity: int) -> float | None:
+        """
+        Cost per unit of the vendor part when ``quantity`` are purchased: the
+        cost of the largest break not above the quantity, or of the smallest
+        break for quantities below every break. ``None`` for vendor parts
+        with no cost.
+        """
+        costs = self._costs.get(vendor_part_pk)
+        if not costs:
+            return None
+        idx = bisect_right(self._volumes[vendor_part_pk], quantity) - 1
+        return costs[max(idx, 0)]
+
+    def unit_costs(self, lines: Iterable[tuple[int, int]]) -> list[float | None]:
+        """
+        ``unit_cost`` for each (vendor part pk, quantity) line, in order.
+        """
+        return [self.unit_cost(*line) for line in lines]
+
+    def vendor_part_pks(self, part_pk: int) -> list[int]:
+        """
+        The loaded vendor parts of the part.
+        """
+        return self._by_part.get(part_pk, [])
+
+    def cheapest(
+        self, part_pk: int, quantity: int
+    ) -> tuple[models.VendorPart, float] | None:
+        """
+        The vendor part of the part with the lowest unit cost for
+        ``quantity``, and that cost. ``None`` when no vendor part has a cost.
+        """
+        best = None
+        for vendor_part_pk in self.vendor_part_pks(part_pk):
+            cost = self.unit_cost(vendor_part_pk, quantity)
+            if cost is not None and (best is None or cost < best[1]):
+                best = (self.vendor_parts[vendor_part_pk], cost)
+        return best
+
+    def options(self, vendor_part_pk: int, quantity: int) -> list[VendorPartOption]:
+        """
+        The ways to buy at least ``quantity`` of the vendor part. A vendor
+        part with price breaks may be bought at the quantity (no less than
+        its smallest break) or at the volume of any larger break, which can
+        cost less in all; one without is bought in whole lots of its volume.
+        """
+        if not self._costs.get(vendor_part_pk):
+            return []
+        vendor_part = self.vendor_parts[vendor_part_pk]
+        lot = self._lots.get(vendor_part_pk)
+        if lot is not None:
+            order_quantities = [math.ceil(quantity / lot) * lot]
+        else:
+            volumes = self._volumes[vendor_part_pk]
+            order_quantities = sorted(
+                {max(quantity, volumes[0])}
+                | {volume for volume in volumes if volume > quantity}
+            )
+        options = []
+        for order_quantity in order_quantities:
+            unit_cost = self.unit_cost(vendor_part_pk, order_quantity)
+            if order_quantity > 0 and unit_cost is not None:
+                options.append(
+                    VendorPartOption(
+                        vendor_part=vendor_part,
+                        order_quantity=order_quantity,
+                        unit_cost=unit_cost,
+                    )
+                )
+        return options
+
+    def select(self, part_pk: int, quantity: int) -> VendorPartSelection | None:
+        """
+        The cheapest option, in all, to buy at least ``quantity`` of the part
+        from any of its vendor parts; ties go to the smaller order, then to
+        the older vendor part. ``None`` when no vendor part has a cost.
+        """
+        options = [
+            option
+            for vendor_part_pk in self.vendor_part_pks(part_pk)
+            for option in self.options(vendor_part_pk, quantity)
+        ]
+        if not options:
+            return None
+        options.sort(
+            key=lambda option: (
+                round(option.total_cost, 4),
+                option.order_quantity,
+                option.vendor_part.pk,
+            )
+        )
+        return VendorPartSelection(part_pk=part_pk, quantity=quantity, options=options)
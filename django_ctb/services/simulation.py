@@ -0,0 +1,183 @@
+"""
+Services for predicting the outcome of clearing a project build without
+creating one (nothing is written).
+"""
+
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from django.db.models import QuerySet
+
+from django_ctb import models
+from django_ctb.services.build import ProjectBuildAllocator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SimulatedDebit:
+    """Stock which would be taken from an inventory line"""
+
+    inventory_line: models.InventoryLine
+    quantity: int
+
+
+@dataclass
+class SimulatedReservation:
+    """
+    Stock which would be reserved for a part, and the inventory lines it would
+    be taken from.
+    """
+
+    part: models.Part
+    quantity: int
+    project_parts: list[models.ProjectPart] = field(default_factory=list)
+    debits: list[SimulatedDebit] = field(default_factory=list)
+
+
+@dataclass
+class SimulatedShortage:
+    """A part which would be short, and by how many"""
+
+    part: models.Part
+    quantity: int
+
+
+@dataclass
+class ClearanceSimulation:
+    """
+    The reservations and shortages which clearing a build of ``quantity`` of
+    a project version would create.
+    """
+
+    project_version: models.ProjectVersion
+    quantity: int
+    reservations: list[SimulatedReservation] = field(default_factory=list)
+    shortages: list[SimulatedShortage] = field(default_factory=list)
+
+    @property
+    def is_clear(self) -> bool:
+        """Whether the build would be cleared (there would be no shortages)"""
+        return not self.shortages
+
+
+class ClearanceSimulator(ProjectBuildAllocator):
+    """
+    Applies the allocation rules of ``ProjectBuildAllocator`` to a build
+    which does not exist, using an in-memory snapshot of the owner's
+    inventory. Nothing is locked or written, so the stock remains available
+    to real builds.
+
+    The snapshot is loaded in a fixed number of queries: the project parts,
+    the substitute parts (when there are substitutions), and the candidate
+    inventory lines.
+
+    Use ``simulate`` to run the simulation.
+    """
+
+    def __init__(
+        self,
+        *,
+        project_version: models.ProjectVersion,
+        quantity: int,
+        excluded_project_part_pks: Iterable[int] = (),
+        substitutions: dict[int, int] | None = None,
+    ):
+        """
+        Provide the project version (with its project loaded) and the number
+        to build. Project parts may be excluded, as with
+        ``ProjectBuild.excluded_project_parts``, and given substitute parts
+        (project part pk to part pk) which take precedence over their own.
+        """
+        super().__init__(
+            project_build=models.ProjectBuild(
+                project_version=project_version, quantity=quantity
+            )
+        )
+        self.project_version = project_version
+        self.quantity = quantity
+        self.excluded_project_part_pks = set(excluded_project_part_pks)
+        self.substitutions = dict(substitutions or {})
+        self.substitute_parts: dict[int, models.Part] = {}
+
+    def _excluded_project_part_pks(self) -> set[int]:
+        return self.excluded_project_part_pks
+
+    def _part_called_for(self, project_part: models.ProjectPart) -> models.Part | None:
+        substitute_part_pk = self.substitutions.get(project_part.pk)
+        if substitute_part_pk is not None:
+            return self.substitute_parts[substitute_part_pk]
+        return super()._part_called_for(project_part)
+
+    def _load_demands(self):
+        if self.substitutions:
+            self.substitute_parts = models.Part.objects.in_bulk(
+                set(self.substitutions.values())
+            )
+            missing = set(self.substitutions.values()) - set(self.substitute_parts)
+            if missing:
+                raise models.Part.DoesNotExist(
+                    f"Substitute parts not found: {sorted(missing)}"
+                )
+        super()._load_demands()
+
+    def _load_shortages(self):
+        # a new build has no past shortages (nor fallback parts)
+        pass
+
+    def _load_reservations(self):
+        # a new build has no reservations
+        pass
+
+    def _inventory_lines_queryset(
+        self, *, owner_id: int, equivalence_classes: set[int]
+    ) -> QuerySet[models.InventoryLine]:
+        return models.InventoryLine.objects.filter(
+            self._candidate_inventory_lines(
+                owner_id=owner_id, equivalence_classes=equivalence_classes
+            )
+        ).order_by("pk")
+
+    def _write(self, **kwargs):
+        # nothing is written
+        pass
+
+    def simulate(self) -> ClearanceSimulation:
+        """
+        Returns the reservations which clearing the build would create (with
+        the stock each takes from each inventory line), and the shortages
+        which would keep it from being cleared.
+        """
+        self._allocate()
+        demands = {demand.part.pk: demand for demand in self.demands}
+        debits: dict[int, list[SimulatedDebit]] = {}
+        for action in self._created_actions:
+            debits.setdefault(id(action.reservation), []).append(
+                SimulatedDebit(
+                    inventory_line=action.inventory_line, quantity=-action.delta
+                )
+            )
+        simulation = ClearanceSimulation(
+            project_version=self.project_version, quantity=self.quantity
+        )
+        for reservation in self._created_reservations:
+            reservation_debits = debits.get(id(reservation), [])
+            simulation.reservations.append(
+                SimulatedReservation(
+                    part=reservation.part,
+                    quantity=sum(debit.quantity for debit in reservation_debits),
+                    project_parts=demands[reservation.part.pk].project_parts,
+                    debits=reservation_debits,
+                )
+            )
+        simulation.shortages = [
+            SimulatedShortage(part=shortage.part, quantity=shortage.quantity)
+            for shortage in self._created_shortages
+        ]
+        logger.info(
+            f"Simulated {self.quantity}x {self.project_version}: "
+            f"{len(simulation.reservations)} reservations, "
+            f"{len(simulation.shortages)} shortages"
+        )
+        return simulation
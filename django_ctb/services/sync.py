@@ -2,33 +2,449 @@
 Services and helpers for syncing bills of material (BOM) to project versions
 """
 
-import csv
-import io
+import hashlib
 import logging
-from contextlib import closing
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from typing import Any
 
-import requests
+from django.db import transaction
 from django.db.models import Sum
 from django.utils import timezone
 
 from django_ctb import models
+from django_ctb.conf import settings
 from django_ctb.exceptions import MissingVendorPart, RefNotFoundException
 from django_ctb.github.services import GithubService
-from django_ctb.mouser.services import MouserPartService
+from django_ctb.mirror.services import GitMirrorService
+from django_ctb.mouser.services import (
+    MouserPartService,
+    populate_mouser_vendor_parts,
+)
+from django_ctb.services.bom import BomParser
+from django_ctb.transport import get_transport
 
 logger = logging.getLogger(__name__)
 
 
+class BomPartIndex:
+    """
+    Lookup tables for resolving the rows of a whole BOM to parts, loaded with
+    a fixed number of queries. Maps (vendor name, item number) to vendor part,
+    and (value, footprint name, symbol) to candidate parts ranked the same way
+    as ``ProjectVersionBomService._get_matching_parts``.
+    """
+
+    def __init__(self, rows: list[models.BillOfMaterialsRow]):
+        """
+        Loads every vendor part and candidate part the given rows may
+        resolve to.
+        """
+        self.vendor_parts: dict[tuple[str, str], models.VendorPart] = {}
+        self.parts: dict[tuple[str, str, str], list[models.Part]] = {}
+        # position of each candidate part in the ranked query
+        self.part_ranks: dict[int, int] = {}
+        self._load_vendor_parts(
+            [row for row in rows if row.item_number and row.vendor_name]
+        )
+        self._load_parts(
+            [row for row in rows if not (row.item_number and row.vendor_name)]
+        )
+
+    def _load_vendor_parts(self, rows: list[models.BillOfMaterialsRow]):
+        if not rows:
+            return
+        vendor_parts = (
+            models.VendorPart.objects.filter(
+                vendor__name__in={row.vendor_name for row in rows},
+                item_number__in={row.item_number for row in rows},
+            )
+            .select_related("vendor", "part")
+            .order_by("pk")
+        )
+        for vendor_part in vendor_parts:
+            self.vendor_parts.setdefault(
+                (vendor_part.vendor.name, vendor_part.item_number), vendor_part
+            )
+
+    def _load_parts(self, rows: list[models.BillOfMaterialsRow]):
+        if not rows:
+            return
+        parts = list(
+            models.Part.objects.filter(
+                value__in={row.value for row in rows},
+                symbol__in={symbol for row in rows for symbol in row.symbols},
+                package__isnull=False,
+            )
+            .exclude(inventory_lines__is_deprioritized=True)
+            .annotate(qty_in_inventory=Sum("inventory_lines__quantity"))
+            .order_by("-qty_in_inventory", "pk")
+        )
+        package_footprints = models.Package.footprints.through.objects.filter(
+            package_id__in={part.package_id for part in parts},
+            footprint__name__in={row.footprint_name for row in rows},
+        ).values_list("package_id", "footprint__name")
+        footprint_names: dict[int | None, list[str]] = {}
+        for package_pk, footprint_name in package_footprints:
+            footprint_names.setdefault(package_pk, []).append(footprint_name)
+        for rank, part in enumerate(parts):
+            self.part_ranks[part.pk] = rank
+            for footprint_name in footprint_names.get(part.package_id, []):
+                self.parts.setdefault(
+                    (part.value, footprint_name, part.symbol), []
+                ).append(part)
+
+    def get_vendor_part(
+        self, *, row: models.BillOfMaterialsRow
+    ) -> models.VendorPart | None:
+        """
+        Returns the vendor part for the row's "Vendor" and "PartNum", if known.
+        """
+        if row.vendor_name is None or row.item_number is None:
+            return None
+        return self.vendor_parts.get((row.vendor_name, row.item_number))
+
+    def get_part(self, *, row: models.BillOfMaterialsRow) -> models.Part | None:
+        """
+        Returns the part the row resolves to from what is already known;
+        unknown vendor parts are not looked up.
+        """
+        if row.item_number and row.vendor_name:
+            vendor_part = self.get_vendor_part(row=row)
+            return None if vendor_part is None else vendor_part.part
+        return next(iter(self.get_matching_parts(row=row)), None)
+
+    def add_vendor_part(self, vendor_part: models.VendorPart):
+        """
+        Records a vendor part created during the sync so later rows find it.
+        """
+        self.vendor_parts[(vendor_part.vendor.name, vendor_part.item_number)] = (
+            vendor_part
+        )
+
+    def get_matching_parts(
+        self, *, row: models.BillOfMaterialsRow
+    ) -> list[models.Part]:
+        """
+        Returns the parts matching the row's "Value", "Footprint", and
+        reference symbols, best candidate first.
+        """
+        candidates = {
+            part.pk: part
+            for symbol in row.symbols
+            for part in self.parts.get((row.value, row.footprint_name, symbol), [])
+        }
+        return sorted(candidates.values(), key=lambda part: self.part_ranks[part.pk])
+
+
+class BomSyncWriter:
+    """
+    Loads the project parts, footprint refs, and implicit part definitions of
+    a project version, diffs the synced BOM rows against them, and applies
+    only the resulting inserts, updates, and deletes in bulk. Each writer
+    writes once.
+    """
+
+    project_part_fields = (
+        "part",
+        "quantity",
+        "is_optional",
+        "missing_part_description",
+    )
+
+    def __init__(self, *, project_version: models.ProjectVersion):
+        """
+        Loads the current state of the project version.
+        """
+        self.project_version = project_version
+        self.project_parts: dict[int, models.ProjectPart] = {}
+        self.explicit_project_parts: dict[int | None, models.ProjectPart] = {}
+        self.implicit_project_parts: dict[
+            tuple[int, int | None], models.ProjectPart
+        ] = {}
+        self.footprint_refs: dict[int, dict[str, models.ProjectPartFootprintRef]] = {}
+        self.implicit_definitions: dict[int, list[models.ImplicitProjectPart]] = {}
+        self._created_project_parts: list[models.ProjectPart] = []
+        self._dirty_project_parts: dict[int, models.ProjectPart] = {}
+        self._deleted_project_part_pks: set[int] = set()
+        self._created_footprint_refs: list[models.ProjectPartFootprintRef] = []
+        self._deleted_footprint_ref_pks: set[int] = set()
+        self._implicit_lines: dict[int, models.ProjectPart] = {}
+        self._load()
+
+    def _load(self):
+        for project_part in models.ProjectPart.objects.filter(
+            project_version=self.project_version
+        ).order_by("pk"):
+            project_part.project_version = self.project_version
+            self.project_parts[project_part.pk] = project_part
+            if project_part.is_implicit:
+                self.implicit_project_parts.setdefault(
+                    (project_part.line_number, project_part.part_id), project_part
+                )
+            else:
+                self.explicit_project_parts.setdefault(
+                    project_part.line_number, project_part
+                )
+        for footprint_ref in models.ProjectPartFootprintRef.objects.filter(
+            project_part__project_version=self.project_version
+        ):
+            self.footprint_refs.setdefault(footprint_ref.project_part_id, {})[
+                footprint_ref.footprint_ref
+            ] = footprint_ref
+        for implicit_definition in models.ImplicitProjectPart.objects.filter(
+            owner=self.project_version.project.owner
+        ).order_by("pk"):
+            self.implicit_definitions.setdefault(
+                implicit_definition.for_package_id, []
+            ).append(implicit_definition)
+
+    def _set_fields(self, project_part: models.ProjectPart, **fields):
+        changed = False
+        for name, value in fields.items():
+            if getattr(project_part, name) != value:
+                setattr(project_part, name, value)
+                changed = True
+        if changed and project_part.pk is not None:
+            self._dirty_project_parts[project_part.pk] = project_part
+
+    def _create_project_part(self, **fields) -> models.ProjectPart:
+        project_part = models.ProjectPart(
+            project_version=self.project_version, **fields
+        )
+        self._created_project_parts.append(project_part)
+        return project_part
+
+    def sync_project_part(
+        self, *, row: models.BillOfMaterialsRow, part: models.Part | None
+    ) -> models.ProjectPart:
+        """
+        Creates or updates the (explicit) project part for the row. The
+        project part is not saved until ``write`` is called.
+        """
+        fields = {"quantity": row.quantity, "is_optional": row.optional}
+        if part is None:
+            fields["missing_part_description"] = f"{row}"
+        project_part = self.explicit_project_parts.get(row.line_number)
+        if project_part is None:
+            project_part = self._create_project_part(
+                line_number=row.line_number, is_implicit=False, part=part, **fields
+            )
+            self.explicit_project_parts[row.line_number] = project_part
+            return project_part
+        if project_part.part_id != getattr(part, "pk", None):
+            self._dirty_project_parts[project_part.pk] = project_part
+        # assigned either way so the part is cached on the project part
+        project_part.part = part
+        self._set_fields(project_part, **fields)
+        return project_part
+
+    def sync_footprints(
+        self, footprint_refs: set[str], *, project_part: models.ProjectPart
+    ):
+        """
+        Creates missing footprint refs and deletes outdated ones for the
+        project part.
+        """
+        existing = self.footprint_refs.get(project_part.pk, {})
+        for footprint_ref, instance in existing.items():
+            if footprint_ref not in footprint_refs:
+                self._deleted_footprint_ref_pks.add(instance.pk)
+        self._created_footprint_refs.extend(
+            models.ProjectPartFootprintRef(
+                project_part=project_part, footprint_ref=footprint_ref
+            )
+            for footprint_ref in sorted(set(footprint_refs) - set(existing))
+        )
+
+    def sync_implicit_parts(self, *, project_part: models.ProjectPart):
+        """
+        Queues the line of the project part so that its implicit project parts
+        are reconciled, with those of every other queued line, when ``write``
+        is called.
+        """
+        self._implicit_lines[project_part.line_number] = project_part
+
+    def _reconcile_implicit_parts(self):
+        # the implicit project parts wanted for every queued line, computed
+        #  from the preloaded definitions, diffed once against the existing ones
+        wanted: dict[tuple[int, int], int] = {}
+        for line_number, project_part in self._implicit_lines.items():
+            for implicit_definition in self.implicit_definitions.get(
+                project_part.part.package_id, []
+            ):
+                wanted[(line_number, implicit_definition.part_id)] = (
+                    implicit_definition.quantity * project_part.quantity
+                )
+        # clean up any vestiges
+        for key, implicit_project_part in list(self.implicit_project_parts.items()):
+            if key[0] in self._implicit_lines and key not in wanted:
+                self._delete_project_part(implicit_project_part)
+                del self.implicit_project_parts[key]
+        for (line_number, part_id), quantity in wanted.items():
+            implicit_project_part = self.implicit_project_parts.get(
+                (line_number, part_id)
+            )
+            if implicit_project_part is None:
+                self.implicit_project_parts[(line_number, part_id)] = (
+                    self._create_project_part(
+                        line_number=line_number,
+                        is_implicit=True,
+                        part_id=part_id,
+                        quantity=quantity,
+                    )
+                )
+                logger.info(
+                    f">>>> Created implicit project part for line {line_number}"
+                )
+            else:
+                self._set_fields(implicit_project_part, quantity=quantity)
+        self._implicit_lines.clear()
+
+    def _delete_project_part(self, project_part: models.ProjectPart):
+        if project_part.pk is None:
+            self._created_project_parts.remove(project_part)
+            return
+        self._dirty_project_parts.pop(project_part.pk, None)
+        self._deleted_project_part_pks.add(project_part.pk)
+
+    def delete_stale(self, project_parts: list[models.ProjectPart]):
+        """
+        Deletes the existing explicit project parts which are not among the
+        given (synced) project parts, along with the implicit project parts on
+        lines which are no longer in the BOM.
+        """
+        kept_pks = {project_part.pk for project_part in project_parts}
+        kept_line_numbers = {project_part.line_number for project_part in project_parts}
+        for project_part in self.project_parts.values():
+            if project_part.is_implicit:
+                if project_part.line_number not in kept_line_numbers:
+                    self._delete_project_part(project_part)
+            elif project_part.pk not in kept_pks:
+                self._delete_project_part(project_part)
+
+    @property
+    def has_changes(self) -> bool:
+        """
+        Whether ``write`` has anything to write.
+        """
+        return bool(
+            self._created_project_parts
+            or self._dirty_project_parts
+            or self._deleted_project_part_pks
+            or self._created_footprint_refs
+            or self._deleted_footprint_ref_pks
+        )
+
+    def write(self):
+        """
+        Reconciles the queued implicit project parts, then applies the
+        accumulated changes in bulk, in a single transaction.
+        """
+        self._reconcile_implicit_parts()
+        if not self.has_changes:
+            return
+        with transaction.atomic():
+            if self._deleted_project_part_pks:
+                models.ProjectPart.objects.filter(
+                    pk__in=self._deleted_project_part_pks
+                ).delete()
+            if self._deleted_footprint_ref_pks:
+                models.ProjectPartFootprintRef.objects.filter(
+                    pk__in=self._deleted_footprint_ref_pks
+                ).delete()
+            models.ProjectPart.objects.bulk_create(self._created_project_parts)
+            models.ProjectPart.objects.bulk_update(
+                list(self._dirty_project_parts.values()), self.project_part_fields
+            )
+            models.ProjectPartFootprintRef.objects.bulk_create(
+                [
+                    footprint_ref
+                    for footprint_ref in self._created_footprint_refs
+                    if footprint_ref.project_part.pk
+                    not in self._deleted_project_part_pks
+                ]
+            )
+
+
+@dataclass
+class ProjectVersionSyncReport:
+    """
+    Outcome of syncing one version of a project with
+    ``ProjectVersionBomService.sync_project``, and the seconds spent resolving
+    its commit ref, downloading its BOM, and writing its project parts.
+
+    ``status`` is one of "synced", "skipped" (the commit was already synced),
+    "ref_not_found", or "failed" (the ref or BOM could not be fetched).
+    """
+
+    project_version_pk: int
+    status: str = "pending"
+    synced_commit: str = ""
+    resolve_time: float = 0.0
+    download_time: float = 0.0
+    write_time: float = 0.0
+    # the BOM was downloaded once for several versions
+    shared_download: bool = False
+    row_errors: dict[str, list[int]] = field(default_factory=dict)
+
+
+def _timed(func: Callable, **kwargs) -> tuple[Any, Exception | None, float]:
+    # runs on a worker thread; exceptions are handed back rather than raised
+    started = time.perf_counter()
+    try:
+        result, error = func(**kwargs), None
+    except Exception as exc:
+        result, error = None, exc
+    return result, error, time.perf_counter() - started
+
+
 class ProjectVersionBomService:
     """Downloads BOM from repo at specified commit and creates project
     parts for each line."""
 
-    def _get_vendor_part(self, *, row):
+    # bytes read at a time from a BOM download
+    bom_chunk_size: int = 64 * 1024
+
+    def __init__(self):
+        """
+        The part index and writer are only set for the duration of a sync;
+        outside of a sync rows are resolved with per-row queries and changes
+        are written immediately. Mouser vendor parts created during a sync
+        are populated together when it ends.
+        """
+        self.part_index: BomPartIndex | None = None
+        self.writer: BomSyncWriter | None = None
+        self.unpopulated_vendor_part_pks: list[int] = []
+
+    @contextmanager
+    def _writes(self, project_version):
+        if self.writer is not None:
+            yield self.writer
+            return
+        self.writer = BomSyncWriter(project_version=project_version)
+        try:
+            yield self.writer
+            self.writer.write()
+        finally:
+            self.writer = None
+
+    def _find_vendor_part(self, *, row) -> models.VendorPart | None:
+        if self.part_index is not None:
+            return self.part_index.get_vendor_part(row=row)
         try:
-            vendor_part = models.VendorPart.objects.get(
+            return models.VendorPart.objects.get(
                 vendor__name=row.vendor_name, item_number=row.item_number
             )
         except models.VendorPart.DoesNotExist:
+            return None
+
+    def _get_vendor_part(self, *, row):
+        vendor_part = self._find_vendor_part(row=row)
+        if vendor_part is None:
             # such a vendor part will need to exist before this project
             #  bom can be validated
             logger.info(
@@ -37,9 +453,15 @@ class ProjectVersionBomService:
             )
             # If the vendor is Mouser then the part can be looked up via API
             if row.vendor_name == "Mouser":
-                vendor_part = MouserPartService().create_vendor_part(
-                    row=row,
-                )
+                if self.part_index is None:
+                    vendor_part = MouserPartService().create_vendor_part(row=row)
+                else:
+                    # populated in one batch once the rows are synced
+                    vendor_part = MouserPartService().create_vendor_part(
+                        row=row, populate=False
+                    )
+                    self.part_index.add_vendor_part(vendor_part)
+                    self.unpopulated_vendor_part_pks.append(vendor_part.pk)
             else:
                 raise MissingVendorPart(
                     f"Vendor Part not found {row.vendor_name}: {row.item_number}"
@@ -59,25 +481,21 @@ class ProjectVersionBomService:
             )
             .exclude(inventory_lines__is_deprioritized=True)
             .annotate(qty_in_inventory=Sum("inventory_lines__quantity"))
-            .order_by("-qty_in_inventory")
+            .order_by("-qty_in_inventory", "pk")
         )
 
     def _get_part(self, *, row):
         if row.item_number and row.vendor_name:
             return self._get_vendor_part(row=row).part
+        if self.part_index is not None:
+            return next(iter(self.part_index.get_matching_parts(row=row)), None)
         _part = self._get_matching_parts(row=row).first()
         return _part
 
     def _sync_footprints(self, footprint_refs, *, project_part):
-        # get rid of any outdated/altered refs
-        models.ProjectPartFootprintRef.objects.filter(
-            project_part=project_part
-        ).exclude(footprint_ref__in=footprint_refs).delete()
-        # create any missing refs
-        for footprint_ref in footprint_refs:
-            models.ProjectPartFootprintRef.objects.get_or_create(
-                footprint_ref=footprint_ref, project_part=project_part
-            )
+        # get rid of any outdated/altered refs and create any missing refs
+        with self._writes(project_part.project_version) as writer:
+            writer.sync_footprints(footprint_refs, project_part=project_part)
 
     def _sync_implicit_parts(self, *, project_part):
         if project_part.part is None:
@@ -86,30 +504,8 @@ class ProjectVersionBomService:
                 f"part {project_part}"
             )
             return
-        implicit_project_parts = models.ImplicitProjectPart.objects.filter(
-            owner=project_part.project_version.project.owner,
-            for_package=project_part.part.package,
-        )
-        project_part_pks = []
-        for implicit_project_part in implicit_project_parts:
-            quantity = implicit_project_part.quantity * project_part.quantity
-            _implicit_project_part, _ = models.ProjectPart.objects.update_or_create(
-                project_version=project_part.project_version,
-                line_number=project_part.line_number,
-                is_implicit=True,
-                part=implicit_project_part.part,
-                defaults={
-                    "quantity": quantity,
-                },
-            )
-            logger.info(
-                f">>>> Created implicit project part {_implicit_project_part.pk}"
-            )
-            project_part_pks.append(_implicit_project_part.pk)
-        # clean up any vestiges
-        models.ProjectPart.objects.exclude(pk__in=project_part_pks).filter(
-            line_number=project_part.line_number, is_implicit=True
-        ).delete()
+        with self._writes(project_part.project_version) as writer:
+            writer.sync_implicit_parts(project_part=project_part)
 
     def _sync_row(self, *, row, project_version):
         _part = None
@@ -117,69 +513,201 @@ class ProjectVersionBomService:
             _part = self._get_part(row=row)
         except MissingVendorPart:
             pass
-        defaults = {
-            "part": _part,
-            "quantity": row.quantity,
-            "is_optional": row.optional,
-        }
-        if _part is None:
-            defaults.update({"missing_part_description": f"{row}"})
-        project_part, _ = models.ProjectPart.objects.update_or_create(
-            project_version=project_version,
-            line_number=row.line_number,
-            is_implicit=False,
-            defaults=defaults,
-        )
-
-        self._sync_footprints(row.references, project_part=project_part)
-        self._sync_implicit_parts(project_part=project_part)
+        with self._writes(project_version) as writer:
+            project_part = writer.sync_project_part(row=row, part=_part)
+            self._sync_footprints(row.references, project_part=project_part)
+            self._sync_implicit_parts(project_part=project_part)
         return project_part
 
-    def _get_commit_hash(self, project_version) -> str:
+    def _get_commit_hash(self, project_version, commit_ref: str | None = None) -> str:
         ret = ""
-        if project_version.project.git_server == models.Project.GitServer.GITHUB:
+        project = project_version.project
+        if commit_ref is None:
+            commit_ref = project_version.commit_ref
+        if project.git_server == models.Project.GitServer.GITHUB:
             ret = GithubService().get_commit_hash_for_ref(
-                user=project_version.project.git_user,
-                repo=project_version.project.git_repo,
-                commit_ref=project_version.commit_ref,
+                user=project.git_user,
+                repo=project.git_repo,
+                commit_ref=commit_ref,
+            )
+        elif project.git_server == models.Project.GitServer.MIRROR:
+            ret = GitMirrorService().get_commit_hash_for_ref(
+                remote=project.git_url, commit_ref=commit_ref
             )
         return ret
 
-    def _sync(self, *, project_version: models.ProjectVersion, synced_commit: str):
-        row_errors = {}
-        project_part_pks = []
+    @contextmanager
+    def _open_bom(
+        self, *, project_version: models.ProjectVersion, synced_commit: str
+    ) -> Iterator[Iterable[bytes]]:
+        """
+        Opens the BOM of the project version at the commit as an iterable of
+        byte chunks. Raises ``RefNotFoundException`` when a mirror has no BOM
+        at the commit.
+        """
+        project = project_version.project
+        if project.git_server == models.Project.GitServer.MIRROR:
+            logger.info(f">> Reading BOM from mirror of {project.git_url}")
+            try:
+                content = GitMirrorService().read_file(
+                    remote=project.git_url,
+                    commit_hash=synced_commit,
+                    path=project_version.bom_path,
+                )
+            except GitMirrorService.GitError as e:
+                logger.error(
+                    f"Cannot read {project_version.bom_path} at {synced_commit}"
+                    f" from mirror of {project.git_url}: {e}"
+                )
+                raise RefNotFoundException from e
+            yield [content]
+            return
         _bom_url = project_version.bom_url_for_commit(synced_commit)
         logger.info(f">> Getting BOM from {_bom_url}")
-        file_response = requests.get(_bom_url)
-        with (
-            closing(file_response),
-            io.StringIO(file_response.content.decode("utf-8")) as bom,
-        ):
-            reader = csv.DictReader(bom)
-            logger.info(">> Parsing csv")
-            for line_number, _row in enumerate(reader, start=1):
-                if "#" not in _row:
-                    _row["#"] = line_number
-                row = models.BillOfMaterialsRow.model_validate(_row)
+        with closing(get_transport().get(_bom_url, stream=True)) as file_response:
+            yield file_response.iter_content(chunk_size=self.bom_chunk_size)
+
+    def _read_bom(
+        self,
+        *,
+        project_version: models.ProjectVersion,
+        synced_commit: str,
+        synced_hash: str | None = None,
+    ) -> tuple[list[models.BillOfMaterialsRow] | None, str]:
+        """
+        Downloads the BOM of the project version at the commit, returning its
+        rows (parsed with ``BomParser``) and the SHA-256 of its content. Each
+        chunk is hashed and parsed as it arrives, so the content is never held
+        whole. ``None`` is returned for the rows of a BOM whose hash is
+        ``synced_hash``.
+        """
+        hasher = hashlib.sha256()
+
+        def _hashed(chunks: Iterable[bytes]) -> Iterator[bytes]:
+            for chunk in chunks:
+                hasher.update(chunk)
+                yield chunk
+
+        logger.info(">> Parsing BOM")
+        with self._open_bom(
+            project_version=project_version, synced_commit=synced_commit
+        ) as chunks:
+            hashed_chunks = _hashed(chunks)
+            rows = list(BomParser().parse(hashed_chunks, path=project_version.bom_path))
+            # hash anything the parser left unread (e.g. past the XML root)
+            for _ in hashed_chunks:
+                pass
+        bom_hash = hasher.hexdigest()
+        if bom_hash == synced_hash:
+            return None, bom_hash
+        return rows, bom_hash
+
+    def fetch_bom(
+        self, *, project_version: models.ProjectVersion, commit_ref: str
+    ) -> tuple[str, list[models.BillOfMaterialsRow]]:
+        """
+        Resolves ``commit_ref`` in the repo of the project version and reads
+        the rows of its BOM at the resolved commit, without writing anything.
+        Returns the resolved commit hash and the rows.
+        """
+        synced_commit = self._get_commit_hash(project_version, commit_ref=commit_ref)
+        rows, _ = self._read_bom(
+            project_version=project_version, synced_commit=synced_commit
+        )
+        assert rows is not None
+        return synced_commit, rows
+
+    def _synced_hash(self, project_version: models.ProjectVersion) -> str | None:
+        # Rows whose part was missing must be resolved again even when the BOM
+        #  is unchanged, since the part may have been added since
+        if project_version.project_parts.filter(part__isnull=True).exists():
+            return None
+        return project_version.bom_hash
+
+    def _is_synced(
+        self, *, project_version: models.ProjectVersion, synced_commit: str
+    ) -> bool:
+        # The BOM at a given commit never changes, but only a real commit hash
+        #  (not the empty string for unsupported git servers) identifies it
+        return bool(
+            synced_commit
+            and project_version.bom_hash
+            and project_version.last_synced_commit == synced_commit
+            and self._synced_hash(project_version)
+        )
+
+    def _sync(
+        self,
+        *,
+        project_version: models.ProjectVersion,
+        synced_commit: str,
+        force: bool = False,
+    ):
+        synced_hash = None if force else self._synced_hash(project_version)
+        rows, bom_hash = self._read_bom(
+            project_version=project_version,
+            synced_commit=synced_commit,
+            synced_hash=synced_hash,
+        )
+        return self._sync_rows(
+            project_version=project_version,
+            synced_commit=synced_commit,
+            rows=rows,
+            bom_hash=bom_hash,
+            synced_hash=synced_hash,
+        )
+
+    def _sync_rows(
+        self,
+        *,
+        project_version: models.ProjectVersion,
+        synced_commit: str,
+        rows: list[models.BillOfMaterialsRow] | None,
+        bom_hash: str,
+        synced_hash: str | None = None,
+    ):
+        # rows are only left unparsed when the BOM content is unchanged
+        row_errors = {}
+        project_parts = []
+        if rows is None or bom_hash == synced_hash:
+            # The BOM content is unchanged (e.g. a branch moved without
+            #  touching it); only record the commit
+            logger.info(">> BOM content is unchanged. Skipping rows")
+            project_version.last_synced_commit = synced_commit
+            project_version.synced = timezone.now()
+            project_version.save(update_fields=["last_synced_commit", "synced"])
+            return row_errors
+        self.part_index = BomPartIndex(rows)
+        self.writer = BomSyncWriter(project_version=project_version)
+        try:
+            for row in rows:
                 logger.info(f">>>> Line {row.line_number}")
                 project_part = self._sync_row(row=row, project_version=project_version)
                 if project_part.part is None:
                     logger.info(f">>>> Part missing for line {row}")
                     logger.info(row.symbols)
                     row_errors.setdefault("part_missing", []).append(row.line_number)
-                project_part_pks.append(project_part.pk)
-        logger.info(f">> Created these project parts {project_part_pks}")
-        # remove any outdated lines (implicit parts are cleaned up in
-        #  _sync_implicit_parts)
-        models.ProjectPart.objects.filter(
-            project_version=project_version, is_implicit=False
-        ).exclude(pk__in=project_part_pks).delete()
-        project_version.last_synced_commit = synced_commit
-        project_version.synced = timezone.now()
-        project_version.save()
+                project_parts.append(project_part)
+            # remove any outdated lines
+            self.writer.delete_stale(project_parts)
+            with transaction.atomic():
+                self.writer.write()
+                project_version.last_synced_commit = synced_commit
+                project_version.bom_hash = bom_hash
+                project_version.synced = timezone.now()
+                project_version.save(
+                    update_fields=["last_synced_commit", "bom_hash", "synced"]
+                )
+        finally:
+            self.part_index = None
+            self.writer = None
+            if self.unpopulated_vendor_part_pks:
+                populate_mouser_vendor_parts.send(self.unpopulated_vendor_part_pks)
+                self.unpopulated_vendor_part_pks = []
+        logger.info(f">> Synced these project parts {[pp.pk for pp in project_parts]}")
         return row_errors
 
-    def sync(self, project_version_pk):
+    def sync(self, project_version_pk, force=False):
         """
         Finds a project version by PK then downloads BOM from repository and
         creates project parts for each row. BOM rows which cannot be matched
@@ -193,6 +721,12 @@ class ProjectVersionBomService:
 
         Upon completion of the sync process the commit hash where the BOM was
         found will be saved and the project version will be marked synced.
+
+        Unless ``force`` is given, the sync returns immediately when the
+        commit was already synced, and the BOM is neither parsed nor
+        re-synced when its content hash is unchanged. Either shortcut is only
+        taken while every project part of the version has a part; rows with
+        a missing part are always resolved again.
         """
         project_version = models.ProjectVersion.objects.get(pk=project_version_pk)
         logger.info(f"Starting project version sync for {project_version}")
@@ -203,4 +737,171 @@ class ProjectVersionBomService:
                 f"!! Cannot find commit ref {project_version.commit_ref}. Aborting!"
             )
             return
-        return self._sync(project_version=project_version, synced_commit=synced_commit)
+        if not force and self._is_synced(
+            project_version=project_version, synced_commit=synced_commit
+        ):
+            logger.info(f">> Commit {synced_commit} is already synced. Skipping")
+            return {}
+        try:
+            return self._sync(
+                project_version=project_version,
+                synced_commit=synced_commit,
+                force=force,
+            )
+        except RefNotFoundException:
+            logger.info(
+                f"!! Cannot find BOM {project_version.bom_path} at {synced_commit}."
+                " Aborting!"
+            )
+            return
+
+    def _resolve_commits(
+        self,
+        project_versions: list[models.ProjectVersion],
+        *,
+        executor: ThreadPoolExecutor,
+        reports: dict[int, ProjectVersionSyncReport],
+    ):
+        by_ref: dict[str, list[models.ProjectVersion]] = {}
+        for project_version in project_versions:
+            by_ref.setdefault(project_version.commit_ref, []).append(project_version)
+        futures = {
+            commit_ref: executor.submit(
+                _timed, self._get_commit_hash, project_version=group[0]
+            )
+            for commit_ref, group in by_ref.items()
+        }
+        for commit_ref, future in futures.items():
+            synced_commit, error, elapsed = future.result()
+            if isinstance(error, RefNotFoundException):
+                logger.info(f"!! Cannot find commit ref {commit_ref}")
+            elif error is not None:
+                logger.error(f"!! Cannot resolve commit ref {commit_ref}: {error!r}")
+            for project_version in by_ref[commit_ref]:
+                report = reports[project_version.pk]
+                report.resolve_time = elapsed
+                if isinstance(error, RefNotFoundException):
+                    report.status = "ref_not_found"
+                elif error is not None:
+                    report.status = "failed"
+                else:
+                    report.synced_commit = synced_commit
+
+    def _download_boms(
+        self,
+        project_versions: list[models.ProjectVersion],
+        *,
+        executor: ThreadPoolExecutor,
+        reports: dict[int, ProjectVersionSyncReport],
+        synced_hashes: dict[int, str | None],
+    ) -> dict[int, tuple[list[models.BillOfMaterialsRow] | None, str]]:
+        by_fetch: dict[tuple[str, str], list[models.ProjectVersion]] = {}
+        for project_version in project_versions:
+            synced_commit = reports[project_version.pk].synced_commit
+            by_fetch.setdefault((synced_commit, project_version.bom_path), []).append(
+                project_version
+            )
+        futures = {}
+        for fetch, group in by_fetch.items():
+            # the BOM need not be parsed when every version sharing it has
+            #  already synced the same content
+            group_hashes = {
+                synced_hashes[project_version.pk] for project_version in group
+            }
+            futures[fetch] = executor.submit(
+                _timed,
+                self._read_bom,
+                project_version=group[0],
+                synced_commit=fetch[0],
+                synced_hash=group_hashes.pop() if len(group_hashes) == 1 else None,
+            )
+        boms = {}
+        for fetch, future in futures.items():
+            bom, error, elapsed = future.result()
+            if error is not None:
+                logger.error(f"!! Cannot download BOM {fetch[1]}@{fetch[0]}: {error!r}")
+            for project_version in by_fetch[fetch]:
+                report = reports[project_version.pk]
+                report.download_time = elapsed
+                report.shared_download = len(by_fetch[fetch]) > 1
+                if error is not None:
+                    report.status = "failed"
+                else:
+                    boms[project_version.pk] = bom
+        return boms
+
+    def sync_project(self, project_pk, force=False) -> list[ProjectVersionSyncReport]:
+        """
+        Syncs every version of a project together. Each distinct commit ref
+        is resolved once and each distinct (commit, BOM path) is downloaded
+        once, concurrently on a pool of ``CTB_SYNC_MAX_WORKERS`` threads; the
+        project parts of each version are then written in turn, as ``sync``
+        would.
+
+        Returns a report, with timings, for each version.
+        """
+        project_versions = list(
+            models.ProjectVersion.objects.filter(project_id=project_pk)
+            .select_related("project")
+            .order_by("pk")
+        )
+        logger.info(
+            f"Starting project sync for {len(project_versions)} project versions"
+        )
+        reports = {
+            project_version.pk: ProjectVersionSyncReport(
+                project_version_pk=project_version.pk
+            )
+            for project_version in project_versions
+        }
+        with ThreadPoolExecutor(
+            max_workers=settings.CTB_SYNC_MAX_WORKERS, thread_name_prefix="ctb-sync"
+        ) as executor:
+            self._resolve_commits(project_versions, executor=executor, reports=reports)
+            pending = []
+            for project_version in project_versions:
+                report = reports[project_version.pk]
+                if report.status != "pending":
+                    continue
+                if not force and self._is_synced(
+                    project_version=project_version,
+                    synced_commit=report.synced_commit,
+                ):
+                    report.status = "skipped"
+                    continue
+                pending.append(project_version)
+            synced_hashes = {
+                project_version.pk: (
+                    None if force else self._synced_hash(project_version)
+                )
+                for project_version in pending
+            }
+            boms = self._download_boms(
+                pending,
+                executor=executor,
+                reports=reports,
+                synced_hashes=synced_hashes,
+            )
+        for project_version in pending:
+            if project_version.pk not in boms:
+                continue
+            report = reports[project_version.pk]
+            rows, bom_hash = boms[project_version.pk]
+            started = time.perf_counter()
+            report.row_errors = self._sync_rows(
+                project_version=project_version,
+                synced_commit=report.synced_commit,
+                rows=rows,
+                bom_hash=bom_hash,
+                synced_hash=synced_hashes[project_version.pk],
+            )
+            report.write_time = time.perf_counter() - started
+            report.status = "synced"
+        for report in reports.values():
+            logger.info(
+                f">> Project version {report.project_version_pk} {report.status}: "
+                f"resolve {report.resolve_time:.3f}s, "
+                f"download {report.download_time:.3f}s, "
+                f"write {report.write_time:.3f}s"
+            )
+        return list(reports.values())
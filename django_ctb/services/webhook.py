@@ -0,0 +1,102 @@
+"""
+Services for handling push webhooks from git servers
+"""
+
+import hashlib
+import hmac
+import logging
+from typing import Any
+
+from django.db.models import Q
+
+from django_ctb import models
+from django_ctb.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Github truncates the commit list of very large pushes
+_MAX_PUSH_COMMITS = 2048
+
+
+class PushWebhookService:
+    """
+    Finds the project versions affected by a (Github style) push webhook so
+    that only those are re-synced.
+    """
+
+    def verify_signature(self, *, body: bytes, signature: str | None) -> bool:
+        """
+        Checks the ``X-Hub-Signature-256`` header of a webhook request, the
+        HMAC-SHA256 of the body keyed with ``CTB_WEBHOOK_SECRET``. Always
+        fails when no secret is configured.
+        """
+        secret = settings.CTB_WEBHOOK_SECRET
+        if not secret or not signature:
+            return False
+        expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(f"sha256={expected}", signature)
+
+    def _get_projects(self, repository: dict[str, Any]):
+        remotes = {
+            repository[key]
+            for key in ("clone_url", "ssh_url", "git_url", "html_url")
+            if repository.get(key)
+        }
+        user, _, repo = (repository.get("full_name") or "").partition("/")
+        return models.Project.objects.filter(
+            Q(git_remote__in=remotes)
+            | (
+                (Q(git_remote__isnull=True) | Q(git_remote=""))
+                & Q(
+                    git_server__in=[
+                        models.Project.GitServer.GITHUB,
+                        models.Project.GitServer.MIRROR,
+                    ],
+                    git_user__iexact=user,
+                    git_repo__iexact=repo,
+                )
+            )
+        )
+
+    def get_affected_project_versions(
+        self, payload: dict[str, Any]
+    ) -> list[models.ProjectVersion]:
+        """
+        Project versions of the pushed repo whose ``commit_ref`` is the pushed
+        ref and whose BOM may have changed: the push touched ``bom_path``, or
+        the changed paths are unknown (a tag, a new or force pushed branch, a
+        truncated commit list), or the version was never synced.
+        """
+        ref = payload.get("ref") or ""
+        if not ref or payload.get("deleted"):
+            return []
+        short_ref = ref.removeprefix("refs/heads/").removeprefix("refs/tags/")
+        commits = payload.get("commits") or []
+        changed_paths = {
+            path
+            for commit in commits
+            for key in ("added", "modified", "removed")
+            for path in commit.get(key) or []
+        }
+        paths_unknown = (
+            ref.startswith("refs/tags/")
+            or payload.get("created")
+            or payload.get("forced")
+            or not commits
+            or len(commits) >= _MAX_PUSH_COMMITS
+        )
+        project_versions = models.ProjectVersion.objects.filter(
+            project__in=self._get_projects(payload.get("repository") or {}),
+            commit_ref__in={ref, short_ref},
+        ).order_by("pk")
+        affected = [
+            project_version
+            for project_version in project_versions
+            if paths_unknown
+            or not project_version.last_synced_commit
+            or project_version.bom_path.lstrip("/") in changed_paths
+        ]
+        logger.info(
+            f"Push to {ref} affects project versions {[pv.pk for pv in affected]}"
+        )
+        return affected
@@ -4,8 +4,11 @@ Dramatiq tasks for performing long-running actions in the background
 
 import dramatiq
 
+from django_ctb.exceptions import InvalidReceipt
 from django_ctb.mouser.services import (
     populate_mouser_vendor_part,  # noqa: F401
+    populate_mouser_vendor_parts,  # noqa: F401
+    refresh_stale_mouser_prices,  # noqa: F401
 )
 from django_ctb.services import (
     ProjectBuildService,
@@ -15,7 +18,7 @@ from django_ctb.services import (
 
 
 @dramatiq.actor
-def sync_project_version(project_version_pk):
+def sync_project_version(project_version_pk, force=False):
     """
     Background task to sync the Bill Of Materials (BOM) for a given project
     version. Syncing the BOM will create project parts for each BOM row which
@@ -24,8 +27,23 @@ def sync_project_version(project_version_pk):
     project part. Implicit project parts will be generated when a known
     footprint is called for (e.g. an LED footprint may create an implicit
     project part for the LED bezel).
+
+    Versions whose commit (or BOM content) was already synced are skipped
+    unless ``force`` is given.
+    """
+    ProjectVersionBomService().sync(project_version_pk, force=force)
+
+
+@dramatiq.actor
+def sync_project(project_pk, force=False):
+    """
+    Background task to sync the BOMs of every version of a project together.
+    Commit refs are resolved once each, and versions sharing a commit and BOM
+    path share a single download; downloads run concurrently. The rows of
+    each version are then synced as with ``sync_project_version``, and the
+    time spent on each version is logged.
     """
-    ProjectVersionBomService().sync(project_version_pk)
+    ProjectVersionBomService().sync_project(project_pk, force=force)
 
 
 @dramatiq.actor
@@ -63,9 +81,9 @@ def generate_vendor_orders(project_build_pks):
     """
     Background task to create vendor orders from project build shortages.
     Prefers to add to existing (unplaced) orders rather than create a new one.
+    Demand for a part is summed across the builds before vendors are chosen.
     """
-    for project_build_pk in project_build_pks:
-        VendorOrderService().generate_vendor_orders(project_build_pk)
+    VendorOrderService().generate_vendor_orders_for_builds(project_build_pks)
 
 
 @dramatiq.actor
@@ -76,3 +94,19 @@ def complete_order(vendor_order_pk):
     track.
     """
     VendorOrderService().complete_order(vendor_order_pk)
+
+
+@dramatiq.actor(throws=(InvalidReceipt,))
+def receive_order(vendor_order_pk, lines=None):
+    """
+    Background task to receive part of a vendor order. ``lines`` lists the
+    [order line pk, quantity received] of each line received; all that is
+    left of the order is received when it is omitted. The order is marked
+    fulfilled once every line has been received in full.
+
+    Receipts which are no longer valid (e.g. the lines were received in the
+    meantime) are not retried.
+    """
+    VendorOrderService().receive_order(
+        vendor_order_pk, None if lines is None else dict(lines)
+    )
@@ -0,0 +1,240 @@
+"""
+HTTP transport shared by the GitHub, BOM download, and Mouser integrations.
+Pools connections per host, applies timeouts, retries with backoff on rate
+limiting and server errors, and records the timing of every request.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django_ctb.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# POSTs (the Mouser search) are not retried here: every Mouser call counts
+#  against its quota, so each one must be taken from the shared rate limit
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+@dataclass(frozen=True)
+class RequestTiming:
+    """
+    Timing of a single request (including any retries) made by a transport
+    """
+
+    method: str
+    host: str
+    path: str
+    status_code: int | None
+    elapsed: float
+    retries: int = 0
+
+
+class HttpTransport:
+    """
+    Makes HTTP requests through one pooled ``requests.Session``. Connections
+    are kept alive and pooled per host; GET requests which are rate limited
+    or fail with a server error are retried with exponential backoff
+    (honoring ``Retry-After``). The final response is returned whatever its
+    status, so callers check ``status_code`` as before.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float | None = None,
+        max_retries: int | None = None,
+        backoff_factor: float | None = None,
+        pool_connections: int | None = None,
+        pool_maxsize: int | None = None,
+        metrics_size: int | None = None,
+    ):
+        """
+        Options default to the ``CTB_HTTP_...`` settings.
+        """
+        self.timeout = settings.CTB_HTTP_TIMEOUT if timeout is None else timeout
+        self.max_retries = (
+            settings.CTB_HTTP_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.backoff_factor = (
+            settings.CTB_HTTP_BACKOFF_FACTOR
+            if backoff_factor is None
+            else backoff_factor
+        )
+        self.pool_connections = (
+            settings.CTB_HTTP_POOL_CONNECTIONS
+            if pool_connections is None
+            else pool_connections
+        )
+        self.pool_maxsize = (
+            settings.CTB_HTTP_POOL_MAXSIZE if pool_maxsize is None else pool_maxsize
+        )
+        self.timings: deque[RequestTiming] = deque(
+            maxlen=settings.CTB_HTTP_METRICS_SIZE
+            if metrics_size is None
+            else metrics_size
+        )
+        self._session: requests.Session | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """The pooled session, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Makes a request, applying the default timeout, and records its timing.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self._send(method, url, **kwargs)
+            return response
+        finally:
+            self._record(method, url, response, time.perf_counter() - started)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Makes a GET request"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Makes a POST request"""
+        return self.request("POST", url, **kwargs)
+
+    def _record(self, method, url, response, elapsed):
+        _url = urlsplit(url)
+        retry_state = getattr(getattr(response, "raw", None), "retries", None)
+        if not isinstance(retry_state, Retry):
+            # not a response from the network (e.g. a stand-in)
+            retry_state = None
+        timing = RequestTiming(
+            method=method,
+            host=_url.netloc,
+            path=_url.path,
+            status_code=getattr(response, "status_code", None),
+            elapsed=elapsed,
+            retries=len(retry_state.history) if retry_state else 0,
+        )
+        self.timings.append(timing)
+        logger.debug(
+            f"{timing.method} {timing.host}{timing.path} -> {timing.status_code}"
+            f" in {timing.elapsed:.3f}s ({timing.retries} retries)"
+        )
+
+    def close(self):
+        """Closes the pooled connections"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class LocalTransport(HttpTransport):
+    """
+    Stand-in transport which hands every request to ``handler`` (called with
+    the method, url, and request keyword arguments) instead of the network.
+    Timings are still recorded.
+    """
+
+    def __init__(self, handler: Callable[..., requests.Response], **kwargs):
+        """
+        ``handler`` returns the response for each request.
+        """
+        super().__init__(**kwargs)
+        self.handler = handler
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.handler(method, url, **kwargs)
+
+
+_transport: HttpTransport | None = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HttpTransport:
+    """
+    Returns the shared transport, built from ``CTB_HTTP_TRANSPORT`` on first
+    use.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = import_string(settings.CTB_HTTP_TRANSPORT)()
+    return _transport
+
+
+def reset_transport():
+    """
+    Closes the shared transport so that the next call to ``get_transport``
+    builds a new one from the current settings.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = None
+
+
+@contextmanager
+def override_transport(transport: HttpTransport) -> Iterator[HttpTransport]:
+    """
+    Uses ``transport`` as the shared transport for the duration of the block
+    (e.g. a ``LocalTransport`` in tests).
+    """
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    try:
+        yield transport
+    finally:
+        with _transport_lock:
+            _transport = previous
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting, **kwargs):
+    if setting.startswith("CTB_HTTP_"):
+        reset_transport()
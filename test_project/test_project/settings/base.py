@@ -85,6 +85,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # take the write lock when a transaction begins so that concurrent
+        #  workers queue up rather than fail (sqlite has no row locking)
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
     }
 }
 
@@ -0,0 +1,5 @@
+from .test import *  # noqa: F403
+
+# in-memory sqlite databases cannot be shared between threads with locking,
+#  use a file so that concurrency tests see real transaction behavior
+DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}  # noqa: F405
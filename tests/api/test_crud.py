@@ -1,3 +1,6 @@
+import hashlib
+import hmac
+import json
 from datetime import datetime
 from typing import Any, NamedTuple, cast
 from unittest.mock import Mock
@@ -6,13 +9,15 @@ import pytest
 from django.db import models
 from django.db.models.fields.generated import GeneratedField
 from django.urls import reverse
+from django.utils import timezone
 from factory.django import DjangoModelFactory
 from rest_framework import serializers, status
 from rest_framework.test import APIClient
 
 from django_ctb import models as m
-from django_ctb import services
+from django_ctb import services, tasks
 from django_ctb.api import serializers as s
+from django_ctb.exceptions import RefNotFoundException
 from django_ctb.mouser.services import MouserService
 from tests import factories as fac
 
@@ -36,9 +41,9 @@ def other_user_authed_api_client(user_factory, api_client):
 
 
 def assert_status(response, status_code):
-    assert (
-        response.status_code == status_code
-    ), f"Bad response ({response.status_code}, expected {status_code}) {response.text}"
+    assert response.status_code == status_code, (
+        f"Bad response ({response.status_code}, expected {status_code}) {response.text}"
+    )
 
 
 def deep_print(instance: models.Model):
@@ -234,7 +239,13 @@ class TestCRUD:
         try:
             # check attributes
             for field in instance._meta.concrete_fields:
-                if field.name in ("id", "owner", "created", "updated"):
+                if field.name in (
+                    "id",
+                    "owner",
+                    "created",
+                    "updated",
+                    "equivalence_class",
+                ):
                     continue
                 if not hasattr(created, field.name):
                     continue
@@ -313,7 +324,7 @@ class TestCRUD:
         self.resource.refresh_from_db()
         # TODO: expanded validation here
         for field in instance._meta.concrete_fields:
-            if field.name in ("id", "owner", "updated"):
+            if field.name in ("id", "owner", "updated", "equivalence_class"):
                 continue
             if isinstance(field, GeneratedField):
                 # don't compare this... it isn't real
@@ -560,10 +571,48 @@ class TestProjectBuildPartReservationManyToMany:
         assert_status(response, status.HTTP_400_BAD_REQUEST)
 
 
+class TestProjectGitRemote:
+    @pytest.mark.parametrize(
+        "git_remote",
+        [
+            "https://github.com/fake/repo.git",
+            "ssh://git@github.com/fake/repo.git",
+        ],
+    )
+    def test_update_accepts_network_remotes(
+        self, user_authed_api_client, project, git_remote
+    ):
+        response = user_authed_api_client.patch(
+            reverse("django-ctb-api:project-detail", kwargs={"pk": project.id}),
+            {"git_remote": git_remote},
+            format="json",
+        )
+        assert_status(response, status.HTTP_200_OK)
+        project.refresh_from_db()
+        assert project.git_remote == git_remote
+
+    @pytest.mark.parametrize(
+        "git_remote",
+        ["/srv/git/private.git", "file:///srv/git/private.git", "ext::sh -c id"],
+    )
+    def test_update_rejects_local_remotes(
+        self, user_authed_api_client, project, git_remote
+    ):
+        response = user_authed_api_client.patch(
+            reverse("django-ctb-api:project-detail", kwargs={"pk": project.id}),
+            {"git_remote": git_remote},
+            format="json",
+        )
+        assert_status(response, status.HTTP_400_BAD_REQUEST)
+        project.refresh_from_db()
+        assert project.git_remote is None
+
+
 class ActionTestParam(NamedTuple):
     action_name: str
     service_klass: Any
     action_method_name: str
+    action_kwargs: dict = {}
 
 
 action_params = [
@@ -577,11 +626,6 @@ action_params = [
         service_klass=services.VendorOrderService,
         action_method_name="complete_order",
     ),
-    ActionTestParam(
-        action_name="project-version-sync",
-        service_klass=services.ProjectVersionBomService,
-        action_method_name="sync",
-    ),
     ActionTestParam(
         action_name="project-build-clear-to-build",
         service_klass=services.ProjectBuildService,
@@ -597,11 +641,6 @@ action_params = [
         service_klass=services.ProjectBuildService,
         action_method_name="cancel_build",
     ),
-    ActionTestParam(
-        action_name="project-build-generate-vendor-orders",
-        service_klass=services.VendorOrderService,
-        action_method_name="generate_vendor_orders",
-    ),
 ]
 
 
@@ -609,6 +648,7 @@ class TestAPIActions:
     action_name: str
     service_klass: Any
     action_method_name: str
+    action_kwargs: dict
 
     @pytest.fixture(
         autouse=True,
@@ -619,6 +659,7 @@ class TestAPIActions:
         request.cls.action_name = request.param.action_name
         request.cls.service_klass = request.param.service_klass
         request.cls.action_method_name = request.param.action_method_name
+        request.cls.action_kwargs = request.param.action_kwargs
 
     def test_action(self, broker, worker, monkeypatch, user_authed_api_client):
         _mock = Mock()
@@ -636,4 +677,545 @@ class TestAPIActions:
 
         broker.join("default")
         worker.join()
-        _mock.assert_called_once_with(12345)
+        _mock.assert_called_once_with(12345, **self.action_kwargs)
+
+
+class TestProjectVersionSyncAction:
+    @pytest.mark.parametrize("force", [False, True])
+    def test_action(
+        self,
+        broker,
+        worker,
+        monkeypatch,
+        user_authed_api_client,
+        project_version,
+        force,
+    ):
+        _mock = Mock()
+        monkeypatch.setattr(services.ProjectVersionBomService, "sync", _mock)
+
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:project-version-sync",
+                kwargs={"pk": project_version.pk},
+            ),
+            {"force": force},
+            format="json",
+        )
+        assert_status(response, status.HTTP_200_OK)
+
+        broker.join("default")
+        worker.join()
+        _mock.assert_called_once_with(project_version.pk, force=force)
+
+    def test_not_found(self, monkeypatch, user_authed_api_client, db):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.sync_project_version, "send", _mock)
+
+        response = user_authed_api_client.post(
+            reverse("django-ctb-api:project-version-sync", kwargs={"pk": 12345}),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_404_NOT_FOUND)
+        _mock.assert_not_called()
+
+    def test_other_user(
+        self, monkeypatch, other_user_authed_api_client, project_version
+    ):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.sync_project_version, "send", _mock)
+
+        response = other_user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:project-version-sync",
+                kwargs={"pk": project_version.pk},
+            ),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_404_NOT_FOUND)
+        _mock.assert_not_called()
+
+
+class TestProjectSyncAction:
+    @pytest.mark.parametrize("force", [False, True])
+    def test_action(
+        self, broker, worker, monkeypatch, user_authed_api_client, project, force
+    ):
+        _mock = Mock()
+        monkeypatch.setattr(services.ProjectVersionBomService, "sync_project", _mock)
+
+        response = user_authed_api_client.post(
+            reverse("django-ctb-api:project-sync", kwargs={"pk": project.pk}),
+            {"force": force},
+            format="json",
+        )
+        assert_status(response, status.HTTP_200_OK)
+
+        broker.join("default")
+        worker.join()
+        _mock.assert_called_once_with(project.pk, force=force)
+
+    def test_not_found(self, monkeypatch, user_authed_api_client, db):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.sync_project, "send", _mock)
+
+        response = user_authed_api_client.post(
+            reverse("django-ctb-api:project-sync", kwargs={"pk": 12345}),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_404_NOT_FOUND)
+        _mock.assert_not_called()
+
+    def test_other_user(self, monkeypatch, other_user_authed_api_client, project):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.sync_project, "send", _mock)
+
+        response = other_user_authed_api_client.post(
+            reverse("django-ctb-api:project-sync", kwargs={"pk": project.pk}),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_404_NOT_FOUND)
+        _mock.assert_not_called()
+
+
+class TestProjectBuildGenerateVendorOrdersAction:
+    def test_action(self, broker, worker, monkeypatch, user_authed_api_client):
+        _mock = Mock()
+        monkeypatch.setattr(
+            services.VendorOrderService, "generate_vendor_orders_for_builds", _mock
+        )
+
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:project-build-generate-vendor-orders",
+                kwargs={"pk": 12345},
+            ),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_200_OK)
+
+        broker.join("default")
+        worker.join()
+        _mock.assert_called_once_with([12345])
+
+
+class TestVendorOrderReceiveAction:
+    @pytest.mark.parametrize("partial", [False, True], ids=["all", "partial"])
+    def test_action(
+        self,
+        broker,
+        worker,
+        monkeypatch,
+        user_authed_api_client,
+        vendor_order_line,
+        partial,
+    ):
+        _mock = Mock()
+        monkeypatch.setattr(services.VendorOrderService, "receive_order", _mock)
+        data = (
+            {"lines": [{"order_line_id": vendor_order_line.pk, "quantity": 4}]}
+            if partial
+            else {}
+        )
+
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:vendor-order-receive",
+                kwargs={"pk": vendor_order_line.vendor_order_id},
+            ),
+            data,
+            format="json",
+        )
+        assert_status(response, status.HTTP_200_OK)
+
+        broker.join("default")
+        worker.join()
+        _mock.assert_called_once_with(
+            vendor_order_line.vendor_order_id,
+            {vendor_order_line.pk: 4} if partial else None,
+        )
+
+    @pytest.mark.parametrize(
+        "quantities",
+        [
+            [0],
+            [1, 1],
+            [11],
+        ],
+        ids=["zero", "repeated", "too many"],
+    )
+    def test_invalid(
+        self, monkeypatch, user_authed_api_client, vendor_order_line, quantities
+    ):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.receive_order, "send", _mock)
+
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:vendor-order-receive",
+                kwargs={"pk": vendor_order_line.vendor_order_id},
+            ),
+            {
+                "lines": [
+                    {"order_line_id": vendor_order_line.pk, "quantity": quantity}
+                    for quantity in quantities
+                ]
+            },
+            format="json",
+        )
+        assert_status(response, status.HTTP_400_BAD_REQUEST)
+        _mock.assert_not_called()
+
+    def test_invalid__other_order(
+        self,
+        monkeypatch,
+        user_authed_api_client,
+        vendor_order_line,
+        vendor_order_factory,
+    ):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.receive_order, "send", _mock)
+        other_order = vendor_order_factory(order_number="other")
+
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:vendor-order-receive", kwargs={"pk": other_order.pk}
+            ),
+            {"lines": [{"order_line_id": vendor_order_line.pk, "quantity": 1}]},
+            format="json",
+        )
+        assert_status(response, status.HTTP_400_BAD_REQUEST)
+        assert "not on vendor order" in response.json()["lines"][0]
+        _mock.assert_not_called()
+
+    def test_invalid__fulfilled(
+        self, monkeypatch, user_authed_api_client, vendor_order_line
+    ):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.receive_order, "send", _mock)
+        vendor_order = vendor_order_line.vendor_order
+        vendor_order.fulfilled = timezone.now()
+        vendor_order.save()
+
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:vendor-order-receive", kwargs={"pk": vendor_order.pk}
+            ),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_400_BAD_REQUEST)
+        _mock.assert_not_called()
+
+    def test_not_found(self, monkeypatch, user_authed_api_client, db):
+        _mock = Mock()
+        monkeypatch.setattr(tasks.receive_order, "send", _mock)
+
+        response = user_authed_api_client.post(
+            reverse("django-ctb-api:vendor-order-receive", kwargs={"pk": 12345}),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_404_NOT_FOUND)
+        _mock.assert_not_called()
+
+
+class TestProjectVersionDiffAction:
+    def test_diff(self, monkeypatch, user_authed_api_client, project_version, part):
+        line = services.BomDiffLine(
+            line_number=4,
+            target_row=m.BillOfMaterialsRow.model_validate(
+                {
+                    "#": 4,
+                    "Reference": "R1, R2",
+                    "Qty": 2,
+                    "Value": "1k",
+                    "Footprint": "R_0805",
+                }
+            ),
+            target_part=part,
+            target_cost=0.5,
+        )
+        _mock = Mock(
+            return_value=services.BomDiff(
+                base_commit="aaaa",
+                target_commit="bbbb",
+                added=[line],
+                target_cost=0.5,
+            )
+        )
+        monkeypatch.setattr(services.BomDiffService, "diff", _mock)
+        response = user_authed_api_client.get(
+            reverse(
+                "django-ctb-api:project-version-diff",
+                kwargs={"pk": project_version.pk},
+            ),
+            {"commit_ref": "main"},
+        )
+        assert_status(response, status.HTTP_200_OK)
+        _mock.assert_called_once_with(project_version.pk, commit_ref="main")
+        data = response.json()
+        assert data["cost_delta"] == 0.5
+        assert data["added"][0]["target_part_id"] == part.pk
+        assert data["added"][0]["base_part_id"] is None
+        assert data["added"][0]["base_row"] is None
+        assert data["added"][0]["target_row"]["references"] == ["R1", "R2"]
+        assert data["added"][0]["target_quantity"] == 2
+        assert data["removed"] == []
+
+    def test_diff__ref_not_found(
+        self, monkeypatch, user_authed_api_client, project_version
+    ):
+        monkeypatch.setattr(
+            services.BomDiffService,
+            "diff",
+            Mock(side_effect=RefNotFoundException),
+        )
+        response = user_authed_api_client.get(
+            reverse(
+                "django-ctb-api:project-version-diff",
+                kwargs={"pk": project_version.pk},
+            ),
+            {"commit_ref": "nope"},
+        )
+        assert_status(response, status.HTTP_404_NOT_FOUND)
+
+    def test_diff__commit_ref_required(self, user_authed_api_client, project_version):
+        response = user_authed_api_client.get(
+            reverse(
+                "django-ctb-api:project-version-diff",
+                kwargs={"pk": project_version.pk},
+            ),
+        )
+        assert_status(response, status.HTTP_400_BAD_REQUEST)
+
+
+class TestProjectVersionSimulateAction:
+    def test_simulate(
+        self,
+        user_authed_api_client,
+        project_version,
+        project_part,
+        part,
+        part_factory,
+        inventory_line_factory,
+    ):
+        inventory_line = inventory_line_factory(part=part, quantity=15)
+        substitute = part_factory(name="substitute", symbol="SUB")
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:project-version-simulate",
+                kwargs={"pk": project_version.pk},
+            ),
+            {"quantity": 5},
+            format="json",
+        )
+        assert_status(response, status.HTTP_200_OK)
+        data = response.json()
+        assert data["is_clear"] is True
+        assert data["reservations"] == [
+            {
+                "part_id": part.pk,
+                "quantity": 10,
+                "project_part_ids": [project_part.pk],
+                "debits": [{"inventory_line_id": inventory_line.pk, "quantity": 10}],
+            }
+        ]
+        assert data["shortages"] == []
+        inventory_line.refresh_from_db()
+        assert inventory_line.quantity == 15
+
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:project-version-simulate",
+                kwargs={"pk": project_version.pk},
+            ),
+            {
+                "quantity": 5,
+                "substitutions": [
+                    {"project_part_id": project_part.pk, "part_id": substitute.pk}
+                ],
+            },
+            format="json",
+        )
+        assert_status(response, status.HTTP_200_OK)
+        data = response.json()
+        assert data["is_clear"] is False
+        assert data["shortages"] == [{"part_id": substitute.pk, "quantity": 10}]
+
+    def test_simulate__quantity_required(self, user_authed_api_client, project_version):
+        response = user_authed_api_client.post(
+            reverse(
+                "django-ctb-api:project-version-simulate",
+                kwargs={"pk": project_version.pk},
+            ),
+            {},
+            format="json",
+        )
+        assert_status(response, status.HTTP_400_BAD_REQUEST)
+
+
+class TestProjectVersionBuildableAction:
+    def test_buildable(
+        self,
+        user_authed_api_client,
+        project_version,
+        project_part,
+        part,
+        inventory_line_factory,
+    ):
+        inventory_line_factory(part=part, quantity=7)
+        response = user_authed_api_client.get(
+            reverse("django-ctb-api:project-version-buildable"),
+            {"project": project_version.project_id},
+        )
+        assert_status(response, status.HTTP_200_OK)
+        assert response.json() == [
+            {
+                "project_version_id": project_version.pk,
+                "quantity": 3,
+                "limiting_parts": [{"part_id": part.pk, "needed": 2, "stock": 7}],
+            }
+        ]
+
+    def test_buildable__exclude_optional(
+        self,
+        user_authed_api_client,
+        project_version,
+        project_part_factory,
+        part,
+        inventory_line_factory,
+    ):
+        project_part_factory(part=part, is_optional=True)
+        inventory_line_factory(part=part, quantity=7)
+        response = user_authed_api_client.get(
+            reverse("django-ctb-api:project-version-buildable"),
+            {"exclude_optional": "true"},
+        )
+        assert_status(response, status.HTTP_200_OK)
+        assert response.json() == [
+            {
+                "project_version_id": project_version.pk,
+                "quantity": None,
+                "limiting_parts": [],
+            }
+        ]
+
+
+class TestPushWebhook:
+    @pytest.fixture
+    def post_push(self, api_client, settings):
+        settings.CTB_WEBHOOK_SECRET = "secret"
+
+        def _post(payload, *, event="push", secret="secret"):
+            body = json.dumps(payload).encode()
+            digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+            return api_client.post(
+                reverse("django-ctb-api:push-webhook"),
+                body,
+                content_type="application/json",
+                headers={
+                    "X-GitHub-Event": event,
+                    "X-Hub-Signature-256": f"sha256={digest}",
+                },
+            )
+
+        return _post
+
+    @pytest.fixture
+    def push_payload(self, project_version):
+        project_version.commit_ref = "main"
+        project_version.save()
+        return {
+            "ref": "refs/heads/main",
+            "repository": {"full_name": "fake/fake"},
+            "commits": [{"modified": [project_version.bom_path]}],
+        }
+
+    def test_push(self, broker, worker, monkeypatch, post_push, push_payload):
+        _mock = Mock()
+        monkeypatch.setattr(services.ProjectVersionBomService, "sync", _mock)
+        response = post_push(push_payload)
+        assert_status(response, status.HTTP_202_ACCEPTED)
+        (project_version_pk,) = response.json()["project_versions"]
+
+        broker.join("default")
+        worker.join()
+        _mock.assert_called_once_with(project_version_pk, force=False)
+
+    def test_bad_signature(self, monkeypatch, post_push, push_payload):
+        _mock = Mock()
+        monkeypatch.setattr(
+            services.PushWebhookService, "get_affected_project_versions", _mock
+        )
+        response = post_push(push_payload, secret="wrong")
+        assert_status(response, status.HTTP_403_FORBIDDEN)
+        _mock.assert_not_called()
+
+    @pytest.mark.parametrize("payload", [[], "push", None])
+    def test_not_an_object(self, monkeypatch, post_push, payload):
+        _mock = Mock()
+        monkeypatch.setattr(
+            services.PushWebhookService, "get_affected_project_versions", _mock
+        )
+        response = post_push(payload)
+        assert_status(response, status.HTTP_400_BAD_REQUEST)
+        _mock.assert_not_called()
+
+    def test_ping(self, post_push):
+        response = post_push({"zen": "Keep it logically awesome."}, event="ping")
+        assert_status(response, status.HTTP_202_ACCEPTED)
+        assert response.json() == {"project_versions": []}
+
+
+class TestPartFilters:
+    def test_equivalence_class(self, user_authed_api_client, part, part_factory):
+        equivalent = part_factory(name="equivalent", symbol="E", equivalent_to=part)
+        part_factory(name="unrelated", symbol="U")
+        response = user_authed_api_client.get(
+            reverse("django-ctb-api:part-list"),
+            {"equivalence_class": part.equivalence_class},
+        )
+        assert_status(response, status.HTTP_200_OK)
+        assert {result["id"] for result in response.json()["results"]} == {
+            part.pk,
+            equivalent.pk,
+        }
+
+
+class TestInventoryLineFilters:
+    @pytest.fixture
+    def inventory_lines(self, inventory_line_factory):
+        lines = [inventory_line_factory(quantity=quantity) for quantity in (3, 8, 5)]
+        m.InventoryLine.objects.filter(pk=lines[0].pk).update(reserved_quantity=4)
+        return lines
+
+    def test_quantity_on_hand(self, user_authed_api_client, inventory_lines):
+        response = user_authed_api_client.get(
+            reverse("django-ctb-api:inventory-line-list"),
+            {"quantity_on_hand__gte": 6},
+        )
+        assert_status(response, status.HTTP_200_OK)
+        results = response.json()["results"]
+        assert {result["id"] for result in results} == {
+            inventory_lines[0].pk,
+            inventory_lines[1].pk,
+        }
+        assert {result["quantity_on_hand"] for result in results} == {7, 8}
+
+    def test_ordering(self, user_authed_api_client, inventory_lines):
+        response = user_authed_api_client.get(
+            reverse("django-ctb-api:inventory-line-list"),
+            {"ordering": "-quantity_on_hand"},
+        )
+        assert_status(response, status.HTTP_200_OK)
+        assert [result["id"] for result in response.json()["results"]] == [
+            inventory_lines[1].pk,
+            inventory_lines[0].pk,
+            inventory_lines[2].pk,
+        ]
@@ -1,11 +1,14 @@
 import datetime
+from unittest.mock import Mock
 
 import dramatiq
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 
 from django_ctb import models as m
+from django_ctb.transport import LocalTransport, override_transport
 
 from . import factories as fac
 
@@ -491,3 +494,16 @@ def project_part_footprint_ref(db, project_part):
     )
     yield footprint_ref
     footprint_ref.delete()
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def http_handler():
+    handler = Mock()
+    with override_transport(LocalTransport(handler)):
+        yield handler
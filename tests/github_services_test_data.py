@@ -1,3 +1,5 @@
+from typing import Any
+
 TAGS_RESPONSE = [
     {
         "name": "v2",
@@ -22,7 +24,7 @@ TAGS_RESPONSE = [
 ]
 
 
-BRANCHES_RESPONSE = {
+BRANCHES_RESPONSE: dict[str, Any] = {
     "name": "main",
     "commit": {
         "sha": "69db8442ac20fe9be7998f2a6cd497413062b2af",
@@ -1,53 +1,73 @@
-from unittest.mock import Mock
+import json
 
 import pytest
-import requests
 
 from django_ctb.mouser.client import MouserClient
+from django_ctb.ratelimit import RateLimitExceeded
 
 from .data import get_many_part_response, get_part_response, missing_part_response
 
 
 class FakeResponse:
-    def __init__(self, text, status_code=200):
+    def __init__(self, text, status_code=200, headers=None):
         self.text = text
         self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _search_response(part_numbers):
+    return json.dumps(
+        {
+            "Errors": [],
+            "SearchResults": {
+                "NumberOfResult": len(part_numbers),
+                "Parts": [
+                    {
+                        "Description": f"Part {part_number}",
+                        "ManufacturerPartNumber": part_number,
+                        "PriceBreaks": [{"Quantity": 1, "Price": "$0.10"}],
+                        "ProductDetailUrl": f"https://www.mouser.com/{part_number}",
+                        "MouserPartNumber": part_number,
+                    }
+                    for part_number in part_numbers
+                ],
+            },
+        }
+    )
 
 
 class TestMouserClient:
-    def test_get_part__missing(self, monkeypatch):
-        monkeypatch.setattr(
-            requests,
-            "post",
-            Mock(return_value=FakeResponse(text=missing_part_response)),
-        )
+    def test_get_part__missing(self, http_handler):
+        http_handler.return_value = FakeResponse(text=missing_part_response)
         with pytest.raises(MouserClient.EmptyResponse):
             MouserClient().get_part("876-ASDFQWERZXCV")
 
-    def test_get_part__bad_response(self, monkeypatch):
-        monkeypatch.setattr(
-            requests,
-            "post",
-            Mock(return_value=FakeResponse(text="bad", status_code=300)),
-        )
+    def test_get_part__bad_response(self, http_handler):
+        http_handler.return_value = FakeResponse(text="bad", status_code=300)
         with pytest.raises(MouserClient.BadResponse):
             MouserClient().get_part("876-ASDFQWERZXCV")
 
-    def test_get_part__bad_json(self, monkeypatch):
-        monkeypatch.setattr(
-            requests,
-            "post",
-            Mock(
-                return_value=FakeResponse(text='{"Errors": [], "BlearchResults": {}}')
-            ),
+    @pytest.mark.parametrize(
+        "headers,retry_after", [({"Retry-After": "7"}, 7), ({}, 60)]
+    )
+    def test_get_part__rate_limited(self, http_handler, headers, retry_after):
+        http_handler.return_value = FakeResponse(
+            text="", status_code=429, headers=headers
         )
-        with pytest.raises(Exception):
+        with pytest.raises(RateLimitExceeded) as excinfo:
             MouserClient().get_part("876-ASDFQWERZXCV")
+        assert excinfo.value.retry_after == retry_after
+        assert http_handler.call_count == 1
 
-    def test_get_part(self, monkeypatch):
-        monkeypatch.setattr(
-            requests, "post", Mock(return_value=FakeResponse(get_part_response))
+    def test_get_part__bad_json(self, http_handler):
+        http_handler.return_value = FakeResponse(
+            text='{"Errors": [], "BlearchResults": {}}'
         )
+        with pytest.raises(Exception):
+            MouserClient().get_part("876-ASDFQWERZXCV")
+
+    def test_get_part(self, http_handler):
+        http_handler.return_value = FakeResponse(get_part_response)
         mouser_part = MouserClient().get_part("863-BAT54SLT1G")
         assert mouser_part.name == "BAT54SLT1G"
         assert mouser_part.description == "Schottky Diodes & Rectifiers 30V 225mW Dual"
@@ -56,10 +76,8 @@ class TestMouserClient:
             == "/ProductDetail/onsemi/BAT54SLT1G?qs=vLkC5FC1VN9oCh8qaBIZiQ%3D%3D"
         )
 
-    def test_get_part_many_returned(self, monkeypatch):
-        monkeypatch.setattr(
-            requests, "post", Mock(return_value=FakeResponse(get_many_part_response))
-        )
+    def test_get_part_many_returned(self, http_handler):
+        http_handler.return_value = FakeResponse(get_many_part_response)
         mouser_part = MouserClient().get_part("863-BAT54SLT1G-2")
         assert mouser_part.name == "BAT54SLT1G"
         assert mouser_part.description == "Schottky Diodes & Rectifiers 30V 225mW Dual"
@@ -67,3 +85,29 @@ class TestMouserClient:
             mouser_part.url_path
             == "/ProductDetail/onsemi/BAT54SLT1G?qs=vLkC5FC1VN9oCh8qaBIZiQ%3D%3D"
         )
+
+    def test_get_parts(self, http_handler):
+        part_numbers = [f"863-PART{idx}" for idx in range(12)]
+
+        def _search(method, url, *, data, **kwargs):
+            requested = json.loads(data)["SearchByPartRequest"]["mouserPartNumber"]
+            # one part number is unknown and the rest come back upper case
+            found = [
+                part_number.upper()
+                for part_number in requested.split("|")
+                if part_number.upper() != "863-PART3"
+            ]
+            return FakeResponse(_search_response(found))
+
+        http_handler.side_effect = _search
+        requested = [part_number.lower() for part_number in part_numbers]
+        mouser_parts = MouserClient().get_parts(requested + requested[:2])
+        assert http_handler.call_count == 2
+        assert sorted(mouser_parts) == sorted(
+            part_number for part_number in requested if part_number != "863-part3"
+        )
+        assert mouser_parts["863-part11"].name == "863-PART11"
+
+    def test_get_parts__empty(self, http_handler):
+        assert MouserClient().get_parts([]) == {}
+        http_handler.assert_not_called()
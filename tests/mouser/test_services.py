@@ -1,11 +1,18 @@
+from datetime import timedelta
 from decimal import Decimal
 from unittest.mock import Mock
 
 import pytest
+from django.utils import timezone
 
 from django_ctb import models as m
 from django_ctb.mouser.client import MouserClient, MouserPart, MouserPricebreak
-from django_ctb.mouser.services import MouserPartService, MouserService
+from django_ctb.mouser.services import (
+    MouserPartService,
+    MouserService,
+    refresh_stale_mouser_prices,
+)
+from django_ctb.ratelimit import RateLimitExceeded
 
 
 class TestMouserPartService:
@@ -159,6 +166,29 @@ class TestMouserPartService:
         _vendor_part.part.delete()
         _vendor_part.delete()
 
+    def test_create_vendor_part__not_populated(
+        self, bom_row, package, vendor_mouser, broker, worker, monkeypatch
+    ):
+        """
+        :scenario: Vendor parts can be created without populating them
+
+        | GIVEN a project version BOM row represents an unknown part
+        | AND the same row shows the vendor as "Mouser"
+        | WHEN create_vendor_part is run for the BOM row without populating
+        | THEN a placeholder vendor part is created
+        | AND no task to populate the vendor part is started
+        """
+        mock_populate = Mock()
+        monkeypatch.setattr(MouserService, "populate", mock_populate)
+        _vendor_part = MouserPartService().create_vendor_part(bom_row, populate=False)
+        assert _vendor_part.url_path == "placeholder"
+
+        broker.join("default")
+        worker.join()
+        mock_populate.assert_not_called()
+        _vendor_part.part.delete()
+        _vendor_part.delete()
+
 
 class TestMouserService:
     def test__populate(self, monkeypatch, vendor_part_mouser):
@@ -183,6 +213,10 @@ class TestMouserService:
         assert vendor_part_mouser.part.name == "BIGBOI1234"
         assert vendor_part_mouser.part.value == "BIGBOI1234"
         assert vendor_part_mouser.part.description == "Fake part"
+        assert [
+            (price_break.volume, float(price_break.cost))
+            for price_break in vendor_part_mouser.price_breaks.all()
+        ] == [(1, 0.01), (10, 0.009), (100, 0.008)]
 
     def test_populate(self, monkeypatch, vendor_part_mouser):
         mock__populate = Mock()
@@ -190,13 +224,44 @@ class TestMouserService:
         MouserService().populate(vendor_part_mouser.pk)
         mock__populate.assert_called_once_with(vendor_part_mouser)
 
+    def test_populate_many(
+        self, monkeypatch, vendor_mouser, part_factory, vendor_part_factory
+    ):
+        vendor_parts = [
+            vendor_part_factory(
+                part=part_factory(name="placeholder", symbol="T"),
+                vendor=vendor_mouser,
+                item_number=item_number,
+                url_path="placeholder",
+            )
+            for item_number in ("233-FAKE", "233-MISSING")
+        ]
+        mouser_part = MouserPart(
+            description="Fake part",  # type: ignore[unknown-argument]
+            name="BIGBOI1234",  # type: ignore[unknown-argument]
+            mouser_part_number="233-FAKE",  # type: ignore[unknown-argument]
+            url_path="https://www.mouser.com/whatever/path",  # type: ignore[unknown-argument]
+            price_breaks=[
+                MouserPricebreak(volume=1, cost="$0.01"),  # type: ignore[invalid-argument-type]
+            ],  # type: ignore[unknown-argument]
+        )  # type: ignore[missing-argument]
+        mock_get_parts = Mock(return_value={"233-FAKE": mouser_part})
+        monkeypatch.setattr(MouserClient, "get_parts", mock_get_parts)
+        MouserService().populate_many([vendor_part.pk for vendor_part in vendor_parts])
+        assert list(mock_get_parts.call_args.args[0]) == ["233-FAKE", "233-MISSING"]
+        for vendor_part in vendor_parts:
+            vendor_part.refresh_from_db()
+        assert vendor_parts[0].url_path == "/whatever/path"
+        assert vendor_parts[0].part.name == "BIGBOI1234"
+        assert vendor_parts[1].url_path == "placeholder"
+
     def test_populate__missing(self, db, monkeypatch):
         mock__populate = Mock(side_effect=Exception)
         monkeypatch.setattr(MouserService, "_populate", mock__populate)
         MouserService().populate(123)
         mock__populate.assert_not_called()
 
-    def test__create__missing_part(self, monkeypatch):
+    def test__create__missing_part(self, db, monkeypatch):
         monkeypatch.setattr(
             MouserClient, "get_part", Mock(side_effect=MouserClient.EmptyResponse)
         )
@@ -234,3 +299,218 @@ class TestMouserService:
         assert vp.url_path == "/whatever/path"
         vp.delete()
         p.delete()
+
+
+def _mouser_part(part_number, *, name="BIGBOI1234", price="$0.01"):
+    return MouserPart.model_validate(
+        {
+            "Description": "Fake part",
+            "ManufacturerPartNumber": name,
+            "MouserPartNumber": part_number,
+            "ProductDetailUrl": f"https://www.mouser.com/ProductDetail/{part_number}",
+            "PriceBreaks": [{"Quantity": 1, "Price": price}],
+        }
+    )
+
+
+class TestMouserPartCache:
+    """
+    :feature: Mouser part responses are kept and reused until they are stale
+    """
+
+    @pytest.fixture
+    def cache(self, db):
+        def _cache(part_number, *, age=0, **kwargs):
+            MouserService()._store({part_number: _mouser_part(part_number, **kwargs)})
+            m.MouserPartResponse.objects.filter(part_number=part_number).update(
+                fetched=timezone.now() - timedelta(seconds=age)
+            )
+
+        return _cache
+
+    def test_populate__cached(self, monkeypatch, cache, vendor_part_mouser):
+        """
+        :scenario: Fresh responses are used rather than calling the API
+
+        | GIVEN the response for a part number was fetched recently
+        | WHEN a vendor part with the part number is populated
+        | THEN the Mouser API is not called
+        | AND the vendor part is populated from the cached response
+        """
+        cache(vendor_part_mouser.item_number, name="CACHED")
+        mock_get_part = Mock(side_effect=AssertionError)
+        monkeypatch.setattr(MouserClient, "get_part", mock_get_part)
+        MouserService().populate(vendor_part_mouser.pk)
+        vendor_part_mouser.refresh_from_db()
+        assert vendor_part_mouser.part.name == "CACHED"
+        assert vendor_part_mouser.cost == Decimal("0.01")
+
+    def test_populate__stale(self, settings, monkeypatch, cache, vendor_part_mouser):
+        """
+        :scenario: Stale responses are fetched again and kept
+
+        | GIVEN the response for a part number is older than the cache TTL
+        | WHEN a vendor part with the part number is populated
+        | THEN the Mouser API is called
+        | AND the new response is kept
+        """
+        settings.CTB_MOUSER_CACHE_TTL = 60
+        item_number = vendor_part_mouser.item_number
+        cache(item_number, name="STALE", age=120)
+        mock_get_part = Mock(return_value=_mouser_part(item_number, name="NEW"))
+        monkeypatch.setattr(MouserClient, "get_part", mock_get_part)
+        MouserService().populate(vendor_part_mouser.pk)
+        mock_get_part.assert_called_once_with(item_number)
+        vendor_part_mouser.refresh_from_db()
+        assert vendor_part_mouser.part.name == "NEW"
+        cached = m.MouserPartResponse.objects.fresh().get()
+        assert cached.response["ManufacturerPartNumber"] == "NEW"
+
+    def test__create__cached(self, monkeypatch, cache, vendor_mouser):
+        """
+        :scenario: Vendor parts are created from fresh responses
+
+        | GIVEN the response for a part number was fetched recently
+        | WHEN a vendor part is created for the part number
+        | THEN the Mouser API is not called
+        """
+        cache("233-FAKE")
+        monkeypatch.setattr(MouserClient, "get_part", Mock(side_effect=AssertionError))
+        vendor_part = MouserService()._create("233-FAKE")
+        assert vendor_part.url_path == "/ProductDetail/233-FAKE"
+        vendor_part.delete()
+
+    def test_populate_many__cached(
+        self, monkeypatch, cache, vendor_mouser, part_factory, vendor_part_factory
+    ):
+        """
+        :scenario: Only the part numbers without a fresh response are looked up
+
+        | GIVEN the response for one of two part numbers was fetched recently
+        | WHEN vendor parts with both part numbers are populated
+        | THEN only the other part number is looked up
+        | AND its response is kept
+        | AND both vendor parts are populated
+        """
+        vendor_parts = [
+            vendor_part_factory(
+                part=part_factory(name="placeholder", symbol="T"),
+                vendor=vendor_mouser,
+                item_number=item_number,
+                url_path="placeholder",
+            )
+            for item_number in ("233-CACHED", "233-NEW")
+        ]
+        cache("233-CACHED")
+        mock_get_parts = Mock(return_value={"233-NEW": _mouser_part("233-NEW")})
+        monkeypatch.setattr(MouserClient, "get_parts", mock_get_parts)
+        MouserService().populate_many([vendor_part.pk for vendor_part in vendor_parts])
+        assert list(mock_get_parts.call_args.args[0]) == ["233-NEW"]
+        assert m.MouserPartResponse.objects.fresh().count() == 2
+        for vendor_part in vendor_parts:
+            vendor_part.refresh_from_db()
+            assert vendor_part.url_path == f"/ProductDetail/{vendor_part.item_number}"
+
+    @pytest.fixture
+    def stale_parts(
+        self,
+        settings,
+        cache,
+        vendor_mouser,
+        part_factory,
+        vendor_part_factory,
+        project_part_factory,
+    ):
+        settings.CTB_MOUSER_CACHE_TTL = 60
+        vendor_parts = {}
+        for item_number, age in (
+            ("233-FRESH", 0),
+            ("233-OLDEST", 300),
+            ("233-USED", 120),
+            ("233-GONE", 200),
+        ):
+            cache(item_number, age=age, name=f"{item_number}-NAME")
+            vendor_parts[item_number] = vendor_part_factory(
+                part=part_factory(name=f"{item_number}-NAME", symbol="T"),
+                vendor=vendor_mouser,
+                item_number=item_number,
+                cost=1,
+                volume=1,
+            )
+        project_part_factory(part=vendor_parts["233-USED"].part)
+        return vendor_parts
+
+    def test_refresh_stale_prices(self, monkeypatch, stale_parts):
+        """
+        :scenario: Stale prices are refreshed, most used parts first
+
+        | GIVEN the responses for some part numbers are stale
+        | AND one of the stale part numbers is used by a project
+        | AND one of the stale part numbers is no longer listed by Mouser
+        | WHEN the stale prices are refreshed
+        | THEN only the stale part numbers are looked up, the used one first
+          then the oldest
+        | AND the cost and volume of their vendor parts are updated
+        | AND nothing else about the parts is changed
+        | AND the part number which is no longer listed is dropped
+        """
+        mock_get_parts = Mock(
+            return_value={
+                item_number: _mouser_part(item_number, name="NEW", price="$0.50")
+                for item_number in ("233-USED", "233-OLDEST")
+            }
+        )
+        monkeypatch.setattr(MouserClient, "get_parts", mock_get_parts)
+        assert MouserService().refresh_stale_prices() == 2
+        assert list(mock_get_parts.call_args.args[0]) == [
+            "233-USED",
+            "233-OLDEST",
+            "233-GONE",
+        ]
+        for item_number, vendor_part in stale_parts.items():
+            vendor_part.refresh_from_db()
+            assert vendor_part.part.name == f"{item_number}-NAME"
+        assert stale_parts["233-USED"].cost == Decimal("0.5")
+        assert stale_parts["233-OLDEST"].cost == Decimal("0.5")
+        assert stale_parts["233-FRESH"].cost == Decimal("1")
+        assert [
+            (price_break.volume, price_break.cost)
+            for price_break in stale_parts["233-USED"].price_breaks.all()
+        ] == [(1, Decimal("0.5"))]
+        assert not m.MouserPartResponse.objects.stale().exists()
+        assert not m.MouserPartResponse.objects.filter(part_number="233-GONE").exists()
+
+    def test_refresh_stale_prices__limit(self, monkeypatch, stale_parts):
+        """
+        :scenario: Refreshing stale prices can be limited
+
+        | GIVEN the responses for some part numbers are stale
+        | WHEN the stale prices are refreshed with a limit of one
+        | THEN only the most used stale part number is looked up
+        """
+        mock_get_parts = Mock(
+            return_value={"233-USED": _mouser_part("233-USED", price="$0.50")}
+        )
+        monkeypatch.setattr(MouserClient, "get_parts", mock_get_parts)
+        assert MouserService().refresh_stale_prices(limit=1) == 1
+        assert list(mock_get_parts.call_args.args[0]) == ["233-USED"]
+        assert m.MouserPartResponse.objects.stale().count() == 2
+
+    def test_refresh_stale_prices__requeued(self, broker, worker, monkeypatch):
+        """
+        :scenario: Refreshing stale prices resumes after the rate limit
+
+        | GIVEN the Mouser limit is reached while refreshing stale prices
+        | WHEN the task refreshing stale prices runs
+        | THEN the task is requeued
+        """
+        mock_refresh = Mock(side_effect=[RateLimitExceeded(retry_after=0.01), 0])
+        monkeypatch.setattr(MouserService, "refresh_stale_prices", mock_refresh)
+        refresh_stale_mouser_prices.send(5)
+
+        broker.join("default")
+        worker.join()
+        assert [call.kwargs for call in mock_refresh.call_args_list] == [
+            {"limit": 5},
+            {"limit": 5},
+        ]
@@ -0,0 +1,180 @@
+import tracemalloc
+
+import pytest
+
+from django_ctb import models as m
+from django_ctb import services as s
+
+CSV_BOM = b"""Qty,Reference,Vendor,PartNum,Footprint,Value
+2,"R1, R2",Mouser,123-ASDF,Resistor_SMD:R_0805,4K7
+1,C1,,,Capacitor_SMD:C_0805,100n
+"""
+
+XML_BOM = b"""<?xml version="1.0" encoding="UTF-8"?>
+<export version="E">
+  <design><source>test.kicad_sch</source></design>
+  <components>
+    <comp ref="R1">
+      <value>4K7</value>
+      <footprint>Resistor_SMD:R_0805</footprint>
+      <fields>
+        <field name="Vendor">Mouser</field>
+        <field name="PartNum">123-ASDF</field>
+      </fields>
+    </comp>
+    <comp ref="C1">
+      <value>100n</value>
+      <footprint>Capacitor_SMD:C_0805</footprint>
+    </comp>
+    <comp ref="R2">
+      <value>4K7</value>
+      <footprint>Resistor_SMD:R_0805</footprint>
+      <property name="Vendor" value="Mouser"/>
+      <property name="PartNum" value="123-ASDF"/>
+    </comp>
+    <comp ref="R3">
+      <value>4K7</value>
+      <footprint>Resistor_SMD:R_0805</footprint>
+      <property name="dnp" value=""/>
+    </comp>
+  </components>
+  <libparts><libpart lib="Device" part="R"/></libparts>
+  <nets><net code="1" name="GND"><node ref="R1" pin="1"/></net></nets>
+</export>
+"""
+
+
+def _chunks(content, size=16):
+    return [content[idx : idx + size] for idx in range(0, len(content), size)]
+
+
+def _panel_csv(rows):
+    lines = [b"Qty,Reference,Footprint,Value"]
+    lines += [
+        f'2,"R{2 * i + 1}, R{2 * i + 2}",R_0805,{i}k'.encode() for i in range(rows)
+    ]
+    return b"\n".join(lines) + b"\n"
+
+
+def _panel_xml(rows):
+    comps = [
+        f'<comp ref="R{i}"><value>{i // 2}k</value><footprint>R_0805</footprint>'
+        "</comp>".encode()
+        for i in range(rows * 2)
+    ]
+    return b"<export><components>" + b"".join(comps) + b"</components></export>"
+
+
+class TestBomParser:
+    """
+    :feature: Bills of Material are parsed as they are downloaded, from CSV
+              or KiCAD XML
+    """
+
+    expected = [
+        m.BillOfMaterialsRow.model_validate(
+            {
+                "#": 1,
+                "Qty": 2,
+                "Reference": "R1, R2",
+                "Vendor": "Mouser",
+                "PartNum": "123-ASDF",
+                "Footprint": "Resistor_SMD:R_0805",
+                "Value": "4K7",
+            }
+        ),
+        m.BillOfMaterialsRow.model_validate(
+            {
+                "#": 2,
+                "Qty": 1,
+                "Reference": "C1",
+                "Footprint": "Capacitor_SMD:C_0805",
+                "Value": "100n",
+            }
+        ),
+    ]
+
+    def test_parse_csv(self):
+        """
+        :scenario: CSV BOMs are parsed into rows
+
+        | GIVEN a CSV BOM is downloaded in chunks
+        | WHEN the BOM is parsed
+        | THEN each line of the BOM becomes a row, numbered in order
+        """
+        rows = list(s.BomParser(batch_size=1).parse(_chunks(CSV_BOM), path="a.csv"))
+        # blank columns are kept as they are in CSV
+        assert [row.model_dump() for row in rows] == [
+            self.expected[0].model_dump(),
+            {**self.expected[1].model_dump(), "vendor_name": "", "item_number": ""},
+        ]
+
+    def test_parse_kicad_xml(self):
+        """
+        :scenario: KiCAD XML BOMs are grouped into rows
+
+        | GIVEN a KiCAD XML BOM is downloaded in chunks
+        | WHEN the BOM is parsed
+        | THEN components with the same value, footprint, and vendor fields are
+          grouped into a row
+        | AND components which are not populated are skipped
+        """
+        rows = list(s.BomParser().parse(_chunks(XML_BOM), path="nested/bom.XML"))
+        assert rows == self.expected
+
+    def test_parse_csv__streams(self):
+        """
+        :scenario: Parsing does not wait for the whole BOM
+
+        | GIVEN a large CSV BOM is downloaded in chunks
+        | WHEN the first rows are parsed
+        | THEN only part of the BOM has been read
+        """
+        chunks = _chunks(_panel_csv(10_000), size=1024)
+        read = []
+
+        def _download():
+            for chunk in chunks:
+                read.append(chunk)
+                yield chunk
+
+        rows = s.BomParser(batch_size=100).parse(_download(), path="panel.csv")
+        assert next(rows).line_number == 1
+        assert len(read) < len(chunks) / 10
+
+    @pytest.mark.parametrize(
+        "panel, path", [(_panel_csv, "panel.csv"), (_panel_xml, "panel.xml")]
+    )
+    def test_parse__panelized(self, panel, path):
+        """
+        :scenario: Panelized BOMs with ten thousand rows are parsed
+
+        | GIVEN a panelized BOM has ten thousand rows
+        | WHEN the BOM is parsed
+        | THEN every row is parsed
+        """
+        content = panel(10_000)
+        rows = list(s.BomParser().parse(_chunks(content, size=64 * 1024), path=path))
+        assert len(rows) == 10_000
+        assert rows[-1].line_number == 10_000
+        assert rows[-1].quantity == 2
+        assert rows[-1].value == "9999k"
+
+    def test_parse_csv__flat_memory(self):
+        """
+        :scenario: Parsing a large CSV BOM does not hold the whole file
+
+        | GIVEN a CSV BOM has a hundred thousand rows
+        | WHEN the BOM is parsed (and its rows are not kept)
+        | THEN the memory used is well below the size of the BOM
+        """
+        content = _panel_csv(100_000)
+        chunks = _chunks(content, size=64 * 1024)
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in s.BomParser().parse(chunks, path="panel.csv"))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert count == 100_000
+        assert peak < len(content) / 2
@@ -1,6 +1,8 @@
 from unittest.mock import Mock
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from django_ctb import models as m
@@ -8,102 +10,90 @@ from django_ctb import services as s
 from django_ctb.exceptions import InsufficientInventory
 
 
-class TestPartSatisfactionManager:
+class TestProjectBuildAllocatorStock:
     """
-    :feature: Part Satisfaction is responsive to stock of Parts
+    :feature: Project Build allocation is responsive to stock of Parts
     """
 
-    def test_part_satisfaction_no_inventory(self, part, project_part, project_build):
+    @staticmethod
+    def _allocate(project_build):
+        return s.ProjectBuildAllocator(project_build=project_build).allocate()
+
+    def test_allocate_no_inventory(self, part, project_part, project_build):
         """
-        :scenario: Part Satisfaction indicates missing stock for Project
-                   Parts
+        :scenario: Allocation indicates missing stock for Project Parts
 
         | GIVEN a part exists
         | AND there is no inventory line for the part
-        | WHEN the part satisfaction ensure reservation process is run targeting
-          that part
-        | THEN no inventory line will be used in fulfillment
-        | AND an InsufficientInventory exception will be raised with the
-          unfilfilled need
-        """
-        satisfaction = s.PartSatisfactionManager(part=part, project_build=project_build)
-        satisfaction.add_project_part(project_part=project_part)
-        assert satisfaction.needed == 6
-        assert satisfaction.unfulfilled == 6
-        assert satisfaction.project_parts == [project_part]
-        with pytest.raises(InsufficientInventory) as exc:
-            satisfaction.ensure_reservation()
-        assert exc.value.shortages[0].quantity == 6
+        | WHEN the allocator is run for a project build using the part
+        | THEN no reservation will be made
+        | AND a shortage will be recorded with the unfulfilled need
+        """
+        reservations, shortages = self._allocate(project_build)
+        assert reservations == []
+        assert [(shortage.part, shortage.quantity) for shortage in shortages] == [
+            (part, 6)
+        ]
 
-    def test_part_satisfaction_insufficient_inventory(
+    def test_allocate_insufficient_inventory(
         self, part, inventory_line_factory, project_part, project_build
     ):
         """
-        :scenario: Part Satisfaction indicates insufficient stock for Project
-                   Parts
+        :scenario: Allocation indicates insufficient stock for Project Parts
 
         | GIVEN a part exists
         | AND the given part has an inventory line with insufficient stock
-        | WHEN the part satisfaction ensure reservation process is run targeting
-          that part
-        | THEN the inventory line is used for fulfillment
-        | AND an InsufficientInventory exception will be raised with the
-          unfilfilled need
+        | WHEN the allocator is run for a project build using the part
+        | THEN a shortage will be recorded with the unfulfilled need
         | AND no reservation will be created
         | AND no inventory action will be created
         """
         initial_inventory_count = m.InventoryAction.objects.all().count()
         initial_reservation_count = m.ProjectBuildPartReservation.objects.all().count()
         _line = inventory_line_factory(part=part, quantity=1)
-        satisfaction = s.PartSatisfactionManager(part=part, project_build=project_build)
-        satisfaction.add_project_part(project_part=project_part)
-        with pytest.raises(InsufficientInventory) as exc:
-            satisfaction.ensure_reservation()
-        assert exc.value.shortages[0].quantity == 5
+        reservations, shortages = self._allocate(project_build)
+        assert reservations == []
+        assert shortages[0].quantity == 5
         assert initial_inventory_count == m.InventoryAction.objects.all().count()
         assert (
             initial_reservation_count
             == m.ProjectBuildPartReservation.objects.all().count()
         )
 
-    def test_part_satisfaction_sufficient_inventory(
+    def test_allocate_sufficient_inventory(
         self, part, inventory_line_factory, project_part, project_build
     ):
         """
-        :scenario: Part Satisfaction indicates sufficient stock for Project
-                   Parts
+        :scenario: Allocation reserves the inventory line with the least stock
 
         | GIVEN a part exists
-        | AND the given part has two inventory lines with stock
-        | WHEN the part satisfaction ensure reservation process is run
-          targeting the part
+        | AND the given part has several inventory lines with enough stock
+        | WHEN the allocator is run for a project build using the part
         | THEN the inventory line with the least stock is selected for
           inventory action
         """
         inventory_line_factory(part=part, quantity=20)
         _line = inventory_line_factory(part=part, quantity=10)
         inventory_line_factory(part=part, quantity=30)
-        satisfaction = s.PartSatisfactionManager(part=part, project_build=project_build)
-        satisfaction.add_project_part(project_part=project_part)
-        reservation = satisfaction.ensure_reservation()
+        (reservation,), shortages = self._allocate(project_build)
+        assert shortages == []
         assert reservation.inventory_actions.all().count() == 1
         assert reservation.inventory_actions.all()[0].inventory_line == _line
         assert reservation.inventory_actions.all()[0].delta == -6
         reservation.inventory_actions.all().delete()
 
-    def test_part_satisfaction_sufficient_inventory_split(
+    def test_allocate_sufficient_inventory_split(
         self, part, inventory_line_factory, project_part, project_build
     ):
         """
-        :scenario: Part Satisfaction will utilize stock from more than one
-                   Inventory Line
+        :scenario: Allocation will utilize stock from more than one Inventory
+                   Line
 
         | GIVEN a part exists
         | AND the given part has more than one inventory line with stock
         | AND one of the inventory lines does not have enough stock for the
           project
-        | WHEN the part satisfaction ensure reservation process is run
-          targeting the part
+        | WHEN the allocator is run for a project build using the part
         | THEN the inventory line with the least stock is used for fulfillment
           first
         | AND the inventory line with the next least stock is used for the
@@ -112,17 +102,15 @@ class TestPartSatisfactionManager:
         _other_line = inventory_line_factory(part=part, quantity=20)
         _line = inventory_line_factory(part=part, quantity=4)
         inventory_line_factory(part=part, quantity=30)
-        satisfaction = s.PartSatisfactionManager(part=part, project_build=project_build)
-        satisfaction.add_project_part(project_part=project_part)
-        reservation = satisfaction.ensure_reservation()
-        assert reservation.inventory_actions.all().count() == 2
-        assert reservation.inventory_actions.all()[0].inventory_line == _line
-        assert reservation.inventory_actions.all()[0].delta == -4
-        assert reservation.inventory_actions.all()[1].inventory_line == _other_line
-        assert reservation.inventory_actions.all()[1].delta == -2
+        (reservation,), _ = self._allocate(project_build)
+        actions = reservation.inventory_actions.all().order_by("delta")
+        assert [(action.inventory_line, action.delta) for action in actions] == [
+            (_line, -4),
+            (_other_line, -2),
+        ]
         reservation.inventory_actions.all().delete()
 
-    def test_part_satisfaction_sufficient_inventory_split_refund(
+    def test_allocate_sufficient_inventory_split_refund(
         self,
         part,
         inventory_line_factory,
@@ -132,15 +120,14 @@ class TestPartSatisfactionManager:
         project_build_part_reservation,
     ):
         """
-        :scenario: Part Satisfaction will return stock to more than one
-                   Inventory Line
+        :scenario: Allocation will return stock to more than one Inventory
+                   Line
 
         | GIVEN a project build part reservation exists
         | AND the given reservation has more than one inventory action
           associated
         | AND the number of needed parts has been reduced for the build
-        | WHEN the part satisfaction ensure reservation process is run
-          targeting the part
+        | WHEN the allocator is run for the project build
         | THEN the inventory action for the inventory line with the most
           remaining stock will be refunded
         | AND the inventory action for the inventory line with the next most
@@ -166,9 +153,7 @@ class TestPartSatisfactionManager:
             delta=-2,
             reservation=project_build_part_reservation,
         )
-        satisfaction = s.PartSatisfactionManager(part=part, project_build=project_build)
-        satisfaction.add_project_part(project_part=project_part)
-        reservation = satisfaction.ensure_reservation()
+        (reservation,), _ = self._allocate(project_build)
         assert reservation == project_build_part_reservation
         assert reservation.inventory_actions.all().count() == 2
         _other_line.refresh_from_db()
@@ -179,63 +164,28 @@ class TestPartSatisfactionManager:
         assert _big_line.quantity == 30
         reservation.inventory_actions.all().delete()
 
-    def test_part_satisfaction_sufficient_inventory_deprioritized(
+    def test_allocate_sufficient_inventory_deprioritized(
         self, part, inventory_line_factory, project_part, project_build
     ):
         """
-        :scenario: Part Satisfaction will respect (de-)prioritization
+        :scenario: Allocation will respect (de-)prioritization
 
         | GIVEN a part exists
         | AND the given part has a deprioritized inventory line with stock
         | AND the given part has an inventory line with stock
-        | WHEN the part satisfaction ensure reservation process is run
+        | WHEN the allocator is run for a project build using the part
         | THEN the non deprioritized inventory line will be used
         """
         inventory_line_factory(part=part, quantity=6, is_deprioritized=True)
         _prio_line = inventory_line_factory(part=part, quantity=10)
         inventory_line_factory(part=part, quantity=3, is_deprioritized=True)
-        satisfaction = s.PartSatisfactionManager(part=part, project_build=project_build)
-        satisfaction.add_project_part(project_part=project_part)
-        reservation = satisfaction.ensure_reservation()
+        (reservation,), _ = self._allocate(project_build)
         assert reservation.inventory_actions.all().count() == 1
         assert reservation.inventory_actions.all()[0].inventory_line == _prio_line
         assert reservation.inventory_actions.all()[0].delta == -6
         reservation.inventory_actions.all().delete()
 
-    def test_part_satisfaction__find_equivalent_parts(self, part_factory, part):
-        """
-        :scenario: Parts marked equivalent to each other will be found to an
-                   arbitrary recursive depth
-
-        | GIVEN there is a branching tree of parts equivalent to a certain part
-        | WHEN the part satisfaction manager looks for equivalent parts
-        | THEN the equivalent parts will be found to a configurable max depth
-        """
-        _all_parts = {part}
-        _part = None
-        for jdx in range(3):
-            _part = part
-            for idx in range(5):
-                _part = part_factory(
-                    name=f"{jdx}{idx}", symbol=f"{jdx}{idx}", equivalent_to=_part
-                )
-                _all_parts.add(_part)
-
-        _not_found_part = part_factory(
-            name="cantfindme", symbol="cantfindme", equivalent_to=_part
-        )
-
-        found_parts = s.PartSatisfactionManager.find_equivalent_parts(
-            part=part, maxdepth=5
-        )
-        assert _not_found_part not in found_parts
-        assert found_parts == _all_parts
-        other_way = s.PartSatisfactionManager.find_equivalent_parts(
-            part=_not_found_part, maxdepth=11
-        )
-        assert len(other_way) == 17
-
-    def test_part_satisfaction_respects_owner(
+    def test_allocate_respects_owner(
         self,
         part,
         inventory_line_factory,
@@ -245,16 +195,13 @@ class TestPartSatisfactionManager:
         user_factory,
     ):
         """
-        :scenario: Part Satisfaction only considers Inventories owned by Project
-                   owner
+        :scenario: Allocation only considers Inventories owned by Project owner
 
         | GIVEN a part exists
         | AND the given part has an inventory line with sufficient stock with separate owner
-        | WHEN the part satisfaction ensure reservation process is run targeting
-          that part
+        | WHEN the allocator is run for a project build using the part
         | THEN the inventory line is not used for fulfillment
-        | AND an InsufficientInventory exception will be raised with the
-          unfilfilled need
+        | AND a shortage will be recorded with the unfulfilled need
         | AND no reservation will be created
         | AND no inventory action will be created
         """
@@ -263,11 +210,9 @@ class TestPartSatisfactionManager:
         separate_user = user_factory("bob", email="bob@test.test", password="password")
         separate_owner = owner_factory(user=separate_user)
         _line = inventory_line_factory(part=part, quantity=100, owner=separate_owner)
-        satisfaction = s.PartSatisfactionManager(part=part, project_build=project_build)
-        satisfaction.add_project_part(project_part=project_part)
-        with pytest.raises(InsufficientInventory) as exc:
-            satisfaction.ensure_reservation()
-        assert exc.value.shortages[0].quantity == 6
+        reservations, shortages = self._allocate(project_build)
+        assert reservations == []
+        assert shortages[0].quantity == 6
         assert initial_inventory_count == m.InventoryAction.objects.all().count()
         assert (
             initial_reservation_count
@@ -1035,6 +980,192 @@ class TestProjectBuildServiceClearToBuild:
         m.InventoryAction.objects.all().delete()
 
 
+class TestProjectBuildAllocator:
+    """
+    :feature: Project Builds are allocated with a fixed number of queries
+    """
+
+    @pytest.fixture
+    def stocked_build(
+        self,
+        part_factory,
+        inventory_line_factory,
+        project_version_factory,
+        project_build_factory,
+        project_part_factory,
+    ):
+        builds = []
+
+        def _factory(part_count):
+            project_version = project_version_factory()
+            project_build = project_build_factory(
+                project_version=project_version, quantity=2
+            )
+            for idx in range(part_count):
+                part = part_factory(name=f"alloc {idx}", symbol=f"A{idx}")
+                equivalent = part_factory(
+                    name=f"alloc {idx} equivalent",
+                    symbol=f"E{idx}",
+                    equivalent_to=part,
+                )
+                project_part_factory(
+                    part=part,
+                    line_number=idx,
+                    quantity=3,
+                    project_version=project_version,
+                )
+                if idx % 3 == 0:
+                    # not enough stock; becomes a shortage
+                    inventory_line_factory(part=part, quantity=2)
+                else:
+                    # spread across the part and its equivalent
+                    inventory_line_factory(part=part, quantity=4)
+                    inventory_line_factory(part=equivalent, quantity=5)
+            builds.append(project_build)
+            return project_build
+
+        yield _factory
+        for project_build in builds:
+            s.ProjectBuildService()._cancel_build(project_build)
+
+    def test_allocate(self, stocked_build):
+        """
+        :scenario: Allocator reserves stock for every part of a build at once
+
+        | GIVEN a project build uses several parts
+        | AND some parts have enough stock spread across equivalent parts
+        | AND some parts have insufficient stock
+        | WHEN the allocator is run for the project build
+        | THEN the parts with enough stock are reserved from the least stocked
+          inventory lines first
+        | AND shortages are recorded for the parts with insufficient stock
+        | AND the stock of parts with a shortage is left in place
+        """
+        project_build = stocked_build(6)
+        project_parts = list(
+            project_build.project_version.project_parts.order_by("line_number")
+        )
+
+        reservations, shortages = s.ProjectBuildAllocator(
+            project_build=project_build
+        ).allocate()
+        expected_reservations = []
+        for project_part in project_parts[1:3] + project_parts[4:6]:
+            line = m.InventoryLine.objects.get(part=project_part.part)
+            equivalent_line = m.InventoryLine.objects.get(
+                part__equivalent_to=project_part.part
+            )
+            assert (line.quantity, equivalent_line.quantity) == (0, 3)
+            expected_reservations.append(
+                (
+                    project_part.part_id,
+                    [project_part.pk],
+                    sorted([(line.pk, -4), (equivalent_line.pk, -2)]),
+                )
+            )
+        assert [
+            (
+                reservation.part_id,
+                list(reservation.project_parts.values_list("pk", flat=True)),
+                sorted(
+                    reservation.inventory_actions.values_list(
+                        "inventory_line_id", "delta"
+                    )
+                ),
+            )
+            for reservation in reservations
+        ] == expected_reservations
+        assert [(shortage.part_id, shortage.quantity) for shortage in shortages] == [
+            (project_parts[0].part_id, 4),
+            (project_parts[3].part_id, 4),
+        ]
+        for project_part in [project_parts[0], project_parts[3]]:
+            assert m.InventoryLine.objects.get(part=project_part.part).quantity == 2
+
+    def test_allocate_query_count_is_constant(
+        self, stocked_build, django_assert_max_num_queries
+    ):
+        """
+        :scenario: Allocator query count does not depend on BOM size
+
+        | GIVEN a project build uses a few parts
+        | AND another project build uses many parts
+        | WHEN the allocator is run for each project build
+        | THEN the same bounded number of queries is used for each
+        """
+        for part_count in [3, 30]:
+            project_build = stocked_build(part_count)
+            with django_assert_max_num_queries(20):
+                s.ProjectBuildAllocator(project_build=project_build).allocate()
+
+    def test_allocate_uses_equivalence_class(
+        self, project_part, project_build, part, part_factory, inventory_line_factory
+    ):
+        """
+        :scenario: Allocator finds stock of equivalent parts at any depth
+
+        | GIVEN a part used in a project has no stock
+        | AND a long chain of parts is equivalent to the part
+        | AND only the last part in the chain has stock
+        | WHEN the allocator is run for the project build
+        | THEN stock of the last part in the chain is reserved
+        """
+        project_build.quantity = 1
+        project_build.save()
+        _part = part
+        for idx in range(8):
+            _part = part_factory(name=f"{idx}", symbol=f"{idx}", equivalent_to=_part)
+        _line = inventory_line_factory(part=_part, quantity=10)
+        reservations, shortages = s.ProjectBuildAllocator(
+            project_build=project_build
+        ).allocate()
+        assert shortages == []
+        assert reservations[0].inventory_actions.get().inventory_line == _line
+        s.ProjectBuildService()._cancel_build(project_build)
+
+    def test_allocate_maintains_reserved_quantity(
+        self, stocked_build, project_part_factory
+    ):
+        """
+        :scenario: Allocator keeps the reserved quantity of inventory lines in
+                   step with the inventory actions
+
+        | GIVEN a project build has been allocated
+        | AND a project part quantity of the project build is changed
+        | WHEN the allocator is run again for the project build
+        | THEN the reserved quantity of every inventory line matches the
+          inventory actions of pending reservations
+        """
+        project_build = stocked_build(6)
+        s.ProjectBuildAllocator(project_build=project_build).allocate()
+        assert not m.InventoryLine.objects.with_mismatched_reserved_quantity()
+        project_part = project_build.project_version.project_parts.get(line_number=1)
+        project_part.quantity = 1
+        project_part.save()
+        s.ProjectBuildAllocator(project_build=project_build).allocate()
+        assert not m.InventoryLine.objects.with_mismatched_reserved_quantity()
+
+    def test_allocate_rerun_does_not_write(self, stocked_build):
+        """
+        :scenario: Allocator does not write when nothing has changed
+
+        | GIVEN a project build has been allocated
+        | WHEN the allocator is run again for the project build
+        | THEN no rows are inserted, updated, or deleted
+        | AND the same reservations and shortages are returned
+        """
+        project_build = stocked_build(6)
+        first = s.ProjectBuildAllocator(project_build=project_build).allocate()
+        with CaptureQueriesContext(connection) as queries:
+            second = s.ProjectBuildAllocator(project_build=project_build).allocate()
+        assert not any(
+            query["sql"].lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+            for query in queries.captured_queries
+        )
+        assert [r.pk for r in first[0]] == [r.pk for r in second[0]]
+        assert [sh.pk for sh in first[1]] == [sh.pk for sh in second[1]]
+
+
 class TestProjectBuildServiceCompletion:
     """
     :feature: Project Builds can be completed
@@ -1070,6 +1201,37 @@ class TestProjectBuildServiceCompletion:
         assert project_build.completed is not None
         reservation.delete()
 
+    def test__complete_build__releases_reserved_quantity(
+        self, project_build, inventory_line_factory, part
+    ):
+        """
+        :scenario: Completing a Project Build removes the utilized quantities
+                   from the stock on-hand
+
+        | GIVEN a project build has been cleared
+        | AND the inventory lines count the reservation quantities as reserved
+        | WHEN the complete build action is run for the project build
+        | THEN the inventory lines no longer count the quantities as reserved
+        | AND the quantities are no longer on-hand
+        """
+        _line = inventory_line_factory(part=part, quantity=10)
+        _other_line = inventory_line_factory(part=part, quantity=1)
+        s.ProjectBuildService()._clear_to_build(project_build)
+        _line.refresh_from_db()
+        _other_line.refresh_from_db()
+        assert _line.reserved_quantity + _other_line.reserved_quantity == 6
+        s.ProjectBuildService()._complete_build(project_build)
+        _line.refresh_from_db()
+        _other_line.refresh_from_db()
+        assert _line.reserved_quantity == 0
+        assert _other_line.reserved_quantity == 0
+        assert _line.quantity_on_hand + _other_line.quantity_on_hand == 5
+        assert not m.InventoryLine.objects.with_mismatched_reserved_quantity()
+        m.InventoryAction.objects.filter(
+            reservation__project_build=project_build
+        ).delete()
+        project_build.part_reservations.all().delete()
+
     def test__complete_build__no_build(
         self, project_part, project_build, inventory_line_factory, monkeypatch
     ):
@@ -1166,6 +1328,7 @@ class TestProjectBuildServiceCancelation:
         | WHEN the cancel build action is run for the project build
         | THEN the part reservations are deleted
         | AND the inventory lines are credited with the reservation quantities
+        | AND the inventory lines no longer count the quantities as reserved
         | AND the project build clear status is cleared
         """
         _line = inventory_line_factory(part=part, quantity=10)
@@ -1174,9 +1337,13 @@ class TestProjectBuildServiceCancelation:
         assert project_build.cleared is not None
         _line.refresh_from_db()
         assert _line.quantity == 4
+        assert _line.reserved_quantity == 6
+        assert _line.quantity_on_hand == 10
         s.ProjectBuildService()._cancel_build(project_build)
         _line.refresh_from_db()
         assert _line.quantity == 10
+        assert _line.reserved_quantity == 0
+        assert _line.quantity_on_hand == 10
         project_build.refresh_from_db()
         assert project_build.cleared is None
 
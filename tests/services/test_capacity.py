@@ -0,0 +1,173 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from django_ctb import models as m
+from django_ctb import services as s
+
+
+class TestBuildableQuantityCalculator:
+    """
+    :feature: The buildable quantity of every Project Version is found at once
+    """
+
+    @pytest.fixture
+    def stock(
+        self,
+        part_factory,
+        project_version_factory,
+        project_part_factory,
+        inventory_line_factory,
+    ):
+        resistor = part_factory(name="resistor", symbol="R")
+        equivalent = part_factory(
+            name="resistor equivalent", symbol="RE", equivalent_to=resistor
+        )
+        capacitor = part_factory(name="capacitor", symbol="C")
+        led = part_factory(name="led", symbol="D")
+        first = project_version_factory()
+        project_part_factory(
+            part=resistor, project_version=first, line_number=1, quantity=2
+        )
+        project_part_factory(
+            part=capacitor, project_version=first, line_number=2, quantity=1
+        )
+        project_part_factory(
+            part=led, project_version=first, line_number=3, quantity=1, is_optional=True
+        )
+        project_part_factory(
+            part=equivalent, project_version=first, line_number=4, quantity=1
+        )
+        second = project_version_factory()
+        project_part_factory(
+            part=capacitor, project_version=second, line_number=1, quantity=4
+        )
+        empty = project_version_factory()
+        inventory_line_factory(part=resistor, quantity=5)
+        inventory_line_factory(part=equivalent, quantity=4)
+        inventory_line_factory(part=capacitor, quantity=10)
+        inventory_line_factory(part=capacitor, quantity=10, is_deprioritized=True)
+        inventory_line_factory(part=led, quantity=2)
+        return {
+            "resistor": resistor,
+            "capacitor": capacitor,
+            "led": led,
+            "first": first,
+            "second": second,
+            "empty": empty,
+        }
+
+    @staticmethod
+    def _summary(buildable):
+        return {
+            buildable_quantity.project_version.pk: (
+                buildable_quantity.quantity,
+                [
+                    (limiting_part.part.pk, limiting_part.needed, limiting_part.stock)
+                    for limiting_part in buildable_quantity.limiting_parts
+                ],
+            )
+            for buildable_quantity in buildable
+        }
+
+    def test_calculate(self, stock):
+        """
+        :scenario: The buildable quantity is limited by the scarcest part
+
+        | GIVEN project versions call for parts with stock
+        | AND some parts have stock of equivalent parts
+        | AND some stock is deprioritized
+        | WHEN the buildable quantities are calculated
+        | THEN each project version's quantity is limited by its scarcest part
+        | AND stock of equivalent parts counts toward the parts called for
+        | AND deprioritized stock does not count
+        | AND project versions calling for no parts have no quantity
+        """
+        buildable = s.BuildableQuantityCalculator(
+            m.ProjectVersion.objects.filter(
+                pk__in=[stock[name].pk for name in ("first", "second", "empty")]
+            ),
+            use_numpy=False,
+        ).calculate()
+        assert self._summary(buildable) == {
+            stock["first"].pk: (2, [(stock["led"].pk, 1, 2)]),
+            stock["second"].pk: (2, [(stock["capacitor"].pk, 4, 10)]),
+            stock["empty"].pk: (None, []),
+        }
+
+    def test_calculate__options(self, stock):
+        """
+        :scenario: Optional parts and deprioritized stock can be left out or
+                   counted
+
+        | GIVEN project versions call for optional parts and parts with
+          deprioritized stock
+        | WHEN the buildable quantities are calculated leaving out optional
+          parts and counting deprioritized stock
+        | THEN the quantities are limited by the remaining parts
+        """
+        buildable = s.BuildableQuantityCalculator(
+            m.ProjectVersion.objects.filter(
+                pk__in=[stock["first"].pk, stock["second"].pk]
+            ),
+            include_optional=False,
+            include_deprioritized=True,
+            use_numpy=False,
+        ).calculate()
+        assert self._summary(buildable) == {
+            stock["first"].pk: (3, [(stock["resistor"].pk, 3, 9)]),
+            stock["second"].pk: (5, [(stock["capacitor"].pk, 4, 20)]),
+        }
+
+    def test_calculate__repeated(self, stock, inventory_line_factory):
+        """
+        :scenario: Buildable quantities can be calculated again
+
+        | GIVEN the buildable quantities have been calculated
+        | AND more stock has arrived
+        | WHEN the buildable quantities are calculated again
+        | THEN the quantities reflect the current stock
+        | AND the demand is not counted twice
+        """
+        calculator = s.BuildableQuantityCalculator(
+            m.ProjectVersion.objects.filter(pk=stock["second"].pk), use_numpy=False
+        )
+        assert self._summary(calculator.calculate()) == {
+            stock["second"].pk: (2, [(stock["capacitor"].pk, 4, 10)])
+        }
+        inventory_line_factory(part=stock["capacitor"], quantity=2)
+        assert self._summary(calculator.calculate()) == {
+            stock["second"].pk: (3, [(stock["capacitor"].pk, 4, 12)])
+        }
+
+    def test_calculate__queries(self, stock):
+        """
+        :scenario: Buildable quantities are calculated in three queries
+
+        | GIVEN several project versions call for parts with stock
+        | WHEN the buildable quantities are calculated
+        | THEN three queries are made
+        """
+        with CaptureQueriesContext(connection) as queries:
+            s.BuildableQuantityCalculator(use_numpy=False).calculate()
+        assert len(queries.captured_queries) == 3
+
+    def test_calculate__numpy(self, stock):
+        """
+        :scenario: NumPy calculates the same buildable quantities
+
+        | GIVEN NumPy is installed
+        | WHEN the buildable quantities are calculated with and without NumPy
+        | THEN the results are the same
+        """
+        pytest.importorskip("numpy")
+        for include_optional in [True, False]:
+            assert self._summary(
+                s.BuildableQuantityCalculator(
+                    use_numpy=True, include_optional=include_optional
+                ).calculate()
+            ) == self._summary(
+                s.BuildableQuantityCalculator(
+                    use_numpy=False, include_optional=include_optional
+                ).calculate()
+            )
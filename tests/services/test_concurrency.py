@@ -0,0 +1,185 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+
+from django_ctb import models as m
+from django_ctb import services as s
+
+WORKERS = 4
+
+# threads cannot share an in-memory test database with locking; these tests
+#  run against a file with ``--ds=test_project.settings.concurrency``
+pytestmark = pytest.mark.skipif(
+    not settings.DATABASES["default"].get("TEST", {}).get("NAME"),
+    reason="needs a file-backed test database",
+)
+
+
+def run_concurrently(func, args_list):
+    """
+    Runs ``func`` once for each item of ``args_list`` from a thread pool, each
+    thread using its own database connection. Returns the results in order and
+    re-raises the first exception encountered.
+    """
+
+    def _run(args):
+        try:
+            return func(*args)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        futures = [executor.submit(_run, args) for args in args_list]
+    return [future.result() for future in futures]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentBuilds:
+    """
+    :feature: Project Builds can be cleared, completed, and cancelled by
+              parallel workers without oversubscribing stock
+    """
+
+    @pytest.fixture
+    def shared_stock(
+        self,
+        part_factory,
+        inventory_line_factory,
+        project_version_factory,
+        project_part_factory,
+        project_build_factory,
+    ):
+        parts = [
+            part_factory(name=f"shared {idx}", symbol=f"S{idx}") for idx in range(3)
+        ]
+        lines = {}
+        for part in parts:
+            lines[inventory_line_factory(part=part, quantity=7).pk] = 7
+            lines[inventory_line_factory(part=part, quantity=5).pk] = 5
+        builds = []
+        for _ in range(2):
+            project_version = project_version_factory()
+            for idx, part in enumerate(parts):
+                project_part_factory(
+                    part=part,
+                    line_number=idx,
+                    quantity=2,
+                    project_version=project_version,
+                )
+            for _ in range(4):
+                builds.append(
+                    project_build_factory(project_version=project_version, quantity=1)
+                )
+        yield builds, lines
+        for build in m.ProjectBuild.objects.filter(completed__isnull=True):
+            s.ProjectBuildService().cancel_build(build.pk)
+        m.InventoryAction.objects.all().delete()
+        m.ProjectBuildPartReservation.objects.all().delete()
+
+    @staticmethod
+    def assert_ledger_consistent(lines):
+        for line_pk, initial_quantity in lines.items():
+            line = m.InventoryLine.objects.get(pk=line_pk)
+            delta = line.inventory_actions.aggregate(total=Sum("delta"))["total"] or 0
+            assert line.quantity >= 0
+            assert line.quantity == initial_quantity + delta
+        assert not m.InventoryLine.objects.with_mismatched_reserved_quantity()
+        for reservation in m.ProjectBuildPartReservation.objects.all():
+            assert reservation.quantity == 2
+        for build in m.ProjectBuild.objects.all():
+            if build.cleared is not None:
+                assert build.shortfalls.count() == 0
+                assert build.part_reservations.count() == 3
+
+    def test_clear_to_build(self, shared_stock):
+        """
+        :scenario: Parallel Clear To Build Processes do not oversubscribe stock
+
+        | GIVEN several project builds call for the same parts
+        | AND there is only enough stock for some of the project builds
+        | WHEN the clear to build wrapper is run for every project build at once
+        | THEN stock is never reserved past zero
+        | AND every inventory line quantity matches its inventory actions
+        | AND only as many project builds as the stock allows are cleared
+        """
+        builds, lines = shared_stock
+        run_concurrently(
+            s.ProjectBuildService().clear_to_build, [(b.pk,) for b in builds]
+        )
+        self.assert_ledger_consistent(lines)
+        # 12 of each part are stocked, each build needs 2
+        assert m.ProjectBuild.objects.filter(cleared__isnull=False).count() == 6
+        assert m.InventoryLine.objects.aggregate(total=Sum("quantity"))["total"] == 0
+
+    def test_clear_complete_and_cancel(self, shared_stock):
+        """
+        :scenario: Parallel Complete and Cancel Processes keep the inventory
+                   ledger consistent
+
+        | GIVEN several project builds call for the same parts
+        | AND the project builds have been cleared where stock allows
+        | WHEN half the project builds are completed while the other half are
+          cancelled and re-cleared, all at once
+        | THEN every inventory line quantity matches its inventory actions
+        | AND stock is never reserved past zero
+        """
+        builds, lines = shared_stock
+        run_concurrently(
+            s.ProjectBuildService().clear_to_build, [(b.pk,) for b in builds]
+        )
+        cleared = list(
+            m.ProjectBuild.objects.filter(cleared__isnull=False).values_list(
+                "pk", flat=True
+            )
+        )
+        others = [b.pk for b in builds if b.pk not in cleared]
+
+        def _complete_or_cancel(build_pk):
+            if build_pk in cleared[::2]:
+                s.ProjectBuildService().complete_build(build_pk)
+            else:
+                s.ProjectBuildService().cancel_build(build_pk)
+                s.ProjectBuildService().clear_to_build(build_pk)
+
+        run_concurrently(_complete_or_cancel, [(pk,) for pk in cleared + others])
+        self.assert_ledger_consistent(lines)
+        assert m.ProjectBuild.objects.filter(completed__isnull=False).count() == 3
+        assert m.ProjectBuild.objects.filter(cleared__isnull=False).count() == 6
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentOrders:
+    """
+    :feature: Vendor Orders can be completed by parallel workers
+    """
+
+    def test_complete_order(
+        self,
+        vendor_part,
+        vendor_order_factory,
+        vendor_order_line_factory,
+        inventory_line_factory,
+    ):
+        """
+        :scenario: Parallel Complete Order Processes credit stock once each
+
+        | GIVEN several vendor orders include the same part
+        | WHEN the complete order wrapper is run for every vendor order at once
+        | THEN the inventory line is credited by every order line
+        """
+        inventory_line = inventory_line_factory(part=vendor_part.part, quantity=1)
+        orders = []
+        for idx in range(6):
+            order = vendor_order_factory(order_number=f"concurrent {idx}")
+            order.lines.add(vendor_order_line_factory(quantity=idx + 1), bulk=True)
+            orders.append(order)
+        run_concurrently(
+            s.VendorOrderService().complete_order, [(o.pk,) for o in orders]
+        )
+        inventory_line.refresh_from_db()
+        assert inventory_line.quantity == 1 + sum(range(1, 7))
+        assert inventory_line.inventory_actions.count() == 6
+        m.InventoryAction.objects.all().delete()
@@ -0,0 +1,236 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from django_ctb import models as m
+from django_ctb import services as s
+from django_ctb.exceptions import RefNotFoundException
+from django_ctb.github.services import GithubService
+
+BASE_BOM = """Qty,Reference,Footprint,Value
+2,"R1, R2",{footprint},1k
+1,R3,{footprint},2k
+1,C1,{footprint},100n
+"""
+
+TARGET_BOM = """Qty,Reference,Footprint,Value
+3,"R1, R2, R4",{footprint},1k
+1,RV3,{footprint},2k
+1,C1,{footprint},100n
+1,D1,{footprint},led
+"""
+
+
+class TestBomDiffService:
+    """
+    :feature: The BOM of a project version at another commit can be compared
+              with its current BOM without changing anything
+    """
+
+    class Closable:
+        def __init__(self, content):
+            self.content = content
+
+        def close(self):
+            pass
+
+        def iter_content(self, chunk_size=1):
+            yield self.content
+
+    @pytest.fixture
+    def parts(self, part_factory, vendor_part_factory):
+        one_k = part_factory(name="1k resistor", symbol="R", value="1k")
+        two_k = part_factory(name="2k resistor", symbol="R", value="2k")
+        vendor_part_factory(part=one_k, item_number="1k", cost=0.10)
+        vendor_part_factory(part=two_k, item_number="2k", cost=1.00)
+        return one_k, two_k
+
+    @pytest.fixture
+    def boms(self):
+        # BOM content by commit; tests may replace it
+        return {"aaaa": BASE_BOM, "bbbb": TARGET_BOM}
+
+    @pytest.fixture
+    def remote(self, monkeypatch, http_handler, footprint, project_version, boms):
+        commits = {"v0": "aaaa", "main": "bbbb"}
+
+        def _get_commit_hash_for_ref(self, *, user, repo, commit_ref):
+            if commit_ref not in commits:
+                raise RefNotFoundException
+            return commits[commit_ref]
+
+        def _download(method, url, **kwargs):
+            (commit,) = [
+                commit
+                for commit in boms
+                if url == project_version.bom_url_for_commit(commit)
+            ]
+            return self.Closable(boms[commit].format(footprint=footprint.name).encode())
+
+        monkeypatch.setattr(
+            GithubService, "get_commit_hash_for_ref", _get_commit_hash_for_ref
+        )
+        http_handler.side_effect = _download
+
+    def test_diff(self, project_version, parts, remote, http_handler):
+        """
+        :scenario: Added, removed, and changed lines are reported with the
+                   change in cost
+
+        | GIVEN a project version has a BOM at its commit ref
+        | AND the BOM at another commit ref adds a line, changes the quantity
+          of a line, and changes the references of a line such that it
+          resolves to no part
+        | WHEN the BOMs are diffed
+        | THEN both BOMs are downloaded
+        | AND the added line is reported
+        | AND the line with a changed quantity is reported
+        | AND the line which resolves to a different part is reported
+        | AND the costs of both BOMs and their difference are reported
+        | AND nothing is written
+        """
+        one_k, two_k = parts
+        with CaptureQueriesContext(connection) as queries:
+            bom_diff = s.BomDiffService().diff(project_version.pk, commit_ref="main")
+        assert not [
+            query
+            for query in queries.captured_queries
+            if query["sql"].lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        assert http_handler.call_count == 2
+        assert (bom_diff.base_commit, bom_diff.target_commit) == ("aaaa", "bbbb")
+        (added,) = bom_diff.added
+        assert (added.line_number, added.base_row) == (4, None)
+        assert added.target_row is not None
+        assert added.target_row.value == "led"
+        assert bom_diff.removed == []
+        (quantity_changed,) = bom_diff.quantity_changed
+        assert quantity_changed.line_number == 1
+        assert (quantity_changed.base_quantity, quantity_changed.target_quantity) == (
+            2,
+            3,
+        )
+        assert quantity_changed.base_part == quantity_changed.target_part == one_k
+        (part_changed,) = bom_diff.part_changed
+        assert part_changed.line_number == 2
+        assert part_changed.base_row is not None
+        assert part_changed.target_row is not None
+        assert part_changed.base_row.references == ["R3"]
+        assert part_changed.target_row.references == ["RV3"]
+        assert (part_changed.base_part, part_changed.target_part) == (two_k, None)
+        assert bom_diff.base_cost == pytest.approx(1.20)
+        assert bom_diff.target_cost == pytest.approx(0.30)
+        assert bom_diff.cost_delta == pytest.approx(-0.90)
+
+    def test_diff__removed(self, project_version, parts, remote):
+        """
+        :scenario: Lines missing from the target BOM are reported removed
+
+        | GIVEN the BOM at a commit ref has more lines than at another
+        | WHEN the BOMs are diffed the other way around
+        | THEN the extra line is reported removed
+        """
+        bom_diff = s.BomDiffService().diff(
+            project_version.pk, commit_ref="v0", base_ref="main"
+        )
+        assert bom_diff.added == []
+        (removed,) = bom_diff.removed
+        assert (removed.line_number, removed.target_row) == (4, None)
+        assert removed.base_row is not None
+        assert removed.base_row.value == "led"
+        assert bom_diff.cost_delta == pytest.approx(0.90)
+
+    @pytest.mark.parametrize(
+        "target_vendor_part", ["test vendor,2k", "other vendor,1k"]
+    )
+    def test_diff__vendor_part_changed(
+        self,
+        project_version,
+        parts,
+        remote,
+        boms,
+        vendor_factory,
+        vendor_part_factory,
+        target_vendor_part,
+    ):
+        """
+        :scenario: Lines whose vendor part changed are reported as changed
+                   lines
+
+        | GIVEN the BOM at another commit ref changes only the "Vendor" or
+          "PartNum" of a line
+        | WHEN the BOMs are diffed
+        | THEN the line is reported as resolving to a different part
+        | AND no line is reported added or removed
+        """
+        one_k, two_k = parts
+        vendor_part_factory(
+            part=two_k,
+            vendor=vendor_factory(name="other vendor", base_url="https://other"),
+            item_number="1k",
+        )
+        header = "Qty,Reference,Footprint,Value,Vendor,PartNum\n"
+        boms["aaaa"] = header + "2,R1,{footprint},1k,test vendor,1k\n"
+        boms["bbbb"] = header + f"2,R1,{{footprint}},1k,{target_vendor_part}\n"
+        bom_diff = s.BomDiffService().diff(project_version.pk, commit_ref="main")
+        assert not (bom_diff.added or bom_diff.removed or bom_diff.quantity_changed)
+        (part_changed,) = bom_diff.part_changed
+        assert (part_changed.base_part, part_changed.target_part) == (one_k, two_k)
+        assert part_changed.base_row is not None
+        assert part_changed.base_row.item_number == "1k"
+
+    def test_diff__implicit_parts(
+        self,
+        project_version,
+        parts,
+        remote,
+        part_factory,
+        vendor_part_factory,
+        implicit_project_part_factory,
+    ):
+        """
+        :scenario: The cost of implicit parts is included
+
+        | GIVEN the package of the BOM's parts has an implicit part
+        | WHEN the BOMs are diffed
+        | THEN the costs include the implicit parts of each line
+        """
+        screw = part_factory(name="screw", symbol="S")
+        vendor_part_factory(part=screw, item_number="screw", cost=0.05)
+        implicit_project_part_factory(part=screw, quantity=2)
+        bom_diff = s.BomDiffService().diff(project_version.pk, commit_ref="main")
+        assert bom_diff.base_cost == pytest.approx(1.20 + 3 * 2 * 0.05)
+        assert bom_diff.target_cost == pytest.approx(0.30 + 3 * 2 * 0.05)
+
+    def test_diff__base_ref(self, project_version, parts, remote):
+        """
+        :scenario: The BOM can be compared against any commit ref
+
+        | GIVEN a project version has been synced
+        | WHEN the BOMs at the same commit ref are diffed
+        | THEN nothing has changed
+        """
+        project_version.last_synced_commit = "zzzz"
+        project_version.save()
+        bom_diff = s.BomDiffService().diff(
+            project_version.pk, commit_ref="main", base_ref="main"
+        )
+        assert not (
+            bom_diff.added
+            or bom_diff.removed
+            or bom_diff.quantity_changed
+            or bom_diff.part_changed
+        )
+        assert bom_diff.cost_delta == 0
+
+    def test_diff__ref_not_found(self, project_version, remote):
+        """
+        :scenario: Commit refs which cannot be found cannot be diffed
+
+        | GIVEN a commit ref is not in the repo
+        | WHEN the BOM at the commit ref is diffed
+        | THEN an exception will be raised
+        """
+        with pytest.raises(RefNotFoundException):
+            s.BomDiffService().diff(project_version.pk, commit_ref="nope")
+        assert not m.ProjectPart.objects.exists()
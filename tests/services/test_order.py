@@ -1,28 +1,40 @@
-from unittest.mock import Mock, call
+from decimal import Decimal
+from unittest.mock import Mock
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from django_ctb import models as m
 from django_ctb import services as s
-from django_ctb.exceptions import MissingVendorPart
+from django_ctb.exceptions import InvalidReceipt, MissingVendorPart
 
 # TODO: update monkeypatch usage here
 
 
+def _upsert_order_line(*, vendor_part, quantity, owner):
+    s.VendorOrderService()._upsert_order_lines(
+        {(owner.pk, vendor_part.vendor_id): [(vendor_part, quantity)]},
+        prices=s.PriceTable.for_parts([vendor_part.part_id]),
+    )
+
+
 class TestVendorOrderService:
     """
     :feature: Vendor Orders can be generated and fulfilled
     """
 
-    def test__complete_order_line(self, vendor_order_line_factory, vendor_part, owner):
+    def test_receive_order__new_inventory_line(
+        self, vendor_order_line_factory, vendor_part, owner
+    ):
         """
-        :scenario: Completing an Order Line will create Inventory Line if necessary
+        :scenario: Receiving an Order Line will create Inventory Line if necessary
                    and create an Inventory Action
 
         | GIVEN a vendor order has an order line associated to an inventory
         | AND no inventory line exists for the order line part
-        | WHEN _complete_order_line is run
+        | WHEN the order line is received
         | THEN an inventory line will be created in the given inventory for the
           order line part
         | AND the quantity of parts in the inventory line will be increased by
@@ -33,7 +45,9 @@ class TestVendorOrderService:
         """
         assert len(m.InventoryLine.objects.all()) == 0
         order_line = vendor_order_line_factory(vendor_part=vendor_part, quantity=11)
-        s.VendorOrderService()._complete_order_line(order_line)
+        s.VendorOrderService().receive_order(
+            order_line.vendor_order_id, {order_line.pk: 11}
+        )
         assert len(m.InventoryLine.objects.all()) == 1
         assert len(m.InventoryAction.objects.all()) == 1
         inventory_line = m.InventoryLine.objects.all()[0]
@@ -48,16 +62,16 @@ class TestVendorOrderService:
         action.delete()
         inventory_line.delete()
 
-    def test__complete_order_line__existing_inventory(
+    def test_receive_order__existing_inventory(
         self, vendor_order_line_factory, vendor_part, inventory_line_factory
     ):
         """
-        :scenario: Complete Order Line Process will update an Inventory Line and
+        :scenario: Receiving an Order Line will update an Inventory Line and
                    create an Inventory Action
 
         | GIVEN a vendor order has an order line
         | AND an inventory line exists for the order line part
-        | WHEN _complete_order_line is run
+        | WHEN the order line is received
         | AND the quantity of parts in the inventory line will be increased by
           the quantity in the inventory line
         | AND an inventory line action will be created showing the inventory
@@ -66,7 +80,9 @@ class TestVendorOrderService:
         """
         inventory_line = inventory_line_factory(part=vendor_part.part, quantity=3)
         order_line = vendor_order_line_factory(vendor_part=vendor_part, quantity=11)
-        s.VendorOrderService()._complete_order_line(order_line)
+        s.VendorOrderService().receive_order(
+            order_line.vendor_order_id, {order_line.pk: 11}
+        )
         inventory_line.refresh_from_db()
         assert inventory_line.quantity == 14
         assert len(m.InventoryAction.objects.all()) == 1
@@ -80,35 +96,181 @@ class TestVendorOrderService:
     def test__complete_order(
         self,
         vendor_order_line_factory,
-        monkeypatch,
         vendor_part_factory,
         vendor_order,
         part_factory,
+        inventory_line_factory,
     ):
         """
-        :scenario: Complete Vendor Order Process will complete each Order Line and
-                   fulfill the Vendor Order
+        :scenario: Complete Vendor Order Process will credit inventory for every
+                   Order Line at once and fulfill the Vendor Order
 
         | GIVEN a vendor order exists with several order lines
+        | AND two of the order lines are for the same part
+        | AND an inventory line exists for one of the parts
         | WHEN _complete_order is called on the vendor order
-        | THEN _complete_order_line will be called for each order line
+        | THEN the existing inventory line will be credited
+        | AND inventory lines will be created for the other parts
+        | AND an inventory action will be created for each order line
+        | AND each order line will be marked received in full
         | AND the vendor order will be marked "fulfilled"
         """
-        order_lines = []
-        for idx in range(5):
-            part = part_factory(name=f"part{idx}", symbol="R")
-            vendor_part = vendor_part_factory(part=part, item_number=f"test-item-{idx}")
-            order_lines.append(
-                vendor_order_line_factory(vendor_part=vendor_part, quantity=100)
+        parts = [part_factory(name=f"part{idx}", symbol="R") for idx in range(4)]
+        inventory_line = inventory_line_factory(part=parts[0], quantity=3)
+        order_lines = [
+            vendor_order_line_factory(
+                vendor_part=vendor_part_factory(
+                    part=part, item_number=f"test-item-{idx}"
+                ),
+                quantity=100 + idx,
             )
-        mock_complete_order_line = Mock()
-        monkeypatch.setattr(
-            s.VendorOrderService, "_complete_order_line", mock_complete_order_line
-        )
+            for idx, part in enumerate(parts + [parts[1]])
+        ]
         s.VendorOrderService()._complete_order(vendor_order)
         vendor_order.refresh_from_db()
         assert vendor_order.fulfilled is not None
-        mock_complete_order_line.assert_has_calls([call(line) for line in order_lines])
+        inventory_line.refresh_from_db()
+        assert inventory_line.quantity == 103
+        assert dict(
+            m.InventoryLine.objects.filter(part__in=parts).values_list(
+                "part", "quantity"
+            )
+        ) == {
+            parts[0].pk: 103,
+            parts[1].pk: 101 + 104,
+            parts[2].pk: 102,
+            parts[3].pk: 103,
+        }
+        assert sorted(m.InventoryAction.objects.values_list("order_line", "delta")) == [
+            (order_line.pk, order_line.quantity) for order_line in order_lines
+        ]
+        assert [
+            order_line.received_quantity
+            for order_line in m.VendorOrderLine.objects.order_by("pk")
+        ] == [100, 101, 102, 103, 104]
+        m.InventoryAction.objects.all().delete()
+        m.InventoryLine.objects.exclude(pk=inventory_line.pk).delete()
+
+    def test__complete_order__queries(
+        self, owner, vendor, part_factory, vendor_part_factory
+    ):
+        """
+        :scenario: Completing a Vendor Order takes the same number of queries
+                   however many Order Lines it has
+
+        | GIVEN a vendor order exists with two order lines
+        | AND another vendor order exists with twenty order lines
+        | WHEN _complete_order is called on each vendor order
+        | THEN both take the same number of queries
+        """
+        query_counts = []
+        for line_count in (2, 20):
+            order = m.VendorOrder.objects.create(
+                owner=owner, vendor=vendor, order_number=f"order-{line_count}"
+            )
+            m.VendorOrderLine.objects.bulk_create(
+                m.VendorOrderLine(
+                    vendor_order=order,
+                    vendor_part=vendor_part_factory(
+                        part=part_factory(name=f"part{line_count}-{idx}", symbol="R"),
+                        item_number=f"test-item-{line_count}-{idx}",
+                    ),
+                    quantity=idx + 1,
+                    cost=1,
+                )
+                for idx in range(line_count)
+            )
+            order = m.VendorOrder.objects.prefetch_related("lines").get(pk=order.pk)
+            with CaptureQueriesContext(connection) as queries:
+                s.VendorOrderService()._complete_order(order)
+            query_counts.append(len(queries.captured_queries))
+        assert query_counts[0] == query_counts[1]
+        assert m.InventoryAction.objects.count() == 22
+        m.InventoryAction.objects.all().delete()
+        m.InventoryLine.objects.all().delete()
+        m.VendorOrder.objects.all().delete()
+
+    def test_receive_order__partial(
+        self, vendor_order, vendor_order_line_factory, vendor_part_factory, part
+    ):
+        """
+        :scenario: Vendor Orders can be received in parts
+
+        | GIVEN a vendor order exists with two order lines
+        | WHEN part of one order line is received
+        | THEN inventory is credited with the quantity received
+        | AND the vendor order is not fulfilled
+        | WHEN the rest of the vendor order is received
+        | THEN inventory is credited with the rest of each order line
+        | AND the vendor order is fulfilled
+        """
+        first = vendor_order_line_factory(quantity=10)
+        second = vendor_order_line_factory(
+            vendor_part=vendor_part_factory(part=part, item_number="other"),
+            quantity=5,
+        )
+        s.VendorOrderService().receive_order(vendor_order.pk, {first.pk: 4})
+        vendor_order.refresh_from_db()
+        assert vendor_order.fulfilled is None
+        inventory_line = m.InventoryLine.objects.get(part=part)
+        assert inventory_line.quantity == 4
+        first.refresh_from_db()
+        assert first.received_quantity == 4
+
+        s.VendorOrderService().receive_order(
+            vendor_order.pk, {first.pk: 6, second.pk: 5}
+        )
+        vendor_order.refresh_from_db()
+        assert vendor_order.fulfilled is not None
+        inventory_line.refresh_from_db()
+        assert inventory_line.quantity == 15
+        assert sorted(m.InventoryAction.objects.values_list("order_line", "delta")) == [
+            (first.pk, 4),
+            (first.pk, 6),
+            (second.pk, 5),
+        ]
+        m.InventoryAction.objects.all().delete()
+        inventory_line.delete()
+
+    @pytest.mark.parametrize("quantity", [11, -1])
+    def test_receive_order__invalid(
+        self, vendor_order, vendor_order_line_factory, quantity
+    ):
+        """
+        :scenario: Receiving more than is left of an Order Line is an error
+
+        | GIVEN a vendor order exists with an order line
+        | WHEN more than the order line quantity (or a negative quantity) is
+          received
+        | THEN an exception is raised
+        | AND nothing is received
+        """
+        order_line = vendor_order_line_factory(quantity=10)
+        with pytest.raises(InvalidReceipt):
+            s.VendorOrderService().receive_order(
+                vendor_order.pk, {order_line.pk: quantity}
+            )
+        with pytest.raises(InvalidReceipt):
+            s.VendorOrderService().receive_order(
+                vendor_order.pk, {order_line.pk + 1000: 1}
+            )
+        assert not m.InventoryAction.objects.exists()
+        assert not m.InventoryLine.objects.exists()
+
+    def test_receive_order__fulfilled(self, vendor_order, vendor_order_line):
+        """
+        :scenario: Fulfilled Vendor Orders cannot be received again
+
+        | GIVEN a vendor order has been fulfilled
+        | WHEN the vendor order is received
+        | THEN an exception is raised
+        | AND nothing is received
+        """
+        vendor_order.fulfilled = timezone.now()
+        vendor_order.save()
+        with pytest.raises(InvalidReceipt):
+            s.VendorOrderService().receive_order(vendor_order.pk)
+        assert not m.InventoryAction.objects.exists()
 
     def test_complete_order(self, monkeypatch, vendor_order):
         """
@@ -151,7 +313,7 @@ class TestVendorOrderService:
         with pytest.raises(m.VendorOrder.DoesNotExist):
             s.VendorOrderService().complete_order(vendor_order.pk)
 
-    def test__accumulate_shortfalls(
+    def test__accumulate_demand(
         self, project_build, part, part_factory, project_build_part_shortage_factory
     ):
         """
@@ -159,7 +321,7 @@ class TestVendorOrderService:
 
         | GIVEN a project build exists
         | AND the project build has several shortfalls
-        | WHEN _accumulate_shortfalls is called for the project build
+        | WHEN _accumulate_demand is called for the project build
         | THEN any shortfalls which share a common part will be gathered into a
           single entry with the sum total of component count
         | AND all shortfalls from the build will be represented in the return
@@ -174,7 +336,10 @@ class TestVendorOrderService:
         project_build_part_shortage_factory(
             part=other_part, quantity=3, project_build=project_build
         )
-        shortfalls = list(s.VendorOrderService()._accumulate_shortfalls(project_build))
+        owner_pk = project_build.project_version.project.owner_id
+        demand = s.VendorOrderService()._accumulate_demand([project_build])
+        assert list(demand) == [owner_pk]
+        shortfalls = demand[owner_pk]
         assert len(shortfalls) == 2
         if shortfalls[0].part == part:
             assert shortfalls[0].count == 18
@@ -196,11 +361,59 @@ class TestVendorOrderService:
         | WHEN _select_vendor_part is run for the part
         | THEN the vendor part with the lowest cost will be returned
         """
-        cheapest = vendor_part_factory(cost=0.01, part=part)
-        vendor_part_factory(cost=0.02, part=part)
-        vendor_part_factory(cost=0.03, part=part)
-        selected = s.VendorOrderService()._select_vendor_part(part)
-        assert selected == cheapest
+        cheapest = vendor_part_factory(cost=0.01, part=part, volume=1)
+        vendor_part_factory(cost=0.02, part=part, volume=1)
+        vendor_part_factory(cost=0.03, part=part, volume=1)
+        prices = s.PriceTable.for_parts([part.pk])
+        selection = s.VendorOrderService()._select_vendor_part(part, 1, prices=prices)
+        assert selection.vendor_part == cheapest
+        assert len(selection.options) == 3
+
+    def test__select_vendor_part__lots(self, part, vendor_part_factory):
+        """
+        :scenario: Select Vendor Part Process rounds up to whole lots and
+                   prefers the cheapest Vendor for the whole order
+
+        | GIVEN a part is sold singly and in lots of one hundred
+        | AND each is cheaper per unit in lots
+        | WHEN _select_vendor_part is run for a few of the part
+        | THEN the vendor part sold singly is returned
+        | WHEN _select_vendor_part is run for more than a lot of the part
+        | THEN the vendor part sold in lots is returned
+        | AND the order quantity is rounded up to whole lots
+        """
+        single = vendor_part_factory(cost=0.10, part=part, volume=1)
+        lots = vendor_part_factory(cost=0.02, part=part, volume=100)
+        prices = s.PriceTable.for_parts([part.pk])
+        service = s.VendorOrderService()
+        selection = service._select_vendor_part(part, 12, prices=prices)
+        assert (selection.vendor_part, selection.order_quantity) == (single, 12)
+        selection = service._select_vendor_part(part, 130, prices=prices)
+        assert (selection.vendor_part, selection.order_quantity) == (lots, 200)
+        assert selection.explanation.startswith(
+            f"130 needed; chose {lots.vendor.name} {lots.item_number}: 200 @"
+        )
+
+    def test__select_vendor_part__price_breaks(self, part, vendor_part_factory):
+        """
+        :scenario: Select Vendor Part Process orders up to a price break when
+                   that costs less
+
+        | GIVEN a vendor part has price breaks at 1 and 10
+        | AND ten at the second break cost less than eight at the first
+        | WHEN _select_vendor_part is run for eight of the part
+        | THEN ten of the vendor part are ordered
+        """
+        vendor_part = vendor_part_factory(cost=1, part=part, volume=1)
+        for volume, cost in ((1, 1.00), (10, 0.50)):
+            m.VendorPartPriceBreak.objects.create(
+                vendor_part=vendor_part, volume=volume, cost=cost
+            )
+        prices = s.PriceTable.for_parts([part.pk])
+        selection = s.VendorOrderService()._select_vendor_part(part, 8, prices=prices)
+        assert selection.order_quantity == 10
+        assert selection.chosen.total_cost == pytest.approx(5.0)
+        assert [option.order_quantity for option in selection.options] == [10, 8]
 
     def test__select_vendor_part__none(self, part):
         """
@@ -211,9 +424,11 @@ class TestVendorOrderService:
         | THEN a MissingVendorPart exception is raised
         """
         with pytest.raises(MissingVendorPart):
-            s.VendorOrderService()._select_vendor_part(part)
+            s.VendorOrderService()._select_vendor_part(
+                part, 1, prices=s.PriceTable.for_parts([part.pk])
+            )
 
-    def test__populate_vendor_order(
+    def test__upsert_order_lines(
         self, vendor_part, vendor, vendor_order, vendor_order_line, owner
     ):
         """
@@ -223,20 +438,18 @@ class TestVendorOrderService:
         | GIVEN a vendor part exists for a vendor
         | AND a vendor order exists for the given vendor
         | AND a vendor order line exists for the part
-        | WHEN _populate_vendor_order is called for the vendor part providing a
+        | WHEN _upsert_order_lines is called for the vendor part providing a
           quantity
         | THEN the provided quantity will be added to the existing order line
         """
 
         assert vendor_order.lines.count() == 1
-        s.VendorOrderService()._populate_vendor_order(
-            vendor_part=vendor_part, quantity=22, owner=owner
-        )
+        _upsert_order_line(vendor_part=vendor_part, quantity=22, owner=owner)
         vendor_order_line.refresh_from_db()
         assert vendor_order.lines.count() == 1
         assert vendor_order_line.quantity == 32
 
-    def test__populate_vendor_order__new_line(self, vendor_part, vendor_order, owner):
+    def test__upsert_order_lines__new_line(self, vendor_part, vendor_order, owner):
         """
         :scenario: Populate Vendor Order Process will create a new Order Line
                    in an existing Vendor Order as needed.
@@ -244,36 +457,32 @@ class TestVendorOrderService:
         | GIVEN a vendor part exists for a vendor
         | AND a vendor order exists for the given vendor
         | AND no vendor order line exists for the part
-        | WHEN _populate_vendor_order is called for the vendor part providing a quantity
+        | WHEN _upsert_order_lines is called for the vendor part providing a quantity
         | THEN a vendor order will be created with the given vendor
         | AND a vendor order line will be created for the vendor part
         | AND the provided quantity will be represented in the order line
         """
         assert vendor_order.lines.count() == 0
-        s.VendorOrderService()._populate_vendor_order(
-            vendor_part=vendor_part, quantity=22, owner=owner
-        )
+        _upsert_order_line(vendor_part=vendor_part, quantity=22, owner=owner)
         assert vendor_order.lines.count() == 1
         assert vendor_order.lines.all()[0].quantity == 22
         assert vendor_order.lines.all()[0].vendor_part == vendor_part
         vendor_order.lines.all()[0].delete()
 
-    def test__populate_vendor_order__new_order(self, vendor_part, owner):
+    def test__upsert_order_lines__new_order(self, vendor_part, owner):
         """
         :scenario: Populate Vendor Order Process will create a new Vendor Order
                    when no open Vendor Order exists.
 
         | GIVEN a vendor part exists for a vendor
         | AND no vendor order exists for the given vendor
-        | WHEN _populate_vendor_order is called for the vendor part providing a quantity
+        | WHEN _upsert_order_lines is called for the vendor part providing a quantity
         | THEN a vendor order will be created with the given vendor
         | AND a vendor order line will be created for the vendor part
         | AND the provided quantity will be represented in the order line
         """
         assert m.VendorOrder.objects.count() == 0
-        s.VendorOrderService()._populate_vendor_order(
-            vendor_part=vendor_part, quantity=22, owner=owner
-        )
+        _upsert_order_line(vendor_part=vendor_part, quantity=22, owner=owner)
         assert m.VendorOrder.objects.count() == 1
         vendor_order = m.VendorOrder.objects.all()[0]
         assert vendor_order.vendor == vendor_part.vendor
@@ -283,7 +492,7 @@ class TestVendorOrderService:
         vendor_order.lines.all()[0].delete()
         vendor_order.delete()
 
-    def test__populate_vendor_order__respects_owner(
+    def test__upsert_order_lines__respects_owner(
         self,
         vendor_part,
         vendor,
@@ -299,7 +508,7 @@ class TestVendorOrderService:
         | GIVEN a vendor part exists for a vendor
         | AND there is an owner
         | AND a vendor order exists for the given vendor with a separate owner
-        | WHEN _populate_vendor_order is called for the vendor part providing a quantity
+        | WHEN _upsert_order_lines is called for the vendor part providing a quantity
         | THEN a vendor order will be created with the given vendor and the given owner
         | AND a vendor order line will be created for the vendor part
         | AND the provided quantity will be represented in the order line
@@ -309,9 +518,7 @@ class TestVendorOrderService:
         separate_owner = owner_factory(user=separate_user)
         vendor_order_factory(owner=separate_owner)
         assert m.VendorOrder.objects.count() == 1
-        s.VendorOrderService()._populate_vendor_order(
-            vendor_part=vendor_part, quantity=22, owner=owner
-        )
+        _upsert_order_line(vendor_part=vendor_part, quantity=22, owner=owner)
         assert m.VendorOrder.objects.count() == 2
         vendor_order = m.VendorOrder.objects.all()[1]
         assert vendor_order.owner == owner
@@ -361,11 +568,147 @@ class TestVendorOrderService:
             part=third_part, quantity=21, project_build=project_build
         )
 
-        s.VendorOrderService().generate_vendor_orders(project_build.pk)
+        with CaptureQueriesContext(connection) as queries:
+            selections = s.VendorOrderService().generate_vendor_orders(project_build.pk)
         assert m.VendorOrder.objects.count() == 2
+        # vendor parts for every shortfall part are loaded in one query
+        assert (
+            len(
+                [
+                    query
+                    for query in queries.captured_queries
+                    if 'FROM "django_ctb_vendorpart"' in query["sql"]
+                ]
+            )
+            == 1
+        )
+        # vendor parts without price breaks are ordered in whole lots
+        assert [
+            (selection.quantity, selection.order_quantity) for selection in selections
+        ] == [(18, 24), (3, 12)]
         m.VendorOrder.objects.all().delete()
         assert m.VendorOrder.objects.count() == 0
 
+    def test_generate_vendor_orders__price_breaks(
+        self, project_build, part, vendor_part, project_build_part_shortage_factory
+    ):
+        """
+        :scenario: Order lines are costed at the price break for their quantity
+
+        | GIVEN a project build has a shortfall for a part
+        | AND the vendor part for the part has price breaks
+        | WHEN generate_vendor_orders is called for the project build
+        | THEN the order line costs the price break for the shortfall quantity
+        """
+        for volume, cost in ((1, 1.00), (10, 0.50), (100, 0.10)):
+            m.VendorPartPriceBreak.objects.create(
+                vendor_part=vendor_part, volume=volume, cost=cost
+            )
+        project_build_part_shortage_factory(
+            part=part, quantity=12, project_build=project_build
+        )
+        s.VendorOrderService().generate_vendor_orders(project_build.pk)
+        order_line = m.VendorOrderLine.objects.get()
+        assert order_line.quantity == 12
+        assert order_line.cost == Decimal("0.5")
+        m.VendorOrder.objects.all().delete()
+
+    def _short_builds(self, count, *, part, project_build_factory, shortage_factory):
+        builds = [project_build_factory() for _ in range(count)]
+        for build in builds:
+            shortage_factory(part=part, quantity=5, project_build=build)
+        return builds
+
+    def test_generate_vendor_orders_for_builds(
+        self,
+        part,
+        vendor_part,
+        project_build_factory,
+        project_build_part_shortage_factory,
+    ):
+        """
+        :scenario: Vendor Orders for many Project Builds are generated together
+
+        | GIVEN several project builds are short of the same part
+        | WHEN generate_vendor_orders_for_builds is called for the project builds
+        | THEN one order line covers the shortfalls of every build together
+        | AND the order quantity is rounded up to whole lots once
+        """
+        builds = self._short_builds(
+            3,
+            part=part,
+            project_build_factory=project_build_factory,
+            shortage_factory=project_build_part_shortage_factory,
+        )
+        (selection,) = s.VendorOrderService().generate_vendor_orders_for_builds(
+            [build.pk for build in builds]
+        )
+        assert (selection.quantity, selection.order_quantity) == (15, 24)
+        order_line = m.VendorOrderLine.objects.get()
+        assert (order_line.vendor_part, order_line.quantity) == (vendor_part, 24)
+        m.VendorOrder.objects.all().delete()
+
+    def test_generate_vendor_orders_for_builds__queries(
+        self,
+        part,
+        part_factory,
+        vendor_part,
+        vendor_part_factory,
+        vendor_mouser,
+        project_build_factory,
+        project_build_part_shortage_factory,
+        vendor_order_factory,
+        vendor_order_line_factory,
+    ):
+        """
+        :scenario: Generating Vendor Orders takes a fixed number of queries
+
+        | GIVEN open vendor orders to two vendors each have a line for a part
+        | AND project builds are short of both parts
+        | WHEN generate_vendor_orders_for_builds is called for a few builds
+        | AND again for many more builds
+        | THEN both take the same number of queries
+        | AND the existing order lines are added to
+        """
+        vendor_order_line = vendor_order_line_factory(quantity=10)
+        other_part = part_factory(name="other", symbol="O")
+        other_vendor_part = vendor_part_factory(
+            part=other_part, vendor=vendor_mouser, volume=1
+        )
+        m.VendorOrderLine.objects.create(
+            vendor_order=vendor_order_factory(vendor=vendor_mouser),
+            vendor_part=other_vendor_part,
+            quantity=1,
+            cost=other_vendor_part.cost,
+        )
+        counts = []
+        for count in (2, 10):
+            builds = self._short_builds(
+                count,
+                part=part,
+                project_build_factory=project_build_factory,
+                shortage_factory=project_build_part_shortage_factory,
+            )
+            for build in builds:
+                project_build_part_shortage_factory(
+                    part=other_part, quantity=1, project_build=build
+                )
+            with CaptureQueriesContext(connection) as queries:
+                s.VendorOrderService().generate_vendor_orders_for_builds(
+                    [build.pk for build in builds]
+                )
+            counts.append(len(queries.captured_queries))
+        assert counts[0] == counts[1]
+        vendor_order_line.refresh_from_db()
+        # 2 * 5 rounded up to 12, then 10 * 5 rounded up to 60
+        assert vendor_order_line.quantity == 10 + 12 + 60
+        assert m.VendorOrderLine.objects.get(
+            vendor_part=other_vendor_part
+        ).quantity == (1 + 2 + 10)
+        assert m.VendorOrder.objects.count() == 2
+        assert m.VendorOrderLine.objects.count() == 2
+        m.VendorOrderLine.objects.filter(vendor_part=other_vendor_part).delete()
+
     def test_generate_vendor_orders__no_build(self, db):
         """
         :scenario: Generate Vendor Orders Proces will ignore non-extand Project
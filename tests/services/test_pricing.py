@@ -0,0 +1,103 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from django_ctb import models as m
+from django_ctb import services as s
+
+
+class TestPriceTable:
+    """
+    :feature: Vendor parts are costed by the quantity purchased, from their
+              price breaks
+    """
+
+    @pytest.fixture
+    def vendor_parts(self, part, vendor, vendor_mouser, vendor_part_factory):
+        tiered = vendor_part_factory(part=part, vendor=vendor, cost=1, volume=1)
+        for volume, cost in ((1, 1.00), (10, 0.50), (100, 0.10)):
+            m.VendorPartPriceBreak.objects.create(
+                vendor_part=tiered, volume=volume, cost=cost
+            )
+        flat = vendor_part_factory(part=part, vendor=vendor_mouser, cost=0.30, volume=1)
+        return tiered, flat
+
+    @pytest.mark.parametrize(
+        "quantity, expected",
+        [(0, 1.00), (1, 1.00), (9, 1.00), (10, 0.50), (99, 0.50), (5000, 0.10)],
+    )
+    def test_unit_cost(self, vendor_parts, quantity, expected):
+        """
+        :scenario: The price break for the quantity applies
+
+        | GIVEN a vendor part has price breaks at 1, 10, and 100
+        | WHEN the unit cost of a quantity is looked up
+        | THEN the cost of the largest break not above the quantity is returned
+        """
+        tiered, _ = vendor_parts
+        prices = s.PriceTable.for_parts([tiered.part_id])
+        assert prices.unit_cost(tiered.pk, quantity) == pytest.approx(expected)
+
+    def test_unit_cost__no_price_breaks(self, vendor_parts, vendor_part_factory):
+        """
+        :scenario: Vendor parts without price breaks cost their own cost
+
+        | GIVEN a vendor part has no price breaks
+        | WHEN the unit cost of any quantity is looked up
+        | THEN the cost of the vendor part is returned
+        | AND vendor parts without a cost have no unit cost
+        """
+        tiered, flat = vendor_parts
+        uncosted = vendor_part_factory(part=tiered.part, cost=None)
+        prices = s.PriceTable.for_parts([tiered.part_id])
+        assert prices.unit_costs([(flat.pk, 1), (flat.pk, 1000)]) == [
+            pytest.approx(0.30),
+            pytest.approx(0.30),
+        ]
+        assert prices.unit_cost(uncosted.pk, 1) is None
+
+    def test_cheapest(self, vendor_parts):
+        """
+        :scenario: The cheapest vendor part depends on the quantity
+
+        | GIVEN a part has a flat priced vendor part and a tiered vendor part
+        | WHEN the cheapest vendor part is looked up for a small quantity
+        | THEN the flat priced vendor part is returned
+        | WHEN the cheapest vendor part is looked up for a large quantity
+        | THEN the tiered vendor part is returned
+        """
+        tiered, flat = vendor_parts
+        prices = s.PriceTable.for_parts([tiered.part_id])
+        assert prices.cheapest(tiered.part_id, 5) == (flat, pytest.approx(0.30))
+        assert prices.cheapest(tiered.part_id, 100) == (tiered, pytest.approx(0.10))
+        assert prices.cheapest(tiered.part_id + 1000, 100) is None
+
+    def test_bulk(self, vendor, part_factory, vendor_part_factory):
+        """
+        :scenario: Many lines are costed without further queries
+
+        | GIVEN many parts have vendor parts with price breaks
+        | WHEN the price table is loaded for the parts
+        | THEN it is loaded in two queries
+        | AND costing thousands of lines makes no queries
+        """
+        vendor_parts = [
+            vendor_part_factory(
+                part=part_factory(name=f"part {idx}", symbol="R"), vendor=vendor
+            )
+            for idx in range(20)
+        ]
+        m.VendorPartPriceBreak.objects.bulk_create(
+            m.VendorPartPriceBreak(vendor_part=vendor_part, volume=volume, cost=cost)
+            for vendor_part in vendor_parts
+            for volume, cost in ((1, 0.2), (50, 0.1))
+        )
+        with CaptureQueriesContext(connection) as queries:
+            prices = s.PriceTable.for_parts(vp.part_id for vp in vendor_parts)
+        assert len(queries.captured_queries) == 2
+        lines = [(vendor_parts[idx % 20].pk, idx % 100) for idx in range(5000)]
+        with CaptureQueriesContext(connection) as queries:
+            costs = prices.unit_costs(lines)
+        assert not queries.captured_queries
+        assert costs[49] == pytest.approx(0.2)
+        assert costs[50] == pytest.approx(0.1)
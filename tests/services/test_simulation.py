@@ -0,0 +1,192 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from django_ctb import models as m
+from django_ctb import services as s
+
+
+class TestClearanceSimulator:
+    """
+    :feature: Clearing a Project Build can be simulated without writing
+    """
+
+    @pytest.fixture
+    def stocked_version(
+        self,
+        part_factory,
+        inventory_line_factory,
+        project_version_factory,
+        project_part_factory,
+    ):
+        def _factory(part_count):
+            project_version = project_version_factory()
+            for idx in range(part_count):
+                part = part_factory(name=f"sim {idx}", symbol=f"S{idx}")
+                equivalent = part_factory(
+                    name=f"sim {idx} equivalent",
+                    symbol=f"E{idx}",
+                    equivalent_to=part,
+                )
+                project_part_factory(
+                    part=part,
+                    line_number=idx,
+                    quantity=3,
+                    project_version=project_version,
+                )
+                if idx % 3 == 0:
+                    # not enough stock; becomes a shortage
+                    inventory_line_factory(part=part, quantity=2)
+                else:
+                    # spread across the part and its equivalent
+                    inventory_line_factory(part=part, quantity=4)
+                    inventory_line_factory(part=equivalent, quantity=5)
+            return m.ProjectVersion.objects.select_related("project").get(
+                pk=project_version.pk
+            )
+
+        return _factory
+
+    def test_simulate_matches_allocator(self, stocked_version, project_build_factory):
+        """
+        :scenario: Simulation predicts the reservations and shortages of a
+                   clear to build
+
+        | GIVEN a project version uses several parts
+        | AND some parts have enough stock spread across equivalent parts
+        | AND some parts have insufficient stock
+        | WHEN clearing a build of the project version is simulated
+        | THEN the reservations, inventory lines drawn on, and shortages are
+          those made by clearing such a build
+        | AND nothing is written
+        """
+        project_version = stocked_version(6)
+        with CaptureQueriesContext(connection) as queries:
+            simulation = s.ClearanceSimulator(
+                project_version=project_version, quantity=2
+            ).simulate()
+        assert not any(
+            query["sql"].lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+            for query in queries.captured_queries
+        )
+        assert not m.ProjectBuildPartReservation.objects.exists()
+        assert not m.InventoryAction.objects.exists()
+        assert not simulation.is_clear
+
+        with transaction.atomic():
+            project_build = project_build_factory(
+                project_version=project_version, quantity=2
+            )
+            reservations, shortages = s.ProjectBuildAllocator(
+                project_build=project_build
+            ).allocate()
+            expected = (
+                [
+                    (
+                        reservation.part_id,
+                        sorted(reservation.project_parts.values_list("pk", flat=True)),
+                        sorted(
+                            (action.inventory_line_id, -action.delta)
+                            for action in reservation.inventory_actions.all()
+                        ),
+                    )
+                    for reservation in reservations
+                ],
+                [(shortage.part_id, shortage.quantity) for shortage in shortages],
+            )
+            transaction.set_rollback(True)
+        assert (
+            [
+                (
+                    reservation.part.pk,
+                    sorted(pp.pk for pp in reservation.project_parts),
+                    sorted(
+                        (debit.inventory_line.pk, debit.quantity)
+                        for debit in reservation.debits
+                    ),
+                )
+                for reservation in simulation.reservations
+            ],
+            [
+                (shortage.part.pk, shortage.quantity)
+                for shortage in simulation.shortages
+            ],
+        ) == expected
+        assert len(simulation.reservations) == 4
+        assert [shortage.quantity for shortage in simulation.shortages] == [4, 4]
+
+    def test_simulate_query_count_is_constant(self, stocked_version):
+        """
+        :scenario: Simulation query count does not depend on BOM size
+
+        | GIVEN a project version uses a few parts
+        | AND another project version uses many parts
+        | WHEN clearing a build of each project version is simulated
+        | THEN the same number of queries is used for each
+        """
+        query_counts = []
+        for part_count in [3, 30]:
+            project_version = stocked_version(part_count)
+            with CaptureQueriesContext(connection) as queries:
+                s.ClearanceSimulator(
+                    project_version=project_version, quantity=2
+                ).simulate()
+            query_counts.append(len(queries.captured_queries))
+        assert query_counts[0] == query_counts[1] == 2
+
+    def test_simulate_exclusions_and_substitutions(
+        self, stocked_version, part_factory, inventory_line_factory
+    ):
+        """
+        :scenario: Simulation honors excluded and substituted project parts
+
+        | GIVEN a project version has parts with insufficient stock
+        | WHEN clearing a build is simulated excluding one of those parts
+        | AND substituting a part with plenty of stock for the other
+        | THEN the build would be cleared
+        | AND the substitute part would be reserved in place of the other
+        """
+        project_version = stocked_version(6)
+        short = list(
+            project_version.project_parts.filter(line_number__in=[0, 3]).order_by(
+                "line_number"
+            )
+        )
+        substitute = part_factory(name="substitute", symbol="SUB")
+        inventory_line = inventory_line_factory(part=substitute, quantity=100)
+        simulation = s.ClearanceSimulator(
+            project_version=project_version,
+            quantity=2,
+            excluded_project_part_pks=[short[0].pk],
+            substitutions={short[1].pk: substitute.pk},
+        ).simulate()
+        assert simulation.is_clear
+        assert len(simulation.reservations) == 5
+        reservation = next(
+            reservation
+            for reservation in simulation.reservations
+            if reservation.part == substitute
+        )
+        assert reservation.project_parts == [short[1]]
+        assert [(d.inventory_line, d.quantity) for d in reservation.debits] == [
+            (inventory_line, 6)
+        ]
+        inventory_line.refresh_from_db()
+        assert inventory_line.quantity == 100
+
+    def test_simulate_missing_substitute(self, stocked_version):
+        """
+        :scenario: Simulation cannot substitute parts which do not exist
+
+        | GIVEN a project version
+        | WHEN clearing a build is simulated substituting a missing part
+        | THEN an exception is raised
+        """
+        project_version = stocked_version(1)
+        project_part = project_version.project_parts.get()
+        with pytest.raises(m.Part.DoesNotExist):
+            s.ClearanceSimulator(
+                project_version=project_version,
+                quantity=1,
+                substitutions={project_part.pk: 987654},
+            ).simulate()
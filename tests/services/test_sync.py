@@ -1,13 +1,15 @@
+import hashlib
 from unittest.mock import Mock
 
 import pytest
-import requests
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from django_ctb import models as m
 from django_ctb import services as s
 from django_ctb.exceptions import MissingVendorPart, RefNotFoundException
 from django_ctb.github.services import GithubService
-from django_ctb.mouser.services import MouserPartService
+from django_ctb.mouser.services import MouserPartService, MouserService
 
 
 class TestProjectVersionBomServiceSync:
@@ -365,7 +367,9 @@ class TestProjectVersionBomServiceSync:
         assert project_part.missing_part_description is not None
         project_part.delete()
 
-    def test__sync(self, project_version, monkeypatch, project_part_factory, part):
+    def test__sync(
+        self, project_version, monkeypatch, project_part_factory, part, http_handler
+    ):
         """
         :scenario: Bills of Material will be retrieved (http) and parsed into
                    Project Parts
@@ -388,6 +392,9 @@ class TestProjectVersionBomServiceSync:
             def close(self):
                 pass
 
+            def iter_content(self, chunk_size=1):
+                yield self.content
+
         _real_project_part = project_part_factory(
             project_version=project_version, part=part
         )
@@ -397,15 +404,9 @@ class TestProjectVersionBomServiceSync:
 
         mock_sync_row = Mock(return_value=_real_project_part)
         monkeypatch.setattr(s.ProjectVersionBomService, "_sync_row", mock_sync_row)
-        monkeypatch.setattr(
-            requests,
-            "get",
-            Mock(
-                return_value=Closable(
-                    b"""Qty,Reference,Vendor,PartNum,Footprint,Value
+        http_handler.return_value = Closable(
+            b"""Qty,Reference,Vendor,PartNum,Footprint,Value
 3,"A1, A2, A3","test vendor","test-item-number","Test Footprint","asdf" """
-                )
-            ),
         )
 
         s.ProjectVersionBomService()._sync(
@@ -442,7 +443,7 @@ class TestProjectVersionBomServiceSync:
         mock_sync_row.assert_not_called()
 
     def test__sync__missing_part(
-        self, project_version, monkeypatch, project_part_factory, part
+        self, project_version, monkeypatch, project_part_factory, part, http_handler
     ):
         """
         :scenario: When resyncing a Bill of Materials Project Parts which are
@@ -469,21 +470,18 @@ class TestProjectVersionBomServiceSync:
             def close(self):
                 pass
 
+            def iter_content(self, chunk_size=1):
+                yield self.content
+
         _bad_project_part = project_part_factory(
             project_version=project_version, part=part, line_number=2
         )
         print(_bad_project_part)
         print(_bad_project_part.line_number)
 
-        monkeypatch.setattr(
-            requests,
-            "get",
-            Mock(
-                return_value=Closable(
-                    b"""#,Qty,Reference,Vendor,PartNum,Footprint,Value
+        http_handler.return_value = Closable(
+            b"""#,Qty,Reference,Vendor,PartNum,Footprint,Value
 1,3,"A1, A2, A3",,,"Unknown Footprint","zxcv" """
-                )
-            ),
         )
 
         s.ProjectVersionBomService()._sync(
@@ -507,9 +505,273 @@ class TestProjectVersionBomServiceSync:
         monkeypatch.setattr(s.ProjectVersionBomService, "_sync", mock_sync)
         s.ProjectVersionBomService().sync(project_version.pk)
         mock_sync.assert_called_once_with(
+            project_version=project_version, synced_commit="asdfasdf", force=False
+        )
+
+    def test_sync__already_synced(self, project_version, monkeypatch):
+        """
+        :scenario: Syncing a commit which was already synced returns immediately
+
+        | GIVEN a project version has been synced at a commit
+        | AND the commit ref still resolves to that commit
+        | WHEN sync is run for the project version
+        | THEN the BOM is not downloaded or synced again
+        """
+        project_version.last_synced_commit = "asdfasdf"
+        project_version.bom_hash = "somehash"
+        project_version.save()
+        monkeypatch.setattr(
+            GithubService,
+            "get_commit_hash_for_ref",
+            Mock(return_value="asdfasdf"),
+        )
+        mock_sync = Mock(return_value={})
+        monkeypatch.setattr(s.ProjectVersionBomService, "_sync", mock_sync)
+        assert s.ProjectVersionBomService().sync(project_version.pk) == {}
+        mock_sync.assert_not_called()
+
+    def test_sync__already_synced_force(self, project_version, monkeypatch):
+        """
+        :scenario: Syncing a commit which was already synced can be forced
+
+        | GIVEN a project version has been synced at a commit
+        | AND the commit ref still resolves to that commit
+        | WHEN sync is run for the project version with force
+        | THEN the BOM is synced again
+        """
+        project_version.last_synced_commit = "asdfasdf"
+        project_version.bom_hash = "somehash"
+        project_version.save()
+        monkeypatch.setattr(
+            GithubService,
+            "get_commit_hash_for_ref",
+            Mock(return_value="asdfasdf"),
+        )
+        mock_sync = Mock(return_value={})
+        monkeypatch.setattr(s.ProjectVersionBomService, "_sync", mock_sync)
+        s.ProjectVersionBomService().sync(project_version.pk, force=True)
+        mock_sync.assert_called_once_with(
+            project_version=project_version, synced_commit="asdfasdf", force=True
+        )
+
+    @pytest.mark.parametrize("force", [False, True])
+    def test__sync__unchanged_content(
+        self,
+        project_version,
+        monkeypatch,
+        project_part_factory,
+        part,
+        force,
+        http_handler,
+    ):
+        """
+        :scenario: Rows are only re-synced when the BOM content has changed
+                   (or the sync is forced)
+
+        | GIVEN a project version has been synced
+        | AND the commit ref now resolves to a new commit
+        | AND the BOM content at the new commit is unchanged
+        | WHEN _sync is run for the new commit
+        | THEN the rows are not synced again unless the sync is forced
+        | AND the new commit is saved on the project version
+        """
+
+        class Closable:
+            def __init__(self, content):
+                self.content = content
+
+            def close(self):
+                pass
+
+            def iter_content(self, chunk_size=1):
+                yield self.content
+
+        content = b"""Qty,Reference,Footprint,Value
+3,"A1, A2, A3","Test Footprint","asdf" """
+        project_version.last_synced_commit = "oldcommit"
+        project_version.bom_hash = hashlib.sha256(content).hexdigest()
+        project_version.save()
+        _project_part = project_part_factory(project_version=project_version, part=part)
+        mock_sync_row = Mock(return_value=_project_part)
+        monkeypatch.setattr(s.ProjectVersionBomService, "_sync_row", mock_sync_row)
+        http_handler.return_value = Closable(content)
+
+        s.ProjectVersionBomService()._sync(
+            project_version=project_version, synced_commit="newcommit", force=force
+        )
+        assert mock_sync_row.called is force
+        project_version.refresh_from_db()
+        assert project_version.last_synced_commit == "newcommit"
+        assert project_version.bom_hash == hashlib.sha256(content).hexdigest()
+
+    def test__read_bom__streams(self, project_version, monkeypatch, http_handler):
+        """
+        :scenario: BOMs are hashed and parsed as they are downloaded
+
+        | GIVEN a BOM is downloaded in chunks
+        | WHEN the BOM is read
+        | THEN parsing has begun before the first chunk is downloaded
+        | AND every row is parsed
+        | AND the hash is of the whole content
+        """
+        parsing = []
+        downloaded_while_parsing = []
+
+        class Closable:
+            def close(self):
+                pass
+
+            def iter_content(self, chunk_size=1):
+                for idx in range(0, len(content), chunk_size):
+                    downloaded_while_parsing.append(bool(parsing))
+                    yield content[idx : idx + chunk_size]
+
+        parse = s.BomParser.parse
+
+        def _parse(self, chunks, **kwargs):
+            parsing.append(True)
+            return parse(self, chunks, **kwargs)
+
+        content = b"Qty,Reference,Footprint,Value\n" + b"".join(
+            f'1,"R{i}",R_0805,{i}k\n'.encode() for i in range(1, 101)
+        )
+        monkeypatch.setattr(s.BomParser, "parse", _parse)
+        monkeypatch.setattr(s.ProjectVersionBomService, "bom_chunk_size", 64)
+        http_handler.return_value = Closable()
+
+        rows, bom_hash = s.ProjectVersionBomService()._read_bom(
+            project_version=project_version, synced_commit="newcommit"
+        )
+        assert len(downloaded_while_parsing) > 1
+        assert all(downloaded_while_parsing)
+        assert rows is not None and len(rows) == 100
+        assert bom_hash == hashlib.sha256(content).hexdigest()
+
+    def test_sync__bom_path_changed(self, project_version, monkeypatch):
+        """
+        :scenario: A commit which was already synced is synced again when the
+                   BOM path has changed
+
+        | GIVEN a project version has been synced at a commit
+        | AND its BOM path has since been changed
+        | AND the commit ref still resolves to that commit
+        | WHEN sync is run for the project version
+        | THEN the BOM is synced again
+        """
+        project_version.last_synced_commit = "asdfasdf"
+        project_version.bom_hash = "somehash"
+        project_version.save()
+        project_version.bom_path = "other.csv"
+        project_version.save()
+        monkeypatch.setattr(
+            GithubService,
+            "get_commit_hash_for_ref",
+            Mock(return_value="asdfasdf"),
+        )
+        mock_sync = Mock(return_value={})
+        monkeypatch.setattr(s.ProjectVersionBomService, "_sync", mock_sync)
+        s.ProjectVersionBomService().sync(project_version.pk)
+        mock_sync.assert_called_once()
+
+    def test_sync__already_synced_missing_part(
+        self, project_version, monkeypatch, project_part_factory, http_handler
+    ):
+        """
+        :scenario: Rows with a missing part are resolved again even when the
+                   commit and BOM content are unchanged
+
+        | GIVEN a project version has been synced at a commit
+        | AND one of its rows had no matching part
+        | AND the commit ref still resolves to that commit
+        | WHEN sync is run for the project version
+        | THEN the BOM is parsed and its rows are synced again
+        | AND the missing part is reported
+        """
+
+        class Closable:
+            def close(self):
+                pass
+
+            def iter_content(self, chunk_size=1):
+                yield content
+
+        content = b"""Qty,Reference,Footprint,Value
+3,"A1, A2, A3","Test Footprint","asdf" """
+        project_version.last_synced_commit = "asdfasdf"
+        project_version.bom_hash = hashlib.sha256(content).hexdigest()
+        project_version.save()
+        _project_part = project_part_factory(
+            project_version=project_version, part=None, line_number=2
+        )
+        monkeypatch.setattr(
+            GithubService,
+            "get_commit_hash_for_ref",
+            Mock(return_value="asdfasdf"),
+        )
+        mock_sync_row = Mock(return_value=_project_part)
+        monkeypatch.setattr(s.ProjectVersionBomService, "_sync_row", mock_sync_row)
+        http_handler.return_value = Closable()
+
+        row_errors = s.ProjectVersionBomService().sync(project_version.pk)
+        mock_sync_row.assert_called_once()
+        assert row_errors == {"part_missing": [1]}
+
+    def test__sync__mouser_parts_populated_together(
+        self,
+        project_version,
+        package,
+        vendor_mouser,
+        http_handler,
+        broker,
+        worker,
+        monkeypatch,
+    ):
+        """
+        :scenario: Mouser parts created by a sync are populated in one batch
+
+        | GIVEN a BOM has several rows with unknown "Mouser" part numbers
+        | WHEN _sync is run
+        | THEN a placeholder vendor part is created for each row
+        | AND a single task populates all of the placeholder vendor parts
+        """
+
+        class Closable:
+            def __init__(self, content):
+                self.content = content
+
+            def close(self):
+                pass
+
+            def iter_content(self, chunk_size=1):
+                yield self.content
+
+        http_handler.return_value = Closable(
+            b"""Qty,Reference,Footprint,Value,Vendor,PartNum
+1,R1,Test Footprint,1k,Mouser,123-R1K
+1,C1,Test Footprint,1u,Mouser,123-C1U
+"""
+        )
+        mock_populate = Mock()
+        mock_populate_many = Mock()
+        monkeypatch.setattr(MouserService, "populate", mock_populate)
+        monkeypatch.setattr(MouserService, "populate_many", mock_populate_many)
+        s.ProjectVersionBomService()._sync(
             project_version=project_version, synced_commit="asdfasdf"
         )
 
+        broker.join("default")
+        worker.join()
+        vendor_parts = m.VendorPart.objects.filter(vendor=vendor_mouser)
+        assert vendor_parts.count() == 2
+        mock_populate.assert_not_called()
+        mock_populate_many.assert_called_once_with(
+            [vendor_part.pk for vendor_part in vendor_parts.order_by("pk")]
+        )
+        project_version.project_parts.all().delete()
+        for vendor_part in vendor_parts:
+            vendor_part.delete()
+            vendor_part.part.delete()
+
 
 class TestProjectVersionBomServicePartSelection:
     """
@@ -867,3 +1129,441 @@ class TestProjectVersionBomServicePartSelection:
         )
         mock_get_matching_part.assert_called_once_with(row=_row)
         assert _part is None
+
+
+class TestBomPartIndex:
+    """
+    :feature: BOM rows are resolved to Parts with a fixed number of queries
+    """
+
+    @staticmethod
+    def _row(line_number, *, value, references, footprint, vendor="", item=""):
+        return m.BillOfMaterialsRow.model_validate(
+            {
+                "#": line_number,
+                "Reference": references,
+                "Qty": 2,
+                "PartNum": item,
+                "Vendor": vendor,
+                "Value": value,
+                "Footprint": footprint,
+            }
+        )
+
+    @pytest.fixture
+    def catalog(self, part_factory, footprint, inventory_line_factory, vendor_part):
+        green_led = part_factory(name="LED Green", value="LED", symbol="D")
+        white_led = part_factory(name="LED White", value="LED", symbol="D")
+        red_led = part_factory(name="LED Red", value="LED", symbol="LED")
+        part_factory(name="LED Blue", value="LED", symbol="D")
+        pot = part_factory(name="Pot", value="B100K", symbol="RV")
+        inventory_line_factory(part=green_led, quantity=22)
+        inventory_line_factory(part=white_led, quantity=53)
+        inventory_line_factory(part=red_led, quantity=60, is_deprioritized=True)
+        inventory_line_factory(part=pot, quantity=1)
+        rows = [
+            self._row(1, value="LED", references="D1, D2", footprint=footprint.name),
+            self._row(2, value="LED", references="D3, LED1", footprint=footprint.name),
+            self._row(3, value="B100K", references="RV1", footprint=footprint.name),
+            self._row(4, value="B100K", references="RV2", footprint="other"),
+            self._row(5, value="A100K", references="RV3", footprint=footprint.name),
+            self._row(
+                6,
+                value="LED",
+                references="D4",
+                footprint=footprint.name,
+                vendor=vendor_part.vendor.name,
+                item=vendor_part.item_number,
+            ),
+        ]
+        return rows
+
+    def test_matches_per_row_queries(self, catalog):
+        """
+        :scenario: The part index makes the same part choices as the per-row
+                   queries
+
+        | GIVEN a BOM has rows which match several, one, or no parts
+        | AND some matching parts are deprioritized or have more stock than others
+        | WHEN the part index is built for the BOM
+        | THEN every row resolves to the same parts, in the same order, as the
+          per-row queries
+        """
+        index = s.BomPartIndex(catalog)
+        service = s.ProjectVersionBomService()
+        for row in catalog:
+            if row.item_number:
+                assert index.get_vendor_part(row=row) == service._get_vendor_part(
+                    row=row
+                )
+            else:
+                assert index.get_matching_parts(row=row) == list(
+                    service._get_matching_parts(row=row)
+                )
+
+    def test_query_count_is_constant(self, catalog, django_assert_num_queries):
+        """
+        :scenario: The part index is loaded with a fixed number of queries
+
+        | GIVEN a BOM has many rows
+        | WHEN the part index is built for the BOM
+        | THEN the number of queries does not depend on the number of rows
+        | AND resolving the rows to parts makes no further queries
+        """
+        service = s.ProjectVersionBomService()
+        with django_assert_num_queries(3):
+            service.part_index = s.BomPartIndex(catalog * 20)
+            parts = [service._get_part(row=row) for row in catalog * 20]
+        assert parts[0].name == "LED White"
+        assert parts[4] is None
+
+
+class TestBomSyncWriter:
+    """
+    :feature: Re-syncing a Bill of Materials writes only what changed
+    """
+
+    class Closable:
+        def __init__(self, content):
+            self.content = content
+
+        def close(self):
+            pass
+
+        def iter_content(self, chunk_size=1):
+            yield self.content
+
+    @pytest.fixture
+    def synced_bom(
+        self,
+        project_version,
+        part_factory,
+        implicit_project_part_factory,
+        footprint,
+        http_handler,
+    ):
+        knob = part_factory(name="knob", symbol="K")
+        implicit_project_part_factory(part=knob, quantity=2)
+        for idx in range(30):
+            part_factory(name=f"resistor {idx}", symbol="R", value=f"{idx}k")
+
+        def _sync(lines, *, quantity=2):
+            rows = "\n".join(
+                f'{quantity},"R{2 * idx + 1}, R{2 * idx + 2}",{footprint.name},{idx}k'
+                for idx in range(lines)
+            )
+            http_handler.return_value = self.Closable(
+                f"Qty,Reference,Footprint,Value\n{rows}".encode()
+            )
+            # forced so that an unchanged BOM is still diffed
+            return s.ProjectVersionBomService()._sync(
+                project_version=project_version,
+                synced_commit="asdfasdfsadf",
+                force=True,
+            )
+
+        yield _sync
+        project_version.project_parts.all().delete()
+
+    @staticmethod
+    def _writes(queries):
+        return [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+            and "django_ctb_projectversion" not in query["sql"].split("WHERE")[0]
+        ]
+
+    def test_unchanged_bom_does_not_write(self, synced_bom, project_version):
+        """
+        :scenario: Re-syncing an unchanged BOM does not write any project parts
+
+        | GIVEN a BOM has been synced yielding project parts, footprint refs, and
+          implicit project parts
+        | WHEN the unchanged BOM is synced again
+        | THEN no project parts or footprint refs are inserted, updated, or
+          deleted
+        """
+        synced_bom(20)
+        assert project_version.project_parts.count() == 40
+        with CaptureQueriesContext(connection) as queries:
+            synced_bom(20)
+        assert self._writes(queries) == []
+        assert project_version.project_parts.count() == 40
+
+    def test_changed_bom_is_diffed(self, synced_bom, project_version):
+        """
+        :scenario: Re-syncing a changed BOM applies only the differences
+
+        | GIVEN a BOM has been synced yielding project parts
+        | WHEN the BOM is synced again with fewer rows and different quantities
+        | THEN the project parts of removed rows (and their implicit project
+          parts) are deleted
+        | AND the remaining project parts and implicit project parts are updated
+        | AND the footprint refs are retained
+        """
+        synced_bom(20)
+        kept_pks = set(
+            project_version.project_parts.filter(line_number__lte=10).values_list(
+                "pk", flat=True
+            )
+        )
+        synced_bom(10, quantity=3)
+        project_parts = project_version.project_parts.all()
+        assert {project_part.pk for project_part in project_parts} == kept_pks
+        for project_part in project_parts:
+            if project_part.is_implicit:
+                assert project_part.quantity == 6
+            else:
+                assert project_part.quantity == 3
+                assert project_part.footprint_refs.count() == 2
+
+    def test_query_count_is_constant(self, synced_bom, django_assert_max_num_queries):
+        """
+        :scenario: Syncing a BOM takes a fixed number of queries
+
+        | GIVEN a BOM has many rows
+        | WHEN the BOM is synced
+        | THEN the number of queries does not depend on the number of rows
+        """
+        with django_assert_max_num_queries(15):
+            synced_bom(30)
+        with django_assert_max_num_queries(15):
+            synced_bom(5)
+
+    def test_implicit_parts_query_count_is_constant(
+        self, synced_bom, project_version, part_factory, implicit_project_part_factory
+    ):
+        """
+        :scenario: Implicit project parts take a fixed number of queries
+
+        | GIVEN a BOM has many rows whose package has implicit parts
+        | WHEN the BOM is synced with more implicit parts defined for the package
+        | THEN every row gets each of the implicit project parts
+        | AND the number of queries does not depend on the number of implicit
+          parts
+        """
+        with CaptureQueriesContext(connection) as single:
+            synced_bom(10)
+        assert project_version.project_parts.filter(is_implicit=True).count() == 10
+        project_version.project_parts.all().delete()
+        for idx in range(3):
+            implicit_project_part_factory(
+                part=part_factory(name=f"screw {idx}", symbol="S"), quantity=idx + 1
+            )
+        with CaptureQueriesContext(connection) as several:
+            synced_bom(10)
+        assert project_version.project_parts.filter(is_implicit=True).count() == 40
+        assert len(several.captured_queries) == len(single.captured_queries)
+
+
+class TestProjectVersionBomServiceSyncProject:
+    """
+    :feature: Every version of a project is synced together, downloading each
+              BOM once
+    """
+
+    class Closable:
+        def __init__(self, content):
+            self.content = content
+
+        def close(self):
+            pass
+
+        def iter_content(self, chunk_size=1):
+            yield self.content
+
+    @pytest.fixture
+    def resistor(self, part_factory):
+        resistor = part_factory(name="Resistor 1k", symbol="R", value="1k")
+        yield resistor
+        m.ProjectPart.objects.filter(part=resistor).delete()
+
+    @pytest.fixture
+    def project_versions(self, project_version_factory, resistor, footprint):
+        project_versions = []
+        for revision, commit_ref in enumerate(["main", "main", "v1", "missing"]):
+            project_version = project_version_factory()
+            project_version.revision = revision
+            project_version.commit_ref = commit_ref
+            project_version.save()
+            project_versions.append(project_version)
+        return project_versions
+
+    @pytest.fixture
+    def remote(self, monkeypatch, http_handler, footprint):
+        commits = {"main": "aaaa", "v1": "bbbb"}
+        resolved = []
+
+        def _get_commit_hash_for_ref(self, *, user, repo, commit_ref):
+            resolved.append(commit_ref)
+            if commit_ref not in commits:
+                raise RefNotFoundException
+            return commits[commit_ref]
+
+        monkeypatch.setattr(
+            GithubService, "get_commit_hash_for_ref", _get_commit_hash_for_ref
+        )
+        http_handler.side_effect = lambda method, url, **kwargs: self.Closable(
+            f"Qty,Reference,Footprint,Value\n1,R1,{footprint.name},1k".encode()
+        )
+        return resolved
+
+    def test_sync_project(self, project, project_versions, remote, http_handler):
+        """
+        :scenario: Shared commit refs and BOMs are fetched once
+
+        | GIVEN a project has versions sharing a commit ref and BOM path
+        | AND another version whose commit ref cannot be found
+        | WHEN the project is synced
+        | THEN each commit ref is resolved once
+        | AND each (commit, BOM path) is downloaded once
+        | AND each version with a found commit ref is synced
+        | AND a report with timings is returned for each version
+        """
+        reports = s.ProjectVersionBomService().sync_project(project.pk)
+        assert sorted(remote) == ["main", "missing", "v1"]
+        assert sorted(call.args[1] for call in http_handler.call_args_list) == [
+            project_versions[0].bom_url_for_commit("aaaa"),
+            project_versions[2].bom_url_for_commit("bbbb"),
+        ]
+        assert [report.project_version_pk for report in reports] == [
+            project_version.pk for project_version in project_versions
+        ]
+        assert [report.status for report in reports] == [
+            "synced",
+            "synced",
+            "synced",
+            "ref_not_found",
+        ]
+        assert [report.shared_download for report in reports[:3]] == [
+            True,
+            True,
+            False,
+        ]
+        for report in reports[:3]:
+            assert report.write_time > 0
+        for project_version, commit in zip(project_versions, ["aaaa", "aaaa", "bbbb"]):
+            project_version.refresh_from_db()
+            assert project_version.last_synced_commit == commit
+            assert project_version.project_parts.count() == 1
+
+    def test_sync_project__already_synced(
+        self, project, project_versions, remote, http_handler
+    ):
+        """
+        :scenario: Versions whose commit was already synced are skipped
+
+        | GIVEN a project has been synced
+        | WHEN the project is synced again
+        | THEN no BOM is downloaded
+        | AND the versions are reported skipped
+        | WHEN the project is synced again with force
+        | THEN the BOMs are downloaded and synced again
+        """
+        service = s.ProjectVersionBomService()
+        service.sync_project(project.pk)
+        http_handler.reset_mock()
+        reports = service.sync_project(project.pk)
+        http_handler.assert_not_called()
+        assert [report.status for report in reports[:3]] == ["skipped"] * 3
+        reports = service.sync_project(project.pk, force=True)
+        assert http_handler.call_count == 2
+        assert [report.status for report in reports[:3]] == ["synced"] * 3
+
+    def test_sync_project__unchanged_content(
+        self, project, project_versions, remote, http_handler, monkeypatch
+    ):
+        """
+        :scenario: BOMs whose content is unchanged are not synced again
+
+        | GIVEN a project has been synced
+        | AND a commit ref now resolves to a new commit with the same BOM
+        | WHEN the project is synced again
+        | THEN the BOM at the new commit is downloaded but its rows are not
+          synced
+        | AND the new commit is saved on the versions
+        """
+        service = s.ProjectVersionBomService()
+        service.sync_project(project.pk)
+        get_commit_hash_for_ref = GithubService.get_commit_hash_for_ref
+
+        def _moved(self, *, user, repo, commit_ref):
+            if commit_ref == "main":
+                return "cccc"
+            return get_commit_hash_for_ref(
+                self, user=user, repo=repo, commit_ref=commit_ref
+            )
+
+        monkeypatch.setattr(GithubService, "get_commit_hash_for_ref", _moved)
+        mock_sync_row = Mock()
+        monkeypatch.setattr(s.ProjectVersionBomService, "_sync_row", mock_sync_row)
+        http_handler.reset_mock()
+        reports = service.sync_project(project.pk)
+        assert http_handler.call_count == 1
+        mock_sync_row.assert_not_called()
+        assert [report.status for report in reports] == [
+            "synced",
+            "synced",
+            "skipped",
+            "ref_not_found",
+        ]
+        for project_version in project_versions[:2]:
+            project_version.refresh_from_db()
+            assert project_version.last_synced_commit == "cccc"
+            assert project_version.project_parts.count() == 1
+
+    def test_sync_project__missing_part(
+        self, project, project_versions, remote, http_handler, resistor
+    ):
+        """
+        :scenario: Versions with a missing part are synced again
+
+        | GIVEN a project has been synced
+        | AND the BOM rows of its versions had no matching part
+        | WHEN the matching part is added and the project is synced again
+        | THEN the BOMs are downloaded and synced again
+        | AND the project parts of the versions have the part
+        """
+        resistor.value = "2k"
+        resistor.save()
+        service = s.ProjectVersionBomService()
+        service.sync_project(project.pk)
+        resistor.value = "1k"
+        resistor.save()
+        http_handler.reset_mock()
+        reports = service.sync_project(project.pk)
+        assert http_handler.call_count == 2
+        assert [report.status for report in reports[:3]] == ["synced"] * 3
+        for project_version in project_versions[:3]:
+            assert project_version.project_parts.get().part == resistor
+
+    def test_sync_project__download_failed(
+        self, project, project_versions, remote, http_handler
+    ):
+        """
+        :scenario: A BOM which cannot be downloaded does not stop the others
+
+        | GIVEN a project has versions at different commits
+        | AND the BOM at one commit cannot be downloaded
+        | WHEN the project is synced
+        | THEN the versions at that commit are reported failed
+        | AND the other versions are synced
+        """
+        content = http_handler.side_effect
+
+        def _download(method, url, **kwargs):
+            if "aaaa" in url:
+                raise ConnectionError
+            return content(method, url, **kwargs)
+
+        http_handler.side_effect = _download
+        reports = s.ProjectVersionBomService().sync_project(project.pk)
+        assert [report.status for report in reports] == [
+            "failed",
+            "failed",
+            "synced",
+            "ref_not_found",
+        ]
+        project_versions[0].refresh_from_db()
+        assert project_versions[0].last_synced_commit is None
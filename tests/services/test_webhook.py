@@ -0,0 +1,182 @@
+import hashlib
+import hmac
+
+import pytest
+
+from django_ctb import models as m
+from django_ctb import services as s
+
+
+def _push(ref="refs/heads/main", *, changed=(), full_name="fake/fake", **kwargs):
+    return {
+        "ref": ref,
+        "repository": {
+            "full_name": full_name,
+            "clone_url": f"https://github.com/{full_name}.git",
+        },
+        "commits": [{"added": [], "modified": list(changed), "removed": []}],
+        **kwargs,
+    }
+
+
+class TestPushWebhookService:
+    """
+    :feature: Push webhooks re-sync only the project versions whose BOM may
+              have changed
+    """
+
+    @pytest.fixture
+    def project_version(self, project_version):
+        project_version.commit_ref = "main"
+        project_version.last_synced_commit = "asdf"
+        project_version.save()
+        return project_version
+
+    @pytest.fixture
+    def affected(self):
+        def _affected(payload):
+            service = s.PushWebhookService()
+            return [pv.pk for pv in service.get_affected_project_versions(payload)]
+
+        return _affected
+
+    def test_verify_signature(self, settings):
+        """
+        :scenario: Only webhooks signed with the shared secret are accepted
+
+        | GIVEN a webhook secret is configured
+        | WHEN a webhook body is signed with the secret
+        | THEN the signature is verified
+        | WHEN the signature is wrong or missing
+        | THEN the signature is not verified
+        """
+        settings.CTB_WEBHOOK_SECRET = "secret"
+        body = b'{"ref": "refs/heads/main"}'
+        digest = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+        service = s.PushWebhookService()
+        assert service.verify_signature(body=body, signature=f"sha256={digest}")
+        assert not service.verify_signature(body=body, signature=digest)
+        assert not service.verify_signature(
+            body=body + b" ", signature=f"sha256={digest}"
+        )
+        assert not service.verify_signature(body=body, signature=None)
+
+    def test_verify_signature__no_secret(self, settings):
+        """
+        :scenario: Webhooks are refused when no secret is configured
+
+        | GIVEN no webhook secret is configured
+        | WHEN a webhook body is signed with an empty secret
+        | THEN the signature is not verified
+        """
+        settings.CTB_WEBHOOK_SECRET = ""
+        body = b"{}"
+        digest = hmac.new(b"", body, hashlib.sha256).hexdigest()
+        assert not s.PushWebhookService().verify_signature(
+            body=body, signature=f"sha256={digest}"
+        )
+
+    def test_bom_changed(self, project_version, affected):
+        """
+        :scenario: Pushes which change the BOM affect the project version
+
+        | GIVEN a synced project version tracks a branch
+        | WHEN the branch is pushed with a change to the BOM
+        | THEN the project version is affected
+        """
+        payload = _push(changed=["README.md", project_version.bom_path])
+        assert affected(payload) == [project_version.pk]
+
+    def test_bom_unchanged(self, project_version, affected):
+        """
+        :scenario: Pushes which do not change the BOM are ignored
+
+        | GIVEN a synced project version tracks a branch
+        | WHEN the branch is pushed without a change to the BOM
+        | THEN the project version is not affected
+        """
+        assert affected(_push(changed=["README.md"])) == []
+
+    @pytest.mark.parametrize(
+        "payload",
+        [
+            pytest.param(_push("refs/heads/other", changed=["nested/deep/test.csv"])),
+            pytest.param(
+                _push(changed=["nested/deep/test.csv"], full_name="fake/other")
+            ),
+            pytest.param(_push(changed=["nested/deep/test.csv"], deleted=True)),
+        ],
+        ids=["other-ref", "other-repo", "deleted"],
+    )
+    def test_not_matched(self, project_version, affected, payload):
+        """
+        :scenario: Pushes to other refs or repos are ignored
+
+        | GIVEN a synced project version tracks a branch
+        | WHEN another branch or repo is pushed, or the branch is deleted
+        | THEN the project version is not affected
+        """
+        assert affected(payload) == []
+
+    @pytest.mark.parametrize(
+        "payload",
+        [
+            pytest.param(_push(forced=True), id="forced"),
+            pytest.param(_push(created=True), id="created"),
+            pytest.param({**_push(), "commits": []}, id="no-commits"),
+        ],
+    )
+    def test_paths_unknown(self, project_version, affected, payload):
+        """
+        :scenario: Pushes which may have changed the BOM affect the project
+                   version
+
+        | GIVEN a synced project version tracks a branch
+        | WHEN the branch is pushed such that the changed paths are unknown
+        | THEN the project version is affected
+        """
+        assert affected(payload) == [project_version.pk]
+
+    def test_tag(self, project_version, affected):
+        """
+        :scenario: Pushed tags affect the project versions using them
+
+        | GIVEN a project version uses a tag
+        | WHEN the tag is pushed
+        | THEN the project version is affected
+        """
+        project_version.commit_ref = "v1"
+        project_version.save()
+        assert affected(_push("refs/tags/v1")) == [project_version.pk]
+
+    def test_never_synced(self, project_version, affected):
+        """
+        :scenario: Pushes affect project versions which were never synced
+
+        | GIVEN a project version tracks a branch and was never synced
+        | WHEN the branch is pushed without a change to the BOM
+        | THEN the project version is affected
+        """
+        project_version.last_synced_commit = None
+        project_version.save()
+        assert affected(_push(changed=["README.md"])) == [project_version.pk]
+
+    def test_git_remote(self, project_factory, project_version_factory, affected):
+        """
+        :scenario: Projects with a git remote are matched by its url
+
+        | GIVEN a project version of a project with a git remote
+        | WHEN a repo with that clone url is pushed with a change to the BOM
+        | THEN the project version is affected
+        """
+        project = project_factory(
+            git_server=m.Project.GitServer.MIRROR,
+            git_remote="https://github.com/fake/renamed.git",
+        )
+        project_version = project_version_factory(project=project)
+        project_version.commit_ref = "main"
+        project_version.save()
+        payload = _push(changed=["nested/deep/test.csv"], full_name="fake/renamed")
+        assert affected(payload) == [project_version.pk]
+        payload = _push(changed=["nested/deep/test.csv"], full_name="fake/fake")
+        assert project_version.pk not in affected(payload)
@@ -108,18 +108,13 @@ class TestVendorPartAdmin:
     def test__populate(
         self, vendor_part, broker, worker, monkeypatch, vendor_part_admin
     ):
-        call_count = 0
-
-        def patched_populate(*args):
-            nonlocal call_count
-            call_count += 1
-
-        monkeypatch.setattr(MouserService, "populate", patched_populate)
+        mock_populate_many = Mock()
+        monkeypatch.setattr(MouserService, "populate_many", mock_populate_many)
         vendor_part_admin._populate(Mock(), m.VendorPart.objects.all())
 
         broker.join("default")
         worker.join()
-        assert call_count == 1
+        mock_populate_many.assert_called_once_with([vendor_part.pk])
 
 
 class TestProjectVersionAdmin:
@@ -137,7 +132,7 @@ class TestProjectVersionAdmin:
     ):
         call_count = 0
 
-        def patched_sync_bom(*args):
+        def patched_sync_bom(*args, **kwargs):
             nonlocal call_count
             call_count += 1
 
@@ -148,6 +143,17 @@ class TestProjectVersionAdmin:
         worker.join()
         assert call_count == 1
 
+    def test_force_sync_bom(
+        self, project_version, project_version_admin, broker, worker, monkeypatch
+    ):
+        mock_sync = Mock()
+        monkeypatch.setattr(ProjectVersionBomService, "sync", mock_sync)
+        project_version_admin.force_sync_bom(Mock(), m.ProjectVersion.objects.all())
+
+        broker.join("default")
+        worker.join()
+        mock_sync.assert_called_once_with(project_version.pk, force=True)
+
 
 class TestProjectBuildAdmin:
     def test_bom_view(self, admin_client, project_build):
@@ -221,7 +227,9 @@ class TestProjectBuildAdmin:
             call_count += 1
 
         monkeypatch.setattr(
-            VendorOrderService, "generate_vendor_orders", patched_generate_vendor_orders
+            VendorOrderService,
+            "generate_vendor_orders_for_builds",
+            patched_generate_vendor_orders,
         )
         project_build_admin._generate_vendor_orders(
             Mock(), m.ProjectBuild.objects.all()
@@ -0,0 +1,146 @@
+from io import StringIO
+from unittest.mock import Mock
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from django_ctb import models as m
+from django_ctb import services as s
+from django_ctb.mouser.services import MouserService
+from django_ctb.ratelimit import RateLimitExceeded
+
+
+class TestRebuildReservedQuantities:
+    """
+    :feature: The reserved quantity of Inventory Lines can be verified and
+              rebuilt from Inventory Actions
+    """
+
+    @pytest.fixture
+    def drifted_line(self, project_build, part, inventory_line_factory):
+        inventory_line = inventory_line_factory(part=part, quantity=10)
+        s.ProjectBuildService()._clear_to_build(project_build)
+        m.InventoryLine.objects.filter(pk=inventory_line.pk).update(reserved_quantity=2)
+        yield inventory_line
+        s.ProjectBuildService()._cancel_build(project_build)
+
+    def test_check__consistent(self, project_build, part, inventory_line_factory):
+        """
+        :scenario: Checking consistent reserved quantities succeeds
+
+        | GIVEN a project build has been cleared
+        | WHEN the rebuild reserved quantities command is run in check mode
+        | THEN the command reports that all reserved quantities match
+        """
+        inventory_line_factory(part=part, quantity=10)
+        s.ProjectBuildService()._clear_to_build(project_build)
+        out = StringIO()
+        call_command("rebuild_reserved_quantities", "--check", stdout=out)
+        assert "All reserved quantities match" in out.getvalue()
+        s.ProjectBuildService()._cancel_build(project_build)
+
+    def test_check__mismatched(self, drifted_line):
+        """
+        :scenario: Checking mismatched reserved quantities fails without
+                   changing them
+
+        | GIVEN an inventory line reserved quantity disagrees with its inventory
+          actions
+        | WHEN the rebuild reserved quantities command is run in check mode
+        | THEN the mismatched inventory line is reported
+        | AND the command fails
+        | AND the reserved quantity is unchanged
+        """
+        out = StringIO()
+        with pytest.raises(CommandError):
+            call_command("rebuild_reserved_quantities", "--check", stdout=out)
+        assert f"Inventory line {drifted_line.pk}" in out.getvalue()
+        drifted_line.refresh_from_db()
+        assert drifted_line.reserved_quantity == 2
+
+    def test_rebuild(self, drifted_line):
+        """
+        :scenario: Mismatched reserved quantities are rebuilt
+
+        | GIVEN an inventory line reserved quantity disagrees with its inventory
+          actions
+        | WHEN the rebuild reserved quantities command is run
+        | THEN the reserved quantity is rebuilt from the inventory actions
+        """
+        out = StringIO()
+        call_command("rebuild_reserved_quantities", stdout=out)
+        assert "Rebuilt 1 inventory line(s)" in out.getvalue()
+        drifted_line.refresh_from_db()
+        assert drifted_line.reserved_quantity == 6
+        assert drifted_line.quantity_on_hand == 10
+
+
+class TestRefreshMouserPrices:
+    """
+    :feature: The prices of Mouser parts with stale cached responses can be
+              refreshed
+    """
+
+    def test_refresh(self, monkeypatch):
+        """
+        :scenario: Stale prices are refreshed
+
+        | GIVEN the responses for some part numbers are stale
+        | WHEN the refresh Mouser prices command is run with a limit
+        | THEN at most that many part numbers are refreshed
+        """
+        mock_refresh = Mock(return_value=3)
+        monkeypatch.setattr(MouserService, "refresh_stale_prices", mock_refresh)
+        out = StringIO()
+        call_command("refresh_mouser_prices", "--limit", "3", stdout=out)
+        mock_refresh.assert_called_once_with(limit=3)
+        assert "Refreshed 3 Mouser part(s)" in out.getvalue()
+
+    def test_refresh__rate_limited(self, monkeypatch):
+        """
+        :scenario: Refreshing fails when the Mouser rate limit is reached
+
+        | GIVEN the Mouser rate limit is reached
+        | WHEN the refresh Mouser prices command is run
+        | THEN the command fails saying when to retry
+        """
+        monkeypatch.setattr(
+            MouserService,
+            "refresh_stale_prices",
+            Mock(side_effect=RateLimitExceeded(retry_after=42)),
+        )
+        with pytest.raises(CommandError, match="retry after 42s"):
+            call_command("refresh_mouser_prices", stdout=StringIO())
+
+
+class TestBuildableQuantities:
+    """
+    :feature: The buildable quantity of Project Versions can be reported
+    """
+
+    def test_report(self, project_part, part, inventory_line_factory):
+        """
+        :scenario: Buildable quantities are reported with their limiting parts
+
+        | GIVEN a project version calls for a part with stock
+        | WHEN the buildable quantities command is run for the project version
+        | THEN the number of builds the stock covers is reported
+        | AND the limiting part is reported
+        """
+        inventory_line_factory(part=part, quantity=7)
+        inventory_line_factory(part=part, quantity=10, is_deprioritized=True)
+        out = StringIO()
+        call_command(
+            "buildable_quantities", str(project_part.project_version_id), stdout=out
+        )
+        assert f"(pk:{project_part.project_version_id}): 3\n" in out.getvalue()
+        assert f"limited by {part}: 2 needed, 7 in stock" in out.getvalue()
+
+        out = StringIO()
+        call_command(
+            "buildable_quantities",
+            str(project_part.project_version_id),
+            "--include-deprioritized",
+            stdout=out,
+        )
+        assert f"(pk:{project_part.project_version_id}): 8\n" in out.getvalue()
@@ -1,7 +1,6 @@
 from unittest.mock import Mock, patch
 
 import pytest
-import requests
 
 from django_ctb.exceptions import RefNotFoundException
 from django_ctb.github.services import GithubService
@@ -19,12 +18,7 @@ class TestGithubService:
               of commit references
     """
 
-    @patch.object(
-        requests,
-        "get",
-        Mock(return_value=Mock(status_code=200, json=lambda: COMMITS_RESPONSE)),
-    )
-    def test__get_commit_hash(self):
+    def test__get_commit_hash(self, http_handler):
         """
         :scenario: Commit hashes will be found when requesting commits
 
@@ -32,17 +26,15 @@ class TestGithubService:
         | WHEN _get_commit_hash is called with the commit hash
         | THEN the commit hash will be returned
         """
+        http_handler.return_value = Mock(
+            status_code=200, json=lambda: COMMITS_RESPONSE, headers={}
+        )
         commit_hash = GithubService()._get_commit_hash(
             url_prefix="asdf", commit_ref="asdf"
         )
         assert commit_hash == "4ddd1280a3a048c6ef0d0463296c636ed7f1c0fe"
 
-    @patch.object(
-        requests,
-        "get",
-        Mock(return_value=Mock(status_code=404, json=lambda: COMMITS_RESPONSE)),
-    )
-    def test__get_commit_hash__missing(self):
+    def test__get_commit_hash__missing(self, http_handler):
         """
         :scenario: Non hash commit refs will not be found by requesting commits
 
@@ -51,15 +43,13 @@ class TestGithubService:
           hash
         | THEN an exception will be raised
         """
+        http_handler.return_value = Mock(
+            status_code=404, json=lambda: COMMITS_RESPONSE, headers={}
+        )
         with pytest.raises(RefNotFoundException):
             GithubService()._get_commit_hash(url_prefix="asdf", commit_ref="asdf")
 
-    @patch.object(
-        requests,
-        "get",
-        Mock(return_value=Mock(status_code=200, json=lambda: BRANCHES_RESPONSE)),
-    )
-    def test__get_branch_head_commit_hash(self):
+    def test__get_branch_head_commit_hash(self, http_handler):
         """
         :scenario: Commit hashes will be found when requesting branches
 
@@ -67,17 +57,15 @@ class TestGithubService:
         | WHEN _get_branch_head_commit_hash is called with the branch name
         | THEN the commit hash will be returned
         """
+        http_handler.return_value = Mock(
+            status_code=200, json=lambda: BRANCHES_RESPONSE, headers={}
+        )
         commit_hash = GithubService()._get_branch_head_commit_hash(
             url_prefix="asdf", commit_ref="asdf"
         )
         assert commit_hash == "69db8442ac20fe9be7998f2a6cd497413062b2af"
 
-    @patch.object(
-        requests,
-        "get",
-        Mock(return_value=Mock(status_code=404, json=lambda: BRANCHES_RESPONSE)),
-    )
-    def test__get_branch_head_commit_hash__missing(self):
+    def test__get_branch_head_commit_hash__missing(self, http_handler):
         """
         :scenario: Non hash commit refs will not be found by requesting commits
 
@@ -86,17 +74,15 @@ class TestGithubService:
           than the branch name
         | THEN an exception will be raised
         """
+        http_handler.return_value = Mock(
+            status_code=404, json=lambda: BRANCHES_RESPONSE, headers={}
+        )
         with pytest.raises(RefNotFoundException):
             GithubService()._get_branch_head_commit_hash(
                 url_prefix="asdf", commit_ref="asdf"
             )
 
-    @patch.object(
-        requests,
-        "get",
-        Mock(return_value=Mock(status_code=200, json=lambda: TAGS_RESPONSE)),
-    )
-    def test__get_tag_commit_hash(self):
+    def test__get_tag_commit_hash(self, http_handler):
         """
         :scenario: Commit hashes will be found when requesting tags
 
@@ -104,6 +90,9 @@ class TestGithubService:
         | WHEN _get_tag_commit_hash is called with the tag name
         | THEN the commit hash will be returned
         """
+        http_handler.return_value = Mock(
+            status_code=200, json=lambda: TAGS_RESPONSE, headers={}
+        )
         commit_hash = GithubService()._get_tag_commit_hash(
             url_prefix="asdf", commit_ref="v1"
         )
@@ -114,12 +103,7 @@ class TestGithubService:
         )
         assert commit_hash == "69db8442ac20fe9be7998f2a6cd497413062b2af"
 
-    @patch.object(
-        requests,
-        "get",
-        Mock(return_value=Mock(status_code=200, json=lambda: TAGS_RESPONSE)),
-    )
-    def test__get_tag_commit_hash__missing_tag(self):
+    def test__get_tag_commit_hash__missing_tag(self, http_handler):
         """
         :scenario: Non hash commit refs will not be found by requesting commits
 
@@ -128,15 +112,16 @@ class TestGithubService:
           than the tag name
         | THEN an exception will be raised
         """
+        http_handler.return_value = Mock(
+            status_code=200, json=lambda: TAGS_RESPONSE, headers={}
+        )
         with pytest.raises(RefNotFoundException):
             GithubService()._get_tag_commit_hash(url_prefix="asdf", commit_ref="v3")
 
-    @patch.object(
-        requests,
-        "get",
-        Mock(return_value=Mock(status_code=404, json=lambda: TAGS_RESPONSE)),
-    )
-    def test__get_tag_commit_hash__wtf_happened(self):
+    def test__get_tag_commit_hash__wtf_happened(self, http_handler):
+        http_handler.return_value = Mock(
+            status_code=404, json=lambda: TAGS_RESPONSE, headers={}
+        )
         with pytest.raises(RefNotFoundException):
             GithubService()._get_tag_commit_hash(url_prefix="asdf", commit_ref="v2")
 
@@ -190,3 +175,145 @@ class TestGithubService:
             GithubService().get_commit_hash_for_ref(
                 user="user", repo="repo", commit_ref="qwerqwer"
             )
+
+
+class TestGithubServiceCache:
+    """
+    :feature: Resolved commit references are cached so that syncing many
+              project versions makes few requests to Github
+    """
+
+    url_prefix = "https://api.github.com/repos/user/repo"
+    sha = "4ddd1280a3a048c6ef0d0463296c636ed7f1c0fe"
+
+    @pytest.fixture
+    def now(self, monkeypatch):
+        now = [1_000_000.0]
+        monkeypatch.setattr(
+            "django_ctb.github.services.time", Mock(time=lambda: now[0])
+        )
+        return now
+
+    @pytest.fixture
+    def github(self, http_handler):
+        """Github stand-in serving ``responses`` (path -> status, data)"""
+        responses = {}
+
+        def _respond(method, url, *, headers, **kwargs):
+            path = url.removeprefix(self.url_prefix)
+            status, data = responses.get(path, (404, {}))
+            etag = f'"{hash(str(data))}"'
+            if headers.get("If-None-Match") == etag:
+                status = 304
+            return Mock(status_code=status, json=lambda: data, headers={"ETag": etag})
+
+        http_handler.side_effect = _respond
+        http_handler.responses = responses
+        return http_handler
+
+    def _paths(self, github):
+        return [
+            _call.args[1].removeprefix(self.url_prefix)
+            for _call in github.call_args_list
+        ]
+
+    def test_commit_hash_cached_forever(self, github, now):
+        """
+        :scenario: Full commit hashes are resolved once
+
+        | GIVEN a commit ref is a full commit hash
+        | WHEN the commit hash is resolved repeatedly, long apart
+        | THEN Github is requested only once
+        """
+        github.responses[f"/commits/{self.sha}"] = (200, {"sha": self.sha})
+        for _ in range(3):
+            ret = GithubService().get_commit_hash_for_ref(
+                user="user", repo="repo", commit_ref=self.sha
+            )
+            assert ret == self.sha
+            now[0] += 60 * 60 * 24 * 365
+        assert self._paths(github) == [f"/commits/{self.sha}"]
+
+    def test_branch_revalidated(self, github, now):
+        """
+        :scenario: Branches are trusted for a while, then revalidated
+
+        | GIVEN a commit ref is a branch name
+        | WHEN the branch is resolved twice within the ref TTL
+        | THEN Github is requested for the branch once
+        | WHEN the branch is resolved after the ref TTL
+        | THEN the branch is revalidated (not modified) with its ETag
+        | WHEN the branch moves and is resolved after the ref TTL
+        | THEN the new head commit hash is returned
+        """
+        github.responses["/branches/main"] = (200, BRANCHES_RESPONSE)
+        branch_sha = BRANCHES_RESPONSE["commit"]["sha"]
+        service = GithubService()
+
+        def _resolve():
+            return service.get_commit_hash_for_ref(
+                user="user", repo="repo", commit_ref="main"
+            )
+
+        assert _resolve() == branch_sha
+        assert _resolve() == branch_sha
+        assert self._paths(github) == ["/commits/main", "/branches/main"]
+
+        github.reset_mock()
+        now[0] += 61
+        assert _resolve() == branch_sha
+        assert self._paths(github) == ["/branches/main"]
+        assert github.call_args.kwargs["headers"]["If-None-Match"]
+
+        github.reset_mock()
+        now[0] += 61
+        github.responses["/branches/main"] = (200, {"commit": {"sha": self.sha}})
+        assert _resolve() == self.sha
+        assert self._paths(github) == ["/branches/main"]
+
+    def test_branch_deleted(self, github, now):
+        """
+        :scenario: Refs which no longer resolve are not served from the cache
+
+        | GIVEN a branch has been resolved
+        | AND the branch has been deleted
+        | WHEN the branch is resolved after the ref TTL
+        | THEN an exception will be raised
+        """
+        github.responses["/branches/main"] = (200, BRANCHES_RESPONSE)
+        GithubService().get_commit_hash_for_ref(
+            user="user", repo="repo", commit_ref="main"
+        )
+        del github.responses["/branches/main"]
+        now[0] += 61
+        with pytest.raises(RefNotFoundException):
+            GithubService().get_commit_hash_for_ref(
+                user="user", repo="repo", commit_ref="main"
+            )
+
+    def test_many_tags(self, github, now):
+        """
+        :scenario: Many tags of one repo share the tag list
+
+        | GIVEN several project versions refer to tags of one repo
+        | WHEN every tag is resolved, twice
+        | THEN the tag list is requested once
+        | AND each tag is resolved without further requests after the first time
+        """
+        github.responses["/tags"] = (200, TAGS_RESPONSE)
+        for _ in range(2):
+            for tag, sha in (
+                ("v1", "4ddd1280a3a048c6ef0d0463296c636ed7f1c0fe"),
+                ("v2", "69db8442ac20fe9be7998f2a6cd497413062b2af"),
+            ):
+                ret = GithubService().get_commit_hash_for_ref(
+                    user="user", repo="repo", commit_ref=tag
+                )
+                assert ret == sha
+        assert self._paths(github) == [
+            "/commits/v1",
+            "/branches/v1",
+            "/tags",
+            "/commits/v2",
+            "/branches/v2",
+        ]
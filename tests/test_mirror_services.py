@@ -0,0 +1,328 @@
+import hashlib
+import subprocess
+import threading
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from django_ctb import models as m
+from django_ctb import services as s
+from django_ctb.exceptions import RefNotFoundException
+from django_ctb.mirror.services import GitMirrorService
+
+BOM = b"""Qty,Reference,Footprint,Value
+3,"A1, A2, A3","Test Footprint","asdf"
+"""
+
+
+class Upstream:
+    """A local repository standing in for the remote of a project"""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.mkdir()
+        self.git("init", "--quiet", "--initial-branch=main")
+
+    def git(self, *args):
+        return subprocess.run(
+            [
+                "git",
+                "-C",
+                str(self.path),
+                "-c",
+                "user.name=test",
+                "-c",
+                "user.email=test@test.test",
+                *args,
+            ],
+            capture_output=True,
+            check=True,
+        ).stdout.decode()
+
+    def commit(self, files):
+        for name, content in files.items():
+            (self.path / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.path / name).write_bytes(content)
+        self.git("add", "--all")
+        self.git("commit", "--quiet", "--message", "commit")
+        return self.git("rev-parse", "HEAD").strip()
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    return Upstream(tmp_path / "upstream")
+
+
+@pytest.fixture
+def mirror_root(tmp_path, settings):
+    settings.CTB_GIT_MIRROR_ROOT = str(tmp_path / "mirrors")
+    return tmp_path / "mirrors"
+
+
+class TestGitMirrorService:
+    """
+    :feature: Projects with a local mirror git server resolve commit refs and
+              read files from a bare mirror of the repo
+    """
+
+    def test_get_commit_hash_for_ref(self, upstream, mirror_root):
+        """
+        :scenario: Commit hashes, branches, and tags are resolved from the mirror
+
+        | GIVEN a repo has commits, a branch, and a tag
+        | WHEN each commit ref is resolved
+        | THEN the mirror is cloned
+        | AND the commit hash of each ref is returned
+        """
+        first = upstream.commit({"test.csv": BOM})
+        upstream.git("tag", "v1")
+        second = upstream.commit({"test.csv": BOM + b"1,B1,Other,zxcv\n"})
+        service = GitMirrorService()
+        remote = str(upstream.path)
+        for commit_ref, commit_hash in (
+            ("main", second),
+            ("v1", first),
+            (first, first),
+            (first[:10], first),
+        ):
+            assert (
+                service.get_commit_hash_for_ref(remote=remote, commit_ref=commit_ref)
+                == commit_hash
+            )
+        assert service.mirror_path(remote).parent == mirror_root
+
+    @pytest.mark.parametrize("commit_ref", ["nope", "-v", "0" * 40, ""])
+    def test_get_commit_hash_for_ref__missing(self, upstream, mirror_root, commit_ref):
+        """
+        :scenario: Unknown commit refs are not found
+
+        | GIVEN a repo has been mirrored
+        | WHEN a commit ref which is not in the repo is resolved
+        | THEN an exception will be raised
+        """
+        upstream.commit({"test.csv": BOM})
+        with pytest.raises(RefNotFoundException):
+            GitMirrorService().get_commit_hash_for_ref(
+                remote=str(upstream.path), commit_ref=commit_ref
+            )
+
+    def test_get_commit_hash_for_ref__bad_remote(self, tmp_path, mirror_root):
+        """
+        :scenario: Refs of repos which cannot be cloned are not found
+
+        | GIVEN a repo cannot be cloned
+        | WHEN a commit ref is resolved
+        | THEN an exception will be raised
+        """
+        with pytest.raises(RefNotFoundException):
+            GitMirrorService().get_commit_hash_for_ref(
+                remote=str(tmp_path / "missing"), commit_ref="main"
+            )
+
+    def test_get_commit_hash_for_ref__timeout(self, upstream, mirror_root, monkeypatch):
+        """
+        :scenario: Refs of repos which do not answer in time are not found
+
+        | GIVEN cloning a repo takes longer than the git timeout
+        | WHEN a commit ref is resolved
+        | THEN git is run without prompting and with the timeout
+        | AND an exception will be raised
+        | AND no partial mirror is left behind
+        """
+        upstream.commit({"test.csv": BOM})
+        calls = []
+
+        def _run(command, **kwargs):
+            calls.append((command, kwargs))
+            # the clone is stopped part way through
+            Path(command[-1]).mkdir(parents=True)
+            raise subprocess.TimeoutExpired(command, kwargs["timeout"])
+
+        monkeypatch.setattr(subprocess, "run", _run)
+        service = GitMirrorService(timeout=5)
+        with pytest.raises(RefNotFoundException):
+            service.get_commit_hash_for_ref(
+                remote=str(upstream.path), commit_ref="main"
+            )
+        command, kwargs = calls[0]
+        assert command[:2] == ["git", "clone"]
+        assert kwargs["timeout"] == 5
+        assert kwargs["env"]["GIT_TERMINAL_PROMPT"] == "0"
+        assert kwargs["env"]["GIT_SSH_COMMAND"] == "ssh -oBatchMode=yes"
+        assert not service.mirror_path(str(upstream.path)).exists()
+
+    def test_incremental_fetch(self, upstream, mirror_root):
+        """
+        :scenario: Mirrors are refreshed at most once per fetch interval
+
+        | GIVEN a repo has been mirrored
+        | AND a branch has since moved
+        | WHEN the branch is resolved within the fetch interval
+        | THEN the mirrored commit hash is returned
+        | WHEN the branch is resolved after the fetch interval
+        | THEN the mirror is fetched
+        | AND the new commit hash is returned
+        """
+        first = upstream.commit({"test.csv": BOM})
+        remote = str(upstream.path)
+        GitMirrorService().get_commit_hash_for_ref(remote=remote, commit_ref="main")
+        second = upstream.commit({"test.csv": BOM + b"1,B1,Other,zxcv\n"})
+        assert (
+            GitMirrorService(fetch_interval=3600).get_commit_hash_for_ref(
+                remote=remote, commit_ref="main"
+            )
+            == first
+        )
+        assert (
+            GitMirrorService(fetch_interval=0).get_commit_hash_for_ref(
+                remote=remote, commit_ref="main"
+            )
+            == second
+        )
+
+    def test_incremental_fetch__new_ref(self, upstream, mirror_root):
+        """
+        :scenario: New refs are found within the fetch interval
+
+        | GIVEN a repo has been mirrored
+        | AND a tag has since been added
+        | WHEN the tag is resolved within the fetch interval
+        | THEN the mirror is fetched
+        | AND the commit hash of the tag is returned
+        """
+        first = upstream.commit({"test.csv": BOM})
+        remote = str(upstream.path)
+        service = GitMirrorService(fetch_interval=3600)
+        service.get_commit_hash_for_ref(remote=remote, commit_ref="main")
+        upstream.git("tag", "v2")
+        assert service.get_commit_hash_for_ref(remote=remote, commit_ref="v2") == first
+
+    def test_update__file_lock(self, upstream, mirror_root):
+        """
+        :scenario: Mirrors are not cloned while another process holds the lock
+
+        | GIVEN another process holds the lock of a mirror
+        | WHEN the mirror is updated
+        | THEN the update waits until the lock is released
+        | AND the mirror is then cloned
+        """
+        fcntl = pytest.importorskip("fcntl")
+        upstream.commit({"test.csv": BOM})
+        service = GitMirrorService()
+        remote = str(upstream.path)
+        path = service.mirror_path(remote)
+        mirror_root.mkdir()
+        with open(path.with_name(f"{path.name}.lock"), "wb") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            thread = threading.Thread(target=service.update, args=(remote,))
+            thread.start()
+            thread.join(timeout=0.5)
+            assert thread.is_alive()
+            assert not path.exists()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+        assert path.exists()
+
+    def test_historical_commit(self, upstream, mirror_root, tmp_path):
+        """
+        :scenario: Mirrored commits are read without the remote
+
+        | GIVEN a repo has been mirrored
+        | AND the remote is no longer reachable
+        | WHEN a mirrored commit hash is resolved and its BOM is read
+        | THEN the commit hash and BOM are returned from the mirror
+        """
+        first = upstream.commit({"nested/test.csv": BOM})
+        upstream.commit({"nested/test.csv": b"changed"})
+        remote = str(upstream.path)
+        service = GitMirrorService(fetch_interval=0)
+        service.update(remote)
+        upstream.path.rename(tmp_path / "gone")
+        assert service.get_commit_hash_for_ref(remote=remote, commit_ref=first) == first
+        assert (
+            service.read_file(remote=remote, commit_hash=first, path="/nested/test.csv")
+            == BOM
+        )
+
+    def test_read_file__missing(self, upstream, mirror_root):
+        """
+        :scenario: Missing files cannot be read
+
+        | GIVEN a repo has been mirrored
+        | WHEN a file which is not in the commit is read
+        | THEN an exception will be raised
+        """
+        first = upstream.commit({"test.csv": BOM})
+        remote = str(upstream.path)
+        GitMirrorService().update(remote)
+        with pytest.raises(GitMirrorService.GitError):
+            GitMirrorService().read_file(
+                remote=remote, commit_hash=first, path="missing.csv"
+            )
+
+    def test_sync(
+        self,
+        upstream,
+        mirror_root,
+        project_factory,
+        project_version_factory,
+        project_part_factory,
+        part,
+        monkeypatch,
+    ):
+        """
+        :scenario: Project versions of local mirror projects are synced from
+                   the mirror
+
+        | GIVEN a project uses a local mirror of its repo
+        | WHEN a project version is synced
+        | THEN the BOM is read from the mirror at the resolved commit
+        | AND the commit hash is saved on the project version
+        """
+        project = project_factory(
+            git_server=m.Project.GitServer.MIRROR, git_remote=str(upstream.path)
+        )
+        project_version = project_version_factory(project=project)
+        commit_hash = upstream.commit({"nested/deep/test.csv": BOM})
+        upstream.git("tag", "v0")
+        monkeypatch.setattr(
+            s.ProjectVersionBomService,
+            "_sync_row",
+            Mock(return_value=project_part_factory(project_version=project_version)),
+        )
+        s.ProjectVersionBomService().sync(project_version_pk=project_version.pk)
+        project_version.refresh_from_db()
+        assert project_version.last_synced_commit == commit_hash
+        assert project_version.bom_hash == hashlib.sha256(BOM).hexdigest()
+
+    def test_sync__missing_bom(
+        self, upstream, mirror_root, project_factory, project_version_factory
+    ):
+        """
+        :scenario: Project versions whose BOM is not in the commit are not
+                   synced
+
+        | GIVEN a project uses a local mirror of its repo
+        | AND the commit has no file at the BOM path of a project version
+        | WHEN the project version is synced
+        | THEN the sync is aborted without raising
+        | AND the project version is not marked synced
+        | AND diffing the project version at the commit raises an exception
+        """
+        project = project_factory(
+            git_server=m.Project.GitServer.MIRROR, git_remote=str(upstream.path)
+        )
+        project_version = project_version_factory(project=project)
+        upstream.commit({"elsewhere.csv": BOM})
+        upstream.git("tag", "v0")
+        assert (
+            s.ProjectVersionBomService().sync(project_version_pk=project_version.pk)
+            is None
+        )
+        project_version.refresh_from_db()
+        assert project_version.last_synced_commit is None
+        assert project_version.synced is None
+        with pytest.raises(RefNotFoundException):
+            s.BomDiffService().diff(project_version.pk, commit_ref="v0")
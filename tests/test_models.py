@@ -3,6 +3,7 @@ import datetime
 import pytest
 from django.utils import timezone
 
+from django_ctb import models as m
 from django_ctb.models import BillOfMaterialsRow
 
 
@@ -14,6 +15,132 @@ class TestPartModel:
         assert vendor_part.part.unit_cost == pytest.approx(0.01)
 
 
+class TestPartEquivalenceClass:
+    """
+    :feature: Parts linked as equivalent share an equivalence class
+    """
+
+    def test_new_part(self, part):
+        """
+        :scenario: A Part with no equivalents is in a class of its own
+
+        | GIVEN a part is created with no equivalent part
+        | THEN the equivalence class of the part is its own id
+        """
+        assert part.equivalence_class == part.pk
+        part.refresh_from_db()
+        assert part.equivalence_class == part.pk
+
+    def test_chain(self, part, part_factory):
+        """
+        :scenario: Parts equivalent at any depth share an equivalence class
+
+        | GIVEN a chain of parts each equivalent to the one before
+        | AND a branch of parts equivalent to a part in the middle of the chain
+        | THEN every part in the chain and the branch shares the equivalence
+          class of the first part
+        """
+        chain = [part]
+        for idx in range(8):
+            chain.append(
+                part_factory(name=f"c{idx}", symbol=f"C{idx}", equivalent_to=chain[-1])
+            )
+        branch = part_factory(name="branch", symbol="B", equivalent_to=chain[4])
+        assert set(
+            m.Part.objects.filter(equivalence_class=part.pk).values_list(
+                "pk", flat=True
+            )
+        ) == {p.pk for p in chain} | {branch.pk}
+
+    def test_merge(self, part, part_factory):
+        """
+        :scenario: Linking two groups of equivalent parts merges their classes
+
+        | GIVEN two separate groups of equivalent parts
+        | WHEN a part of the second group is made equivalent to a part of the
+          first group
+        | THEN every part of both groups shares the lower equivalence class
+        """
+        first = part_factory(name="first", symbol="F", equivalent_to=part)
+        other = part_factory(name="other", symbol="O")
+        second = part_factory(name="second", symbol="S", equivalent_to=other)
+        assert second.equivalence_class == other.pk
+        other.equivalent_to = first
+        other.save()
+        assert m.Part.objects.filter(equivalence_class=part.pk).count() == 4
+
+    def test_split(self, part, part_factory):
+        """
+        :scenario: Unlinking a part splits the equivalence class
+
+        | GIVEN a chain of three equivalent parts
+        | WHEN the last part in the chain is no longer equivalent to the middle
+          part
+        | THEN the last part is in a class of its own
+        | AND the other parts keep their class
+        """
+        middle = part_factory(name="middle", symbol="M", equivalent_to=part)
+        last = part_factory(name="last", symbol="L", equivalent_to=middle)
+        last.equivalent_to = None
+        last.save()
+        last.refresh_from_db()
+        middle.refresh_from_db()
+        assert last.equivalence_class == last.pk
+        assert middle.equivalence_class == part.pk
+
+    def test_save_stale(self, part_factory):
+        """
+        :scenario: Saving a stale part keeps its current equivalence class
+
+        | GIVEN a part is loaded
+        | AND another part is then made equivalent to it
+        | WHEN the stale copy of the first part is changed and saved
+        | THEN both parts still share an equivalence class
+        """
+        first = part_factory(name="first", symbol="F")
+        second = part_factory(name="second", symbol="S")
+        stale = m.Part.objects.get(pk=second.pk)
+        first.equivalent_to = second
+        first.save()
+        stale.name = "renamed"
+        stale.save()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert second.name == "renamed"
+        assert second.equivalence_class == first.equivalence_class == first.pk
+
+    def test_delete(self, part, part_factory):
+        """
+        :scenario: Deleting a part splits the equivalence class
+
+        | GIVEN a chain of three equivalent parts
+        | WHEN the middle part is deleted
+        | THEN the first and last parts are each in a class of their own
+        """
+        middle = m.Part.objects.create(name="middle", symbol="M", equivalent_to=part)
+        last = part_factory(name="last", symbol="L", equivalent_to=middle)
+        middle.delete()
+        last.refresh_from_db()
+        part.refresh_from_db()
+        assert last.equivalence_class == last.pk
+        assert part.equivalence_class == part.pk
+
+    def test_rebuild(self, part, part_factory):
+        """
+        :scenario: Equivalence classes can be rebuilt after bulk changes
+
+        | GIVEN parts are linked as equivalent with a bulk update
+        | WHEN the equivalence classes of all parts are rebuilt
+        | THEN the linked parts share an equivalence class
+        """
+        other = part_factory(name="other", symbol="O")
+        m.Part.objects.filter(pk=other.pk).update(equivalent_to=part)
+        classes = m.Part.objects.all().rebuild_equivalence_classes()
+        assert classes[other.pk] == part.pk
+        other.refresh_from_db()
+        assert other.equivalence_class == part.pk
+
+
 class TestProjectPartModel:
     """
     :feature: Project Parts represent data from a Bill of Materials
@@ -91,6 +218,55 @@ class TestProjectVersionModel:
         project_version.refresh_from_db()
         assert float(project_version.total_cost) == pytest.approx(15.25)
 
+    @pytest.fixture
+    def costed_version(
+        self, project_version, part_factory, project_part_factory, vendor_part_factory
+    ):
+        for idx in range(5):
+            part = part_factory(name=f"costed {idx}", symbol=f"C{idx}")
+            for cost in (0.25 + idx, 0.05 * (idx + 1), 3.5):
+                vendor_part_factory(part=part, cost=cost, item_number=f"{idx}-{cost}")
+            project_part_factory(
+                part=part, project_version=project_version, line_number=idx, quantity=3
+            )
+        # lines without a part or without a vendor cost
+        project_part_factory(part=None, project_version=project_version, line_number=5)
+        project_part_factory(
+            part=part_factory(name="uncosted", symbol="U"),
+            project_version=project_version,
+            line_number=6,
+        )
+        return project_version
+
+    def test_with_costs(self, costed_version, django_assert_num_queries):
+        """
+        :scenario: Project Version costs can be rolled up with a fixed number
+                   of queries
+
+        | GIVEN a project version has several project parts
+        | AND the parts have several vendor parts with different costs
+        | WHEN the project versions are queried with costs
+        | THEN the total cost and line costs match the unannotated costs
+        | AND no further queries are made to read the costs
+        """
+        expected_total = costed_version.total_cost
+        expected_lines = {
+            project_part.pk: (project_part.unit_cost, project_part.line_cost)
+            for project_part in costed_version.project_parts.all()
+        }
+        with django_assert_num_queries(2):
+            project_version = m.ProjectVersion.objects.with_costs().get(
+                pk=costed_version.pk
+            )
+            assert project_version.total_cost == pytest.approx(expected_total)
+            for project_part in project_version.project_parts.all():
+                unit_cost, line_cost = expected_lines[project_part.pk]
+                assert project_part.unit_cost == pytest.approx(unit_cost)
+                assert project_part.line_cost == pytest.approx(line_cost)
+        assert expected_total == pytest.approx(
+            14.23 + 3 * sum(0.05 * (idx + 1) for idx in range(5))
+        )
+
     def test_bom_url(self, project_version):
         """
         :scenario: Project Version Bills of Material will be found from Project
@@ -108,6 +284,30 @@ class TestProjectVersionModel:
             == "https://github.com/fake/fake/raw/asdfasdf/nested/deep/test.csv"
         )
 
+    def test_bom_path_change_clears_bom_hash(self, project_version):
+        """
+        :scenario: Changing the BOM path forgets the hash of the old BOM
+
+        | GIVEN a project version has been synced
+        | WHEN it is saved with an unchanged BOM path
+        | THEN the BOM hash is kept
+        | WHEN its BOM path is changed and saved
+        | THEN the BOM hash is cleared
+        """
+        project_version.last_synced_commit = "asdfasdf"
+        project_version.bom_hash = "somehash"
+        project_version.save()
+        project_version = m.ProjectVersion.objects.get(pk=project_version.pk)
+        project_version.pcb_cost = 3
+        project_version.save()
+        project_version.refresh_from_db()
+        assert project_version.bom_hash == "somehash"
+        project_version.bom_path = "other.csv"
+        project_version.save(update_fields=["bom_path"])
+        project_version.refresh_from_db()
+        assert project_version.bom_hash is None
+        assert project_version.last_synced_commit == "asdfasdf"
+
 
 class TestInventoryLineModel:
     """
@@ -161,6 +361,7 @@ class TestInventoryLineModel:
           inventory line for which the build is cleared
         | AND some number of "build" inventory actions associated to the given
           inventory line for which the build is completed
+        | AND the reserved quantities have been rebuilt from the inventory actions
         | WHEN the on hand count is gotten from the given inventory line
         | THEN the number will be the positive quanity on the inventory line less
             the quanitiy indicated by all build actions which are not completed
@@ -201,6 +402,9 @@ class TestInventoryLineModel:
             delta=-27,
             reservation=project_build_part_reservation_factory(utilized=timezone.now()),
         )
+        m.InventoryLine.objects.rebuild_reserved_quantities()
+        inventory_line.refresh_from_db()
+        assert inventory_line.reserved_quantity == 11 + 13 + 17 + 19
         assert inventory_line.quantity_on_hand == 300 + 11 + 13 + 17 + 19
 
 
@@ -0,0 +1,370 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from django_ctb import ratelimit
+from django_ctb.mouser.client import MouserClient
+from django_ctb.mouser.services import (
+    MouserService,
+    populate_mouser_vendor_part,
+    populate_mouser_vendor_parts,
+)
+from django_ctb.ratelimit import (
+    CacheRateLimitBackend,
+    Limit,
+    LocalRateLimitBackend,
+    RateLimiter,
+    RateLimitExceeded,
+    RedisRateLimitBackend,
+    get_rate_limit_backend,
+)
+
+from .mouser.data import get_part_response
+from .mouser.test_client import FakeResponse
+
+
+class Clock:
+    """Stands in for the ``time`` module; sleeping moves the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+class TestRateLimiter:
+    """
+    :feature: Calls to external APIs are limited across every worker
+    """
+
+    @pytest.mark.parametrize(
+        "backend",
+        [LocalRateLimitBackend, CacheRateLimitBackend],
+        ids=["local", "cache"],
+    )
+    def test_acquire(self, clock, backend):
+        """
+        :scenario: Calls beyond the limit wait for the limit to allow them
+
+        | GIVEN a limit of three calls per minute
+        | WHEN three calls are made
+        | THEN the calls are made without waiting
+        | WHEN another call is made
+        | THEN the call waits until the limit allows another call
+        """
+        limiter = RateLimiter("test", [Limit(calls=3, period=60)], backend=backend())
+        for _ in range(3):
+            limiter.acquire()
+        assert clock.slept == []
+        limiter.acquire()
+        assert clock.slept == [pytest.approx(20)]
+
+    def test_acquire__max_wait(self, clock):
+        """
+        :scenario: Callers which cannot wait long enough are told when to retry
+
+        | GIVEN the limit has been reached
+        | WHEN a call is made which will not wait long enough
+        | THEN an exception is raised saying when to retry
+        | AND the call is not counted
+        """
+        limiter = RateLimiter(
+            "test", [Limit(calls=1, period=60)], backend=LocalRateLimitBackend()
+        )
+        limiter.acquire()
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            limiter.acquire(max_wait=10)
+        assert excinfo.value.retry_after == pytest.approx(60)
+        clock.now += 60
+        limiter.acquire(max_wait=0)
+
+    def test_acquire__every_limit(self, clock):
+        """
+        :scenario: Every limit is respected
+
+        | GIVEN a limit per minute and a stricter limit per day
+        | WHEN the daily limit has been reached
+        | THEN calls wait for the daily limit
+        """
+        limiter = RateLimiter(
+            "test",
+            [Limit(calls=30, period=60), Limit(calls=2, period=60 * 60 * 24)],
+            backend=LocalRateLimitBackend(),
+        )
+        limiter.acquire()
+        limiter.acquire()
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            limiter.acquire(max_wait=60)
+        assert excinfo.value.retry_after == pytest.approx(60 * 60 * 12)
+
+    def test_acquire__no_limit(self, clock):
+        """
+        :scenario: Limits of zero calls are ignored
+
+        | GIVEN a limit of zero calls
+        | WHEN many calls are made
+        | THEN the calls are made without waiting
+        """
+        limiter = RateLimiter(
+            "test", [Limit(calls=0, period=60)], backend=LocalRateLimitBackend()
+        )
+        for _ in range(100):
+            limiter.acquire(max_wait=0)
+        assert clock.slept == []
+
+    def test_acquire__shared(self):
+        """
+        :scenario: Workers sharing a backend share the limit
+
+        | GIVEN a limit of five calls per minute kept in the Django cache
+        | WHEN twenty workers make a call at once without waiting
+        | THEN five calls are made
+        | AND the others are told when to retry
+        """
+        made, limited = [], []
+
+        def _worker():
+            limiter = RateLimiter(
+                "test", [Limit(calls=5, period=60)], backend=CacheRateLimitBackend()
+            )
+            try:
+                limiter.acquire(max_wait=0)
+                made.append(1)
+            except RateLimitExceeded:
+                limited.append(1)
+
+        threads = [threading.Thread(target=_worker) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (len(made), len(limited)) == (5, 15)
+
+    @pytest.fixture
+    def redis_backend(self, monkeypatch, settings):
+        redis = pytest.importorskip("redis")
+        fakeredis = pytest.importorskip("fakeredis")
+        from_url = Mock(return_value=fakeredis.FakeRedis())
+        monkeypatch.setattr(redis.Redis, "from_url", from_url)
+        backend = RedisRateLimitBackend()
+        from_url.assert_called_once_with(settings.CTB_RATE_LIMIT_REDIS_URL)
+        return backend
+
+    def test_acquire__redis(self, clock, redis_backend):
+        """
+        :scenario: Limits can be kept in Redis
+
+        | GIVEN a limit of three calls per minute kept in Redis
+        | WHEN four calls are made
+        | THEN the last call waits until the limit allows another call
+        """
+        limiter = RateLimiter(
+            "test", [Limit(calls=3, period=60)], backend=redis_backend
+        )
+        for _ in range(4):
+            limiter.acquire()
+        assert clock.slept == [pytest.approx(20)]
+
+    def test_acquire__redis_multiple_limits(self, clock, redis_backend):
+        """
+        :scenario: Every limit kept in Redis is respected
+
+        | GIVEN limits of two calls per second and three calls per minute
+          kept in Redis
+        | WHEN four calls are made
+        | THEN the third call waits for the per second limit
+        | AND the fourth call waits for the per minute limit
+        | AND calls are refused rather than wait longer than allowed
+        """
+        limiter = RateLimiter(
+            "test",
+            [Limit(calls=2, period=1), Limit(calls=3, period=60)],
+            backend=redis_backend,
+        )
+        for _ in range(4):
+            limiter.acquire()
+        assert clock.slept == [pytest.approx(0.5), pytest.approx(19.5)]
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire(max_wait=1)
+
+    def test_cache_not_shared(self, settings, tmp_path, caplog):
+        """
+        :scenario: Caches which are not shared by the workers are warned about
+
+        | GIVEN the rate limit cache is a local memory cache
+        | WHEN the cache backend is built
+        | THEN a warning is logged
+        | GIVEN the rate limit cache is shared (e.g. file based)
+        | WHEN the cache backend is built
+        | THEN no warning is logged
+        """
+        settings.CACHES = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "shared": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": str(tmp_path),
+            },
+        }
+        settings.CTB_RATE_LIMIT_CACHE = "default"
+        with caplog.at_level("WARNING", logger="django_ctb.ratelimit"):
+            CacheRateLimitBackend()
+        assert "not shared" in caplog.text
+        caplog.clear()
+        settings.CTB_RATE_LIMIT_CACHE = "shared"
+        with caplog.at_level("WARNING", logger="django_ctb.ratelimit"):
+            CacheRateLimitBackend()
+        assert caplog.text == ""
+
+    def test_backend_setting(self, settings):
+        """
+        :scenario: The backend is configurable
+
+        | GIVEN the rate limit backend setting is changed
+        | WHEN the shared backend is used
+        | THEN it is built from the setting
+        """
+        settings.CTB_RATE_LIMIT_BACKEND = "django_ctb.ratelimit.LocalRateLimitBackend"
+        assert isinstance(get_rate_limit_backend(), LocalRateLimitBackend)
+        settings.CTB_RATE_LIMIT_BACKEND = "django_ctb.ratelimit.CacheRateLimitBackend"
+        assert isinstance(get_rate_limit_backend(), CacheRateLimitBackend)
+
+
+class TestMouserRateLimit:
+    """
+    :feature: Calls to the Mouser API respect Mouser's call limits
+    """
+
+    def test_client(self, settings, http_handler):
+        """
+        :scenario: The Mouser client does not call beyond the limit
+
+        | GIVEN the Mouser per minute limit has been reached
+        | WHEN a part is looked up
+        | THEN the Mouser API is not called
+        | AND an exception is raised saying when to retry
+        """
+        settings.CTB_MOUSER_CALLS_PER_MINUTE = 1
+        settings.CTB_MOUSER_RATE_LIMIT_MAX_WAIT = 0
+        http_handler.return_value = FakeResponse(get_part_response)
+        MouserClient().get_part("863-BAT54SLT1G")
+        with pytest.raises(RateLimitExceeded):
+            MouserClient().get_part("863-BAT54SLT1G")
+        assert http_handler.call_count == 1
+
+    def test_populate_requeued(self, broker, worker, monkeypatch):
+        """
+        :scenario: Rate limited vendor parts are populated later
+
+        | GIVEN the Mouser limit has been reached
+        | WHEN a task populating a vendor part runs
+        | THEN the task is requeued
+        | AND the vendor part is populated when it runs again
+        """
+        mock_populate = Mock(side_effect=[RateLimitExceeded(retry_after=0.01), None])
+        monkeypatch.setattr(MouserService, "populate", mock_populate)
+        populate_mouser_vendor_part.send(1234)
+
+        broker.join("default")
+        worker.join()
+        assert mock_populate.call_count == 2
+
+    def test_populate_requeued__mouser_rate_limited(
+        self, settings, http_handler, broker, worker, monkeypatch
+    ):
+        """
+        :scenario: A call which Mouser rate limits takes one call from the
+                   limit and is requeued
+
+        | GIVEN the Mouser limit allows two more calls
+        | AND Mouser rate limits the first call
+        | WHEN a task populating a vendor part runs
+        | THEN the Mouser API is called once and the call is not retried
+        | AND the task is requeued and the vendor part looked up again
+        | AND no call is left within the limit
+        """
+        settings.CTB_MOUSER_CALLS_PER_MINUTE = 2
+        settings.CTB_MOUSER_RATE_LIMIT_MAX_WAIT = 0
+        http_handler.side_effect = [
+            FakeResponse("", status_code=429, headers={"Retry-After": "0"}),
+            FakeResponse(get_part_response),
+        ]
+        mock_populate = Mock(
+            side_effect=lambda pk: MouserClient().get_part("863-BAT54SLT1G")
+        )
+        monkeypatch.setattr(MouserService, "populate", mock_populate)
+        populate_mouser_vendor_part.send(1234)
+
+        broker.join("default")
+        worker.join()
+        assert mock_populate.call_count == 2
+        assert http_handler.call_count == 2
+        with pytest.raises(RateLimitExceeded):
+            MouserClient().get_part("863-BAT54SLT1G")
+        assert http_handler.call_count == 2
+
+    def test_populate_many__rate_limited(
+        self, monkeypatch, vendor_mouser, part, vendor_part_factory
+    ):
+        """
+        :scenario: Vendor parts left when the limit is reached are reported
+
+        | GIVEN the Mouser limit allows one more call
+        | WHEN more vendor parts are populated than one call can look up
+        | THEN the first batch of vendor parts is looked up
+        | AND an exception is raised listing the vendor parts left
+        """
+        vendor_parts = [
+            vendor_part_factory(
+                part=part, vendor=vendor_mouser, item_number=f"233-PART{idx}"
+            )
+            for idx in range(12)
+        ]
+        get_parts = Mock(side_effect=[{}, RateLimitExceeded(retry_after=30)])
+        monkeypatch.setattr(MouserClient, "get_parts", get_parts)
+        with pytest.raises(MouserService.RateLimited) as excinfo:
+            MouserService().populate_many([vp.pk for vp in vendor_parts])
+        assert len(list(get_parts.call_args_list[0].args[0])) == 10
+        assert excinfo.value.retry_after == 30
+        assert excinfo.value.vendor_part_pks == [vp.pk for vp in vendor_parts[10:]]
+
+    def test_populate_many_requeued(self, broker, worker, monkeypatch):
+        """
+        :scenario: Vendor parts left when the limit is reached are populated
+                   later
+
+        | GIVEN the Mouser limit is reached while populating vendor parts
+        | WHEN the task populating the vendor parts runs
+        | THEN the task is requeued for the vendor parts left
+        """
+        mock_populate_many = Mock(
+            side_effect=[
+                MouserService.RateLimited(retry_after=0.01, vendor_part_pks=[3]),
+                None,
+            ]
+        )
+        monkeypatch.setattr(MouserService, "populate_many", mock_populate_many)
+        populate_mouser_vendor_parts.send([1, 2, 3])
+
+        broker.join("default")
+        worker.join()
+        assert [call.args[0] for call in mock_populate_many.call_args_list] == [
+            [1, 2, 3],
+            [3],
+        ]
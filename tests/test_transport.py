@@ -0,0 +1,213 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+
+import pytest
+from django.test import override_settings
+
+from django_ctb.github.services import GithubService
+from django_ctb.transport import (
+    HttpTransport,
+    LocalTransport,
+    get_transport,
+    override_transport,
+)
+
+
+class _Server(ThreadingHTTPServer):
+    statuses: list[int]
+    requests: list[tuple[str, str, tuple]]
+    url: str
+
+
+@pytest.fixture
+def server():
+    """Local HTTP server which answers with the queued statuses, then 200"""
+    statuses: list[int] = []
+    requests: list[tuple[str, str, tuple]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self):
+            requests.append((self.command, self.path, self.client_address))
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            status = statuses.pop(0) if statuses else 200
+            body = b'{"sha": "asdf"}'
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = _respond
+        do_POST = _respond
+
+        def log_message(self, *args):
+            pass
+
+    httpd = _Server(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.statuses = statuses
+    httpd.requests = requests
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHttpTransport:
+    """
+    :feature: Requests to external services share a pooled transport which
+              retries rate limited and failed requests
+    """
+
+    @pytest.fixture
+    def transport(self):
+        transport = HttpTransport(timeout=5, max_retries=3, backoff_factor=0)
+        yield transport
+        transport.close()
+
+    @pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+    def test_retry(self, transport, server, status):
+        """
+        :scenario: Rate limited and server error responses are retried
+
+        | GIVEN an external service responds with a retryable status
+        | AND then responds successfully
+        | WHEN a request is made through the transport
+        | THEN the request is retried
+        | AND the successful response is returned
+        | AND the timing of the request records the retry
+        """
+        server.statuses.extend([status])
+        response = transport.get(f"{server.url}/commits/asdf")
+        assert response.status_code == 200
+        assert response.json() == {"sha": "asdf"}
+        assert len(server.requests) == 2
+        (timing,) = transport.timings
+        assert timing.method == "GET"
+        assert timing.path == "/commits/asdf"
+        assert timing.status_code == 200
+        assert timing.retries == 1
+        assert timing.elapsed > 0
+
+    def test_retry__exhausted(self, transport, server):
+        """
+        :scenario: The last response is returned when retries run out
+
+        | GIVEN an external service keeps responding with a server error
+        | WHEN a request is made through the transport
+        | THEN the request is retried until retries run out
+        | AND the server error response is returned
+        """
+        server.statuses.extend([503] * 10)
+        response = transport.get(f"{server.url}/search")
+        assert response.status_code == 503
+        assert len(server.requests) == 4
+
+    @pytest.mark.parametrize("status", [429, 503])
+    def test_no_retry__post(self, transport, server, status):
+        """
+        :scenario: POST requests are not retried
+
+        | GIVEN an external service responds to a POST with a retryable status
+        | WHEN the POST is made through the transport
+        | THEN the request is not retried
+        | AND the response is returned
+        """
+        server.statuses.extend([status])
+        response = transport.post(f"{server.url}/search", data="{}")
+        assert response.status_code == status
+        assert len(server.requests) == 1
+
+    def test_no_retry__client_error(self, transport, server):
+        """
+        :scenario: Client errors are not retried
+
+        | GIVEN an external service responds with not found
+        | WHEN a request is made through the transport
+        | THEN the request is not retried
+        """
+        server.statuses.extend([404, 404])
+        response = transport.get(f"{server.url}/branches/asdf")
+        assert response.status_code == 404
+        assert len(server.requests) == 1
+
+    def test_keep_alive(self, transport, server):
+        """
+        :scenario: Connections are reused between requests
+
+        | GIVEN several requests are made to the same host
+        | WHEN the requests are made through the transport
+        | THEN they share one connection
+        """
+        for _ in range(3):
+            transport.get(f"{server.url}/tags")
+        assert len({address for *_, address in server.requests}) == 1
+
+    def test_default_timeout(self):
+        """
+        :scenario: Requests are made with the configured timeout
+
+        | GIVEN a transport with a timeout
+        | WHEN a request is made without a timeout
+        | THEN the configured timeout is used
+        """
+        handler = Mock()
+        LocalTransport(handler, timeout=3).get("https://example.com/", timeout=None)
+        LocalTransport(handler, timeout=3).get("https://example.com/")
+        assert handler.call_args_list[0].kwargs == {"timeout": None}
+        assert handler.call_args_list[1].kwargs == {"timeout": 3}
+
+
+class TestSharedTransport:
+    """
+    :feature: Integrations use a shared transport which can be swapped out
+    """
+
+    def test_override_transport(self):
+        """
+        :scenario: A stand-in transport receives the requests of integrations
+
+        | GIVEN a local stand-in transport is in use
+        | WHEN a GitHub commit is requested
+        | THEN the stand-in transport receives the request
+        | AND the shared transport is restored afterward
+        """
+        shared = get_transport()
+        handler = Mock(
+            return_value=Mock(status_code=200, json=lambda: {"sha": "x"}, headers={})
+        )
+        with override_transport(LocalTransport(handler)) as transport:
+            assert get_transport() is transport
+            commit_hash = GithubService()._get_commit_hash(
+                url_prefix="https://api.github.com/repos/user/repo", commit_ref="x"
+            )
+        assert commit_hash == "x"
+        handler.assert_called_once()
+        assert handler.call_args.args == (
+            "GET",
+            "https://api.github.com/repos/user/repo/commits/x",
+        )
+        assert handler.call_args.kwargs["timeout"] == transport.timeout
+        assert transport.timings[0].host == "api.github.com"
+        assert get_transport() is shared
+
+    def test_setting_changed(self):
+        """
+        :scenario: The shared transport follows its settings
+
+        | GIVEN the shared transport is in use
+        | WHEN the HTTP settings are changed
+        | THEN a new shared transport is built from the settings
+        """
+        shared = get_transport()
+        with override_settings(CTB_HTTP_TIMEOUT=1.5):
+            assert get_transport() is not shared
+            assert get_transport().timeout == 1.5
+        assert get_transport().timeout != 1.5